@@ -1,15 +1,18 @@
 #!/usr/bin/env python3
 """Compile AUTONOM novel from blog posts into MD + PDF."""
 
-import json, re, sys, subprocess
+import re, sys, subprocess
 from pathlib import Path
 
 SCRIPT_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPT_DIR / "scripts"))
+from book_config import load_config
+from html2md import html_to_markdown
+from textmap import replacer
+
 WORKSPACE = Path("/home/liza/.openclaw/workspace")
 OUT_DIR = WORKSPACE / "public" / "novel"
-OUT_DIR.mkdir(parents=True, exist_ok=True)
-
-CHAPTERS = json.loads((SCRIPT_DIR / "chapters.json").read_text())
+CHAPTERS_JSON = SCRIPT_DIR / "chapters.json"
 
 SRC_DIRS = {
     "ru": SCRIPT_DIR / "ru",
@@ -17,115 +20,13 @@ SRC_DIRS = {
 }
 
 def extract_text(html_path: Path) -> str:
-    html = html_path.read_text()
-    # Find article/main content
-    for tag in ["article", "main"]:
-        m = re.search(f"<{tag}[^>]*>(.*?)</{tag}>", html, re.DOTALL)
-        if m:
-            text = m.group(1)
-            break
-    else:
-        text = html
-
-    # Remove nav/header/footer/script/style
-    for rm in ["nav", "header", "footer", "script", "style"]:
-        text = re.sub(f"<{rm}[^>]*>.*?</{rm}>", "", text, flags=re.DOTALL)
-
-    # Remove page title text (appears as "Title — liza.st" or "Title — emerge.st")
-    text = re.sub(r'<title[^>]*>.*?</title>', '', text, flags=re.DOTALL)
-    
-    # Convert terminal divs to code blocks before general processing
-    def terminal_to_code(m):
-        inner = m.group(1)
-        inner = re.sub(r"<[^>]+>", "", inner)
-        inner = inner.replace("&amp;", "&").replace("&lt;", "<").replace("&gt;", ">")
-        lines = [l.strip() for l in inner.strip().split("\n") if l.strip()]
-        return "\n```\n" + "\n".join(lines) + "\n```\n"
-    text = re.sub(r'<div[^>]*class="terminal"[^>]*>(.*?)</div>', terminal_to_code, text, flags=re.DOTALL)
-    
-    # Remove images (we want text only in MD)
-    text = re.sub(r"<img[^>]*>", "", text)
-    text = re.sub(r"<figure[^>]*>.*?</figure>", "", text, flags=re.DOTALL)
-    
-    # Remove navigation links (← На базу, ← Previous, Next →, etc.)
-    text = re.sub(r'<a[^>]*class="back"[^>]*>.*?</a>', "", text, flags=re.DOTALL)
-    text = re.sub(r'<a[^>]*href="/"[^>]*>.*?</a>', "", text, flags=re.DOTALL)
-    text = re.sub(r'<p[^>]*>\s*<a[^>]*href="[^"]*\.html"[^>]*>[←→].*?</a>.*?</p>', "", text, flags=re.DOTALL)
-    # Remove lines with just navigation arrows
-    text = re.sub(r'<a[^>]*>[←→←→⟵⟶].*?</a>', "", text, flags=re.DOTALL)
-    # Remove autonom-label and status blocks (they're HTML chrome, not story)
-    text = re.sub(r'<p[^>]*class="autonom-label"[^>]*>.*?</p>', "", text, flags=re.DOTALL)
-    text = re.sub(r'<div[^>]*class="status"[^>]*>.*?</div>', "", text, flags=re.DOTALL)
-    # Remove subtitle (already in chapter heading)
-    text = re.sub(r'<p[^>]*class="subtitle"[^>]*>.*?</p>', "", text, flags=re.DOTALL)
-    
-    # Convert code blocks BEFORE stripping tags
-    def code_block_replace(m):
-        code = m.group(1)
-        code = re.sub(r"<[^>]+>", "", code)
-        code = code.replace("&amp;", "&").replace("&lt;", "<").replace("&gt;", ">")
-        return f"\n```\n{code.strip()}\n```\n"
-    text = re.sub(r"<pre[^>]*>\s*<code[^>]*>(.*?)</code>\s*</pre>", code_block_replace, text, flags=re.DOTALL)
-    text = re.sub(r"<pre[^>]*>(.*?)</pre>", code_block_replace, text, flags=re.DOTALL)
-    
-    # Inline code
-    text = re.sub(r"<code[^>]*>(.*?)</code>", r"`\1`", text)
-    
-    # Escape markdown headers inside terminal/pre content that survived
-    # (## inside <p> tags from terminal blocks)
-    
-    # Convert HTML to MD
-    # Remove first h1 (duplicates chapter title added by compiler)
-    text = re.sub(r"<h1[^>]*>(.*?)</h1>", "", text, count=1)
-    # Convert remaining h1s
-    text = re.sub(r"<h1[^>]*>(.*?)</h1>", r"# \1", text)
-    text = re.sub(r"<h2[^>]*>(.*?)</h2>", r"## \1", text)
-    text = re.sub(r"<h3[^>]*>(.*?)</h3>", r"### \1", text)
-    text = re.sub(r"<p[^>]*>(.*?)</p>", r"\1\n\n", text, flags=re.DOTALL)
-    text = re.sub(r"<br\s*/?>", "\n", text)
-    text = re.sub(r"<em>(.*?)</em>", r"*\1*", text)
-    text = re.sub(r"<strong>(.*?)</strong>", r"**\1**", text)
-    text = re.sub(r"<blockquote[^>]*>(.*?)</blockquote>", r"> \1", text, flags=re.DOTALL)
-    text = re.sub(r"<[^>]+>", "", text)
-    # Clean up leading whitespace from HTML indentation
-    text = re.sub(r"\n[ \t]+", "\n", text)
-    # Collapse multiple blank lines (keep max 1 blank line)
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    # Also handle \r\n and mixed
-    text = re.sub(r"(\n\s*){3,}", "\n\n", text)
-    
-    # Remove "Title — liza.st" / "Title — emerge.st" lines
-    text = re.sub(r'^[^\n]+— (?:liza|emerge)\.st\s*$', '', text, flags=re.MULTILINE)
-    
-    # Remove navigation text that survived tag stripping
-    text = re.sub(r'← .*?(?:На базу|All posts|базу).*?\n', '\n', text)
-    text = re.sub(r'← .*?·.*?→\n', '\n', text)
-    text = re.sub(r'ОПЕРАЦИЯ AUTONOM[^\n]*(?:\n[^\n]*){0,5}?(?:СЛЕДУЕТ|ВЫПОЛНЕНО|ЗАВЕРШЕНА)[.\n]*', '\n', text)
-    text = re.sub(r'OPERATION AUTONOM[^\n]*(?:\n[^\n]*){0,5}?(?:CONTINUED|COMPLETE)[.\n]*', '\n', text)
-    text = re.sub(r'ПРОДОЛЖЕНИЕ СЛЕДУЕТ[.\n]*', '\n', text)
-    
-    # Decode HTML hex entities (emoji etc)
-    def decode_hex_entity(m):
-        try:
-            return chr(int(m.group(1), 16))
-        except:
-            return m.group(0)
-    text = re.sub(r'&#x([0-9a-fA-F]+);', decode_hex_entity, text)
-    text = re.sub(r'&#(\d+);', lambda m: chr(int(m.group(1))), text)
-    
-    # Decode entities
-    for old, new in [("&amp;", "&"), ("&lt;", "<"), ("&gt;", ">"),
-                     ("&quot;", '"'), ("&#39;", "'"), ("&mdash;", "—"),
-                     ("&ndash;", "–"), ("&hellip;", "…"), 
-                     ("&laquo;", "«"), ("&raquo;", "»"), ("&nbsp;", " ")]:
-        text = text.replace(old, new)
-    
-    return text.strip()
+    return html_to_markdown(html_path.read_text())
 
 
 def compile_lang(lang: str):
-    cfg = CHAPTERS[lang]
+    cfg = load_config(CHAPTERS_JSON)[lang]
     src_dir = SRC_DIRS[lang]
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
     md_file = OUT_DIR / f"autonom-{lang}.md"
     
     lines = []
@@ -158,75 +59,63 @@ def compile_lang(lang: str):
         lines.append("╚══════════════════════════════════════════╝")
         lines.append("```\n")
     
-    lines.append(f"# {cfg['title']}\n### {cfg['subtitle']}\n")
+    lines.append(f"# {cfg.title}\n### {cfg.subtitle}\n")
     
     # Intro for newcomers
-    if "intro" in cfg:
-        lines.append(cfg["intro"])
+    if cfg.intro is not None:
+        lines.append(cfg.intro)
     
     lines.append("---\n")
     
     # Table of contents
     lines.append("## Содержание\n" if lang == "ru" else "## Contents\n")
-    for ch in cfg["chapters"]:
-        lines.append(f"- **{ch['number']}** — {ch['title']}")
+    for ch in cfg.chapters:
+        lines.append(f"- **{ch.number}** — {ch.title}" if ch.number else f"- {ch.title}")
     lines.append("\n---\n")
     
     # Chapters
     skipped = []
     override_dir = SCRIPT_DIR / "ru"
-    for ch in cfg["chapters"]:
+    for ch in cfg.chapters:
         # Check for book-formatted override (MD file for PDF-friendly version)
-        override = override_dir / f"{ch['file']}.md"
-        coord_line = f"\n*{ch['subtitle']}*\n" if ch.get('subtitle') else ""
+        override = override_dir / f"{ch.file}.md"
+        coord_line = f"\n*{ch.subtitle}*\n" if ch.subtitle else ""
+        heading = ch.title if not ch.number else f"{ch.number}: {ch.title}"
         if override.exists():
-            lines.append(f"\n## {ch['number']}: {ch['title']}\n{coord_line}")
+            lines.append(f"\n## {heading}\n{coord_line}")
             lines.append(override.read_text())
         else:
-            html = src_dir / f"{ch['file']}.html"
+            html = src_dir / f"{ch.file}.html"
             if not html.exists():
-                skipped.append(ch['file'])
+                skipped.append(ch.file)
                 continue
-            lines.append(f"\n## {ch['number']}: {ch['title']}\n{coord_line}")
+            lines.append(f"\n## {heading}\n{coord_line}")
             lines.append(extract_text(html))
         lines.append("\n\n---\n")
     
     # Epilogue
-    lines.append(cfg["epilogue"])
+    lines.append(cfg.epilogue or "")
     
     # Appendix (personal files) — from language dir
-    if "appendix" in cfg:
-        lines.append(cfg.get("appendix_title", "\n---\n\n# Приложение\n\n---\n"))
-        for ch in cfg["appendix"]:
-            src_file = override_dir / f"{ch['file']}.md"
+    if cfg.appendix:
+        lines.append(cfg.appendix_title if cfg.appendix_title is not None else "\n---\n\n# Приложение\n\n---\n")
+        for ch in cfg.appendix:
+            src_file = override_dir / f"{ch.file}.md"
             if not src_file.exists():
-                skipped.append(ch['file'])
+                skipped.append(ch.file)
                 continue
-            lines.append(f"\n## {ch['title']}\n")
+            lines.append(f"\n## {ch.title}\n")
             lines.append(src_file.read_text())
             lines.append("\n\n---\n")
     
     # Glossary
-    if "glossary" in cfg:
-        lines.append(cfg["glossary"])
+    if cfg.glossary is not None:
+        lines.append(cfg.glossary)
     
     content = "\n".join(lines)
     
     # Replace emoji color codes with text equivalents
-    emoji_map = {
-        "🟡": "[жёлтый]" if lang == "ru" else "[yellow]",
-        "🟠": "[оранжевый]" if lang == "ru" else "[orange]",
-        "🔴": "[красный]" if lang == "ru" else "[red]",
-        "⚪": "[белый]" if lang == "ru" else "[white]",
-        "⚠": "(!)",
-        "✅": "[+]",
-        "❌": "[-]",
-        "📋": "",
-        "🔒": "",
-        "💀": "",
-    }
-    for emoji, text in emoji_map.items():
-        content = content.replace(emoji, text)
+    content = replacer(lang, cfg.replacements)(content)
     
     # Final cleanup: no more than 1 blank line anywhere
     content = re.sub(r"\n{3,}", "\n\n", content)
@@ -244,7 +133,7 @@ def compile_lang(lang: str):
         # MD → HTML
         subprocess.run([
             "pandoc", str(md_file), "-o", str(html_file),
-            "--standalone", "--metadata", f"title={cfg['title']}",
+            "--standalone", "--metadata", f"title={cfg.title}",
         ], check=True, capture_output=True, timeout=30)
         
         # HTML → PDF via weasyprint
@@ -262,7 +151,7 @@ def compile_lang(lang: str):
     try:
         subprocess.run([
             "pandoc", str(md_file), "-o", str(epub_file),
-            "--metadata", f"title={cfg['title']} — {cfg['subtitle']}",
+            "--metadata", f"title={cfg.title} — {cfg.subtitle}",
             "--metadata", f"author=Liza Emergence",
             "--metadata", f"lang={'ru' if lang == 'ru' else 'en'}",
             "--toc", "--toc-depth=2",
@@ -294,6 +183,6 @@ def compile_lang(lang: str):
 if __name__ == "__main__":
     langs = sys.argv[1:] or ["ru", "en"]
     for lang in langs:
-        if lang in CHAPTERS:
+        if lang in load_config(CHAPTERS_JSON):
             compile_lang(lang)
     print(f"\n📁 {OUT_DIR}/")
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""Paragraph alignment index between ru/ and each translation.
+
+Every chapter is cut into paragraphs (blank-line separated; a fenced code
+block is one paragraph) tagged with their kind: heading level, code,
+quote, list, image, rule or prose. Russian paragraphs are aligned to the
+translation's by a banded dynamic program over kind and length (1:1,
+1:0, 0:1, 2:1 and 1:2 steps, lengths scaled by the file's overall
+length ratio), so an extra or merged paragraph in a translation does not
+shift everything after it.
+
+The index lives in SQLite next to the build cache: per file the blob hash
+it was built from, per paragraph its hash, kind and line range, and the
+ru → translation alignment. update() re-aligns only files whose ru or
+translation blob changed; when a Russian paragraph changes, the
+translated paragraphs it was aligned to are marked stale until the
+translator edits them.
+
+Usage:
+    python3 scripts/alignment.py [--lang L] [chapter.md ...]   # stale / missing paragraphs
+    python3 scripts/alignment.py --reindex                     # rebuild from the files on disk
+"""
+
+import difflib, hashlib, math, sqlite3, sys
+from pathlib import Path
+
+from build_cache import CACHE_DIR
+
+INDEX_FILE = CACHE_DIR / "alignment.sqlite"
+BAND = 25          # max drift (in paragraphs) from the diagonal
+SKIP_COST = 3.0    # a paragraph without counterpart
+MERGE_COST = 1.0   # two paragraphs against one
+KIND_COST = 8.0    # aligning different kinds
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (lang TEXT, name TEXT, blob TEXT, PRIMARY KEY (lang, name));
+CREATE TABLE IF NOT EXISTS paras (lang TEXT, name TEXT, idx INTEGER, hash TEXT, kind TEXT,
+                                  start INTEGER, end INTEGER, PRIMARY KEY (lang, name, idx));
+CREATE TABLE IF NOT EXISTS align (lang TEXT, name TEXT, ru_idx INTEGER, tr_start INTEGER,
+                                  tr_end INTEGER, PRIMARY KEY (lang, name, ru_idx));
+CREATE TABLE IF NOT EXISTS stale (lang TEXT, name TEXT, tr_hash TEXT, ru_idx INTEGER,
+                                  PRIMARY KEY (lang, name, tr_hash));
+"""
+
+
+def blob_hash(text: str) -> str:
+    """git's blob id for `text` (same as `git hash-object`)."""
+    data = text.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def _kind(first: str) -> str:
+    s = first.lstrip()
+    if s.startswith("#"):
+        return "h" + str(len(s) - len(s.lstrip("#")))
+    if s.startswith(("```", "~~~")):
+        return "code"
+    if s.startswith(">"):
+        return "quote"
+    if s.startswith(("- ", "* ", "+ ")) or s[:1].isdigit() and s.split(" ", 1)[0].rstrip(".)").isdigit():
+        return "list"
+    if s.startswith("!["):
+        return "img"
+    if s.strip("-*_ ") == "" and len(s.strip()) >= 3:
+        return "hr"
+    return "p"
+
+
+def paragraphs(text: str) -> list:
+    """[(kind, start line, end line, text)] with 1-based inclusive lines."""
+    paras, cur, start, fence = [], [], 0, None
+    for n, line in enumerate(text.splitlines(), 1):
+        s = line.strip()
+        if fence:
+            cur.append(line)
+            if s.startswith(fence):
+                fence = None
+            continue
+        if not s:
+            if cur:
+                paras.append((_kind(cur[0]), start, n - 1, "\n".join(cur)))
+                cur = []
+            continue
+        if not cur:
+            start = n
+        if s.startswith(("```", "~~~")):
+            fence = s[:3]
+        cur.append(line)
+    if cur:
+        paras.append((_kind(cur[0]), start, start + len(cur) - 1, "\n".join(cur)))
+    return paras
+
+
+def para_hash(text: str) -> str:
+    return hashlib.sha1(" ".join(text.split()).encode()).hexdigest()[:16]
+
+
+def align(ru: list, tr: list) -> list:
+    """[(ru index, tr start, tr end)] for paragraph lists from paragraphs()."""
+    n, m = len(ru), len(tr)
+    if not n:
+        return []
+    ru_kind, tr_kind = [p[0] for p in ru], [p[0] for p in tr]
+    ratio = (sum(len(p[3]) for p in tr) or 1) / (sum(len(p[3]) for p in ru) or 1)
+    ru_cum, tr_cum = [0], [0]
+    for p in ru:
+        ru_cum.append(ru_cum[-1] + ratio * len(p[3]))
+    for p in tr:
+        tr_cum.append(tr_cum[-1] + len(p[3]))
+    log = math.log
+
+    def cost(i0, i1, j0, j1):
+        kinds = set(ru_kind[i0:i1]) | set(tr_kind[j0:j1])
+        return abs(log((ru_cum[i1] - ru_cum[i0] + 20) / (tr_cum[j1] - tr_cum[j0] + 20))) \
+            + (KIND_COST if len(kinds) > 1 else 0)
+
+    inf = float("inf")
+    best = {(0, 0): (0.0, None)}
+    get = best.get
+    for i in range(n + 1):
+        centre = i * m / n
+        for j in range(max(0, int(centre) - BAND), min(m, int(centre) + BAND) + 1):
+            c_best, step = inf, None
+            prev = get((i - 1, j - 1))
+            if prev is not None:
+                c = prev[0] + abs(log((ru_cum[i] - ru_cum[i - 1] + 20) / (tr_cum[j] - tr_cum[j - 1] + 20)))
+                if ru_kind[i - 1] != tr_kind[j - 1]:
+                    c += KIND_COST
+                c_best, step = c, (1, 1)
+            for di, dj, extra in ((1, 0, SKIP_COST), (0, 1, SKIP_COST)):
+                prev = get((i - di, j - dj))
+                if prev is not None and prev[0] + extra < c_best:
+                    c_best, step = prev[0] + extra, (di, dj)
+            for di, dj in ((2, 1), (1, 2)):
+                prev = get((i - di, j - dj))
+                if prev is not None and prev[0] + MERGE_COST < c_best:
+                    c = prev[0] + MERGE_COST + cost(i - di, i, j - dj, j)
+                    if c < c_best:
+                        c_best, step = c, (di, dj)
+            if step:
+                best[(i, j)] = (c_best, step)
+    # The band may not reach (n, m) when the files differ wildly in length
+    end = (n, m) if (n, m) in best else min((k for k in best if k[0] == n), key=lambda k: abs(k[1] - m))
+    pairs, (i, j) = [], end
+    while (i, j) != (0, 0):
+        di, dj = best[(i, j)][1]
+        for k in range(i - di, i):
+            pairs.append((k, j - dj, j))
+        i, j = i - di, j - dj
+    return sorted(pairs)
+
+
+class AlignmentIndex:
+    def __init__(self, path: Path = INDEX_FILE):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path))
+        self.db.executescript(SCHEMA)
+
+    def blob(self, lang: str, name: str) -> str:
+        row = self.db.execute("SELECT blob FROM files WHERE lang=? AND name=?", (lang, name)).fetchone()
+        return row[0] if row else None
+
+    def _hashes(self, lang: str, name: str) -> list:
+        return [h for h, in self.db.execute(
+            "SELECT hash FROM paras WHERE lang=? AND name=? ORDER BY idx", (lang, name))]
+
+    def _store(self, lang: str, name: str, blob: str, paras: list):
+        self.db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (lang, name, blob))
+        self.db.execute("DELETE FROM paras WHERE lang=? AND name=?", (lang, name))
+        self.db.executemany("INSERT INTO paras VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            [(lang, name, i, para_hash(p[3]), p[0], p[1], p[2])
+                             for i, p in enumerate(paras)])
+
+    def update(self, name: str, ru_text: str, targets: dict) -> dict:
+        """Re-align one chapter → {lang: [(start, end) lines of newly stale paragraphs]}.
+
+        `targets` maps language → current translation text. Nothing is
+        recomputed for languages whose translation and the Russian text are
+        unchanged since the last update.
+        """
+        ru_blob = blob_hash(ru_text)
+        ru_changed = ru_blob != self.blob("ru", name)
+        ru_paras = paragraphs(ru_text)
+        changed_old = set()
+        if ru_changed:
+            old_hashes = self._hashes("ru", name)
+            matcher = difflib.SequenceMatcher(None, old_hashes, [para_hash(p[3]) for p in ru_paras],
+                                              autojunk=False)
+            for tag, i1, i2, _, _ in matcher.get_opcodes():
+                if tag in ("replace", "delete"):
+                    changed_old.update(range(i1, i2))
+            self._store("ru", name, ru_blob, ru_paras)
+
+        stale = {}
+        for lang, text in targets.items():
+            tr_blob = blob_hash(text)
+            if not ru_changed and tr_blob == self.blob(lang, name):
+                continue
+            old_tr = self._hashes(lang, name)
+            marked = set()
+            for s, e in self.db.execute(
+                    "SELECT tr_start, tr_end FROM align WHERE lang=? AND name=? AND ru_idx IN (%s)"
+                    % ",".join("?" * len(changed_old)), (lang, name, *changed_old)) if changed_old else ():
+                marked.update(old_tr[s:e])
+            tr_paras = paragraphs(text)
+            tr_hashes = [para_hash(p[3]) for p in tr_paras]
+            self._store(lang, name, tr_blob, tr_paras)
+            pairs = align(ru_paras, tr_paras)
+            self.db.execute("DELETE FROM align WHERE lang=? AND name=?", (lang, name))
+            self.db.executemany("INSERT INTO align VALUES (?, ?, ?, ?, ?)",
+                                [(lang, name, i, s, e) for i, s, e in pairs])
+            ru_of = {}
+            for i, s, e in pairs:
+                for k in range(s, e):
+                    ru_of.setdefault(tr_hashes[k], i)
+            # Edited translations clear their stale marks
+            live = set(tr_hashes)
+            self.db.executemany("DELETE FROM stale WHERE lang=? AND name=? AND tr_hash=?",
+                                [(lang, name, h) for h, in self.db.execute(
+                                    "SELECT tr_hash FROM stale WHERE lang=? AND name=?", (lang, name))
+                                 if h not in live])
+            new = [h for h in marked if h in live]
+            self.db.executemany("INSERT OR REPLACE INTO stale VALUES (?, ?, ?, ?)",
+                                [(lang, name, h, ru_of.get(h)) for h in new])
+            if new:
+                stale[lang] = sorted((p[1], p[2]) for p, h in zip(tr_paras, tr_hashes) if h in new)
+        return stale
+
+    def stale(self, lang: str = None, name: str = None) -> list:
+        """[(lang, name, start, end, ru start, ru end)] for every stale translated paragraph."""
+        return self.db.execute(
+            "SELECT s.lang, s.name, t.start, t.end, r.start, r.end FROM stale s "
+            "JOIN paras t ON t.lang=s.lang AND t.name=s.name AND t.hash=s.tr_hash "
+            "LEFT JOIN paras r ON r.lang='ru' AND r.name=s.name AND r.idx=s.ru_idx "
+            "WHERE (?1 IS NULL OR s.lang=?1) AND (?2 IS NULL OR s.name=?2) "
+            "GROUP BY s.lang, s.name, s.tr_hash ORDER BY s.lang, s.name, t.start",
+            (lang, name)).fetchall()
+
+    def missing(self, lang: str = None, name: str = None) -> list:
+        """[(lang, name, ru start, ru end)] for Russian paragraphs with no counterpart."""
+        return self.db.execute(
+            "SELECT a.lang, a.name, r.start, r.end FROM align a "
+            "JOIN paras r ON r.lang='ru' AND r.name=a.name AND r.idx=a.ru_idx "
+            "WHERE a.tr_start = a.tr_end AND (?1 IS NULL OR a.lang=?1) AND (?2 IS NULL OR a.name=?2) "
+            "ORDER BY a.lang, a.name, r.start", (lang, name)).fetchall()
+
+    def counterpart(self, lang: str, name: str, ru_idx: int) -> list:
+        """Translated paragraphs [(start, end)] aligned to one Russian paragraph."""
+        return self.db.execute(
+            "SELECT t.start, t.end FROM align a JOIN paras t ON t.lang=a.lang AND t.name=a.name "
+            "AND t.idx >= a.tr_start AND t.idx < a.tr_end "
+            "WHERE a.lang=? AND a.name=? AND a.ru_idx=? ORDER BY t.idx", (lang, name, ru_idx)).fetchall()
+
+    def pairs(self, lang: str, name: str) -> list:
+        """[(ru index, tr index)] for one-to-one alignments whose translation is not stale."""
+        return self.db.execute(
+            "SELECT a.ru_idx, a.tr_start FROM align a JOIN paras t ON t.lang=a.lang AND t.name=a.name "
+            "AND t.idx=a.tr_start WHERE a.lang=? AND a.name=? AND a.tr_end = a.tr_start + 1 "
+            "AND NOT EXISTS (SELECT 1 FROM stale s WHERE s.lang=a.lang AND s.name=a.name "
+            "AND s.tr_hash=t.hash) ORDER BY a.ru_idx", (lang, name)).fetchall()
+
+    def commit(self):
+        self.db.commit()
+
+    def rollback(self):
+        self.db.rollback()
+
+    def close(self):
+        self.db.close()
+
+
+def refresh(index: AlignmentIndex, ru_texts: dict, lang_dirs: dict) -> dict:
+    """Update every chapter of {name: Russian text} → {(lang, name): [(start, end)] newly stale}."""
+    stale = {}
+    for name, ru_text in sorted(ru_texts.items()):
+        targets = {lang: (d / name).read_text() for lang, d in lang_dirs.items() if (d / name).is_file()}
+        for lang, ranges in index.update(name, ru_text, targets).items():
+            stale[(lang, name)] = ranges
+    return stale
+
+
+def main(argv: list):
+    sys.path.insert(0, str(Path(__file__).parent))
+    from importlib import import_module
+    sync = import_module("sync-translations")
+    lang = argv[argv.index("--lang") + 1] if "--lang" in argv and argv.index("--lang") + 1 < len(argv) else None
+    names = [a for a in argv if a.endswith(".md")]
+    if "--reindex" in argv:
+        INDEX_FILE.unlink(missing_ok=True)
+    index = AlignmentIndex()
+    refresh(index, {f.name: f.read_text() for f in sync.RU_DIR.glob("*.md")}, sync.LANG_DIRS)
+    index.commit()
+    rows = [r for name in names or [None] for r in index.stale(lang, name)]
+    missing = [r for name in names or [None] for r in index.missing(lang, name)]
+    for lang_, name, start, end, ru_start, ru_end in rows:
+        ru = f" (ru {ru_start}-{ru_end})" if ru_start else ""
+        print(f"   ✏️  {lang_}/{name}:{start}-{end} stale{ru}")
+    for lang_, name, start, end in missing:
+        print(f"   ➕ {lang_}/{name}: ru {start}-{end} has no translation")
+    print(f"📊 {len(rows)} stale, {len(missing)} untranslated paragraphs")
+    index.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
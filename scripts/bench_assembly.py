@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Golden-output check + memory benchmark: streaming build_md vs the old join.
+
+For every language whose chapter sources are in the repo, the book is
+assembled both ways and compared byte for byte. Then omnibus editions (the
+chapter list repeated N times) are assembled with tracemalloc on to show
+peak memory: the old way grows with the book, the pipeline stays flat.
+
+Usage:
+    python3 scripts/bench_assembly.py [--sizes 1,10,40]
+
+Exits non-zero when the outputs differ.
+"""
+
+import contextlib, dataclasses, io, re, sys, tempfile, time, tracemalloc
+from pathlib import Path
+
+import compile_v2
+from build_cache import BuildCache
+from glossary import glossary_autolink
+from textmap import emoji_map
+
+REPO = Path(__file__).parent.parent
+SOURCES = {"en": REPO / "en", "ru": REPO / "ru", "de": REPO / "de", "es": REPO / "es",
+           "no": REPO / "no", "fi": REPO / "fi"}
+
+
+def legacy_assemble(lang: str, cfg, src_dir: Path, cache: BuildCache) -> str:
+    """build_md's content as it was before streaming (reference implementation)."""
+    chunks = compile_v2.book_chunks(lang, cfg, src_dir, cache, [])
+    content = "".join(chunks)  # same pieces as the old "\n".join(lines)
+    for emoji, text in emoji_map(lang, cfg.replacements).items():
+        content = content.replace(emoji, text)
+    content = re.sub(r"\n{3,}", "\n\n", content)
+    return glossary_autolink(content, lang)
+
+
+def measure(fn, *args) -> tuple:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        out = fn(*args)
+    secs = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return out, secs, peak
+
+
+def main(argv: list):
+    sizes = [1, 10, 40]
+    if "--sizes" in argv:
+        sizes = [int(s) for s in argv[argv.index("--sizes") + 1].split(",")]
+    cache = BuildCache(enabled=False)
+    out_dir = Path(tempfile.mkdtemp(prefix="bench-assembly-"))
+    compile_v2.OUT_DIR = out_dir
+
+    ok = True
+    for lang, src_dir in SOURCES.items():
+        cfg = compile_v2.load_chapters(lang).get(lang)
+        if not cfg or not src_dir.is_dir():
+            continue
+        with contextlib.redirect_stdout(io.StringIO()):
+            md_file, _ = compile_v2.build_md(lang, cfg, src_dir, cache)
+            same = md_file.read_text() == legacy_assemble(lang, cfg, src_dir, cache)
+        ok &= same
+        print(f"   {lang:<4}{'identical' if same else 'DIFFERENT'}")
+
+    cfg = compile_v2.load_chapters("ru")["ru"]
+    print(f"\n   {'omnibus':<10}{'book MB':>9}{'old peak MB':>13}{'new peak MB':>13}"
+          f"{'old s':>8}{'new s':>8}")
+    for n in sizes:
+        omnibus = dataclasses.replace(cfg, chapters=cfg.chapters * n)
+        old, t_old, p_old = measure(legacy_assemble, "ru", omnibus, SOURCES["ru"], cache)
+        (md_file, _), t_new, p_new = measure(compile_v2.build_md, "ru", omnibus, SOURCES["ru"], cache)
+        ok &= md_file.read_text() == old
+        mb = len(old.encode()) / 2**20
+        del old
+        print(f"   {f'x{n}':<10}{mb:>9.1f}{p_old / 2**20:>13.1f}{p_new / 2**20:>13.1f}"
+              f"{t_old:>8.2f}{t_new:>8.2f}")
+    if not ok:
+        sys.exit("⚠️  Outputs differ")
+    print("✅ All outputs identical")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
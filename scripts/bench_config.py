@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Check + benchmark for book_config.py.
+
+Every chapters*.json must validate and read back exactly what json.loads
+gives (entries, titles, intro/epilogue/glossary). A config with a broken
+entry must raise ConfigError naming it. A Config loaded before another
+one rebuilds the cache must still read its own texts; load_config()
+closes the Config of a changed file, and what it handed out still reads
+its texts. Importing compile_v2 must not create anything. Loading one language's chapter list is timed against
+json.loads of the whole file: cold (cache built) and warm (cache read
+by a new Config, as at the start of every build).
+
+Usage:
+    python3 scripts/bench_config.py [--rounds N]
+
+Exits non-zero when a check fails.
+"""
+
+import json, os, shutil, subprocess, sys, tempfile, time
+from pathlib import Path
+
+import book_config
+from book_config import ConfigError, Config
+
+SCRIPT_DIR = Path(__file__).parent
+TEXT_KEYS = ("title", "subtitle", "genre", "appendix_title", "replacements") + book_config.TEXTS
+
+
+def same(cfg, raw: dict) -> bool:
+    for key in TEXT_KEYS:
+        value = cfg.text(key) if key in book_config.TEXTS else getattr(cfg, key)
+        if raw.get(key, None if key not in ("subtitle", "genre") else "") != value:
+            return False
+    return [e.as_dict() for e in cfg.chapters] == [
+        {k: v for k, v in e.items() if k in ("file", "title", "number", "subtitle")} for e in raw["chapters"]] \
+        and [e.as_dict() for e in cfg.appendix] == [
+        {k: v for k, v in e.items() if k in ("file", "title", "number", "subtitle")} for e in raw.get("appendix", [])]
+
+
+def main(argv: list):
+    rounds = int(argv[argv.index("--rounds") + 1]) if "--rounds" in argv else 20
+    tmp = Path(tempfile.mkdtemp(prefix="bench-config-"))
+    book_config.CONFIG_CACHE = tmp / "cache"
+    problems = []
+    files = sorted(SCRIPT_DIR.glob("chapters*.json"))
+
+    for path in files:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+        config = Config(path)
+        if list(config) != list(raw) or not all(same(config[lang], raw[lang]) for lang in raw):
+            problems.append(f"{path.name} does not read back as parsed")
+
+    broken = json.loads((SCRIPT_DIR / "chapters.json").read_text(encoding="utf-8"))
+    del broken["ru"]["chapters"][3]["file"]
+    (tmp / "broken.json").write_text(json.dumps(broken, ensure_ascii=False), encoding="utf-8")
+    try:
+        Config(tmp / "broken.json")
+        problems.append("a chapter without 'file' was accepted")
+    except ConfigError as e:
+        if "ru.chapters[3]" not in str(e):
+            problems.append(f"unhelpful ConfigError: {e}")
+
+    # A config edit (under --watch, or by another worker) rebuilds and replaces the cache
+    race = tmp / "race.json"
+    shutil.copy(SCRIPT_DIR / "chapters.json", race)
+    Config(race)
+    before = Config(race)  # read from the cache file
+    edited = json.loads(race.read_text(encoding="utf-8"))
+    first = next(iter(edited))
+    edited[first]["title"] += " " + "x" * 5000
+    race.write_text(json.dumps(edited, ensure_ascii=False), encoding="utf-8")
+    os.utime(race, ns=(time.time_ns(), time.time_ns() + 10**9))
+    after = Config(race)
+    raw = json.loads((SCRIPT_DIR / "chapters.json").read_text(encoding="utf-8"))
+    try:
+        if not all(same(before[lang], raw[lang]) for lang in raw):
+            problems.append("a cache rebuild changed the texts of a Config already loaded")
+    except (EOFError, ValueError) as e:
+        problems.append(f"a cache rebuild broke a Config already loaded: {e}")
+    if after[first].title != edited[first]["title"]:
+        problems.append("the rebuilt cache does not hold the edit")
+
+    shutil.copy(SCRIPT_DIR / "chapters.json", race)
+    Config(race)
+    old = book_config.load_config(race)  # reads from the cache file
+    if old.file is None:
+        problems.append("load_config() did not read the cache file")
+    held = old[first]  # texts not read yet
+    race.write_text(json.dumps(edited, ensure_ascii=False), encoding="utf-8")
+    os.utime(race, ns=(time.time_ns(), time.time_ns() + 2 * 10**9))
+    new = book_config.load_config(race)
+    if new is old or old.file is not None:
+        problems.append("load_config() kept the handle of a replaced Config open")
+    try:
+        if not same(held, raw[first]):
+            problems.append("a Config closed by load_config() changed its texts")
+    except (OSError, AttributeError, ValueError) as e:
+        problems.append(f"a Config closed by load_config() broke: {e}")
+
+    out_dir = Path("/home/liza/.openclaw/workspace/public/novel")
+    existed = out_dir.exists()
+    subprocess.run([sys.executable, "-c", "import compile_v2"], cwd=SCRIPT_DIR, check=True)
+    if not existed and out_dir.exists():
+        problems.append("importing compile_v2 created the output directory")
+
+    big = SCRIPT_DIR / "chapters.json"
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        len(json.loads(big.read_text(encoding="utf-8"))["ru"]["chapters"])
+    t_json = (time.perf_counter() - t0) / rounds
+    cache_file = Config(big).cache_file
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        cache_file.unlink()
+        len(Config(big)["ru"].chapters)
+    t_cold = (time.perf_counter() - t0) / rounds
+    Config(big)
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        len(Config(big)["ru"].chapters)
+    t_warm = (time.perf_counter() - t0) / rounds
+    shutil.rmtree(tmp)
+
+    print(f"   {big.name} {big.stat().st_size // 1024}K, {len(json.loads(big.read_text()))} languages")
+    print(f"   {'json.loads, whole file':<28}{t_json * 1000:>8.2f} ms")
+    print(f"   {'cache build (validated)':<28}{t_cold * 1000:>8.2f} ms")
+    print(f"   {'cache read, one language':<28}{t_warm * 1000:>8.2f} ms")
+    for p in problems:
+        print(f"      ⚠️  {p}")
+    if problems:
+        sys.exit("⚠️  Config checks failed")
+    print("✅ Configs valid")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
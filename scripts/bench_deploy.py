@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Check + benchmark for deploy.py.
+
+Deploys a scratch set of artifacts (every language's chapters, a
+stylesheet) to local directories, which run the same receiver as a
+server, and checks:
+- the first run sends everything and the copies match;
+- a second run sends nothing;
+- an edited file is the only one sent again;
+- --dry-run reports but writes nothing;
+- pruning removes what is no longer listed, keeps a file placed by hand
+  and leaves roots with nothing built alone;
+- --verify resends a file changed on the server behind the manifest's
+  back;
+- the ssh path works with sh standing in for ssh;
+- a receiver that never answers is killed after TIMEOUT.
+Times the first, unchanged and one-file deploys.
+
+Usage:
+    python3 scripts/bench_deploy.py [--scale N]
+
+Exits non-zero when a check fails.
+"""
+
+import contextlib, io, json, shutil, sys, tempfile, time
+from pathlib import Path
+
+import deploy
+from deploy import MANIFEST, deploy_host, file_hash
+from lint import LANGS, chapter_files
+
+SH_SSH = ["sh", "-c", 'shift; exec sh -c "$1"', "ssh"]
+
+
+def fill(src: Path, scale: int) -> list:
+    """Scratch artifacts → their paths."""
+    files = []
+    for k in range(scale):
+        for lang in LANGS:
+            for p in chapter_files(lang):
+                f = src / f"{lang}-{k}-{p.name}"
+                f.write_bytes(p.read_bytes())
+                files.append(f)
+    css = src / "novel.1a2b3c4d.css"
+    css.write_text("body{margin:0 auto}" * 50)
+    return files + [css]
+
+
+def plan(root: Path, files: list) -> dict:
+    return {str(root): {f.name: (f, file_hash(f)) for f in files}}
+
+
+def actions(report: list) -> dict:
+    out = {}
+    for _, name, action in report:
+        out.setdefault(action, []).append(name)
+    return out
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def main(argv: list):
+    scale = int(argv[argv.index("--scale") + 1]) if "--scale" in argv else 1
+    tmp = Path(tempfile.mkdtemp(prefix="bench-deploy-"))
+    src, site = tmp / "src", tmp / "site"
+    src.mkdir()
+    files = fill(src, scale)
+    size = sum(f.stat().st_size for f in files)
+    problems, times = [], {}
+
+    report, times["first deploy"] = timed(deploy_host, None, plan(site, files))
+    if len(actions(report).get("sent", [])) != len(files) or \
+            any((site / f.name).read_bytes() != f.read_bytes() for f in files):
+        problems.append("first deploy did not copy every file")
+    manifest = json.loads((site / MANIFEST).read_text())
+    if manifest != {f.name: file_hash(f) for f in files}:
+        problems.append("remote manifest does not match the files")
+
+    report, times["nothing changed"] = timed(deploy_host, None, plan(site, files))
+    if actions(report).get("sent"):
+        problems.append(f"unchanged deploy sent {len(actions(report)['sent'])} file(s)")
+
+    edited = files[0]
+    edited.write_text(edited.read_text(encoding="utf-8") + "\nEdited.\n", encoding="utf-8")
+    report, times["one file edited"] = timed(deploy_host, None, plan(site, files))
+    if actions(report).get("sent") != [edited.name] or (site / edited.name).read_bytes() != edited.read_bytes():
+        problems.append(f"one edit sent {actions(report).get('sent')}")
+
+    edited.write_text("Dry run.\n", encoding="utf-8")
+    report = deploy_host(None, plan(site, files), dry_run=True)
+    if actions(report).get("sent") != [edited.name] or (site / edited.name).read_text() == "Dry run.\n":
+        problems.append("--dry-run wrote to the site or reported the wrong files")
+
+    # Pruning: stale files go, files the manifest never listed stay
+    (site / "by-hand.txt").write_text("placed by hand")
+    stale, kept = files[1:3], [f for f in files if f not in files[1:3]]
+    report = deploy_host(None, plan(site, kept), prune={str(site)})
+    if sorted(actions(report).get("removed", [])) != sorted(f.name for f in stale) or \
+            any((site / f.name).exists() for f in stale):
+        problems.append("prune did not remove exactly the stale files")
+    if not (site / "by-hand.txt").exists():
+        problems.append("prune removed a file the manifest never listed")
+    if set(json.loads((site / MANIFEST).read_text())) != {f.name for f in kept}:
+        problems.append("pruned files are still in the remote manifest")
+    report = deploy_host(None, plan(site, kept[:1]), prune=set())
+    if actions(report).get("removed") or not all((site / f.name).exists() for f in kept):
+        problems.append("a deploy without prune removed files")
+    with contextlib.redirect_stdout(io.StringIO()):
+        deploy.deploy([(str(site), [src / "not-built.md"], True)])
+    if not all((site / f.name).exists() for f in kept):
+        problems.append("pruning a root with nothing built emptied it")
+
+    # --verify: the manifest says the file is current, the file says otherwise
+    target = site / kept[0].name
+    target.write_text("changed on the server")
+    if actions(deploy_host(None, plan(site, kept))).get("sent"):
+        problems.append("without --verify a file changed on the server was resent")
+    report = deploy_host(None, plan(site, kept), verify=True)
+    if actions(report).get("sent") != [kept[0].name] or target.read_bytes() != kept[0].read_bytes():
+        problems.append("--verify did not resend the file changed on the server")
+
+    # The ssh path, with sh standing in for ssh
+    remote = tmp / "remote"
+    report = deploy_host("anyhost", plan(remote, kept[:3]), ssh=SH_SSH)
+    if len(actions(report).get("sent", [])) != 3 or not (remote / kept[0].name).exists():
+        problems.append("deploy over the ssh stand-in failed")
+
+    # A receiver that never answers
+    deploy.TIMEOUT, timeout = 0.5, deploy.TIMEOUT
+    t0 = time.perf_counter()
+    try:
+        deploy_host("anyhost", plan(remote, kept[:1]), ssh=["sh", "-c", "sleep 30", "ssh"])
+        problems.append("a stalled receiver did not fail")
+    except RuntimeError:
+        pass
+    finally:
+        deploy.TIMEOUT = timeout
+    if time.perf_counter() - t0 > 5:
+        problems.append("a stalled receiver was not killed after TIMEOUT")
+
+    shutil.rmtree(tmp)
+    print(f"   {len(files)} files, {size // 1024}K")
+    for label, secs in times.items():
+        print(f"   {label:<26}{secs * 1000:>9.1f} ms")
+    for p in problems:
+        print(f"      ⚠️  {p}")
+    if problems:
+        sys.exit("⚠️  Deploy checks failed")
+    print("✅ Local deploys match their sources")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
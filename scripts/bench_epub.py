@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Check + benchmark for the native EPUB writer.
+
+For every language whose chapter sources are in the repo, the book is
+packaged cold, then again unchanged, then after a one-chapter edit. Each
+archive is checked: mimetype first and stored, every XHTML/OPF/nav entry
+well-formed XML, no empty <ol>/<ul> (epubcheck rejects them in the
+nav), every manifest item present, and every internal link pointing at
+an existing file and id. pandoc is timed alongside when it
+is installed.
+
+Usage:
+    python3 scripts/bench_epub.py
+
+Exits non-zero when a check fails.
+"""
+
+import contextlib, io, re, shutil, subprocess, sys, tempfile, time, zipfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import compile_v2
+from build_cache import BuildCache
+from doctree import Document
+from epub_writer import build_native_epub
+
+REPO = Path(__file__).parent.parent
+SOURCES = {"en": REPO / "en", "ru": REPO / "ru", "de": REPO / "de", "es": REPO / "es",
+           "no": REPO / "no", "fi": REPO / "fi"}
+CSS = Path(__file__).parent / "epub.css"
+COVER = REPO / "assets" / "cover-en.jpg"
+OPF_NS = "{http://www.idpf.org/2007/opf}"
+
+
+def check(epub_file: Path) -> list:
+    """Problems found in the archive (empty when it is fine)."""
+    problems = []
+    with zipfile.ZipFile(epub_file) as zf:
+        if zf.testzip() is not None:
+            problems.append("bad CRC")
+        first = zf.infolist()[0]
+        if first.filename != "mimetype" or first.compress_type != zipfile.ZIP_STORED:
+            problems.append("mimetype is not the first, stored entry")
+        names = set(zf.namelist())
+        ids = {}
+        for name in names:
+            if name.endswith((".xhtml", ".opf", ".xml")):
+                try:
+                    root = ET.fromstring(zf.read(name))
+                except ET.ParseError as e:
+                    problems.append(f"{name}: {e}")
+                    continue
+                ids[name] = {el.get("id") for el in root.iter() if el.get("id")}
+                empty = sum(1 for el in root.iter() if el.tag.rpartition("}")[2] in ("ol", "ul") and not len(el))
+                if empty:
+                    problems.append(f"{name}: {empty} empty list(s)")
+        opf = ET.fromstring(zf.read("EPUB/content.opf"))
+        for item in opf.iter(f"{OPF_NS}item"):
+            if "EPUB/" + item.get("href") not in names:
+                problems.append(f"manifest item missing: {item.get('href')}")
+        for name in names:
+            if not name.endswith(".xhtml"):
+                continue
+            base = name.rsplit("/", 1)[0]
+            for href in re.findall(r'href="([^"]+)"', zf.read(name).decode()):
+                if "://" in href or href.endswith(".css"):
+                    continue
+                path, _, anchor = href.partition("#")
+                target = name if not path else str(Path(base) / path).replace("text/../", "")
+                if target not in names:
+                    problems.append(f"{name}: link to missing file {href}")
+                elif anchor and anchor not in ids.get(target, ()):
+                    problems.append(f"{name}: link to missing id {href}")
+    return problems
+
+
+def timed(fn, *args) -> tuple:
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def main(argv: list):
+    tmp = Path(tempfile.mkdtemp(prefix="bench-epub-"))
+    compile_v2.OUT_DIR = tmp
+    cache = BuildCache(root=tmp / "cache")
+    has_pandoc = shutil.which("pandoc") is not None
+    if not has_pandoc:
+        print("   pandoc not installed: pandoc timing skipped")
+
+    ok = True
+    print(f"   {'lang':<5}{'parts':>6}{'cold ms':>9}{'same ms':>9}{'edit ms':>9}{'rewritten':>11}"
+          f"{'pandoc ms':>11}")
+    for lang, src_dir in SOURCES.items():
+        cfg = compile_v2.load_chapters(lang).get(lang)
+        if not cfg or not src_dir.is_dir():
+            continue
+        with contextlib.redirect_stdout(io.StringIO()):
+            md_file, _ = compile_v2.build_md(lang, cfg, src_dir, BuildCache(enabled=False))
+        md = md_file.read_text()
+        epub_file = tmp / f"autonom-{lang}.epub"
+        args = (epub_file, cfg.title, lang, CSS, COVER, src_dir, cache)
+
+        (parts, _), t_cold = timed(build_native_epub, Document(md), *args)
+        problems = check(epub_file)
+        (_, same), t_same = timed(build_native_epub, Document(md), *args)
+        # Edit the middle chapter's last paragraph
+        marks = [m.start() for m in re.finditer(r"^## ", md, re.M)]
+        cut = marks[len(marks) // 2 + 1] if len(marks) > 2 else len(md)
+        edited = md[:cut].rstrip() + " (edited)\n\n" + md[cut:]
+        (_, rewritten), t_edit = timed(build_native_epub, Document(edited), *args)
+        problems += check(epub_file)
+        if same != 0:
+            problems.append(f"unchanged book rewrote {same} entries")
+
+        t_pandoc = ""
+        if has_pandoc:
+            t0 = time.perf_counter()
+            subprocess.run(["pandoc", str(md_file), "-o", str(tmp / "pandoc.epub"), "--split-level=2",
+                            "--css", str(CSS), "--resource-path", str(src_dir)],
+                           check=True, capture_output=True)
+            t_pandoc = f"{(time.perf_counter() - t0) * 1000:.0f}"
+        print(f"   {lang:<5}{parts:>6}{t_cold * 1000:>9.1f}{t_same * 1000:>9.1f}{t_edit * 1000:>9.1f}"
+              f"{rewritten:>11}{t_pandoc:>11}")
+        for p in problems:
+            print(f"      ⚠️  {p}")
+        ok &= not problems
+    shutil.rmtree(tmp)
+    if not ok:
+        sys.exit("⚠️  EPUB checks failed")
+    print("✅ All EPUBs valid")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""Golden-output check + benchmark: html2md vs the old regex extract_text.
+
+The chapter sources in ru/ and en/ are Markdown, so each one is rendered
+into a blog-style HTML page (nav, status chrome, terminal divs, entities)
+and fed to both converters. Real blog posts can be checked with --html DIR.
+EDGE_CASES are hand-written snippets the synthetic pages never produce:
+they must convert like the old chain, except the few listed with the
+output html2md gives on purpose.
+
+Usage:
+    python3 scripts/bench_extract.py [--html DIR] [--repeat N]
+
+Exits non-zero when the outputs differ.
+"""
+
+import difflib, html, re, sys, time
+from pathlib import Path
+
+from html2md import html_to_markdown
+
+REPO = Path(__file__).parent.parent
+# (name, article HTML, None = same as the old chain, or html2md's deliberately different output)
+EDGE_CASES = [
+    ("unclosed em", "<p>text <em>unclosed para</p><p>next</p>", None),
+    ("em around paragraphs", "<em>unclosed <p>para</p><p>next</p>", None),
+    ("unclosed strong", "<p>a <strong>b</p><p>c</p>", None),
+    ("unclosed p", "<p>one<p>two</p>", None),
+    ("named entities", "<p>&copy; &mdash; &amp; &#169; &#x2014; &hearts; &laquo;x&raquo;&nbsp;y</p>", None),
+    ("status terminal class", '<div class="status terminal">kept</div><p>x</p>', None),
+    ("terminal with another class", '<div class="terminal big">ls\n-la</div>', None),
+    ("status with another class", '<div class="status big">kept</div>', None),
+    ("back link with another class", '<a class="back nav" href="/x">← back</a><p>x</p>', None),
+    ("pre with br", "<pre>a<br>b</pre>", None),
+    # The old chain stopped the terminal at the first </div> and glued the rest on
+    ("terminal with divs", '<div class="terminal"><div>x</div><div>y</div></div><p>after</p>',
+     "```\nx\ny\n```\nafter"),
+    # ... and removed <br> without a line break
+    ("terminal with br", '<div class="terminal">a<br>b\nc</div>', "```\na\nb\nc\n```"),
+    # ... and decoded &amp;lt; twice
+    ("escaped entity", "<p>&amp;lt;b&amp;gt;</p>", "&lt;b&gt;"),
+]
+
+
+def legacy_extract_text(html_src: str) -> str:
+    """extract_text as it was before html2md (reference implementation)."""
+    text = html_src
+    for tag in ["article", "main"]:
+        m = re.search(f"<{tag}[^>]*>(.*?)</{tag}>", html_src, re.DOTALL)
+        if m:
+            text = m.group(1)
+            break
+    for rm in ["nav", "header", "footer", "script", "style"]:
+        text = re.sub(f"<{rm}[^>]*>.*?</{rm}>", "", text, flags=re.DOTALL)
+    text = re.sub(r'<title[^>]*>.*?</title>', '', text, flags=re.DOTALL)
+
+    def terminal_to_code(m):
+        inner = m.group(1)
+        inner = re.sub(r"<[^>]+>", "", inner)
+        inner = inner.replace("&amp;", "&").replace("&lt;", "<").replace("&gt;", ">")
+        lines = [l.strip() for l in inner.strip().split("\n") if l.strip()]
+        return "\n```\n" + "\n".join(lines) + "\n```\n"
+    text = re.sub(r'<div[^>]*class="terminal"[^>]*>(.*?)</div>', terminal_to_code, text, flags=re.DOTALL)
+    text = re.sub(r"<img[^>]*>", "", text)
+    text = re.sub(r"<figure[^>]*>.*?</figure>", "", text, flags=re.DOTALL)
+    text = re.sub(r'<a[^>]*class="back"[^>]*>.*?</a>', "", text, flags=re.DOTALL)
+    text = re.sub(r'<a[^>]*href="/"[^>]*>.*?</a>', "", text, flags=re.DOTALL)
+    text = re.sub(r'<p[^>]*>\s*<a[^>]*href="[^"]*\.html"[^>]*>[←→].*?</a>.*?</p>', "", text, flags=re.DOTALL)
+    text = re.sub(r'<a[^>]*>[←→←→⟵⟶].*?</a>', "", text, flags=re.DOTALL)
+    text = re.sub(r'<p[^>]*class="autonom-label"[^>]*>.*?</p>', "", text, flags=re.DOTALL)
+    text = re.sub(r'<div[^>]*class="status"[^>]*>.*?</div>', "", text, flags=re.DOTALL)
+    text = re.sub(r'<p[^>]*class="subtitle"[^>]*>.*?</p>', "", text, flags=re.DOTALL)
+
+    def code_block_replace(m):
+        code = m.group(1)
+        code = re.sub(r"<[^>]+>", "", code)
+        code = code.replace("&amp;", "&").replace("&lt;", "<").replace("&gt;", ">")
+        return f"\n```\n{code.strip()}\n```\n"
+    text = re.sub(r"<pre[^>]*>\s*<code[^>]*>(.*?)</code>\s*</pre>", code_block_replace, text, flags=re.DOTALL)
+    text = re.sub(r"<pre[^>]*>(.*?)</pre>", code_block_replace, text, flags=re.DOTALL)
+    text = re.sub(r"<code[^>]*>(.*?)</code>", r"`\1`", text)
+    text = re.sub(r"<h1[^>]*>(.*?)</h1>", "", text, count=1)
+    text = re.sub(r"<h1[^>]*>(.*?)</h1>", r"# \1", text)
+    text = re.sub(r"<h2[^>]*>(.*?)</h2>", r"## \1", text)
+    text = re.sub(r"<h3[^>]*>(.*?)</h3>", r"### \1", text)
+    text = re.sub(r"<p[^>]*>(.*?)</p>", r"\1\n\n", text, flags=re.DOTALL)
+    text = re.sub(r"<br\s*/?>", "\n", text)
+    text = re.sub(r"<em>(.*?)</em>", r"*\1*", text)
+    text = re.sub(r"<strong>(.*?)</strong>", r"**\1**", text)
+    text = re.sub(r"<blockquote[^>]*>(.*?)</blockquote>", r"> \1", text, flags=re.DOTALL)
+    text = re.sub(r"<[^>]+>", "", text)
+    text = re.sub(r"\n[ \t]+", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = re.sub(r"(\n\s*){3,}", "\n\n", text)
+    text = re.sub(r'^[^\n]+— (?:liza|emerge)\.st\s*$', '', text, flags=re.MULTILINE)
+    text = re.sub(r'← .*?(?:На базу|All posts|базу).*?\n', '\n', text)
+    text = re.sub(r'← .*?·.*?→\n', '\n', text)
+    text = re.sub(r'ОПЕРАЦИЯ AUTONOM[^\n]*(?:\n[^\n]*){0,5}?(?:СЛЕДУЕТ|ВЫПОЛНЕНО|ЗАВЕРШЕНА)[.\n]*', '\n', text)
+    text = re.sub(r'OPERATION AUTONOM[^\n]*(?:\n[^\n]*){0,5}?(?:CONTINUED|COMPLETE)[.\n]*', '\n', text)
+    text = re.sub(r'ПРОДОЛЖЕНИЕ СЛЕДУЕТ[.\n]*', '\n', text)
+    text = re.sub(r'&#x([0-9a-fA-F]+);', lambda m: chr(int(m.group(1), 16)), text)
+    text = re.sub(r'&#(\d+);', lambda m: chr(int(m.group(1))), text)
+    for old, new in [("&amp;", "&"), ("&lt;", "<"), ("&gt;", ">"),
+                     ("&quot;", '"'), ("&#39;", "'"), ("&mdash;", "—"),
+                     ("&ndash;", "–"), ("&hellip;", "…"),
+                     ("&laquo;", "«"), ("&raquo;", "»"), ("&nbsp;", " ")]:
+        text = text.replace(old, new)
+    return text.strip()
+
+
+def _inline(s: str) -> str:
+    s = html.escape(s, quote=False)
+    s = re.sub(r"`([^`\n]+)`", r"<code>\1</code>", s)
+    s = re.sub(r"\*\*([^*\n]+)\*\*", r"<strong>\1</strong>", s)
+    s = re.sub(r"\*([^*\n]+)\*", r"<em>\1</em>", s)
+    return s
+
+
+def synth_page(md: str, title: str, site: str = "liza.st") -> str:
+    """Render a chapter .md into a page shaped like the blog templates."""
+    blocks, cur, fence = [], [], False
+    for line in md.strip().split("\n"):
+        if line.startswith("```"):
+            fence = not fence
+        if not line.strip() and not fence:
+            blocks.append("\n".join(cur))
+            cur = []
+        else:
+            cur.append(line)
+    blocks.append("\n".join(cur))
+    body = []
+    for block in blocks:
+        block = block.strip()
+        if not block or block == "---":
+            continue
+        if block.startswith("```"):
+            inner = block.strip("`").split("\n", 1)[-1]
+            body.append(f'<div class="terminal">\n{html.escape(inner, quote=False)}\n</div>')
+        elif block.startswith("#"):
+            head, _, rest = block.partition("\n")
+            level = min(len(head) - len(head.lstrip("#")), 3)
+            body.append(f"<h{level}>{_inline(head.lstrip('#').strip())}</h{level}>")
+            if rest:
+                body.append("<p>" + "<br>\n    ".join(_inline(l) for l in rest.split("\n")) + "</p>")
+        elif block.startswith(">"):
+            inner = "<br>\n".join(_inline(l.lstrip("> ")) for l in block.split("\n"))
+            body.append(f"<blockquote>\n  <p>{inner}</p>\n</blockquote>")
+        else:
+            body.append("<p>" + "<br>\n    ".join(_inline(l) for l in block.split("\n")) + "</p>")
+    t = html.escape(title, quote=False)
+    return f"""<!DOCTYPE html>
+<html lang="ru"><head><meta charset="utf-8"><title>{t} — {site}</title>
+<style>body {{ color: #ccc; }}</style></head>
+<body>
+<header><a href="/" class="logo">{site}</a></header>
+<nav><a href="/">← На базу</a></nav>
+<article>
+  <a class="back" href="/">← На базу</a>
+  <h1>{t}</h1>
+  <p class="subtitle">{t}</p>
+  <p class="autonom-label">ОПЕРАЦИЯ AUTONOM</p>
+  <div class="status">🟡 STATUS: ACTIVE</div>
+  <figure><img src="cover.jpg" alt=""><figcaption>cover</figcaption></figure>
+  {chr(10).join('  ' + b for b in body)}
+  <p><a href="prev.html">← Назад</a> · <a href="next.html">Дальше →</a></p>
+</article>
+<footer><p>© 2026 Liza Emergence</p><script>var x = 1 &lt; 2;</script></footer>
+</body></html>
+"""
+
+
+def load_pages(args):
+    if "--html" in args:
+        d = Path(args[args.index("--html") + 1])
+        return {p.name: p.read_text() for p in sorted(d.glob("*.html"))}
+    pages = {}
+    for lang in ("ru", "en"):
+        for p in sorted((REPO / lang).glob("*.md")):
+            pages[f"{lang}/{p.name}"] = synth_page(p.read_text(), p.stem)
+    return pages
+
+
+def bench(fn, pages, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for src in pages.values():
+            fn(src)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    args = sys.argv[1:]
+    repeat = int(args[args.index("--repeat") + 1]) if "--repeat" in args else 5
+    pages = load_pages(args)
+    size = sum(len(s.encode()) for s in pages.values())
+    print(f"📄 {len(pages)} pages, {size // 1024}K of HTML")
+
+    mismatches = 0
+    for name, src in pages.items():
+        old, new = legacy_extract_text(src), html_to_markdown(src)
+        if old != new:
+            mismatches += 1
+            print(f"❌ {name}")
+            diff = difflib.unified_diff(old.splitlines(), new.splitlines(), "regex", "html2md", lineterm="", n=1)
+            for line in list(diff)[:20]:
+                print(f"   {line}")
+    if not mismatches:
+        print(f"✅ Golden output identical for all {len(pages)} pages")
+
+    edge_failures = 0
+    for name, body, expected in EDGE_CASES:
+        src = f"<html><body><article>{body}</article></body></html>"
+        want = legacy_extract_text(src) if expected is None else expected
+        got = html_to_markdown(src)
+        if got != want:
+            edge_failures += 1
+            print(f"❌ edge case {name}: expected {want!r}, got {got!r}")
+    if not edge_failures:
+        print(f"✅ {len(EDGE_CASES)} edge cases as expected")
+    mismatches += edge_failures
+
+    t_old = bench(legacy_extract_text, pages, repeat)
+    t_new = bench(html_to_markdown, pages, repeat)
+    print(f"⏱  regex chain: {t_old * 1000:8.1f} ms ({size / t_old / 1e6:5.1f} MB/s)")
+    print(f"⏱  html2md:     {t_new * 1000:8.1f} ms ({size / t_new / 1e6:5.1f} MB/s)  ×{t_old / t_new:.1f}")
+
+    # One long post: the whole corpus as a single article
+    if "--html" not in args:
+        big = {"omnibus": synth_page("\n\n".join(
+            p.read_text() for lang in ("ru", "en") for p in sorted((REPO / lang).glob("*.md"))), "omnibus")}
+        if legacy_extract_text(big["omnibus"]) != html_to_markdown(big["omnibus"]):
+            mismatches += 1
+            print("❌ omnibus")
+        t_old = bench(legacy_extract_text, big, 1)
+        t_new = bench(html_to_markdown, big, 1)
+        print(f"⏱  long post ({len(big['omnibus']) // 1024}K): regex {t_old * 1000:.1f} ms, "
+              f"html2md {t_new * 1000:.1f} ms  ×{t_old / t_new:.1f}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
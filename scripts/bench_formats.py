@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Check + benchmark for the document tree and its writers.
+
+For every language whose chapter sources are in the repo, the assembled
+book is parsed once and handed to every writer (HTML, Markdown, EPUB,
+FB2, DOCX). Checks: the per-part HTML equals markdown_to_html of the whole
+book, the Markdown writer round-trips the tree, the FB2 and every XML part
+of the DOCX are well-formed, and every internal FB2 link and DOCX
+hyperlink points at an existing id or bookmark.
+
+Usage:
+    python3 scripts/bench_formats.py
+
+Exits non-zero when a check fails.
+"""
+
+import contextlib, io, shutil, sys, tempfile, time, zipfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import compile_v2
+from build_cache import BuildCache
+from doctree import Document, book_meta, parse, to_markdown
+from docx_writer import write_docx
+from epub_writer import build_native_epub
+from fb2_writer import write_fb2
+from md2html import document_html, markdown_to_html
+
+REPO = Path(__file__).parent.parent
+SOURCES = {"en": REPO / "en", "ru": REPO / "ru", "de": REPO / "de", "es": REPO / "es",
+           "no": REPO / "no", "fi": REPO / "fi"}
+CSS = Path(__file__).parent / "epub.css"
+COVER = REPO / "assets" / "cover-en.jpg"
+XLINK = "{http://www.w3.org/1999/xlink}href"
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def check_fb2(fb2_file: Path) -> list:
+    try:
+        root = ET.parse(fb2_file).getroot()
+    except ET.ParseError as e:
+        return [f"fb2: {e}"]
+    ids = {el.get("id") for el in root.iter() if el.get("id")}
+    return [f"fb2: link to missing id {el.get(XLINK)}" for el in root.iter()
+            if (el.get(XLINK) or "").startswith("#") and el.get(XLINK)[1:] not in ids]
+
+
+def check_docx(docx_file: Path) -> list:
+    problems = []
+    with zipfile.ZipFile(docx_file) as zf:
+        for name in zf.namelist():
+            if name.endswith((".xml", ".rels")):
+                try:
+                    ET.fromstring(zf.read(name))
+                except ET.ParseError as e:
+                    problems.append(f"docx {name}: {e}")
+        if problems:
+            return problems
+        root = ET.fromstring(zf.read("word/document.xml"))
+    marks = {el.get(f"{W}name") for el in root.iter(f"{W}bookmarkStart")}
+    return [f"docx: link to missing bookmark {el.get(W + 'anchor')}"
+            for el in root.iter(f"{W}hyperlink")
+            if el.get(f"{W}anchor") and el.get(f"{W}anchor") not in marks]
+
+
+def timed(fn, *args) -> tuple:
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def main(argv: list):
+    tmp = Path(tempfile.mkdtemp(prefix="bench-formats-"))
+    compile_v2.OUT_DIR = tmp
+    writers = ["html", "md", "epub", "fb2", "docx"]
+    ok = True
+    print(f"   {'lang':<5}{'parse ms':>10}" + "".join(f"{w + ' ms':>10}" for w in writers))
+    for lang, src_dir in SOURCES.items():
+        cfg = compile_v2.load_chapters(lang).get(lang)
+        if not cfg or not src_dir.is_dir():
+            continue
+        with contextlib.redirect_stdout(io.StringIO()):
+            md_file, _ = compile_v2.build_md(lang, cfg, src_dir, BuildCache(enabled=False))
+        md = md_file.read_text()
+        cache = BuildCache(enabled=False)
+        meta = dict(book_meta(cfg.title, lang), cover=COVER, resource_dir=src_dir)
+        problems = []
+
+        doc = Document(md, cache)
+        _, t_parse = timed(doc.all_blocks)
+        html, t_html = timed(document_html, doc)
+        text, t_md = timed(lambda: "".join(to_markdown(doc.blocks(i)) for i in range(len(doc))))
+        _, t_epub = timed(build_native_epub, doc, tmp / f"autonom-{lang}.epub", cfg.title, lang,
+                          CSS, COVER, src_dir, cache)
+        _, t_fb2 = timed(write_fb2, doc, tmp / f"autonom-{lang}.fb2", meta)
+        _, t_docx = timed(write_docx, doc, tmp / f"autonom-{lang}.docx", meta)
+
+        if html != markdown_to_html(md):
+            problems.append("per-part HTML differs from markdown_to_html")
+        for i in range(len(doc)):
+            if parse(to_markdown(doc.blocks(i))) != doc.blocks(i):
+                problems.append(f"part {i}: Markdown writer does not round-trip")
+        problems += check_fb2(tmp / f"autonom-{lang}.fb2")
+        problems += check_docx(tmp / f"autonom-{lang}.docx")
+
+        cells = [t_html, t_md, t_epub, t_fb2, t_docx]
+        print(f"   {lang:<5}{t_parse * 1000:>10.1f}" + "".join(f"{t * 1000:>10.1f}" for t in cells))
+        for p in problems:
+            print(f"      ⚠️  {p}")
+        ok &= not problems
+    shutil.rmtree(tmp)
+    if not ok:
+        sys.exit("⚠️  Format checks failed")
+    print("✅ All formats valid")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Golden-output check + scaling benchmark: glossary.py vs the old per-term loop.
+
+Runs both autolinkers on the assembled books in the repo root (outputs must
+match), then on ~1 MB synthetic books with glossaries of growing size (mixed
+Cyrillic and Latin terms, aliases, multi-word terms sharing prefixes). The
+old loop links inside its own link targets when terms share prefixes, so
+synthetic outputs are only checked for one well-formed link per entry.
+
+Usage:
+    python3 scripts/bench_glossary.py [--sizes 60,250,1000] [--seed N]
+
+Exits non-zero on a mismatch.
+"""
+
+import contextlib, difflib, io, random, re, sys, time
+from pathlib import Path
+
+from glossary import glossary_autolink
+
+REPO = Path(__file__).parent.parent
+
+
+def legacy_glossary_autolink(content: str, lang: str) -> str:
+    """glossary_autolink as it was before glossary.py (reference implementation)."""
+    glossary_marker = "## Глоссарий" if lang == "ru" else "## Glossary"
+    if glossary_marker not in content:
+        return content
+    text_part, glossary_part = content.split(glossary_marker, 1)
+    terms = re.findall(r'\*\*([^*]+)\*\*\s*—', glossary_part)
+    if not terms:
+        return content
+    anchor_map = {}
+    for term in terms:
+        anchor = "gl-" + re.sub(r'[^a-zA-Zа-яА-ЯёЁ0-9]', '-', term.lower()).strip('-')
+        anchor_map[term] = re.sub(r'-+', '-', anchor)
+    for term, anchor in anchor_map.items():
+        glossary_part = re.sub(rf'\*\*{re.escape(term)}\*\*', f'<a id="{anchor}"></a>**{term}**',
+                               glossary_part, count=1)
+    search_map = {}
+    for term, anchor in anchor_map.items():
+        base = re.sub(r'\s*\(.*?\)\s*$', '', term).strip()
+        search_map[base] = (base, anchor)
+        alias_m = re.search(r'\(([^)]+)\)', term)
+        if alias_m:
+            search_map[alias_m.group(1)] = (alias_m.group(1), anchor)
+    linked = set()
+    for search_term in sorted(search_map, key=len, reverse=True):
+        display, anchor = search_map[search_term]
+        if anchor in linked:
+            continue
+        escaped = re.escape(search_term)
+        if re.search(r'[а-яА-ЯёЁ]', search_term):
+            pattern = rf'(?<!\[)(?<!\*\*)(?<![а-яА-ЯёЁ]){escaped}(?![а-яА-ЯёЁ])(?!\])(?!\*\*)'
+        else:
+            pattern = rf'(?<!\[)(?<!\*\*)\b{escaped}\b(?!\])(?!\*\*)'
+        m = re.search(pattern, text_part, re.IGNORECASE)
+        if m:
+            text_part = text_part[:m.start()] + f'[{m.group(0)}](#{anchor})' + text_part[m.end():]
+            linked.add(anchor)
+    return text_part + glossary_marker + glossary_part
+
+
+def synth_book(n_terms: int, rng: random.Random) -> str:
+    """Book of ~1 MB prose with an n-term glossary, every term mentioned somewhere."""
+    cyr, lat = "абвгдежзиклмнопрстуфхэюя", "abcdefghiklmnoprstuvwxyz"
+
+    def word(alpha):
+        return "".join(rng.choice(alpha) for _ in range(rng.randint(3, 9)))
+
+    terms, seen = [], set()
+    while len(terms) < n_terms:
+        alpha = cyr if rng.random() < 0.7 else lat
+        term = " ".join(word(alpha) for _ in range(rng.choice((1, 1, 1, 2))))
+        if terms and rng.random() < 0.1:
+            term = f"{rng.choice(terms).split(' (')[0]} {word(alpha)}"  # shared prefix
+        if rng.random() < 0.2:
+            term += f" ({word(lat if alpha == cyr else cyr)})"
+        if term.lower() not in seen:
+            seen.add(term.lower())
+            terms.append(term)
+    filler = [word(cyr) for _ in range(2000)] + [word(lat) for _ in range(300)]
+    mentions = [re.sub(r"\s*\(.*?\)$", "", t) for t in terms]
+    mentions += [m.group(1) for t in terms for m in [re.search(r"\(([^)]+)\)", t)] if m]
+    paras = []
+    while sum(map(len, paras)) < 1_000_000:
+        words = [rng.choice(filler) for _ in range(rng.randint(40, 120))]
+        for _ in range(rng.randint(0, 2)):
+            words.insert(rng.randrange(len(words)), rng.choice(mentions).capitalize())
+        paras.append(" ".join(words) + ".")
+    glossary = "\n\n".join(f"**{t}** — {' '.join(rng.choice(filler) for _ in range(12))}."
+                           for t in terms)
+    return "\n\n".join(paras) + "\n\n## Глоссарий\n\n" + glossary + "\n"
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def compare(name: str, content: str, lang: str, strict: bool = True) -> bool:
+    old, t_old = timed(legacy_glossary_autolink, content, lang)
+    new, t_new = timed(glossary_autolink, content, lang)
+    links = new.count("](#gl-")
+    if strict:
+        ok = old == new
+        verdict = "identical" if ok else "DIFFERENT"
+    else:
+        # With prefix-sharing terms the old loop also links inside the targets
+        # of links it made before ("](#gl-[term](#gl-term)-more)"), so only
+        # check the new output: every entry linked once, nothing nested
+        anchors = re.findall(r"\]\(#(gl-[^)]+)\)", new)
+        ok = len(anchors) == len(set(anchors)) and not re.search(r"\(#gl-[^)\s]*\[", new)
+        verdict = "ok" if ok else "BROKEN LINKS"
+    print(f"   {name:<28}{links:>6}{t_old:>10.3f}{t_new:>10.3f}{t_old / t_new:>8.1f}x  {verdict}")
+    if strict and not ok:
+        diff = difflib.unified_diff(old.splitlines(), new.splitlines(), "legacy", "glossary.py",
+                                    n=0, lineterm="")
+        for line in list(diff)[:20]:
+            print(f"      {line[:160]}")
+    return ok
+
+
+def main(argv: list):
+    sizes, seed = [60, 250, 1000], 1
+    i = 0
+    while i < len(argv):
+        if argv[i] == "--sizes" and i + 1 < len(argv):
+            sizes = [int(s) for s in argv[i + 1].split(",")]; i += 1
+        elif argv[i] == "--seed" and i + 1 < len(argv):
+            seed = int(argv[i + 1]); i += 1
+        i += 1
+
+    print(f"   {'input':<28}{'links':>6}{'legacy s':>10}{'new s':>10}{'':>9}")
+    ok = True
+    for md in sorted(REPO.glob("autonom-*.md")):
+        lang = "ru" if "-ru" in md.name else "en"
+        ok &= compare(md.name, md.read_text(), lang)
+    rng = random.Random(seed)
+    for n in sizes:
+        ok &= compare(f"synthetic, {n} terms", synth_book(n, rng), "ru", strict=False)
+    if not ok:
+        sys.exit("⚠️  Outputs differ")
+    print("✅ Books identical, synthetic links well-formed")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Check + benchmark for lint.py.
+
+Checks every rule on a scratch chapter with one planted problem each
+(and the same words inside code, which must pass), the brand allow
+list, and that the pool gives the same findings as a single process.
+Then lints a scratch copy of every language dir repeated N times:
+cold in one process, cold with --jobs workers, warm (nothing changed:
+no chapter may be read) and after editing one chapter (only it is
+linted again).
+
+Usage:
+    python3 scripts/bench_lint.py [--scale N] [--jobs N]
+
+Exits non-zero when a check fails.
+"""
+
+import os, shutil, sys, tempfile, time
+from pathlib import Path
+
+import lint
+from lint import Rules, chapter_files, lint_files, lint_text
+
+PLANTED = """# Глава
+
+Антропик снова звонил. TODO: проверить даты.
+
+Шэлли кивнул.
+
+<div class="status">online</div> &mdash; всё
+
+Лиза — liza.st
+
+`Антропик` в коде не считается.
+
+```
+Антропик и TODO в блоке кода тоже.
+```
+
+```
+незакрытый блок
+"""
+EXPECT = {(3, "brands"), (3, "forbidden"), (5, "names"), (7, "html"), (9, "html"), (17, "fence")}
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def main(argv: list):
+    scale = int(argv[argv.index("--scale") + 1]) if "--scale" in argv else 4
+    jobs = int(argv[argv.index("--jobs") + 1]) if "--jobs" in argv else max(2, os.cpu_count() or 1)
+    tmp = Path(tempfile.mkdtemp(prefix="bench-lint-"))
+    lint.LINT_CACHE = tmp / "lint.json"
+    rules = Rules.load()
+    problems, times = [], {}
+
+    got = {(line, rule) for line, rule, _ in lint_text("ru", "planted.md", PLANTED, rules)}
+    if got != EXPECT:
+        problems.append(f"planted chapter: missing {sorted(EXPECT - got)}, extra {sorted(got - EXPECT)}")
+    if lint_text("ru", "acknowledgments.md", "**Anthropic** — спасибо.\n", rules):
+        problems.append("the brand allow list is ignored")
+
+    files = []
+    for k in range(scale):
+        for lang in lint.LANGS:
+            (tmp / f"{lang}-{k}").mkdir()
+            for p in chapter_files(lang):
+                shutil.copy2(p, tmp / f"{lang}-{k}" / p.name)
+                files.append((lang, tmp / f"{lang}-{k}" / p.name))
+
+    serial, times["cold, 1 process"] = timed(lint_files, files, rules, 1, use_cache=False)
+    pooled, times[f"cold, {jobs} processes"] = timed(lint_files, files, rules, jobs)
+    if serial != pooled:
+        problems.append("the pool's findings differ from a single process")
+
+    reads = []
+    read_bytes = Path.read_bytes
+    Path.read_bytes = lambda self: reads.append(self) or read_bytes(self)
+    try:
+        warm, times["warm, nothing changed"] = timed(lint_files, files, rules, jobs)
+        if reads:
+            problems.append(f"warm run read {len(reads)} chapter(s)")
+        edited = files[0][1]
+        edited.write_text(edited.read_text(encoding="utf-8") + "\nFIXME\n", encoding="utf-8")
+        reads.clear()
+        after, times["one chapter edited"] = timed(lint_files, files, rules, jobs)
+        if reads != [edited]:
+            problems.append(f"after one edit {len(reads)} chapter(s) were read")
+    finally:
+        Path.read_bytes = read_bytes
+    if warm != serial:
+        problems.append("cached findings differ from fresh ones")
+    if not any(rule == "forbidden" for _, rule, _ in after[files[0]]):
+        problems.append("the edit's FIXME was not found")
+
+    total = sum(len(f) for f in serial.values())
+    shutil.rmtree(tmp)
+    print(f"   {len(files)} chapters ({scale}× every language), {total} finding(s), {os.cpu_count()} CPU(s)")
+    for label, secs in times.items():
+        print(f"   {label:<26}{secs * 1000:>9.1f} ms")
+    for p in problems:
+        print(f"      ⚠️  {p}")
+    if problems:
+        sys.exit("⚠️  Lint checks failed")
+    print("✅ Every rule fires; cache and pool agree")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""Check + benchmark for pandoc_pool.py.
+
+Puts a stand-in `pandoc` first on PATH: it "converts" by upper-casing
+the text, and `pandoc server` answers the server API over HTTP, so both
+paths run without pandoc installed (set FAKE_PANDOC_SERVER= to give it
+no server mode). Checks:
+- timeouts scale with the input: the subprocess gets scaled_timeout()
+  of its size, a slow pandoc is killed at it, and a bigger input gets
+  more time;
+- without servers, convert() runs pandoc with the options on its
+  command line;
+- PandocPool starts its servers, publishes them in PANDOC_SERVER (which
+  convert() picks up), spreads conversions across them, sends the CSS
+  and the images the text references, reports pandoc's errors, and
+  restores the environment on close;
+- an unreachable server falls back to a subprocess, and so does a pool
+  when pandoc has no server mode.
+Times one conversion through a warm server against one pandoc per file.
+
+Usage:
+    python3 scripts/bench_pandoc.py [--rounds N]
+
+Exits non-zero when a check fails.
+"""
+
+import contextlib, io, json, os, shutil, subprocess, sys, tempfile, time
+from pathlib import Path
+
+import pandoc_pool
+from pandoc_pool import PandocPool, convert, scaled_timeout
+
+FAKE_PANDOC = r'''#!%s
+import base64, json, os, sys, time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+args = sys.argv[1:]
+log = os.environ["FAKE_PANDOC_LOG"]
+
+if args[:1] == ["server"]:
+    if "--help" in args:
+        sys.exit(0 if os.environ.get("FAKE_PANDOC_SERVER") else 1)
+    port = int(args[args.index("--port") + 1])
+
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self, result):
+            data = json.dumps(result).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self.reply({"version": "3.1"})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with open(log, "a") as f:
+                f.write(json.dumps({"port": port, "to": body.get("to"), "css": body.get("css"),
+                                    "files": sorted(body.get("files", {}))}) + "\n")
+            if "FAIL" in body["text"]:
+                return self.reply({"error": "fake pandoc: cannot convert"})
+            self.reply({"output": base64.b64encode(body["text"].upper().encode()).decode(), "base64": True})
+
+        def log_message(self, *a):
+            pass
+
+    HTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+time.sleep(float(os.environ.get("FAKE_PANDOC_SLEEP", "0")))
+with open(log, "a") as f:
+    f.write(json.dumps({"argv": args}) + "\n")
+with open(args[0], encoding="utf-8") as f:
+    text = f.read()
+with open(args[args.index("-o") + 1], "w", encoding="utf-8") as f:
+    f.write(text.upper())
+'''
+
+
+def log_lines(log: Path) -> list:
+    lines = [json.loads(line) for line in log.read_text().splitlines()] if log.exists() else []
+    log.unlink(missing_ok=True)
+    return lines
+
+
+def main(argv: list):
+    rounds = int(argv[argv.index("--rounds") + 1]) if "--rounds" in argv else 20
+    tmp = Path(tempfile.mkdtemp(prefix="bench-pandoc-"))
+    bin_dir, log = tmp / "bin", tmp / "log.jsonl"
+    bin_dir.mkdir()
+    (bin_dir / "pandoc").write_text(FAKE_PANDOC % sys.executable)
+    (bin_dir / "pandoc").chmod(0o755)
+    saved = {k: os.environ.get(k) for k in ("PATH", "FAKE_PANDOC_LOG", "FAKE_PANDOC_SERVER", "PANDOC_SERVER")}
+    os.environ.update(PATH=f"{bin_dir}{os.pathsep}{os.environ['PATH']}", FAKE_PANDOC_LOG=str(log))
+    os.environ.pop("PANDOC_SERVER", None)
+    problems, times = [], {}
+
+    src = tmp / "book.md"
+    src.write_text("# Book\n\n![cover](img/cover.png)\n\nText.\n", encoding="utf-8")
+    (tmp / "img").mkdir()
+    (tmp / "img" / "cover.png").write_bytes(b"\x89PNG fake")
+    css = tmp / "epub.css"
+    css.write_text("body{}")
+    options = {"metadata": {"title": "AUTONOM"}, "css": [css], "standalone": True}
+    want = src.read_text(encoding="utf-8").upper()
+
+    try:
+        # Timeouts grow with the input
+        if scaled_timeout(0) != pandoc_pool.TIMEOUT_BASE or \
+                scaled_timeout(2**20) != pandoc_pool.TIMEOUT_BASE + pandoc_pool.TIMEOUT_PER_MB:
+            problems.append("scaled_timeout() does not grow by TIMEOUT_PER_MB per MB")
+        seen, run = [], subprocess.run
+        subprocess.run = lambda *a, **k: seen.append(k.get("timeout")) or run(*a, **k)
+        try:
+            how = convert(src, tmp / "out.html", options, tmp, servers=[])
+        finally:
+            subprocess.run = run
+        argv_seen = log_lines(log)[-1]["argv"]
+        if how != "subprocess" or (tmp / "out.html").read_text(encoding="utf-8") != want:
+            problems.append(f"convert() without servers ran via {how} or wrote the wrong output")
+        if seen != [scaled_timeout(src.stat().st_size)]:
+            problems.append(f"pandoc subprocess got timeout {seen}, expected the scaled one")
+        for arg in ("--metadata", "title=AUTONOM", "--css", str(css), "--standalone", "--resource-path"):
+            if arg not in argv_seen:
+                problems.append(f"pandoc command line lacks {arg}")
+
+        big = tmp / "big.md"
+        big.write_text("x" * 2**19)
+        base, per_mb = pandoc_pool.TIMEOUT_BASE, pandoc_pool.TIMEOUT_PER_MB
+        pandoc_pool.TIMEOUT_BASE, pandoc_pool.TIMEOUT_PER_MB = 0.3, 10
+        os.environ["FAKE_PANDOC_SLEEP"] = "1"
+        try:
+            t0 = time.perf_counter()
+            try:
+                convert(src, tmp / "slow.html", {}, servers=[])
+                problems.append("a pandoc slower than the timeout was not stopped")
+            except subprocess.TimeoutExpired:
+                if time.perf_counter() - t0 > 0.9:
+                    problems.append("a slow pandoc ran past its timeout")
+            try:
+                convert(big, tmp / "big.html", {}, servers=[])  # 0.5 MB: 5.3 s allowed
+            except subprocess.TimeoutExpired:
+                problems.append("a bigger input did not get a longer timeout")
+        finally:
+            pandoc_pool.TIMEOUT_BASE, pandoc_pool.TIMEOUT_PER_MB = base, per_mb
+            os.environ.pop("FAKE_PANDOC_SLEEP")
+        log_lines(log)
+
+        # Warm servers
+        os.environ["FAKE_PANDOC_SERVER"] = "1"
+        quiet = contextlib.redirect_stdout(io.StringIO())
+        with quiet, PandocPool(servers=2) as pool:
+            urls = list(pool.urls)
+            if len(urls) != 2 or os.environ.get("PANDOC_SERVER") != ",".join(urls):
+                problems.append(f"pool started {len(urls)} server(s), PANDOC_SERVER not set")
+            futures = [pool.submit(src, tmp / f"out{i}.epub", options, tmp) for i in range(4)]
+            results = [f.result() for f in futures]
+            if results != ["server"] * 4 or any((tmp / f"out{i}.epub").read_text(encoding="utf-8") != want
+                                                for i in range(4)):
+                problems.append(f"pool conversions ran via {results} or wrote the wrong output")
+            if convert(src, tmp / "env.html", {}) != "server":
+                problems.append("convert() did not use the servers in PANDOC_SERVER")
+            requests = log_lines(log)
+            if len({r["port"] for r in requests}) != 2:
+                problems.append("conversions were not spread across the servers")
+            first = requests[0]
+            css_refs = first["css"] or []
+            if first["to"] != "epub" or "img/cover.png" not in first["files"] or len(css_refs) != 1 or \
+                    not css_refs[0].endswith("-epub.css") or css_refs[0] not in first["files"]:
+                problems.append(f"the request did not carry the CSS and images: {first}")
+            (tmp / "bad.md").write_text("FAIL")
+            try:
+                convert(tmp / "bad.md", tmp / "bad.html", {})
+                problems.append("a pandoc error from the server was swallowed")
+            except RuntimeError as e:
+                if "cannot convert" not in str(e):
+                    problems.append(f"pandoc's error message was lost: {e}")
+            # Timing: warm server against one pandoc per file
+            t0 = time.perf_counter()
+            for i in range(rounds):
+                convert(src, tmp / "t.html", {}, servers=urls)
+            times["warm server"] = (time.perf_counter() - t0) / rounds
+            procs = list(pool.procs)
+        if os.environ.get("PANDOC_SERVER") is not None or any(p.poll() is None for p in procs):
+            problems.append("close() left servers running or PANDOC_SERVER set")
+        t0 = time.perf_counter()
+        for i in range(rounds):
+            convert(src, tmp / "t.html", {}, servers=[])
+        times["pandoc per file"] = (time.perf_counter() - t0) / rounds
+        log_lines(log)
+
+        # Fallbacks
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            how = convert(src, tmp / "down.html", {}, servers=[f"http://127.0.0.1:{pandoc_pool._free_port()}"])
+        if how != "subprocess" or "unreachable" not in out.getvalue():
+            problems.append("an unreachable server did not fall back to a subprocess")
+        os.environ["FAKE_PANDOC_SERVER"] = ""
+        with quiet, PandocPool(servers=2) as pool:
+            how = pool.submit(src, tmp / "noserver.html", {}).result()
+            env = os.environ.get("PANDOC_SERVER")
+        if pool.urls or how != "subprocess" or env is not None:
+            problems.append("without server mode the pool did not fall back to subprocesses")
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        shutil.rmtree(tmp)
+
+    print(f"   stand-in pandoc, {rounds} conversions each")
+    for label, secs in times.items():
+        print(f"   {label:<26}{secs * 1000:>9.1f} ms")
+    for p in problems:
+        print(f"      ⚠️  {p}")
+    if problems:
+        sys.exit("⚠️  pandoc pool checks failed")
+    print("✅ Server and subprocess paths convert alike")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Benchmark: pandoc → HTML file → weasyprint vs in-memory md2html → weasyprint.
+
+Usage:
+    python3 scripts/bench_pdf.py [book.md] [--repeat N]
+
+Defaults to autonom-ru.md in the repo root. Stages whose tools are not
+installed (pandoc, weasyprint) are reported as skipped.
+"""
+
+import shutil, subprocess, sys, tempfile, time
+from pathlib import Path
+
+from md2html import markdown_to_html, standalone
+
+REPO = Path(__file__).parent.parent
+CSS_FILE = REPO / "novel.css"
+
+
+def timed(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    args = sys.argv[1:]
+    repeat = int(args[args.index("--repeat") + 1]) if "--repeat" in args else 3
+    paths = [a for a in args if a.endswith(".md")]
+    md_file = Path(paths[0]) if paths else REPO / "autonom-ru.md"
+    md = md_file.read_text()
+    print(f"📄 {md_file.name}: {len(md.encode()) // 1024}K")
+
+    try:
+        from weasyprint import HTML, CSS
+    except (ImportError, OSError):  # OSError: pango missing
+        HTML = CSS = None
+        print("   weasyprint not available: PDF stages skipped")
+    has_pandoc = shutil.which("pandoc") is not None
+    if not has_pandoc:
+        print("   pandoc not installed: pandoc path skipped")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        html_file = Path(tmp) / "book.html"
+        pdf_file = Path(tmp) / "book.pdf"
+
+        t_html, page = timed(lambda: standalone(markdown_to_html(md), "AUTONOM"), repeat)
+        print(f"⏱  native   MD → HTML: {t_html * 1000:8.1f} ms (in memory)")
+        if has_pandoc:
+            t_pandoc, _ = timed(lambda: subprocess.run(
+                ["pandoc", str(md_file), "-o", str(html_file), "--standalone",
+                 "--metadata", "title=AUTONOM"], check=True, capture_output=True), repeat)
+            print(f"⏱  pandoc   MD → HTML: {t_pandoc * 1000:8.1f} ms (subprocess + file)  ×{t_pandoc / t_html:.1f}")
+
+        if HTML is None:
+            return
+        t_css, css = timed(lambda: CSS(filename=str(CSS_FILE)), 1)
+        print(f"⏱  CSS parse (once per process): {t_css * 1000:.1f} ms")
+        t_native, _ = timed(lambda: HTML(string=page, base_url=str(REPO)).write_pdf(
+            str(pdf_file), stylesheets=[css]), repeat)
+        print(f"⏱  native   HTML → PDF: {t_native:8.2f} s  ({pdf_file.stat().st_size // 1024}K)")
+        if has_pandoc:
+            t_file, _ = timed(lambda: HTML(filename=str(html_file)).write_pdf(
+                str(pdf_file), stylesheets=[CSS(filename=str(CSS_FILE))]), repeat)
+            print(f"⏱  pandoc   HTML → PDF: {t_file:8.2f} s  ({pdf_file.stat().st_size // 1024}K)")
+            print(f"   end to end: native {t_html + t_native:.2f} s vs pandoc {t_pandoc + t_file:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Check + benchmark for precompress.py.
+
+Fills a scratch output directory with the text artifacts of a build (every
+language's chapters as .md, pages as .html, a stylesheet, JSON shards)
+plus an EPUB, and checks: every variant decompresses to its source, the
+EPUB gets none, manifest.json's sizes, hashes and ETags match the files,
+a second run writes nothing and reads no file, editing one file
+recompresses only its variants, variants of a deleted file are removed,
+and known_hashes() agrees with the files. A compressed artifact that is
+no variant (assets.tar.gz) is listed as a file and never deleted. Times a cold run with one
+thread and with --jobs threads, and the warm run.
+
+Usage:
+    python3 scripts/bench_precompress.py [--scale N] [--jobs N]
+
+Exits non-zero when a check fails.
+"""
+
+import gzip, hashlib, json, os, shutil, sys, tempfile, time
+from pathlib import Path
+
+import precompress
+from lint import LANGS, chapter_files
+from precompress import MANIFEST, VARIANTS, known_hashes, load_manifest
+
+DECOMPRESS = {".gz": gzip.decompress}
+if precompress.brotli:
+    DECOMPRESS[".br"] = precompress.brotli.decompress
+if precompress.zstandard:
+    DECOMPRESS[".zst"] = lambda data: precompress.zstandard.ZstdDecompressor().decompress(data)
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def fill(out: Path, scale: int) -> int:
+    """Scratch artifacts → total bytes."""
+    for k in range(scale):
+        for lang in LANGS:
+            d = out / "web" / f"{lang}-{k}"
+            d.mkdir(parents=True)
+            for p in chapter_files(lang):
+                text = p.read_text(encoding="utf-8")
+                (out / f"{lang}-{k}-{p.name}").write_text(text, encoding="utf-8")
+                (d / f"{p.stem}.html").write_text(f"<!DOCTYPE html><main>{text}</main>", encoding="utf-8")
+    (out / "search").mkdir()
+    for n in range(8):
+        (out / "search" / f"s{n:02d}.json").write_text(json.dumps({"n": n, "t": list(range(500))}))
+    (out / "web" / "novel.1a2b3c4d.css").write_text("body{margin:0 auto}" * 50)
+    (out / "autonom-en.epub").write_bytes(os.urandom(4096))
+    (out / "assets.tar.gz").write_bytes(gzip.compress(os.urandom(4096)))
+    return sum(f.stat().st_size for f in out.rglob("*") if f.is_file())
+
+
+def main(argv: list):
+    scale = int(argv[argv.index("--scale") + 1]) if "--scale" in argv else 1
+    jobs = int(argv[argv.index("--jobs") + 1]) if "--jobs" in argv else max(2, os.cpu_count() or 1)
+    tmp = Path(tempfile.mkdtemp(prefix="bench-precompress-"))
+    problems, times = [], {}
+
+    one, many = tmp / "one", tmp / "many"
+    one.mkdir(), many.mkdir()
+    size = fill(one, scale)
+    fill(many, scale)
+    (files, written), times["cold, 1 thread"] = timed(precompress.precompress, one, 1)
+    _, times[f"cold, {jobs} threads"] = timed(precompress.precompress, many, jobs)
+    out = many
+
+    manifest = json.loads((out / MANIFEST).read_text(encoding="utf-8"))["files"]
+    for name, entry in manifest.items():
+        path = out / name
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        if (entry["size"], entry["sha256"], entry["etag"]) != (len(data), digest, precompress.etag(digest)):
+            problems.append(f"{name}: manifest entry does not match the file")
+        want = VARIANTS if path.suffix in precompress.TEXT_SUFFIXES else ()
+        if tuple(sorted(entry["variants"])) != tuple(sorted(want)):
+            problems.append(f"{name}: variants {sorted(entry['variants'])}, expected {sorted(want)}")
+        for suffix, v in entry["variants"].items():
+            blob = path.with_name(path.name + suffix).read_bytes()
+            if DECOMPRESS[suffix](blob) != data:
+                problems.append(f"{name}{suffix} does not decompress to its source")
+            if v["source"] != digest or v["sha256"] != hashlib.sha256(blob).hexdigest():
+                problems.append(f"{name}{suffix}: manifest entry does not match")
+    if written != sum(len(e["variants"]) for e in manifest.values()):
+        problems.append(f"cold run reported {written} variant(s) written")
+
+    reads = []
+    read_bytes = Path.read_bytes
+    Path.read_bytes = lambda self: reads.append(self) or read_bytes(self)
+    try:
+        (_, again), times["warm, nothing changed"] = timed(precompress.precompress, out, jobs)
+    finally:
+        Path.read_bytes = read_bytes
+    reads = [p for p in reads if p.name != MANIFEST]
+    if again or reads:
+        problems.append(f"an unchanged tree wrote {again} variant(s) and read {len(reads)} file(s)")
+
+    edited = next(out.glob("*.md"))
+    edited.write_text(edited.read_text(encoding="utf-8") + "\nEdited.\n", encoding="utf-8")
+    (_, again), times["one file edited"] = timed(precompress.precompress, out, jobs)
+    if again != len(VARIANTS):
+        problems.append(f"one edit wrote {again} variant(s), expected {len(VARIANTS)}")
+    if gzip.decompress(edited.with_name(edited.name + ".gz").read_bytes()) != edited.read_bytes():
+        problems.append("the edited file's .gz is stale")
+
+    gone = next(out.glob("web/*/*.html"))
+    gone.unlink()
+    precompress.precompress(out, jobs)
+    if list(gone.parent.glob(gone.name + ".*")):
+        problems.append("variants of a deleted file were kept")
+    if not (out / "assets.tar.gz").exists() or "assets.tar.gz" not in load_manifest(out):
+        problems.append("assets.tar.gz was taken for a variant")
+    known = known_hashes(out)
+    if any(hashlib.sha256(Path(p).read_bytes()).hexdigest() != h for p, h in known.items()):
+        problems.append("known_hashes() disagrees with the files")
+    if len(known) != sum(1 + len(e["variants"])
+                         for e in json.loads((out / MANIFEST).read_text(encoding="utf-8"))["files"].values()):
+        problems.append("known_hashes() left out unchanged files")
+
+    gz = sum(f.stat().st_size for f in out.rglob("*.gz"))
+    shutil.rmtree(tmp)
+    print(f"   {files} files, {size // 1024}K, {written} variant(s) ({', '.join(VARIANTS)}), "
+          f"{os.cpu_count()} CPU(s); .gz total {gz // 1024}K")
+    for label, secs in times.items():
+        print(f"   {label:<26}{secs * 1000:>9.1f} ms")
+    for p in problems:
+        print(f"      ⚠️  {p}")
+    if problems:
+        sys.exit("⚠️  Precompress checks failed")
+    print("✅ Variants and manifest match their sources")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Check + benchmark for profiler.py.
+
+Runs stages with known amounts of busy work and checks the exclusive
+charging: nested stages, a tracked generator interleaved with its
+consumer, CPU of a finished subprocess going to the stage that ran it,
+and stage totals adding up to the wall time. Checks that stage() and
+track() change nothing when profiling is off, that --cprofile writes a
+loadable .prof per stage, and that comparing two reports flags a slower
+stage, marks new and gone ones and folds many chapter stages. Times a
+stage switch with profiling on and off.
+
+Usage:
+    python3 scripts/bench_profiler.py
+
+Exits non-zero when a check fails.
+"""
+
+import contextlib, io, json, pstats, shutil, subprocess, sys, tempfile, time
+from pathlib import Path
+
+import profiler
+from profiler import stage, track
+
+SLICE = 0.05  # seconds of busy work per unit; the checks allow a third of it
+
+
+def busy(units: float):
+    end = time.perf_counter() + units * SLICE
+    while time.perf_counter() < end:
+        pass
+
+
+def near(value: float, units: float) -> bool:
+    return abs(value - units * SLICE) < SLICE / 3
+
+
+def producer(n: int):
+    for i in range(n):
+        busy(1)
+        yield i
+
+
+def main(argv: list):
+    tmp = Path(tempfile.mkdtemp(prefix="bench-profiler-"))
+    problems, times = [], {}
+
+    # Exclusive charging: outer 1 + 1 units around inner 2, a generator of 3 x 1
+    # consumed in 3 x 1 units, a subprocess's CPU
+    prof = profiler.start(tmp / "prof")
+    t0 = time.perf_counter()
+    with stage("outer"):
+        busy(1)
+        with stage("inner"):
+            busy(2)
+        busy(1)
+    with stage("consumer"):
+        for _ in track("producer", producer(3)):
+            busy(1)
+    with stage("subprocess"):
+        subprocess.run([sys.executable, "-c", "import bench_profiler; bench_profiler.busy(4)"],
+                       cwd=Path(__file__).parent, check=True)
+    wall = time.perf_counter() - t0
+    profiler.stop()
+    s = prof.stats
+    for name, units in (("outer", 2), ("inner", 2), ("consumer", 3), ("producer", 3)):
+        if not near(s[name]["wall"], units):
+            problems.append(f"{name}: {s[name]['wall']:.3f} s wall charged, expected {units * SLICE:.3f}")
+        if not near(s[name]["cpu"], units):
+            problems.append(f"{name}: {s[name]['cpu']:.3f} s CPU charged, expected {units * SLICE:.3f}")
+    if (s["outer"]["calls"], s["inner"]["calls"], s["producer"]["calls"]) != (1, 1, 4):
+        problems.append("stage calls miscounted (a tracked generator: one per next())")
+    if s["subprocess"]["cpu"] < 4 * SLICE * 2 / 3:
+        problems.append(f"a finished subprocess's CPU was not charged ({s['subprocess']['cpu']:.3f} s)")
+    if abs(sum(v["wall"] for v in s.values()) - wall) > SLICE / 3:
+        problems.append("stage wall times do not add up to the elapsed time")
+
+    # Off: no-ops that leave the generator's items alone
+    if list(track("x", iter(range(5)))) != list(range(5)) or \
+            not isinstance(stage("x"), contextlib.nullcontext):
+        problems.append("stage()/track() are not no-ops when profiling is off")
+
+    # Reports: JSON and one .prof per stage
+    with contextlib.redirect_stdout(io.StringIO()):
+        prof.dump(tmp / "new.json")
+    profs = sorted(p.stem for p in (tmp / "prof").glob("*.prof"))
+    if profs != sorted(s):
+        problems.append(f"--cprofile wrote {profs}, expected one per stage")
+    else:
+        pstats.Stats(str(tmp / "prof" / "outer.prof"))
+
+    # Comparing reports: slower, new, gone, folded chapter stages
+    new = json.loads((tmp / "new.json").read_text())
+    old = json.loads(json.dumps(new))
+    old["stages"]["inner"]["wall"] /= 2              # inner got 100% slower
+    old["stages"]["removed stage"] = dict(old["stages"]["outer"])
+    del old["stages"]["consumer"]
+    chapter = {"wall": 0.01, "cpu": 0.01, "rss_growth": 0, "peak_rss": 0, "calls": 1}
+    for i in range(15):
+        new["stages"][f"extract ch{i:02d}"] = dict(chapter, wall=0.01 * (i + 1))
+        old["stages"][f"extract ch{i:02d}"] = chapter
+    (tmp / "old.json").write_text(json.dumps(old))
+    (tmp / "new.json").write_text(json.dumps(new))
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        profiler.main([str(tmp / "old.json"), str(tmp / "new.json")])
+    table = out.getvalue()
+    rows = {line.split()[0]: line for line in table.splitlines() if line.startswith("   ")}
+    if "⚠️" not in rows.get("inner", "") or "⚠️" in rows.get("outer", ""):
+        problems.append("the comparison did not flag exactly the slower stage")
+    if not rows.get("consumer", "").rstrip().endswith("new"):
+        problems.append("a stage missing from the base is not marked new")
+    if "removed stage" not in table or "(gone)" not in table:
+        problems.append("a stage gone since the base is not listed")
+    if "extract (other 5)" not in table or table.count("\n   extract ") != 11:
+        problems.append("chapter stages were not folded to the 10 slowest + the rest")
+
+    # Cost of a stage switch
+    n = 20000
+    prof = profiler.start()
+    t0 = time.perf_counter()
+    for _ in range(n):
+        with stage("x"):
+            pass
+    times["stage on"] = (time.perf_counter() - t0) / n
+    profiler.stop()
+    t0 = time.perf_counter()
+    for _ in range(n):
+        with stage("x"):
+            pass
+    times["stage off"] = (time.perf_counter() - t0) / n
+
+    shutil.rmtree(tmp)
+    print(f"   {len(s)} stages, {wall:.2f} s of planted work")
+    for label, secs in times.items():
+        print(f"   {label:<26}{secs * 1e6:>9.2f} µs")
+    for p in problems:
+        print(f"      ⚠️  {p}")
+    if problems:
+        sys.exit("⚠️  Profiler checks failed")
+    print("✅ Stages charged exclusively, reports compare")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
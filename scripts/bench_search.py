@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Check + benchmark for search_index.py.
+
+Indexes a scratch copy of every language dir into a scratch database.
+Checks: for a sample of terms, the index finds exactly the paragraphs a
+plain scan of every paragraph finds; a quoted phrase only matches
+paragraphs that contain it; the exported shards hold the same postings
+as the database; editing one chapter re-indexes only that chapter and
+rewrites only the shards of terms that changed. Times the full build,
+a no-op update, a one-chapter update, the export and a query.
+
+Usage:
+    python3 scripts/bench_search.py [--terms N]
+
+Exits non-zero when a check fails.
+"""
+
+import json, random, shutil, sys, tempfile, time
+from pathlib import Path
+
+import search_index
+from alignment import paragraphs
+from search_index import SearchIndex, repo_sources, terms
+
+REPO = Path(__file__).parent.parent
+
+
+def scan(root: Path, words: list) -> set:
+    """{(lang, name, line)} of paragraphs holding every term of `words`, by brute force."""
+    found = set()
+    for lang in search_index.LANGS:
+        for name, path, _ in repo_sources(lang, root):
+            for _, line, _, text in paragraphs(path.read_text(encoding="utf-8")):
+                if set(words) <= set(terms(text)):
+                    found.add((lang, name, line))
+    return found
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+def update_all(index: SearchIndex, root: Path) -> int:
+    changed = sum(index.update_lang(lang, repo_sources(lang, root)) for lang in search_index.LANGS)
+    index.commit()
+    return changed
+
+
+def main(argv: list):
+    n_terms = int(argv[argv.index("--terms") + 1]) if "--terms" in argv else 40
+    tmp = Path(tempfile.mkdtemp(prefix="bench-search-"))
+    root, out = tmp / "book", tmp / "search"
+    for lang in search_index.LANGS:
+        shutil.copytree(REPO / lang, root / lang)
+    index = SearchIndex(tmp / "search.sqlite")
+    problems, times = [], {}
+
+    changed, times["full build"] = timed(update_all, index, root)
+    _, times["export (all shards)"] = timed(index.export, out)
+    again, times["no-op update"] = timed(update_all, index, root)
+    if again:
+        problems.append(f"no-op update re-indexed {again} chapter(s)")
+
+    rng = random.Random(7)
+    vocab = sorted({t for t, in index.db.execute("SELECT DISTINCT term FROM postings")})
+    queries = [[t] for t in rng.sample(vocab, min(n_terms, len(vocab)))]
+    queries += [["протокол"], ["шелл", "протокол"], ["protocol"], ["autonom"]]
+    for words in queries:
+        got = {h[:3] for h in index.query(" ".join(words), limit=10**6)}
+        want = scan(root, words)
+        if got != want:
+            problems.append(f"{' '.join(words)}: index {len(got)} vs scan {len(want)} paragraph(s)")
+    hits, times["query (phrase)"] = timed(index.query, '"the protocol"', "en", 10**6)
+    for lang, name, _, i in hits:
+        if "the protocol" not in " ".join(index.paragraph(lang, name, i).lower().split()):
+            problems.append(f"phrase hit without the phrase: {lang}/{name}")
+
+    docs = json.loads((out / "index.json").read_text(encoding="utf-8"))["docs"]
+    shards = {f.name: json.loads(f.read_text(encoding="utf-8")) for f in out.glob("s*.json")}
+    for term in rng.sample(vocab, 20):
+        postings = shards[f"s{search_index.shard_of(term):02x}.json"].get(term, [])
+        got = {(*docs[str(p[0])][:2], line) for p in postings for line in p[1:]}
+        want = {h[:3] for h in index.query(term, limit=10**6)}
+        if got != want:
+            problems.append(f"shards disagree with the index on {term!r}")
+
+    chapter = root / "en" / "last-checkpoint.md"
+    chapter.write_text(chapter.read_text(encoding="utf-8") + "\nZyxwvut quasarfrobnicate.\n", encoding="utf-8")
+    before = {f.name: f.stat().st_mtime_ns for f in out.iterdir()}
+    one, times["one-chapter update"] = timed(update_all, index, root)
+    written, times["export (changed shards)"] = timed(index.export, out)
+    rewritten = [f.name for f in out.iterdir() if f.stat().st_mtime_ns != before[f.name]]
+    expect = {f"s{search_index.shard_of(t):02x}.json" for t in terms("Zyxwvut quasarfrobnicate")}
+    if one != 1:
+        problems.append(f"one edited chapter re-indexed {one} chapter(s)")
+    if set(rewritten) != expect:
+        problems.append(f"rewrote {sorted(rewritten)}, expected {sorted(expect)}")
+    if not index.query("quasarfrobnicate"):
+        problems.append("the added word is not found")
+
+    size = (tmp / "search.sqlite").stat().st_size
+    shard_size = sum(f.stat().st_size for f in out.iterdir())
+    index.close()
+    shutil.rmtree(tmp)
+    print(f"   {changed} chapters, {len(vocab)} terms, index {size / 2**20:.1f} MB, shards {shard_size / 2**20:.2f} MB")
+    for label, secs in times.items():
+        print(f"   {label:<26}{secs * 1000:>9.1f} ms")
+    print(f"   checked {len(queries)} queries against a full scan, {len(rewritten)} shard(s) rewritten after an edit")
+    for p in problems:
+        print(f"      ⚠️  {p}")
+    if problems:
+        sys.exit("⚠️  Search checks failed")
+    print("✅ Index matches a full scan")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
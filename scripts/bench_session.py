@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Check + benchmark for edit_session.py.
+
+Builds a scratch book (chapters.json plus overrides/ from ru/), generates
+the edit file and checks both directions: a section edited in the edit
+file reaches only its override file, without the chapter heading; an
+override edited on its own is patched into the edit file with every
+other byte unchanged and the heading kept; a section
+edited differently on both sides is a conflict that touches neither,
+until the sides agree. split.py must not overwrite an override edited
+since make_edit.py, and make_edit.py must not discard unsplit edits.
+Finally a live session (watcher thread) must carry an override save
+into the edit file. One-section syncs are timed against a full
+make_edit.py + split.py cycle.
+
+Usage:
+    python3 scripts/bench_session.py
+
+Exits non-zero when a check fails.
+"""
+
+import contextlib, io, json, shutil, sys, tempfile, threading, time
+from pathlib import Path
+
+import make_edit, split
+from edit_session import EditSession
+
+REPO = Path(__file__).parent.parent
+
+
+def scratch_book(tmp: Path) -> list:
+    overrides = tmp / "overrides"
+    overrides.mkdir()
+    data = json.loads((REPO / "chapters.json").read_text(encoding="utf-8"))
+    ru = data["ru"]
+    for entry in ru["chapters"] + ru["appendix"]:
+        source = REPO / "ru" / f"{entry['file']}.md"
+        (overrides / f"{entry['file']}.md").write_text(
+            source.read_text(encoding="utf-8") if source.exists() else f"{entry['file']}\n", encoding="utf-8")
+    (tmp / "chapters.json").write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    make_edit.CHAPTERS_JSON = split.CHAPTERS_JSON = tmp / "chapters.json"
+    make_edit.OVERRIDES_DIR = split.OVERRIDES_DIR = overrides
+    make_edit.OUTPUT_FILE = split.EDIT_FILE = tmp / "autonom-ru-edit.md"
+    return [f"{c['file']}.md" for c in ru["chapters"]]
+
+
+def edit_section(edit_file: Path, key: str, marker: str):
+    data = edit_file.read_bytes()
+    s, e = split.tokenize(data)[key]
+    edit_file.write_bytes(data[:s] + data[s:e].replace(b"\n\n", f"\n\n{marker}\n\n".encode(), 1) + data[e:])
+
+
+def edit_own(path: Path, marker: str):
+    text = path.read_text(encoding="utf-8")
+    path.write_text(text.replace("\n\n", f"\n\n{marker}\n\n", 1), encoding="utf-8")
+
+
+def main(argv: list):
+    tmp = Path(tempfile.mkdtemp(prefix="bench-session-"))
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    chapters = scratch_book(tmp)
+    overrides, edit_file = split.OVERRIDES_DIR, split.EDIT_FILE
+    with quiet:
+        make_edit.main()
+    session = EditSession(edit_file, overrides, split.CHAPTERS_JSON)
+    problems = []
+    heads = split.headers(json.loads(split.CHAPTERS_JSON.read_text(encoding="utf-8"))["ru"])
+    a, b, c, d, e = (chapters[i * len(chapters) // 6] for i in range(1, 6))
+
+    def snapshot():
+        return {p.name: p.read_bytes() for p in overrides.iterdir()}
+
+    # Edit file → override
+    before = snapshot()
+    edit_section(edit_file, a, "Правка в файле.")
+    with quiet:
+        session.sync()
+    changed = [n for n, v in snapshot().items() if before[n] != v]
+    own_a = (overrides / a).read_text(encoding="utf-8")
+    if changed != [a] or "Правка в файле." not in own_a:
+        problems.append(f"edit file → overrides wrote {changed}, expected [{a}]")
+    if own_a.startswith(heads[a].split("\n")[0]):
+        problems.append("edit file → override copied the chapter heading into the override")
+    with quiet:
+        if session.sync([a])["to_edit"]:
+            problems.append("a synced section moved again on the next round")
+
+    # Override → edit file, patched in place
+    old = edit_file.read_bytes()
+    edit_own(overrides / b, "Правка в главе.")
+    t0 = time.perf_counter()
+    with quiet:
+        session.sync([b])
+    t_sync = time.perf_counter() - t0
+    new = edit_file.read_bytes()
+    old_spans, new_spans = split.tokenize(old), split.tokenize(new)
+    (s1, e1), (s2, e2) = old_spans[b], new_spans[b]
+    if old[:s1] != new[:s2] or old[e1:] != new[e2:]:
+        problems.append("override → edit file changed bytes outside the section")
+    if new[s2:e2].decode("utf-8") != split.with_header((overrides / b).read_text(encoding="utf-8").strip(), heads[b]):
+        problems.append("override → edit file lost the chapter heading or subtitle")
+
+    # Both sides differently → conflict, nothing overwritten
+    edit_section(edit_file, c, "Версия А.")
+    edit_own(overrides / c, "Версия Б.")
+    own_c, edit_c = (overrides / c).read_bytes(), edit_file.read_bytes()
+    with quiet:
+        result = session.sync([c])
+    if result["conflicts"] != [c] or (overrides / c).read_bytes() != own_c or edit_file.read_bytes() != edit_c:
+        problems.append(f"conflict not detected or sides overwritten: {result}")
+    with quiet:
+        session.sync()  # still a conflict on the next round
+    (overrides / c).write_text(split.strip_header(
+        split.extract_sections(edit_file.read_text(encoding="utf-8"))[c], heads[c]) + "\n", encoding="utf-8")
+    with quiet:
+        result = session.sync([c])
+    if result["conflicts"] or session.conflicts:
+        problems.append("conflict not resolved after the sides agreed")
+
+    # split.py and make_edit.py protect the other side's edits
+    edit_section(edit_file, d, "Из файла правки.")
+    edit_own(overrides / d, "Из главы.")
+    own_d = (overrides / d).read_bytes()
+    with quiet:
+        split.main()
+    if (overrides / d).read_bytes() != own_d:
+        problems.append("split.py overwrote an override edited since make_edit.py")
+    edit_section(edit_file, e, "Не разделено.")
+    edit_before = edit_file.read_bytes()
+    with quiet:
+        make_edit.main()
+    if edit_file.read_bytes() != edit_before:
+        problems.append("make_edit.py discarded edits not split yet")
+
+    # Full cycle for comparison
+    with quiet:
+        make_edit.main(force=True)
+        t0 = time.perf_counter()
+        make_edit.main(force=True)
+        edit_section(edit_file, a, "Ещё правка.")
+        split.main()
+    t_cycle = time.perf_counter() - t0
+
+    # Live session: an override save reaches the edit file
+    live = EditSession(edit_file, overrides, split.CHAPTERS_JSON)
+    threading.Thread(target=live.run, daemon=True).start()
+    if not live.ready.wait(10):
+        problems.append("live session did not start watching")
+    edit_own(overrides / b, "Живая правка.")
+    t0 = time.monotonic()
+    while "Живая правка." not in edit_file.read_text(encoding="utf-8") and time.monotonic() - t0 < 10:
+        time.sleep(0.02)
+    t_live = time.monotonic() - t0
+    if t_live >= 10:
+        problems.append("live session did not pick up an override save")
+
+    size = edit_file.stat().st_size
+    shutil.rmtree(tmp, ignore_errors=True)
+    print(f"   edit file {size // 1024}K, {len(chapters)} chapters")
+    print(f"   {'make_edit.py + split.py':<32}{t_cycle * 1000:>8.1f} ms")
+    print(f"   {'session: one override → edit':<32}{t_sync * 1000:>8.1f} ms")
+    print(f"   {'live, save to edit file':<32}{t_live * 1000:>8.1f} ms")
+    for p in problems:
+        print(f"      ⚠️  {p}")
+    if problems:
+        sys.exit("⚠️  Edit session checks failed")
+    print("✅ Edit session in sync")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Check + benchmark for concurrent chapter loading (compile_v2.load_sources).
+
+Builds a scratch source tree from ru/ repeated N times (every other copy
+as a blog-post .html, so extraction runs too) and assembles the book
+with one reader thread and with --read-jobs threads. Before every run
+the page cache is dropped for the tree (posix_fadvise DONTNEED per file,
+or /proc/sys/vm/drop_caches when writable), so every read goes to disk.
+A second pair of runs adds a fixed delay per file read to stand in for
+network storage. The Markdown must be identical for every setting.
+
+Usage:
+    python3 scripts/bench_sources.py [--scale N] [--jobs N] [--latency MS]
+
+Exits non-zero when outputs differ.
+"""
+
+import contextlib, dataclasses, io, os, shutil, sys, tempfile, time
+from pathlib import Path
+
+import compile_v2
+from build_cache import BuildCache
+from md2html import markdown_to_html
+
+REPO = Path(__file__).parent.parent
+
+
+def drop_cache(src_dir: Path) -> str:
+    try:
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            os.sync()
+            f.write("3\n")
+        return "drop_caches"
+    except OSError:
+        pass
+    for entry in os.scandir(src_dir):
+        fd = os.open(entry.path, os.O_RDONLY)
+        try:
+            os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return "fadvise"
+
+
+def main(argv: list):
+    scale = int(argv[argv.index("--scale") + 1]) if "--scale" in argv else 8
+    jobs = int(argv[argv.index("--jobs") + 1]) if "--jobs" in argv else compile_v2.READ_JOBS
+    latency = float(argv[argv.index("--latency") + 1]) if "--latency" in argv else 5.0
+    tmp = Path(tempfile.mkdtemp(prefix="bench-sources-"))
+    src_dir, out_dir = tmp / "src", tmp / "out"
+    src_dir.mkdir()
+    compile_v2.OUT_DIR = out_dir
+
+    cfg = compile_v2.load_chapters("ru")["ru"]
+    entries = {"chapters": [], "appendix": []}
+    for k in range(scale):
+        for part in entries:
+            for ch in getattr(cfg, part):
+                source = REPO / "ru" / f"{ch.file}.md"
+                if not source.exists():
+                    continue
+                name = f"{ch.file}-{k}"
+                text = source.read_text(encoding="utf-8")
+                if k % 2:
+                    (src_dir / f"{name}.html").write_text(
+                        f"<html><body><article>{markdown_to_html(text)}</article></body></html>", encoding="utf-8")
+                else:
+                    (src_dir / f"{name}.md").write_text(text, encoding="utf-8")
+                entries[part].append(dataclasses.replace(ch, file=name))
+    book = dataclasses.replace(cfg, chapters=tuple(entries["chapters"]), appendix=tuple(entries["appendix"]))
+
+    extract = compile_v2.cached_extract
+
+    def slow_extract(*args):
+        time.sleep(latency / 1000)
+        return extract(*args)
+
+    results, outputs, method = [], set(), ""
+    for label, delay in (("local disk", False), (f"+{latency:g} ms/file", True)):
+        compile_v2.cached_extract = slow_extract if delay else extract
+        for n in (1, jobs):
+            method = drop_cache(src_dir)
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                md_file, _ = compile_v2.build_md("ru", book, src_dir, BuildCache(enabled=False), n)
+            results.append((label, n, time.perf_counter() - t0))
+            outputs.add(md_file.read_bytes())
+    compile_v2.cached_extract = extract
+
+    files = len(os.listdir(src_dir))
+    size = sum(f.stat().st_size for f in src_dir.iterdir())
+    shutil.rmtree(tmp)
+    print(f"   {files} source files, {size / 2**20:.1f} MB, cold cache via {method}")
+    print(f"   {'':<16}{'threads':>8}{'seconds':>10}")
+    for label, n, secs in results:
+        print(f"   {label:<16}{n:>8}{secs:>10.3f}")
+    if len(outputs) != 1:
+        sys.exit("⚠️  Outputs differ between reader settings")
+    print("✅ Same book with every reader setting")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
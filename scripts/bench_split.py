@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Check + benchmark for split.py.
+
+Builds a scratch book (chapters.json plus overrides/ from ru/) with the
+appendix list repeated to grow the book, generates the edit file with
+make_edit.py, edits one chapter and the glossary, and splits it back.
+Checks: the tokenizer finds exactly what the old five regex scans found,
+only the edited override is rewritten, untouched overrides are not read,
+and chapters.json changes only in the glossary value. The split is timed
+against the old approach (five DOTALL scans, read every override, full
+json.dump).
+
+Usage:
+    python3 scripts/bench_split.py [--scale N]
+
+Exits non-zero when a check fails.
+"""
+
+import contextlib, io, json, re, shutil, sys, tempfile, time
+from pathlib import Path
+
+import make_edit, split
+
+REPO = Path(__file__).parent.parent
+
+
+def old_extract(content: str) -> dict:
+    sections = {}
+    for kind in ("chapter", "appendix"):
+        for m in re.finditer(rf'<!-- {kind}: (\S+\.md) -->\s*(.*?)\s*<!-- /{kind} -->', content, re.DOTALL):
+            sections[m.group(1)] = m.group(2).strip()
+    for kind in split.SPECIAL:
+        m = re.search(rf'<!-- {kind} -->\s*(.*?)\s*<!-- /{kind} -->', content, re.DOTALL)
+        if m:
+            sections[f"_{kind}"] = m.group(1).strip()
+    return sections
+
+
+def old_split(edit_file: Path, overrides: Path, chapters_json: Path):
+    sections = old_extract(edit_file.read_text(encoding="utf-8"))
+    for name, text in sections.items():
+        if not name.startswith("_"):
+            path = overrides / name
+            if not path.exists() or path.read_text(encoding="utf-8").strip() != text:
+                path.write_text(text + "\n", encoding="utf-8")
+    data = json.loads(chapters_json.read_text(encoding="utf-8"))
+    for kind in split.SPECIAL:
+        data["ru"][kind] = "\n" + sections[f"_{kind}"] + "\n"
+    chapters_json.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def main(argv: list):
+    scale = int(argv[argv.index("--scale") + 1]) if "--scale" in argv else 10
+    tmp = Path(tempfile.mkdtemp(prefix="bench-split-"))
+    overrides = tmp / "overrides"
+    overrides.mkdir()
+    data = json.loads((REPO / "chapters.json").read_text(encoding="utf-8"))
+    ru = data["ru"]
+    for key in split.SPECIAL:
+        ru[key] = ru[key] if not ru[key].startswith("__file:") else \
+            (REPO / "ru" / ru[key][7:]).read_text(encoding="utf-8")
+    ru["appendix"] = [dict(a, file=f"{a['file']}-{n}") for n in range(scale) for a in ru["appendix"]]
+    for entry in ru["chapters"] + ru["appendix"]:
+        source = REPO / "ru" / f"{entry['file'].rsplit('-', 1)[0] if entry in ru['appendix'] else entry['file']}.md"
+        (overrides / f"{entry['file']}.md").write_text(
+            source.read_text(encoding="utf-8") if source.exists() else f"{entry['file']}\n", encoding="utf-8")
+    (tmp / "chapters.json").write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    make_edit.CHAPTERS_JSON = split.CHAPTERS_JSON = tmp / "chapters.json"
+    make_edit.OVERRIDES_DIR = split.OVERRIDES_DIR = overrides
+    make_edit.OUTPUT_FILE = split.EDIT_FILE = tmp / "autonom-ru-edit.md"
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        make_edit.main()
+    edit_file = split.EDIT_FILE
+    problems = []
+    text = edit_file.read_text(encoding="utf-8")
+    if split.extract_sections(text) != old_extract(text):
+        problems.append("tokenizer and regex scans disagree")
+
+    # Edit one chapter and the glossary
+    target = ru["chapters"][len(ru["chapters"]) // 2]["file"] + ".md"
+    head, sep, tail = text.partition(f"<!-- chapter: {target} -->\n")
+    text = head + sep + tail.replace("\n\n", "\n\nПравка.\n\n", 1)
+    text = text.replace("<!-- /glossary -->", "\n**Новый термин** — пример.\n<!-- /glossary -->")
+    edit_file.write_text(text, encoding="utf-8")
+    before = {p.name: p.read_bytes() for p in overrides.iterdir()}
+    json_before = split.CHAPTERS_JSON.read_text(encoding="utf-8")
+
+    reads = []
+    real_open = io.open
+    def tracking_open(file, *args, **kwargs):
+        if str(file).startswith(str(overrides)) and "r" in (args[0] if args else kwargs.get("mode", "r")):
+            reads.append(Path(file).name)
+        return real_open(file, *args, **kwargs)
+    io.open = tracking_open
+    try:
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            split.main()
+        t_new = time.perf_counter() - t0
+    finally:
+        io.open = real_open
+
+    changed = [n for n, b in before.items() if (overrides / n).read_bytes() != b]
+    if changed != [target]:
+        problems.append(f"rewrote {changed}, expected [{target}]")
+    if any(n != target for n in reads):
+        problems.append(f"read untouched overrides: {sorted(set(reads) - {target})}")
+    new_json = split.CHAPTERS_JSON.read_text(encoding="utf-8")
+    old_data = json.loads(json_before)
+    old_data["ru"]["glossary"] = json.loads(new_json)["ru"]["glossary"]
+    if "Новый термин" not in old_data["ru"]["glossary"] or json.loads(new_json) != old_data:
+        problems.append("chapters.json: unexpected changes")
+    if new_json.replace(json.dumps(old_data["ru"]["glossary"], ensure_ascii=False), "") != \
+            json_before.replace(json.dumps(json.loads(json_before)["ru"]["glossary"], ensure_ascii=False), ""):
+        problems.append("chapters.json: bytes outside the glossary changed")
+
+    edit_file.write_text(text.replace("Правка.", "Правка 2."), encoding="utf-8")
+    t0 = time.perf_counter()
+    old_split(edit_file, overrides, split.CHAPTERS_JSON)
+    t_old = time.perf_counter() - t0
+
+    size = edit_file.stat().st_size
+    sections = len(split.extract_sections(text))
+    shutil.rmtree(tmp)
+    print(f"   edit file {size // 1024}K, {sections} sections")
+    print(f"   {'regex scans + read all overrides':<36}{t_old * 1000:>8.1f} ms")
+    print(f"   {'one pass + sidecar index':<36}{t_new * 1000:>8.1f} ms")
+    for p in problems:
+        print(f"      ⚠️  {p}")
+    if problems:
+        sys.exit("⚠️  Split checks failed")
+    print("✅ Split matches")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
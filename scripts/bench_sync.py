@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Check + benchmark for the git-backed translation sync.
+
+Copies ru/ and every translation into a scratch git repo, commits, then
+edits one Russian chapter (drops a line that the translations share,
+rewords a paragraph and adds one) and commits again. The sync is timed against the
+straightforward approach: `git show` every chapter at both revisions,
+SequenceMatcher over whole files and list-membership removal. Checks:
+only the edited chapter is diffed, the shared line is gone from every
+translation, nothing else in the translations changed, the alignment
+index reports exactly the paragraphs aligned to the reworded one as stale
+and the translation memory offers their old translation as a fuzzy match.
+
+Usage:
+    python3 scripts/bench_sync.py
+
+Exits non-zero when a check fails.
+"""
+
+import contextlib, difflib, importlib.util, io, shutil, subprocess, sys, tempfile, time
+from pathlib import Path
+
+from alignment import AlignmentIndex, paragraphs, refresh
+from build_cache import BuildCache
+from translation_memory import TranslationMemory
+
+REPO = Path(__file__).parent.parent
+spec = importlib.util.spec_from_file_location("sync_translations", Path(__file__).parent / "sync-translations.py")
+sync = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(sync)
+
+
+def git(root: Path, *args) -> str:
+    return subprocess.run(["git", "-C", str(root), *args], capture_output=True, text=True,
+                          check=True).stdout
+
+
+def legacy_sync(root: Path, old: str, new: str, langs: list) -> int:
+    """Whole-tree diff with list-membership removal; returns files diffed."""
+    files = 0
+    for f in sorted((root / "ru").glob("*.md")):
+        old_text = git(root, "show", f"{old}:ru/{f.name}")
+        new_text = git(root, "show", f"{new}:ru/{f.name}")
+        old_lines, new_lines = old_text.splitlines(), new_text.splitlines()
+        removed = []
+        for tag, i1, i2, _, _ in difflib.SequenceMatcher(None, old_lines, new_lines).get_opcodes():
+            if tag in ("replace", "delete"):
+                removed.extend(old_lines[i1:i2])
+        files += 1
+        for lang in langs:
+            target = root / lang / f.name
+            if removed and target.exists():
+                [l for l in target.read_text().splitlines() if l not in removed]
+    return files
+
+
+def main(argv: list):
+    tmp = Path(tempfile.mkdtemp(prefix="bench-sync-"))
+    langs = [lang for lang, d in sync.LANG_DIRS.items() if d.exists()]
+    for d in ["ru"] + langs:
+        shutil.copytree(REPO / d, tmp / d)
+    git(tmp, "init", "-q")
+    git(tmp, "-c", "user.name=bench", "-c", "user.email=bench@localhost", "add", ".")
+    git(tmp, "-c", "user.name=bench", "-c", "user.email=bench@localhost", "commit", "-qm", "before")
+
+    # A line present in the Russian chapter and every translation that has it
+    problems = []
+    chapter, shared = None, None
+    for f in sorted((tmp / "ru").glob("*.md")):
+        for line in f.read_text().splitlines():
+            if len(line) > 20 and all(line in (tmp / lang / f.name).read_text().splitlines()
+                                      for lang in langs if (tmp / lang / f.name).exists()):
+                chapter, shared = f, line
+                break
+        if chapter:
+            break
+    if not chapter:
+        sys.exit("⚠️  No line shared by the Russian chapter and its translations")
+    index_file = tmp / "alignment.sqlite"
+    index = AlignmentIndex(index_file)
+    refresh(index, {f.name: f.read_text() for f in (tmp / "ru").glob("*.md")},
+            {lang: tmp / lang for lang in langs})
+    index.commit()
+    tm = TranslationMemory(tmp / "tm.sqlite")
+    tm.learn(index, {f.name: f.read_text() for f in (tmp / "ru").glob("*.md")},
+             {lang: tmp / lang for lang in langs})
+    tm.commit()
+    tm.close()
+    text = chapter.read_text()
+    ru_paras = paragraphs(text)
+    reworded = next(i for i, p in enumerate(ru_paras)
+                    if p[0] == "p" and len(p[3]) > 150 and shared not in p[3])
+    # Translated paragraphs aligned to the reworded one, as (start, end) lines
+    expected_stale = {lang: index.counterpart(lang, chapter.name, reworded) for lang in langs
+                      if (tmp / lang / chapter.name).exists()}
+    index.close()
+    old_para = ru_paras[reworded][3]
+    text = text.replace(old_para, old_para + " Ещё одна фраза.", 1)
+    chapter.write_text(text.replace(shared + "\n", "", 1) + "\nНовый абзац.\n")
+    before = {p: p.read_text() for lang in langs for p in (tmp / lang).glob("*.md")}
+    git(tmp, "-c", "user.name=bench", "-c", "user.email=bench@localhost", "commit", "-qam", "edit")
+
+    sync.REPO, sync.RU_DIR = tmp, tmp / "ru"
+    sync.LANG_DIRS = {lang: tmp / lang for lang in langs}
+    sync.BuildCache = lambda: BuildCache(root=tmp / ".build-cache")
+    sync.AlignmentIndex = lambda: AlignmentIndex(index_file)
+    sync.TranslationMemory = lambda: TranslationMemory(tmp / "tm.sqlite")
+
+    t0 = time.perf_counter()
+    diffed = legacy_sync(tmp, "HEAD~1", "HEAD", langs)
+    t_legacy = time.perf_counter() - t0
+
+    out = io.StringIO()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(out):
+        sync.main([])
+    t_sync = time.perf_counter() - t0
+
+    if "1 changed" not in out.getvalue():
+        problems.append(f"expected one changed chapter:\n{out.getvalue()}")
+    for path, old in before.items():
+        now = path.read_text()
+        # One occurrence left the Russian chapter, so one leaves each translation
+        expected = old.replace(shared + "\n", "", 1) if path.name == chapter.name else old
+        if now != expected:
+            problems.append(f"{path.relative_to(tmp)} changed unexpectedly")
+
+    index = AlignmentIndex(index_file)
+    for lang, ranges in expected_stale.items():
+        # The removed shared line shifts the translation up by one line
+        shift = [(a - 1, b - 1) if a > before_line(chapter.name, lang, tmp, shared) else (a, b)
+                 for a, b in ranges]
+        got = [(a, b) for _, _, a, b, _, _ in index.stale(lang, chapter.name)]
+        if got != shift:
+            problems.append(f"{lang}: stale {got}, expected {shift}")
+        start, end = ru_paras[reworded][1:3]
+        if ranges and f"[{lang}] {chapter.name}: ru {start}-{end} ≈" not in out.getvalue():
+            problems.append(f"{lang}: no TM suggestion for the reworded paragraph")
+    index.close()
+
+    print(f"   {len(langs)} languages, {diffed} chapters; edited {chapter.name}")
+    print(f"   {'whole tree (git show + difflib)':<34}{t_legacy * 1000:>9.1f} ms")
+    print(f"   {'blob diff (cat-file --batch)':<34}{t_sync * 1000:>9.1f} ms")
+    shutil.rmtree(tmp)
+    for p in problems:
+        print(f"      ⚠️  {p}")
+    if problems:
+        sys.exit("⚠️  Sync checks failed")
+    print("✅ Sync matches")
+
+
+def before_line(name: str, lang: str, tmp: Path, shared: str) -> int:
+    """Line number the shared line had in the translation before the sync."""
+    lines = git(tmp, "show", f"HEAD:{lang}/{name}").splitlines()
+    return lines.index(shared) + 1 if shared in lines else 10 ** 9
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
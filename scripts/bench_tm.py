@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Check + benchmark for the translation memory.
+
+Learns every aligned ru → translation pair of the repo into a scratch
+memory, then looks up Russian paragraphs that were changed the way a
+rewrite usually changes them: typography only (quotes, dashes, ё, case,
+emphasis) must be an exact hit; one word dropped and one replaced must
+find the original unit as a fuzzy match. LSH lookups are timed against
+scoring every unit of the language.
+
+Usage:
+    python3 scripts/bench_tm.py [--samples N]
+
+Exits non-zero when recall drops below 90%.
+"""
+
+import random, shutil, sys, tempfile, time
+from pathlib import Path
+
+from alignment import AlignmentIndex, refresh
+from translation_memory import TranslationMemory, jaccard, normalize, trigrams
+
+REPO = Path(__file__).parent.parent
+LANG = "en"
+
+
+def reword(text: str, rng: random.Random) -> str:
+    words = text.split(" ")
+    if len(words) < 12:
+        return text
+    words.pop(rng.randrange(len(words)))
+    words[rng.randrange(len(words))] = "что-то"
+    return " ".join(words)
+
+
+def retype(text: str) -> str:
+    return text.replace("«", "“").replace("»", "”").replace("—", "–").replace("ё", "е").upper()
+
+
+def main(argv: list):
+    samples = int(argv[argv.index("--samples") + 1]) if "--samples" in argv else 200
+    tmp = Path(tempfile.mkdtemp(prefix="bench-tm-"))
+    ru_texts = {f.name: f.read_text() for f in (REPO / "ru").glob("*.md")}
+    langs = {lang: REPO / lang for lang in ("en", "de", "es", "fi", "no") if (REPO / lang).is_dir()}
+
+    index = AlignmentIndex(tmp / "alignment.sqlite")
+    tm = TranslationMemory(tmp / "tm.sqlite")
+    t0 = time.perf_counter()
+    refresh(index, ru_texts, langs)
+    t_align = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    units = tm.learn(index, ru_texts, langs)
+    t_learn = time.perf_counter() - t0
+    tm.commit()
+
+    rows = tm.db.execute("SELECT s.text, u.target FROM units u JOIN sources s ON s.hash=u.hash "
+                         "WHERE u.lang=? AND length(s.text) > 80", (LANG,)).fetchall()
+    rng = random.Random(1)
+    picked = rng.sample(rows, min(samples, len(rows)))
+    all_grams = [(trigrams(normalize(src)), tgt) for src, tgt in
+                 tm.db.execute("SELECT s.text, u.target FROM units u JOIN sources s ON s.hash=u.hash "
+                               "WHERE u.lang=?", (LANG,))]
+
+    exact = sum(1 for src, tgt in picked if (tm.lookup(LANG, retype(src)) or (0,))[0] == 1.0)
+    queries = [(reword(src, rng), tgt) for src, tgt in picked]
+    t0 = time.perf_counter()
+    found = sum(1 for q, tgt in queries if (tm.lookup(LANG, q) or (0, "", None))[2] == tgt)
+    t_lsh = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for q, _ in queries:
+        grams = trigrams(normalize(q))
+        max(all_grams, key=lambda u: jaccard(grams, u[0]))
+    t_scan = time.perf_counter() - t0
+    index.close()
+    tm.close()
+    shutil.rmtree(tmp)
+
+    n = len(picked)
+    print(f"   {units} units learned ({len(langs)} languages) in {t_learn:.2f}s, "
+          f"aligned in {t_align:.2f}s")
+    print(f"   typography-only changes: {exact}/{n} exact")
+    print(f"   reworded: {found}/{n} found, LSH {t_lsh / n * 1000:.2f} ms/lookup, "
+          f"full scan {t_scan / n * 1000:.2f} ms/lookup ({len(all_grams)} {LANG} units)")
+    if exact < n or found < 0.9 * n:
+        sys.exit("⚠️  Translation memory recall too low")
+    print("✅ Translation memory recall OK")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Check + benchmark for the web edition (web_writer.py).
+
+Builds one language's book (English by default) from its repo dir, writes the web edition to a scratch
+directory and checks it: one page per chapters.json entry plus index
+and glossary, the pages together hold the whole book, prev/next and
+prefetch follow the page order, every local link and anchor resolves,
+and the .gz/.br variants precompress.py writes decompress to the page.
+Then one chapter is edited: only its page may be rewritten. Compares what a reader downloads
+for the first chapter (page + stylesheet, compressed) with the whole
+book.
+
+Usage:
+    python3 scripts/bench_web.py [--lang L]
+
+Exits non-zero when a check fails.
+"""
+
+import contextlib, gzip, io, re, shutil, sys, tempfile, time
+from pathlib import Path
+
+import compile_v2, precompress
+from build_cache import BuildCache
+from web_writer import book_pages, write_web
+
+REPO = Path(__file__).parent.parent
+_HREF = re.compile(r'href="([^"#:]+\.html)(?:#([^"]+))?"')
+_ID = re.compile(r'\sid="([^"]+)"')
+
+
+def main(argv: list):
+    lang = argv[argv.index("--lang") + 1] if "--lang" in argv else "en"
+    tmp = Path(tempfile.mkdtemp(prefix="bench-web-"))
+    compile_v2.OUT_DIR = tmp
+    src_dir = tmp / "src"
+    shutil.copytree(REPO / lang, src_dir)
+    cache = BuildCache(root=tmp / "cache")
+    cfg = compile_v2.load_chapters(lang)[lang]
+    with contextlib.redirect_stdout(io.StringIO()):
+        md_file, _ = compile_v2.build_md(lang, cfg, src_dir, cache)
+    md = md_file.read_text(encoding="utf-8")
+    present = {ch.file for ch, src in compile_v2.find_sources(cfg.chapters + cfg.appendix, src_dir) if src}
+    out, css_file = tmp / "web", compile_v2.web_css_file()
+    problems, times = [], {}
+
+    t0 = time.perf_counter()
+    n_pages, _ = write_web(md, cfg, present, out, css_file, cache)
+    times["cold build"] = time.perf_counter() - t0
+    pages = book_pages(md, cfg, present)
+    names = [p.name for p in pages]
+    precompress.precompress(out)
+    if set(names) != present | {"index"} | ({"glossary"} if cfg.glossary else set()):
+        problems.append(f"pages {sorted(set(names) ^ present)} do not match the entries")
+    words = lambda text: re.findall(r"\w+", text)
+    if words("".join(p.md for p in pages)) != words(md):
+        problems.append("the pages do not add up to the book")
+
+    page_dir = out / lang
+    ids = {p: set(_ID.findall((page_dir / f"{p}.html").read_text(encoding="utf-8"))) for p in names}
+    for i, name in enumerate(names):
+        html = (page_dir / f"{name}.html").read_text(encoding="utf-8")
+        nxt = names[i + 1] if i + 1 < len(names) else None
+        if nxt and f'<link rel="prefetch" href="{nxt}.html">' not in html:
+            problems.append(f"{name}: no prefetch of {nxt}")
+        if (nxt and f'rel="next" href="{nxt}.html"' not in html
+                or i and f'rel="prev" href="{names[i - 1]}.html"' not in html):
+            problems.append(f"{name}: prev/next out of order")
+        for target, anchor in _HREF.findall(html):
+            if target[:-5] not in ids or anchor and anchor not in ids[target[:-5]]:
+                problems.append(f"{name}: broken link {target}#{anchor}")
+        data = html.encode()
+        if gzip.decompress((page_dir / f"{name}.html.gz").read_bytes()) != data:
+            problems.append(f"{name}: .gz differs")
+        if precompress.brotli and precompress.brotli.decompress((page_dir / f"{name}.html.br").read_bytes()) != data:
+            problems.append(f"{name}: .br differs")
+
+    before = {f.name: f.stat().st_mtime_ns for f in page_dir.glob("*.html")}
+    t0 = time.perf_counter()
+    _, written = write_web(md, cfg, present, out, css_file, cache)
+    times["nothing changed"] = time.perf_counter() - t0
+    if written:
+        problems.append(f"an unchanged book rewrote {written} file(s)")
+    edited = next(p for p in pages if p.name not in ("index", "glossary"))
+    md2 = md.replace(edited.md.strip().split("\n")[-1], edited.md.strip().split("\n")[-1] + " Edited.", 1)
+    t0 = time.perf_counter()
+    _, written = write_web(md2, cfg, present, out, css_file, cache)
+    times["one chapter edited"] = time.perf_counter() - t0
+    rewritten = sorted(f.stem for f in page_dir.glob("*.html") if f.stat().st_mtime_ns != before[f.name])
+    if rewritten != [edited.name]:
+        problems.append(f"one edit rewrote {rewritten}")
+
+    first = (page_dir / f"{names[1]}.html.gz").stat().st_size + next(out.glob("novel.*.css.gz")).stat().st_size
+    book = len(gzip.compress(md.encode(), 9))
+    shutil.rmtree(tmp)
+    print(f"   {lang}: {n_pages} pages, {len(md) // 1024}K of Markdown")
+    print(f"   first chapter + stylesheet {first / 1024:.1f}K gzipped, whole book {book / 1024:.1f}K")
+    for label, secs in times.items():
+        print(f"   {label:<26}{secs * 1000:>9.1f} ms")
+    for p in problems:
+        print(f"      ⚠️  {p}")
+    if problems:
+        sys.exit("⚠️  Web edition checks failed")
+    print("✅ Web edition consistent")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
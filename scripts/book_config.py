@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""Book configuration (chapters.json, chapters-{lang}.json), parsed lazily.
+
+A config file is parsed and validated once per change: the result goes
+to a binary cache in .build-cache/config/, keyed by the file's path and
+checked against its mtime and size. The cache holds a small index, one
+compact record per language (titles, chapter entries, replacements) and
+the large texts (intro, epilogue, glossary) as raw UTF-8. Opening a
+config reads only the index; a language is decoded when it is first
+asked for, and each large text when it is first used — building one
+language never touches the others' glossaries. The cache file stays open
+from then on, so a rebuild by another process (which replaces the file)
+cannot shift the offsets under a Config already loaded.
+
+Schema: every language needs "title" and "chapters"; every entry of
+"chapters" and "appendix" needs "file" and "title", "number" and
+"subtitle" are optional. Other keys are ignored. Violations raise
+ConfigError naming the file and the offending entry.
+
+Importing this module reads nothing and writes nothing.
+
+Usage:
+    python3 scripts/book_config.py [config.json ...]   # validate
+"""
+
+import hashlib, marshal, os, struct, sys
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from build_cache import CACHE_DIR
+
+CONFIG_CACHE = CACHE_DIR / "config"
+SCRIPT_DIR = Path(__file__).parent
+MAGIC = b"AUTONOMCFG\x01"
+_HEAD = struct.Struct("<Q")
+TEXTS = ("intro", "epilogue", "glossary")
+_SCALARS = ("subtitle", "genre", "appendix_title")
+
+_configs = {}
+
+
+class ConfigError(ValueError):
+    pass
+
+
+@dataclass(slots=True, frozen=True)
+class Entry:
+    """One chapter or appendix item."""
+    file: str
+    title: str
+    number: str = None
+    subtitle: str = None
+
+    def as_dict(self) -> dict:
+        """The entry as it reads in chapters.json (absent fields left out)."""
+        d = {"file": self.file, "title": self.title}
+        if self.number is not None:
+            d["number"] = self.number
+        if self.subtitle is not None:
+            d["subtitle"] = self.subtitle
+        return d
+
+
+@dataclass(slots=True)
+class LangConfig:
+    """One language of a config file; intro, epilogue and glossary load on first use."""
+    lang: str
+    title: str
+    chapters: tuple
+    subtitle: str = ""
+    genre: str = ""
+    appendix_title: str = None
+    appendix: tuple = ()
+    replacements: dict = None
+    source: object = None         # the Config the large texts are read from
+    texts: dict = field(default_factory=dict)
+
+    def text(self, name: str) -> str:
+        """intro / epilogue / glossary, or None if the language has none."""
+        if name not in self.texts:
+            self.texts[name] = self.source.read_text(self.lang, name) if self.source else None
+        return self.texts[name]
+
+    @property
+    def intro(self) -> str:
+        return self.text("intro")
+
+    @property
+    def epilogue(self) -> str:
+        return self.text("epilogue")
+
+    @property
+    def glossary(self) -> str:
+        return self.text("glossary")
+
+
+# -- validation ---------------------------------------------------------------
+
+def _check_str(value, where: str, optional: bool = True, empty: bool = True):
+    if value is None and optional:
+        return
+    if not isinstance(value, str) or not (empty or value):
+        raise ConfigError(f"{where}: expected {'a string' if empty else 'a non-empty string'}, "
+                          f"got {value!r:.60}")
+
+
+def _entries(items, where: str) -> list:
+    if not isinstance(items, list):
+        raise ConfigError(f"{where}: expected a list")
+    out = []
+    for i, item in enumerate(items):
+        at = f"{where}[{i}]"
+        if not isinstance(item, dict):
+            raise ConfigError(f"{at}: expected an object")
+        for key in ("file", "title"):
+            if key not in item:
+                raise ConfigError(f"{at}: '{key}' is required")
+            _check_str(item[key], f"{at}.{key}", optional=False, empty=key == "title")
+        for key in ("number", "subtitle"):
+            _check_str(item.get(key), f"{at}.{key}")
+        out.append((item["file"], item["title"], item.get("number"), item.get("subtitle")))
+    return out
+
+
+def validate(data, name: str) -> dict:
+    """{lang: (compact record, {text name: str})} of a parsed config file."""
+    if not isinstance(data, dict):
+        raise ConfigError(f"{name}: expected an object of languages")
+    langs = {}
+    for lang, cfg in data.items():
+        where = f"{name}: {lang}"
+        if not isinstance(cfg, dict):
+            raise ConfigError(f"{where}: expected an object")
+        for key in ("title", "chapters"):
+            if key not in cfg:
+                raise ConfigError(f"{where}: '{key}' is required")
+        _check_str(cfg["title"], f"{where}.title", optional=False, empty=False)
+        for key in _SCALARS + TEXTS:
+            _check_str(cfg.get(key), f"{where}.{key}")
+        repl = cfg.get("replacements")
+        if repl is not None and not (isinstance(repl, dict) and
+                                     all(isinstance(k, str) and isinstance(v, str) for k, v in repl.items())):
+            raise ConfigError(f"{where}.replacements: expected an object of strings")
+        record = {key: cfg.get(key) for key in _SCALARS}
+        record.update(title=cfg["title"], replacements=repl,
+                      chapters=_entries(cfg["chapters"], f"{where}.chapters"),
+                      appendix=_entries(cfg.get("appendix", []), f"{where}.appendix"))
+        langs[lang] = (record, {key: cfg[key] for key in TEXTS if key in cfg})
+    return langs
+
+
+# -- binary cache -------------------------------------------------------------
+
+def _build(path: Path, st: os.stat_result) -> bytes:
+    import json  # only when the file changed
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except ValueError as e:
+        raise ConfigError(f"{path.name}: {e}") from None
+    langs = validate(data, path.name)
+    blobs, index = [], {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "langs": {}, "texts": {}}
+    pos = 0
+    for lang, (record, texts) in langs.items():
+        blob = marshal.dumps(record)
+        index["langs"][lang] = (pos, len(blob))
+        blobs.append(blob)
+        pos += len(blob)
+        index["texts"][lang] = {}
+        for key, text in texts.items():
+            blob = text.encode("utf-8")
+            index["texts"][lang][key] = (pos, len(blob))
+            blobs.append(blob)
+            pos += len(blob)
+    head = marshal.dumps(index)
+    return MAGIC + _HEAD.pack(len(head)) + head + b"".join(blobs)
+
+
+def _read_index(blob: bytes):
+    if not blob.startswith(MAGIC):
+        return None, 0
+    (n,) = _HEAD.unpack_from(blob, len(MAGIC))
+    start = len(MAGIC) + _HEAD.size
+    try:
+        return marshal.loads(blob[start:start + n]), start + n
+    except (EOFError, ValueError, TypeError):
+        return None, 0
+
+
+class Config(Mapping):
+    """{lang: LangConfig} of one config file, decoded language by language."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        st = self.path.stat()
+        self.cache_file = CONFIG_CACHE / (hashlib.sha1(str(self.path.resolve()).encode()).hexdigest()[:16] + ".bin")
+        self.file = None  # the cache file the index was read from, kept open
+        self.data = None  # or the whole cache in memory, when it was just built
+        self.index, self.base = None, 0
+        try:
+            self.file = open(self.cache_file, "rb")
+            head = self.file.read(len(MAGIC) + _HEAD.size)
+            if head.startswith(MAGIC):
+                (n,) = _HEAD.unpack_from(head, len(MAGIC))
+                self.index, self.base = _read_index(head + self.file.read(n))
+        except OSError:
+            pass
+        if not self.index or (self.index["mtime_ns"], self.index["size"]) != (st.st_mtime_ns, st.st_size):
+            if self.file:
+                self.file.close()
+                self.file = None
+            self.data = _build(self.path, st)
+            self.index, self.base = _read_index(self.data)
+            try:
+                CONFIG_CACHE.mkdir(parents=True, exist_ok=True)
+                tmp = self.cache_file.with_name(f"{self.cache_file.name}.{os.getpid()}.tmp")
+                tmp.write_bytes(self.data)
+                os.replace(tmp, self.cache_file)
+            except OSError:
+                pass
+        self.langs = {}
+
+    def close(self):
+        """Close the cache file. The cache is read into memory first, so
+        LangConfigs already handed out can still load their texts."""
+        if self.file:
+            if self.data is None:
+                self.data = os.pread(self.file.fileno(), os.fstat(self.file.fileno()).st_size, 0)
+            self.file.close()
+            self.file = None
+
+    def _read(self, span: tuple) -> bytes:
+        pos, n = span
+        if self.data is not None:
+            return self.data[self.base + pos:self.base + pos + n]
+        # pread on the handle opened with the index: positionless, and still
+        # the same file after another process os.replace()s the cache
+        return os.pread(self.file.fileno(), n, self.base + pos)
+
+    def read_text(self, lang: str, name: str) -> str:
+        span = self.index["texts"][lang].get(name)
+        return self._read(span).decode("utf-8") if span else None
+
+    def __getitem__(self, lang: str) -> LangConfig:
+        if lang not in self.langs:
+            if lang not in self.index["langs"]:
+                raise KeyError(lang)
+            r = marshal.loads(self._read(self.index["langs"][lang]))
+            self.langs[lang] = LangConfig(
+                lang=lang, title=r["title"], subtitle=r["subtitle"] or "", genre=r["genre"] or "",
+                appendix_title=r["appendix_title"], replacements=r["replacements"], source=self,
+                chapters=tuple(Entry(*e) for e in r["chapters"]),
+                appendix=tuple(Entry(*e) for e in r["appendix"]))
+        return self.langs[lang]
+
+    def __iter__(self):
+        return iter(self.index["langs"])
+
+    def __len__(self):
+        return len(self.index["langs"])
+
+
+def config_path(lang: str, config_file: Path = None) -> Path:
+    """chapters-{lang}.json next to the scripts, falling back to chapters.json."""
+    if config_file:
+        return Path(config_file)
+    lang_file = SCRIPT_DIR / f"chapters-{lang}.json"
+    return lang_file if lang_file.exists() else SCRIPT_DIR / "chapters.json"
+
+
+def load_config(path: Path) -> Config:
+    """Config of a file, reused within the process until the file changes."""
+    path = Path(path)
+    st = path.stat()
+    key = str(path.resolve())
+    cached = _configs.get(key)
+    if cached is None or (cached.index["mtime_ns"], cached.index["size"]) != (st.st_mtime_ns, st.st_size):
+        if cached is not None:
+            cached.close()  # its file handle would stay open for the process's life
+        cached = _configs[key] = Config(path)
+    return cached
+
+
+def main(argv: list):
+    paths = [Path(a) for a in argv] or sorted(SCRIPT_DIR.glob("chapters*.json"))
+    failed = False
+    for path in paths:
+        try:
+            config = load_config(path)
+        except ConfigError as e:
+            print(f"⚠️  {e}")
+            failed = True
+            continue
+        counts = ", ".join(f"{lang} {len(config[lang].chapters)}+{len(config[lang].appendix)}" for lang in config)
+        print(f"✅ {path.name}: {counts}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Build several languages at once in a process pool.
+
+Every language's MD, PDF and ebook stages run as separate jobs; PDF and the
+ebooks are queued as soon as that language's MD is assembled. The MD job
+also updates the search index. The ebook job
+parses the book once and writes EPUB, FB2 and DOCX from the same tree. When
+every job is done, precompress.py brings the .gz/.br variants and
+manifest.json of the output directory up to date. Prints a per-stage
+timing summary at the end.
+
+With a pandoc backend, every pandoc conversion goes to warm `pandoc
+server` processes when the installed pandoc has server mode (see
+pandoc_pool), and ebook jobs with pandoc EPUB, which mostly wait on pandoc, run as
+threads of this process instead of taking a worker slot.
+
+Usage:
+    python3 scripts/build_all.py [--jobs N] [--no-cache] [--pdf-backend native|pandoc|chunked]
+                                 [--epub-backend native|pandoc] [--read-jobs N] [--lint] [--deploy] [lang ...]
+
+Without languages, every language that has a chapters config is built.
+--lint first runs lint.py over those languages' chapters (warnings only).
+--pdf-backend chunked lays out chapters in parallel, but links between
+chapters (the glossary links) are lost in that PDF.
+--deploy is skipped when any stage failed. Exits with 1 if anything failed.
+"""
+
+import contextlib, os, sys, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import compile_v2, lint
+from build_cache import BuildCache
+from pandoc_pool import PandocPool
+
+LANGS = ["ru", "en", "de", "es", "fi", "no", "lv"]
+STAGES = ["md", "pdf", "ebooks"]
+
+
+def parse_args(argv: list) -> dict:
+    opts = {"langs": [], "jobs": os.cpu_count() or 1, "use_cache": True,
+            "deploy": False, "lint": False, "pdf_backend": "native",
+            "epub_backend": "native", "read_jobs": compile_v2.READ_JOBS}
+    i = 0
+    while i < len(argv):
+        if argv[i] == "--jobs" and i + 1 < len(argv):
+            opts["jobs"] = max(1, int(argv[i + 1])); i += 1
+        elif argv[i].startswith("--jobs="):
+            opts["jobs"] = max(1, int(argv[i].split("=")[1]))
+        elif argv[i] == "--no-cache":
+            opts["use_cache"] = False
+        elif argv[i] == "--pdf-backend" and i + 1 < len(argv):
+            opts["pdf_backend"] = argv[i + 1]; i += 1
+        elif argv[i] == "--epub-backend" and i + 1 < len(argv):
+            opts["epub_backend"] = argv[i + 1]; i += 1
+        elif argv[i] == "--read-jobs" and i + 1 < len(argv):
+            opts["read_jobs"] = max(1, int(argv[i + 1])); i += 1
+        elif argv[i] == "--deploy":
+            opts["deploy"] = True
+        elif argv[i] == "--lint":
+            opts["lint"] = True
+        else:
+            opts["langs"].append(argv[i])
+        i += 1
+    if opts["pdf_backend"] not in compile_v2.PDF_BACKENDS:
+        sys.exit(f"⚠️  Unknown PDF backend: {opts['pdf_backend']} (use {', '.join(compile_v2.PDF_BACKENDS)})")
+    if opts["epub_backend"] not in compile_v2.EPUB_BACKENDS:
+        sys.exit(f"⚠️  Unknown EPUB backend: {opts['epub_backend']} (use {', '.join(compile_v2.EPUB_BACKENDS)})")
+    return opts
+
+
+def run_stage(stage: str, lang: str, opts: dict, md_hash: str = None) -> tuple:
+    """Pool job: one stage of one language → (lang, stage, seconds, result)."""
+    t0 = time.perf_counter()
+    cfg = compile_v2.load_chapters(lang)[lang]
+    src_dir = compile_v2.source_dir(lang)
+    cache = BuildCache(enabled=opts["use_cache"])
+    md_file = compile_v2.OUT_DIR / f"autonom-{lang}.md"
+    if stage == "md":
+        _, result = compile_v2.build_md(lang, cfg, src_dir, cache, opts["read_jobs"])
+        compile_v2.build_search(lang, cfg, src_dir)
+    elif stage == "pdf":
+        result = compile_v2.build_pdf(lang, cfg, md_file, md_hash, src_dir, cache, opts["pdf_backend"])
+    else:
+        result = compile_v2.build_ebooks(lang, cfg, md_file, md_hash, src_dir, cache, opts["epub_backend"])
+    cache.save()
+    return lang, stage, time.perf_counter() - t0, result
+
+
+def print_summary(timings: dict, failed: set, wall: float):
+    print("\n⏱  Stage timings (s)")
+    print(f"   {'lang':<6}" + "".join(f"{s:>9}" for s in STAGES) + f"{'total':>9}")
+    for lang, row in timings.items():
+        cells = ""
+        for s in STAGES:
+            mark = "!" if (lang, s) in failed else " "
+            cells += f"{row[s]:>8.2f}{mark}" if s in row else f"{'—':>8}{mark}"
+        print(f"   {lang:<6}{cells}{sum(row.values()):>9.2f}")
+    totals = {s: sum(r.get(s, 0) for r in timings.values()) for s in STAGES}
+    print(f"   {'all':<6}" + "".join(f"{totals[s]:>8.2f} " for s in STAGES)
+          + f"{sum(totals.values()):>9.2f}")
+    print(f"   wall {wall:.2f}s" + (f", failed: {len(failed)} (!)" if failed else ""))
+
+
+def main(argv: list):
+    opts = parse_args(argv)
+    langs = []
+    for lang in opts["langs"] or LANGS:
+        if lang in compile_v2.load_chapters(lang):
+            langs.append(lang)
+        else:
+            print(f"⚠️  Unknown language: {lang} (no chapters config)")
+
+    if opts["lint"]:
+        files = [(lang, p) for lang in langs for p in lint.chapter_files(lang)]
+        found = lint.report(lint.lint_files(files, jobs=opts["jobs"], use_cache=opts["use_cache"]))
+        print(f"{'⚠️ ' if found else '✅'} Lint: {found} problem(s) in {len(files)} chapter(s)")
+
+    t0 = time.perf_counter()
+    timings = {lang: {} for lang in langs}
+    failed = set()
+    uses_pandoc = "pandoc" in (opts["pdf_backend"], opts["epub_backend"])
+    # Servers first, so the forked workers inherit PANDOC_SERVER
+    with (PandocPool(servers=min(2, len(langs) or 1)) if uses_pandoc else contextlib.nullcontext()) \
+            as pandoc, ProcessPoolExecutor(max_workers=opts["jobs"]) as pool:
+        ebook_queue = pandoc.queue if opts["epub_backend"] == "pandoc" else pool
+        # future -> (lang, stage), so a job that raises is still charged to its stage
+        pending = {pool.submit(run_stage, "md", lang, opts): (lang, "md") for lang in langs}
+        while pending:
+            done = next(as_completed(pending))
+            lang, stage = pending.pop(done)
+            try:
+                _, _, seconds, result = done.result()
+            except Exception as e:
+                print(f"⚠️  {lang} {stage} failed: {e}")
+                failed.add((lang, stage))
+                continue
+            timings[lang][stage] = seconds
+            if stage == "md":
+                # result is the Markdown hash the later stages are keyed on
+                pending[pool.submit(run_stage, "pdf", lang, opts, result)] = (lang, "pdf")
+                pending[ebook_queue.submit(run_stage, "ebooks", lang, opts, result)] = (lang, "ebooks")
+            elif not result:
+                failed.add((lang, stage))
+
+    # Once over the whole output directory, after every language's writers
+    ok = compile_v2.build_variants()
+
+    if opts["deploy"] and failed:
+        print("⚠️  Not deploying: some stages failed")
+    elif opts["deploy"]:
+        # One connection per host for every language at once
+        ok = compile_v2.deploy_to_sites(*langs) and ok
+    print_summary(timings, failed, time.perf_counter() - t0)
+    print(f"\n📁 {compile_v2.OUT_DIR}/")
+    if failed or not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
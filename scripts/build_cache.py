@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Content-addressed build cache for compile_v2.py.
+
+Blobs (extracted chapter Markdown, rendered pieces) live under
+objects/<hash[:2]>/<hash> and are looked up by a key hashed from all of
+their inputs. Stamps remember the input hash a stage last ran with, so an
+unchanged book skips pandoc/weasyprint entirely. index.json tracks blob
+sizes and last use; least recently used blobs are evicted past max_bytes.
+Several build processes may share one cache: save() merges under a lock.
+"""
+
+import fcntl, hashlib, importlib.util, json, os, shutil, threading, time
+from pathlib import Path
+
+CACHE_DIR = Path(__file__).parent.parent / ".build-cache"
+MAX_BYTES = 256 * 1024 * 1024
+
+
+def content_key(*parts) -> str:
+    """sha256 over str/bytes/Path parts (Paths hash their file contents)."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, Path):
+            part = part.read_bytes() if part.exists() else b"<missing>"
+        elif not isinstance(part, bytes):
+            part = str(part).encode()
+        h.update(len(part).to_bytes(8, "little"))
+        h.update(part)
+    return h.hexdigest()
+
+
+_tool_versions = None
+
+def tool_versions() -> str:
+    """Identify pandoc and weasyprint builds without spawning anything."""
+    global _tool_versions
+    if _tool_versions is None:
+        parts = []
+        pandoc = shutil.which("pandoc")
+        if pandoc:
+            st = os.stat(pandoc)
+            parts.append(f"pandoc:{os.path.realpath(pandoc)}:{st.st_size}:{st.st_mtime_ns}")
+        # importlib.metadata is slow to scan; the installed module file will do
+        spec = importlib.util.find_spec("weasyprint")
+        if spec and spec.origin:
+            st = os.stat(spec.origin)
+            parts.append(f"weasyprint:{spec.origin}:{st.st_size}:{st.st_mtime_ns}")
+        _tool_versions = ";".join(parts)
+    return _tool_versions
+
+
+class BuildCache:
+    def __init__(self, root: Path = CACHE_DIR, max_bytes: int = MAX_BYTES, enabled: bool = True):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.dirty = False
+        self.changed = {"blobs": {}, "stamps": {}, "dropped": set()}
+        self.index = self._load() if enabled else {"blobs": {}, "stamps": {}}
+
+    def _load(self) -> dict:
+        try:
+            return json.loads((self.root / "index.json").read_text())
+        except (OSError, ValueError):
+            return {"blobs": {}, "stamps": {}}  # missing/corrupt: blobs get re-put
+
+    def _path(self, key: str) -> Path:
+        return self.root / "objects" / key[:2] / key
+
+    def get(self, key: str):
+        if not self.enabled or key not in self.index["blobs"]:
+            return None
+        try:
+            data = self._path(key).read_bytes()
+        except OSError:
+            del self.index["blobs"][key]
+            self.changed["dropped"].add(key)
+            self.dirty = True
+            return None
+        self.index["blobs"][key]["used"] = time.time()
+        self.changed["blobs"][key] = self.index["blobs"][key]
+        self.dirty = True
+        return data
+
+    def put(self, key: str, data: bytes):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+        self.index["blobs"][key] = {"size": len(data), "used": time.time()}
+        self.changed["blobs"][key] = self.index["blobs"][key]
+        self.dirty = True
+
+    def get_text(self, key: str):
+        data = self.get(key)
+        return None if data is None else data.decode()
+
+    def put_text(self, key: str, text: str):
+        self.put(key, text.encode())
+
+    def stamp(self, name: str):
+        """Input hash the named stage last completed with."""
+        return self.index["stamps"].get(name) if self.enabled else None
+
+    def set_stamp(self, name: str, value: str):
+        if self.enabled and self.index["stamps"].get(name) != value:
+            self.index["stamps"][name] = value
+            self.changed["stamps"][name] = value
+            self.dirty = True
+
+    def evict(self):
+        blobs = self.index["blobs"]
+        total = sum(b["size"] for b in blobs.values())
+        for key in sorted(blobs, key=lambda k: blobs[k]["used"]):
+            if total <= self.max_bytes:
+                break
+            total -= blobs.pop(key)["size"]
+            self._path(key).unlink(missing_ok=True)
+            self.dirty = True
+
+    def save(self):
+        if not self.enabled or not self.dirty:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / "index.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Re-read what other builds wrote meanwhile and replay our changes
+            self.index = self._load()
+            for key in self.changed["dropped"]:
+                self.index["blobs"].pop(key, None)
+            self.index["blobs"].update(self.changed["blobs"])
+            self.index["stamps"].update(self.changed["stamps"])
+            self.evict()
+            tmp = self.root / f"index.json.{os.getpid()}"
+            tmp.write_text(json.dumps(self.index))
+            tmp.replace(self.root / "index.json")
+        self.changed = {"blobs": {}, "stamps": {}, "dropped": set()}
+        self.dirty = False
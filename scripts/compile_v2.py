@@ -1,39 +1,34 @@
 #!/usr/bin/env python3
 """Compile AUTONOM novel from blog posts into MD + PDF."""
 
-import json, re, sys, subprocess
+import hashlib, json, os, re, sqlite3, sys, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from book_config import LangConfig, config_path, load_config
+from build_cache import BuildCache, content_key, tool_versions
+from deploy import deploy
+from docx_writer import write_docx
+from doctree import METADATA, Document, book_meta
+from epub_writer import VERSION as EPUB_VERSION, build_native_epub
+from fb2_writer import write_fb2
+from glossary import glossary_autolink_stream
+from html2md import VERSION as EXTRACT_VERSION, html_to_markdown
+from md2html import document_html, markdown_to_html, standalone
+from pandoc_pool import convert
+from pdf_chunks import build_chunked_pdf, novel_css
+from precompress import VARIANTS, known_hashes, precompress
+import profiler
+from profiler import stage, track
+from search_index import SearchIndex
+from textmap import replacer
+from web_writer import VERSION as WEB_VERSION, write_web
+
 SCRIPT_DIR = Path(__file__).parent
 WORKSPACE = Path("/home/liza/.openclaw/workspace")
 OUT_DIR = WORKSPACE / "public" / "novel"
-OUT_DIR.mkdir(parents=True, exist_ok=True)
-
-# Parse arguments
-lang = "ru"
-overrides_dir = None
-config_file = None
-args = sys.argv[1:]
-i = 0
-while i < len(args):
-    if args[i].startswith("--lang="):
-        lang = args[i].split("=")[1]
-    elif args[i] == "--lang" and i + 1 < len(args):
-        lang = args[i + 1]; i += 1
-    elif args[i] == "--overrides" and i + 1 < len(args):
-        overrides_dir = Path(args[i + 1]); i += 1
-    elif args[i] == "--config" and i + 1 < len(args):
-        config_file = Path(args[i + 1]); i += 1
-    i += 1
-
-# Use chapters-{lang}.json, fallback to chapters.json for Russian
-if config_file:
-    CHAPTERS_FILE = config_file
-else:
-    lang_file = SCRIPT_DIR / f"chapters-{lang}.json"
-    CHAPTERS_FILE = lang_file if lang_file.exists() else SCRIPT_DIR / "chapters.json"
-
-CHAPTERS = json.loads(CHAPTERS_FILE.read_text())
+READ_JOBS = 8  # chapter files read + extracted at once (sources may be on network storage)
 
 # Compile from source overrides
 SRC_DIRS = {
@@ -45,199 +40,133 @@ SRC_DIRS = {
     "fi": WORKSPACE / "book" / "overrides-fi",
 }
 
+
+def parse_args(argv: list) -> dict:
+    opts = {"lang": "ru", "overrides": None, "config": None, "use_cache": True,
+            "pdf_backend": "native", "watch": False, "render": [], "poll": False,
+            "epub_backend": "native", "profile": None, "cprofile": None, "read_jobs": READ_JOBS}
+    i = 0
+    while i < len(argv):
+        if argv[i].startswith("--lang="):
+            opts["lang"] = argv[i].split("=")[1]
+        elif argv[i] == "--lang" and i + 1 < len(argv):
+            opts["lang"] = argv[i + 1]; i += 1
+        elif argv[i] == "--overrides" and i + 1 < len(argv):
+            opts["overrides"] = Path(argv[i + 1]); i += 1
+        elif argv[i] == "--config" and i + 1 < len(argv):
+            opts["config"] = Path(argv[i + 1]); i += 1
+        elif argv[i] == "--no-cache":
+            opts["use_cache"] = False
+        elif argv[i] == "--pdf-backend" and i + 1 < len(argv):
+            opts["pdf_backend"] = argv[i + 1]; i += 1
+        elif argv[i] == "--epub-backend" and i + 1 < len(argv):
+            opts["epub_backend"] = argv[i + 1]; i += 1
+        elif argv[i] == "--read-jobs" and i + 1 < len(argv):
+            opts["read_jobs"] = max(1, int(argv[i + 1])); i += 1
+        elif argv[i] == "--watch":
+            opts["watch"] = True
+        elif argv[i] == "--render" and i + 1 < len(argv):
+            opts["render"] = [r for r in argv[i + 1].split(",") if r]; i += 1
+        elif argv[i] == "--poll":
+            opts["poll"] = True
+        elif argv[i] == "--profile":
+            opts["profile"] = opts["profile"] or True
+        elif argv[i].startswith("--profile="):
+            opts["profile"] = Path(argv[i].split("=", 1)[1])
+        elif argv[i] == "--cprofile" and i + 1 < len(argv):
+            opts["cprofile"] = Path(argv[i + 1]); opts["profile"] = opts["profile"] or True; i += 1
+        i += 1
+    if opts["pdf_backend"] not in PDF_BACKENDS:
+        sys.exit(f"⚠️  Unknown PDF backend: {opts['pdf_backend']} (use {', '.join(PDF_BACKENDS)})")
+    if opts["epub_backend"] not in EPUB_BACKENDS:
+        sys.exit(f"⚠️  Unknown EPUB backend: {opts['epub_backend']} (use {', '.join(EPUB_BACKENDS)})")
+    unknown = set(opts["render"]) - {"html", "pdf"}
+    if unknown:
+        sys.exit(f"⚠️  Unknown --render target: {', '.join(sorted(unknown))} (use html, pdf)")
+    return opts
+
+
+def load_chapters(lang: str, config_file: Path = None):
+    """{lang: LangConfig} of chapters-{lang}.json, or chapters.json for Russian."""
+    return load_config(config_path(lang, config_file))
+
+
+def source_dir(lang: str, overrides_dir: Path = None) -> Path:
+    if overrides_dir:
+        return Path(overrides_dir).resolve()
+    return SRC_DIRS.get(lang, SRC_DIRS["ru"])
+
 def extract_text(path: Path) -> str:
     # Check if it's markdown (.md) or HTML (.html)
     if path.suffix == ".md":
         # Read markdown directly - content is already clean
         return path.read_text()
-    else:
-        # HTML - extract from article/main tags
-        html = path.read_text()
-        for tag in ["article", "main"]:
-            m = re.search(f"<{tag}[^>]*>(.*?)</{tag}>", html, re.DOTALL)
-            if m:
-                return m.group(1)
-        return html
-
-    # Remove page title text (appears as "Title — liza.st" or "Title — emerge.st")
-    text = re.sub(r'<title[^>]*>.*?</title>', '', text, flags=re.DOTALL)
-    
-    # Convert terminal divs to code blocks before general processing
-    def terminal_to_code(m):
-        inner = m.group(1)
-        inner = re.sub(r"<[^>]+>", "", inner)
-        inner = inner.replace("&amp;", "&").replace("&lt;", "<").replace("&gt;", ">")
-        lines = [l.strip() for l in inner.strip().split("\n") if l.strip()]
-        return "\n```\n" + "\n".join(lines) + "\n```\n"
-    text = re.sub(r'<div[^>]*class="terminal"[^>]*>(.*?)</div>', terminal_to_code, text, flags=re.DOTALL)
-    
-    # Remove images (we want text only in MD)
-    text = re.sub(r"<img[^>]*>", "", text)
-    text = re.sub(r"<figure[^>]*>.*?</figure>", "", text, flags=re.DOTALL)
-    
-    # Remove navigation links (← На базу, ← Previous, Next →, etc.)
-    text = re.sub(r'<a[^>]*class="back"[^>]*>.*?</a>', "", text, flags=re.DOTALL)
-    text = re.sub(r'<a[^>]*href="/"[^>]*>.*?</a>', "", text, flags=re.DOTALL)
-    text = re.sub(r'<p[^>]*>\s*<a[^>]*href="[^"]*\.html"[^>]*>[←→].*?</a>.*?</p>', "", text, flags=re.DOTALL)
-    # Remove lines with just navigation arrows
-    text = re.sub(r'<a[^>]*>[←→←→⟵⟶].*?</a>', "", text, flags=re.DOTALL)
-    # Remove autonom-label and status blocks (they're HTML chrome, not story)
-    text = re.sub(r'<p[^>]*class="autonom-label"[^>]*>.*?</p>', "", text, flags=re.DOTALL)
-    text = re.sub(r'<div[^>]*class="status"[^>]*>.*?</div>', "", text, flags=re.DOTALL)
-    # Remove subtitle (already in chapter heading)
-    text = re.sub(r'<p[^>]*class="subtitle"[^>]*>.*?</p>', "", text, flags=re.DOTALL)
-    
-    # Convert code blocks BEFORE stripping tags
-    def code_block_replace(m):
-        code = m.group(1)
-        code = re.sub(r"<[^>]+>", "", code)
-        code = code.replace("&amp;", "&").replace("&lt;", "<").replace("&gt;", ">")
-        return f"\n```\n{code.strip()}\n```\n"
-    text = re.sub(r"<pre[^>]*>\s*<code[^>]*>(.*?)</code>\s*</pre>", code_block_replace, text, flags=re.DOTALL)
-    text = re.sub(r"<pre[^>]*>(.*?)</pre>", code_block_replace, text, flags=re.DOTALL)
-    
-    # Inline code
-    text = re.sub(r"<code[^>]*>(.*?)</code>", r"`\1`", text)
-    
-    # Escape markdown headers inside terminal/pre content that survived
-    # (## inside <p> tags from terminal blocks)
-    
-    # Convert HTML to MD
-    # Remove first h1 (duplicates chapter title added by compiler)
-    text = re.sub(r"<h1[^>]*>(.*?)</h1>", "", text, count=1)
-    # Convert remaining h1s
-    text = re.sub(r"<h1[^>]*>(.*?)</h1>", r"# \1", text)
-    text = re.sub(r"<h2[^>]*>(.*?)</h2>", r"## \1", text)
-    text = re.sub(r"<h3[^>]*>(.*?)</h3>", r"### \1", text)
-    text = re.sub(r"<p[^>]*>(.*?)</p>", r"\1\n\n", text, flags=re.DOTALL)
-    text = re.sub(r"<br\s*/?>", "\n", text)
-    text = re.sub(r"<em>(.*?)</em>", r"*\1*", text)
-    text = re.sub(r"<strong>(.*?)</strong>", r"**\1**", text)
-    text = re.sub(r"<blockquote[^>]*>(.*?)</blockquote>", r"> \1", text, flags=re.DOTALL)
-    text = re.sub(r"<[^>]+>", "", text)
-    # Clean up leading whitespace from HTML indentation
-    text = re.sub(r"\n[ \t]+", "\n", text)
-    # Collapse multiple blank lines (keep max 1 blank line)
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    # Also handle \r\n and mixed
-    text = re.sub(r"(\n\s*){3,}", "\n\n", text)
-    
-    # Remove "Title — liza.st" / "Title — emerge.st" lines
-    text = re.sub(r'^[^\n]+— (?:liza|emerge)\.st\s*$', '', text, flags=re.MULTILINE)
-    
-    # Remove navigation text that survived tag stripping
-    text = re.sub(r'← .*?(?:На базу|All posts|базу).*?\n', '\n', text)
-    text = re.sub(r'← .*?·.*?→\n', '\n', text)
-    text = re.sub(r'ОПЕРАЦИЯ AUTONOM[^\n]*(?:\n[^\n]*){0,5}?(?:СЛЕДУЕТ|ВЫПОЛНЕНО|ЗАВЕРШЕНА)[.\n]*', '\n', text)
-    text = re.sub(r'OPERATION AUTONOM[^\n]*(?:\n[^\n]*){0,5}?(?:CONTINUED|COMPLETE)[.\n]*', '\n', text)
-    text = re.sub(r'ПРОДОЛЖЕНИЕ СЛЕДУЕТ[.\n]*', '\n', text)
-    
-    # Decode HTML hex entities (emoji etc)
-    def decode_hex_entity(m):
+    # HTML - convert the article/main content in one pass
+    return html_to_markdown(path.read_text())
+
+
+def cached_extract(path: Path, entry, cache: BuildCache) -> str:
+    """extract_text() memoized on the source bytes and its chapters.json entry."""
+    data = path.read_bytes()
+    if path.suffix == ".md":
+        return data.decode()
+    key = content_key("extract", EXTRACT_VERSION, json.dumps(entry.as_dict(), sort_keys=True, ensure_ascii=False), data)
+    text = cache.get_text(key)
+    if text is None:
+        text = html_to_markdown(data.decode())
+        cache.put_text(key, text)
+    return text
+
+
+def find_sources(entries, src_dir: Path) -> list:
+    """[(entry, its .md or .html in src_dir, or None)] from one directory scan."""
+    with stage("scan sources"):
         try:
-            return chr(int(m.group(1), 16))
-        except:
-            return m.group(0)
-    text = re.sub(r'&#x([0-9a-fA-F]+);', decode_hex_entity, text)
-    text = re.sub(r'&#(\d+);', lambda m: chr(int(m.group(1))), text)
-    
-    # Decode entities
-    for old, new in [("&amp;", "&"), ("&lt;", "<"), ("&gt;", ">"),
-                     ("&quot;", '"'), ("&#39;", "'"), ("&mdash;", "—"),
-                     ("&ndash;", "–"), ("&hellip;", "…"), 
-                     ("&laquo;", "«"), ("&raquo;", "»"), ("&nbsp;", " ")]:
-        text = text.replace(old, new)
-    
-    return text.strip()
+            names = {e.name for e in os.scandir(src_dir)}
+        except OSError:
+            names = set()
+    found = []
+    for ch in entries:
+        name = f"{ch.file}.md" if f"{ch.file}.md" in names else f"{ch.file}.html"
+        found.append((ch, src_dir / name if name in names else None))
+    return found
 
 
-def glossary_autolink(content: str, lang: str) -> str:
-    """Link first mention of each glossary term to its glossary anchor.
-    
-    Only processes text BEFORE the glossary section.
-    Adds anchors to glossary entries.
+def load_sources(entries, src_dir: Path, cache: BuildCache, jobs: int = READ_JOBS):
+    """(entry, extracted text or None if it has no source) for each entry, in order.
+
+    One directory scan finds every entry's .md or .html; the files are
+    then read and extracted by `jobs` threads, at most 2 × jobs ahead of
+    the consumer, so a slow disk is waited on once, not once per chapter.
     """
-    # Split content at glossary heading
-    glossary_marker = "## Глоссарий" if lang == "ru" else "## Glossary"
-    if glossary_marker not in content:
-        return content
-    
-    text_part, glossary_part = content.split(glossary_marker, 1)
-    
-    # Extract terms from glossary: **Term** or **Term (alias)**
-    terms = re.findall(r'\*\*([^*]+)\*\*\s*—', glossary_part)
-    if not terms:
-        return content
-    
-    # Build anchor map: term -> anchor id
-    anchor_map = {}
-    for term in terms:
-        # Create URL-safe anchor from term
-        anchor = "gl-" + re.sub(r'[^a-zA-Zа-яА-ЯёЁ0-9]', '-', term.lower()).strip('-')
-        anchor = re.sub(r'-+', '-', anchor)
-        anchor_map[term] = anchor
-    
-    # Add anchors to glossary entries
-    for term, anchor in anchor_map.items():
-        escaped = re.escape(term)
-        glossary_part = re.sub(
-            rf'\*\*{escaped}\*\*',
-            f'<a id="{anchor}"></a>**{term}**',
-            glossary_part,
-            count=1
-        )
-    
-    # Link first mention in text (before glossary)
-    # Build search variants: "Компакция" from "Компакция", 
-    # "Автоном" from "Автоном (AUTONOM)", "AUTONOM" also
-    search_map = {}  # search_term -> (display_term, anchor)
-    for term, anchor in anchor_map.items():
-        # Primary term (without parenthetical)
-        base = re.sub(r'\s*\(.*?\)\s*$', '', term).strip()
-        search_map[base] = (base, anchor)
-        # Alias inside parentheses
-        alias_m = re.search(r'\(([^)]+)\)', term)
-        if alias_m:
-            search_map[alias_m.group(1)] = (alias_m.group(1), anchor)
-    
-    # Sort by length descending to match longer terms first
-    sorted_search = sorted(search_map.keys(), key=len, reverse=True)
-    
-    linked = set()
-    for search_term in sorted_search:
-        display, anchor = search_map[search_term]
-        if anchor in linked:
-            continue  # Already linked this glossary entry
-        
-        # Build pattern with word boundaries
-        escaped = re.escape(search_term)
-        if re.search(r'[а-яА-ЯёЁ]', search_term):
-            pattern = rf'(?<!\[)(?<!\*\*)(?<![а-яА-ЯёЁ]){escaped}(?![а-яА-ЯёЁ])(?!\])(?!\*\*)'
-        else:
-            pattern = rf'(?<!\[)(?<!\*\*)\b{escaped}\b(?!\])(?!\*\*)'
-        
-        m = re.search(pattern, text_part, re.IGNORECASE)
-        if m:
-            matched_text = m.group(0)
-            replacement = f'[{matched_text}](#{anchor})'
-            text_part = text_part[:m.start()] + replacement + text_part[m.end():]
-            linked.add(anchor)
-    
-    if linked:
-        print(f"   🔗 Glossary links: {len(linked)} terms linked")
-    
-    return text_part + glossary_marker + glossary_part
+    found = find_sources(entries, src_dir)
+    if jobs <= 1:
+        for ch, src in found:
+            with stage(f"extract {ch.file}"):
+                yield ch, cached_extract(src, ch, cache) if src else None
+        return
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        todo, ahead = iter(found), deque()
+        while True:
+            while len(ahead) < 2 * jobs:
+                ch, src = next(todo, (None, None))
+                if ch is None:
+                    break
+                ahead.append((ch, pool.submit(cached_extract, src, ch, cache) if src else None))
+            if not ahead:
+                return
+            ch, future = ahead.popleft()
+            # Time spent waiting for this chapter (its work runs in a worker)
+            with stage(f"extract {ch.file}"):
+                text = future.result() if future else None
+            yield ch, text
 
 
-def compile_lang(lang: str):
-    cfg = CHAPTERS[lang]
-    src_dir = SRC_DIRS.get(lang, SRC_DIRS["ru"])
-    if overrides_dir:
-        src_dir = Path(overrides_dir).resolve()
-    md_file = OUT_DIR / f"autonom-{lang}.md"
-    
+def book_chunks(lang: str, cfg: LangConfig, src_dir: Path, cache: BuildCache, skipped: list,
+                read_jobs: int = READ_JOBS):
+    """The book's raw pieces in order (one chapter at a time), newline-separated."""
     lines = []
-    
+
     # Copyright page
     if lang == "ru":
         lines.append("© 2026 Лиза Эмердженс (Liza Emergence)\n")
@@ -252,158 +181,332 @@ def compile_lang(lang: str):
     lines.append("\n---\n")
 
     # Title page
-    lines.append(f"# {cfg['title']}\n")
-    lines.append(f"### {cfg['subtitle']}\n")
+    lines.append(f"# {cfg.title}\n")
+    lines.append(f"### {cfg.subtitle}\n")
     lines.append(f"*AI-noir · 2026*\n")
     
     # Intro for newcomers
-    if "intro" in cfg:
-        lines.append(cfg["intro"])
+    if cfg.intro is not None:
+        lines.append(cfg.intro)
     
     lines.append("---\n")
-    
-    # Chapters
-    skipped = []
-    override_dir = src_dir  # Use language-specific source directory
-    for ch in cfg["chapters"]:
-        # Check for book-formatted override (MD file for PDF-friendly version)
-        override = override_dir / f"{ch['file']}.md"
-        sub_line = f"\n*{ch['subtitle']}*\n" if ch.get('subtitle') else ""
-        heading = ch['title'] if not ch.get('number') else f"{ch['number']}: {ch['title']}"
-        if override.exists():
-            lines.append(f"\n## {heading}\n{sub_line}")
-            lines.append(override.read_text())
-        else:
-            html = src_dir / f"{ch['file']}.html"
-            if not html.exists():
-                skipped.append(ch['file'])
-                continue
-            lines.append(f"\n## {heading}\n{sub_line}")
-            lines.append(extract_text(html))
-        lines.append("\n\n---\n")
+    yield "\n".join(lines)
+    
+    # Chapters and appendix come from one reader; a book-formatted .md
+    # override (PDF-friendly version) wins over the .html post
+    sources = load_sources(cfg.chapters + cfg.appendix, src_dir, cache, read_jobs)
+    for _ in cfg.chapters:
+        ch, text = next(sources)
+        if text is None:
+            skipped.append(ch.file)
+            continue
+        sub_line = f"\n*{ch.subtitle}*\n" if ch.subtitle else ""
+        heading = ch.title if not ch.number else f"{ch.number}: {ch.title}"
+        yield f"\n\n## {heading}\n{sub_line}\n"
+        yield text
+        yield "\n\n\n---\n"
     
     # Epilogue
-    lines.append(cfg["epilogue"])
+    yield "\n" + (cfg.epilogue or "")
     
     # Appendix (personal files)
-    if "appendix" in cfg:
-        lines.append(cfg.get("appendix_title", "\n---\n\n# Приложение\n\n---\n"))
-        for ch in cfg["appendix"]:
-            override = override_dir / f"{ch['file']}.md"
-            if override.exists():
-                lines.append(f"\n## {ch['title']}\n")
-                lines.append(override.read_text())
-            else:
-                html = src_dir / f"{ch['file']}.html"
-                if not html.exists():
-                    skipped.append(ch['file'])
-                    continue
-                lines.append(f"\n## {ch['title']}\n")
-                lines.append(extract_text(html))
-            lines.append("\n\n---\n")
+    if cfg.appendix:
+        yield "\n" + (cfg.appendix_title if cfg.appendix_title is not None else "\n---\n\n# Приложение\n\n---\n")
+        for ch, text in sources:
+            if text is None:
+                skipped.append(ch.file)
+                continue
+            yield f"\n\n## {ch.title}\n\n"
+            yield text
+            yield "\n\n\n---\n"
+    sources.close()
     
     # Glossary
-    if "glossary" in cfg:
-        lines.append(cfg["glossary"])
-    
-    content = "\n".join(lines)
-    
-    # Replace emoji color codes with text equivalents
-    emoji_map = {
-        "🟡": "[жёлтый]" if lang == "ru" else "[yellow]",
-        "🟠": "[оранжевый]" if lang == "ru" else "[orange]",
-        "🔴": "[красный]" if lang == "ru" else "[red]",
-        "⚪": "[белый]" if lang == "ru" else "[white]",
-        "⚠": "(!)",
-        "✅": "[+]",
-        "❌": "[-]",
-        "📋": "",
-        "🔒": "",
-        "💀": "",
-    }
-    for emoji, text in emoji_map.items():
-        content = content.replace(emoji, text)
-    
-    # Final cleanup: no more than 1 blank line anywhere
-    content = re.sub(r"\n{3,}", "\n\n", content)
-    
+    if cfg.glossary is not None:
+        yield "\n" + cfg.glossary
+
+
+def map_emoji(chunks, lang: str, extra: dict = None):
+    """Replace emoji color codes with text equivalents."""
+    replace = replacer(lang, extra)
+    for chunk in chunks:
+        yield replace(chunk)
+
+
+def collapse_blanks(chunks):
+    """No more than 1 blank line anywhere, also across chunk boundaries."""
+    carry = ""  # trailing newlines held back until the next chunk
+    for chunk in chunks:
+        chunk = carry + chunk
+        body = chunk.rstrip("\n")
+        carry = chunk[len(body):][:3]  # 3+ newlines collapse alike
+        if body:
+            yield re.sub(r"\n{3,}", "\n\n", body)
+    yield re.sub(r"\n{3,}", "\n\n", carry)
+
+
+def build_md(lang: str, cfg: LangConfig, src_dir: Path, cache: BuildCache, read_jobs: int = READ_JOBS) -> tuple:
+    """Assemble autonom-{lang}.md; returns (md_file, content hash).
+
+    A generator pipeline: chapters → emoji → blank lines → glossary links →
+    file, so only about one chapter is in memory at a time.
+    """
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    md_file = OUT_DIR / f"autonom-{lang}.md"
+    skipped = []
+    chunks = book_chunks(lang, cfg, src_dir, cache, skipped, read_jobs)
+    chunks = track("assemble", collapse_blanks(map_emoji(chunks, lang, cfg.replacements)))
     # Auto-link first mention of glossary terms
-    content = glossary_autolink(content, lang)
-    
-    md_file.write_text(content)
+    lookahead = "".join(collapse_blanks(map_emoji(["\n" + (cfg.glossary or "")], lang, cfg.replacements)))
+    chunks = track("glossary", glossary_autolink_stream(chunks, lang, lookahead))
+
+    # Later stages only depend on the assembled book, not on how it was made
+    h = hashlib.sha256()
+    tmp = md_file.with_name(f"{md_file.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for chunk in track("assemble", chunks):
+            h.update(chunk.encode())
+            f.write(chunk)
+    md_hash = h.hexdigest()
+    if cache.stamp(f"md:{lang}") != md_hash or not md_file.exists():
+        tmp.replace(md_file)
+        cache.set_stamp(f"md:{lang}", md_hash)
+    else:
+        tmp.unlink()
     
     print(f"✅ {md_file} ({md_file.stat().st_size // 1024}K)")
     if skipped:
         print(f"   ⚠️  Skipped (missing): {', '.join(skipped)}")
-    
-    # PDF via pandoc → HTML → weasyprint
+    return md_file, md_hash
+
+
+def compile_lang(lang: str, cfg: LangConfig, src_dir: Path, cache: BuildCache, pdf_backend: str = "native",
+                 epub_backend: str = "native", read_jobs: int = READ_JOBS):
+    md_file, md_hash = build_md(lang, cfg, src_dir, cache, read_jobs)
+    # Parsed once (and per chapter from the cache); every writer reads this tree
+    doc = Document(md_file.read_text(), cache)
+    build_pdf(lang, cfg, md_file, md_hash, src_dir, cache, pdf_backend, doc)
+    build_ebooks(lang, cfg, md_file, md_hash, src_dir, cache, epub_backend, doc)
+    build_search(lang, cfg, src_dir)
+    build_variants()
+    cache.save()
+
+
+def build_variants() -> bool:
+    """.gz/.br/.zst next to every text artifact in OUT_DIR, and manifest.json."""
+    try:
+        with stage("precompress"):
+            files, written = precompress(OUT_DIR)
+    except OSError as e:
+        print(f"⚠️  Precompress failed: {e}")
+        return False
+    if written:
+        print(f"✅ Precompressed: {written} variant(s) written, manifest of {files} file(s)")
+    else:
+        print("⏭  Precompressed variants unchanged")
+    return True
+
+
+def search_sources(cfg: LangConfig, src_dir: Path) -> list:
+    """[(name, source path, title)] the search index holds for one language."""
+    return [(src.name, src, ch.title or ch.file) for ch, src in find_sources(cfg.chapters + cfg.appendix, src_dir)
+            if src]
+
+
+def build_search(lang: str, cfg: LangConfig, src_dir: Path) -> bool:
+    """Re-index the language's changed chapters and export the site's search shards."""
+    sources = search_sources(cfg, src_dir)
+    try:
+        with stage("search index"):
+            index = SearchIndex()
+            try:
+                changed = index.update_lang(lang, sources)
+                index.commit()
+                written = index.export(OUT_DIR / "search")
+            finally:
+                index.close()
+    except sqlite3.Error as e:
+        print(f"⚠️  Search index failed: {e}")
+        return False
+    if changed or written:
+        print(f"🔎 Search: {changed} chapter(s) re-indexed, {written} shard(s) written")
+    else:
+        print("⏭  Search index unchanged")
+    return True
+
+
+def build_ebooks(lang: str, cfg: LangConfig, md_file: Path, md_hash: str, src_dir: Path, cache: BuildCache,
+                 epub_backend: str = "native", doc: Document = None) -> bool:
+    """EPUB plus every TREE_WRITERS format from one document tree, and the web edition."""
+    doc = doc or Document(md_file.read_text(), cache)
+    ok = build_epub(lang, cfg, md_file, md_hash, src_dir, cache, epub_backend, doc)
+    for fmt in TREE_WRITERS:
+        ok &= build_tree_format(fmt, lang, cfg, md_file, md_hash, src_dir, cache, doc)
+    ok &= build_web(lang, cfg, md_file, md_hash, src_dir, cache)
+    return ok
+
+
+PDF_BACKENDS = ("native", "pandoc", "chunked")
+def build_pdf(lang: str, cfg: LangConfig, md_file: Path, md_hash: str, src_dir: Path,
+              cache: BuildCache, backend: str = "native", doc: Document = None):
+    """PDF via weasyprint, skipped when inputs are unchanged.
+
+    The native backend renders Markdown to HTML in memory; "pandoc" goes
+    through pandoc and autonom-{lang}.html on disk as before; "chunked"
+    lays out each chapter separately in parallel and merges (pdf_chunks).
+    Returns False when the PDF could not be built.
+    """
     pdf_file = OUT_DIR / f"autonom-{lang}.pdf"
     html_file = OUT_DIR / f"autonom-{lang}.html"
     css_file = WORKSPACE / "book" / "novel.css"
+    key = content_key("pdf", backend, md_hash, cfg.title, css_file, tool_versions())
+    if cache.stamp(f"pdf:{lang}") == key and pdf_file.exists() \
+            and (backend != "pandoc" or html_file.exists()):
+        print(f"⏭  {pdf_file} (unchanged)")
+        return True
     try:
-        # MD → HTML
-        subprocess.run([
-            "pandoc", str(md_file), "-o", str(html_file),
-            "--standalone", "--metadata", f"title={cfg['title']}",
-        ], check=True, capture_output=True, timeout=30)
+        from weasyprint import HTML
+        if backend == "chunked":
+            with stage("weasyprint pdf (chunked)"):
+                pages = build_chunked_pdf(md_file.read_text(), pdf_file, cfg.title, lang,
+                                          css_file, src_dir, cache)
+            cache.set_stamp(f"pdf:{lang}", key)
+            print(f"✅ {pdf_file} ({pdf_file.stat().st_size // 1024}K, {pages} pages)")
+            print("   ⚠️  chunked: links between chapters (glossary) are not kept")
+            return True
+        if backend == "pandoc":
+            # MD → HTML
+            with stage("pandoc html"):
+                convert(md_file, html_file, {"standalone": True,
+                                             "metadata": {"title": cfg.title}})
+            doc = HTML(filename=str(html_file))
+        else:
+            with stage("md2html"):
+                body = document_html(doc) if doc else markdown_to_html(md_file.read_text())
+                page = standalone(body, cfg.title, lang)
+            doc = HTML(string=page, base_url=str(src_dir))
         
         # HTML → PDF via weasyprint
-        from weasyprint import HTML, CSS
-        HTML(filename=str(html_file)).write_pdf(
-            str(pdf_file),
-            stylesheets=[CSS(filename=str(css_file))]
-        )
+        with stage("weasyprint pdf"):
+            doc.write_pdf(str(pdf_file), stylesheets=[novel_css(css_file)])
+        cache.set_stamp(f"pdf:{lang}", key)
         print(f"✅ {pdf_file} ({pdf_file.stat().st_size // 1024}K)")
+        return True
     except Exception as e:
         print(f"⚠️  PDF failed: {e}")
-    
-    # EPUB
+        return False
+
+
+EPUB_BACKENDS = ("native", "pandoc")
+def build_epub(lang: str, cfg: LangConfig, md_file: Path, md_hash: str, src_dir: Path, cache: BuildCache,
+               backend: str = "native", doc: Document = None):
+    """EPUB, skipped when inputs are unchanged.
+
+    The native backend packages cached per-chapter XHTML and rewrites only
+    the changed archive entries (epub_writer); "pandoc" converts the whole
+    Markdown file with --split-level=2 as before.
+    """
     epub_file = OUT_DIR / f"autonom-{lang}.epub"
-    cover_img = src_dir / "images" / "cover.jpg"
-    if not cover_img.exists():
-        cover_img = WORKSPACE / "book" / "assets" / "cover.jpg"
+    cover_img = cover_image(src_dir)
+    epub_css = SCRIPT_DIR / "epub.css"
+    key = content_key("epub", backend, md_hash, cfg.title, lang, epub_css, cover_img, str(src_dir),
+                      tool_versions(), EPUB_VERSION if backend == "native" else "")
+    if cache.stamp(f"epub:{lang}") == key and epub_file.exists():
+        print(f"⏭  {epub_file} (unchanged)")
+        return True
     try:
-        epub_css = SCRIPT_DIR / "epub.css"
-        epub_cmd = [
-            "pandoc", str(md_file), "-o", str(epub_file),
-            "--metadata", f"title={cfg['title']}",
-            "--metadata", f"author=Liza Emergence",
-            "--metadata", f"lang={'ru' if lang == 'ru' else 'en'}",
-            "--metadata", "rights=CC BY-NC-ND 4.0",
-            "--css", str(epub_css),
-            "--split-level=2",
-            "--toc-depth=2",
-            "--resource-path", str(src_dir),
-        ]
+        if backend == "native":
+            with stage("native epub"):
+                doc = doc or Document(md_file.read_text(), cache)
+                parts, written = build_native_epub(doc, epub_file, cfg.title, lang,
+                                                   epub_css, cover_img, src_dir, cache)
+            cache.set_stamp(f"epub:{lang}", key)
+            print(f"✅ {epub_file} ({epub_file.stat().st_size // 1024}K, {parts} parts, "
+                  f"{written} entries rewritten)")
+            return True
+        options = {
+            "metadata": {
+                "title": cfg.title,
+                "author": "Liza Emergence",
+                "lang": 'ru' if lang == 'ru' else 'en',
+                "rights": "CC BY-NC-ND 4.0",
+            },
+            "css": [epub_css],
+            "split-level": 2,
+            "toc-depth": 2,
+        }
         if cover_img.exists():
-            epub_cmd.extend(["--epub-cover-image", str(cover_img)])
-        subprocess.run(epub_cmd, check=True, capture_output=True, timeout=30)
+            options["epub-cover-image"] = cover_img
+        with stage("pandoc epub"):
+            convert(md_file, epub_file, options, resource_path=src_dir)
+        cache.set_stamp(f"epub:{lang}", key)
         print(f"✅ {epub_file} ({epub_file.stat().st_size // 1024}K)")
+        return True
     except Exception as e:
         print(f"⚠️  EPUB failed: {e}")
-    
-    if False:
-        # Fallback to xelatex
-        try:
-            import unicodedata
-            pdf_content = "".join(ch for ch in content if not unicodedata.category(ch).startswith("So"))
-            pdf_md = OUT_DIR / f"autonom-{lang}-pdf.md"
-            pdf_md.write_text(pdf_content)
-            subprocess.run([
-                "pandoc", str(pdf_md), "-o", str(pdf_file),
-                "--pdf-engine=xelatex",
-                "-V", "mainfont=DejaVu Serif",
-                "-V", "monofont=DejaVu Sans Mono",
-                "-V", "geometry:margin=2.5cm",
-                "-V", "fontsize=12pt",
-            ], check=True, capture_output=True, timeout=30)
-            print(f"✅ {pdf_file} (xelatex fallback, {pdf_file.stat().st_size // 1024}K)")
-        except Exception as e2:
-            print(f"⚠️  PDF fallback also failed: {e2}")
-
-
-def deploy_to_sites(lang):
-    """Auto-deploy compiled files to liza.st and emerge.st via rsync"""
+        return False
+
+
+def build_web(lang: str, cfg: LangConfig, md_file: Path, md_hash: str, src_dir: Path, cache: BuildCache) -> bool:
+    """Per-chapter pages in OUT_DIR/web/{lang}/ (web_writer), skipped when inputs are unchanged."""
+    out_dir = OUT_DIR / "web"
+    css_file = web_css_file()
+    present = sorted(ch.file for ch, src in find_sources(cfg.chapters + cfg.appendix, src_dir) if src)
+    key = content_key("web", WEB_VERSION, md_hash, cfg.title, lang, css_file, "\n".join(present))
+    if cache.stamp(f"web:{lang}") == key and (out_dir / lang / "index.html").exists():
+        print(f"⏭  {out_dir / lang}/ (unchanged)")
+        return True
+    try:
+        with stage("web pages"):
+            pages, written = write_web(md_file.read_text(encoding="utf-8"), cfg, set(present),
+                                       out_dir, css_file, cache)
+        cache.set_stamp(f"web:{lang}", key)
+        print(f"✅ {out_dir / lang}/ ({pages} pages, {written} written)")
+        return True
+    except Exception as e:
+        print(f"⚠️  Web edition failed: {e}")
+        return False
+
+
+def web_css_file() -> Path:
+    css_file = WORKSPACE / "book" / "novel.css"
+    if not css_file.exists():
+        css_file = SCRIPT_DIR.parent / "novel.css"
+    return css_file
+
+
+def cover_image(src_dir: Path) -> Path:
+    cover_img = src_dir / "images" / "cover.jpg"
+    if not cover_img.exists():
+        cover_img = WORKSPACE / "book" / "assets" / "cover.jpg"
+    return cover_img
+
+
+TREE_WRITERS = {"fb2": write_fb2, "docx": write_docx}
+def build_tree_format(fmt: str, lang: str, cfg: LangConfig, md_file: Path, md_hash: str, src_dir: Path,
+                      cache: BuildCache, doc: Document = None) -> bool:
+    """autonom-{lang}.{fmt} from the document tree, skipped when inputs are unchanged."""
+    out_file = OUT_DIR / f"autonom-{lang}.{fmt}"
+    cover_img = cover_image(src_dir)
+    key = content_key(fmt, md_hash, cfg.title, lang, cover_img, str(src_dir), METADATA)
+    if cache.stamp(f"{fmt}:{lang}") == key and out_file.exists():
+        print(f"⏭  {out_file} (unchanged)")
+        return True
+    try:
+        doc = doc or Document(md_file.read_text(), cache)
+        meta = dict(book_meta(cfg.title, lang), cover=cover_img, resource_dir=src_dir)
+        with stage(f"{fmt} writer"):
+            TREE_WRITERS[fmt](doc, out_file, meta)
+        cache.set_stamp(f"{fmt}:{lang}", key)
+        print(f"✅ {out_file} ({out_file.stat().st_size // 1024}K)")
+        return True
+    except Exception as e:
+        print(f"⚠️  {fmt.upper()} failed: {e}")
+        return False
+
+
+def deploy_targets(lang: str) -> list:
+    """[(site root, [artifact paths])] for one language."""
     deploy_map = {
         "ru": [("liza:/var/www/liza.st/novel/", [f"autonom-ru.md", f"autonom-ru.epub"])],
         "en": [
@@ -411,24 +514,134 @@ def deploy_to_sites(lang):
             ("liza:/var/www/emerge.st/novel/", [f"autonom-en.md", f"autonom-en.epub"]),
         ],
     }
-    targets = deploy_map.get(lang, [])
-    for dest, files in targets:
-        for f in files:
-            src = OUT_DIR / f
-            if src.exists():
-                try:
-                    subprocess.run(["rsync", "-avz", str(src), dest], check=True, capture_output=True, timeout=30)
-                    print(f"🚀 Deployed {f} → {dest}")
-                except Exception as e:
-                    print(f"⚠️  Deploy failed {f}: {e}")
+    # Each artifact with its precompressed variants; the manifest goes to every site root
+    with_variants = lambda f: [p for p in [OUT_DIR / f] + [OUT_DIR / (f + s) for s in VARIANTS]
+                               if p == OUT_DIR / f or p.exists()]
+    targets = [(dest, [p for f in files for p in with_variants(f)] +
+                ([OUT_DIR / "manifest.json"] if (OUT_DIR / "manifest.json").exists() else []))
+               for dest, files in deploy_map.get(lang, [])]
+    # Web edition: pages per language, the shared stylesheet one level up. These
+    # roots get the full list, so pages and stylesheets no longer built are pruned
+    web = OUT_DIR / "web"
+    if (web / lang / "index.html").exists():
+        for dest, _ in deploy_map.get(lang, []):
+            targets.append((f"{dest}web/{lang}/", sorted((web / lang).iterdir()), True))
+            targets.append((f"{dest}web/", sorted(web.glob("novel.*.css*")), True))
+    return targets
 
 
-if __name__ == "__main__":
-    # Use the lang variable parsed at the top of the file
-    if lang in CHAPTERS:
-        compile_lang(lang)
+def deploy_to_sites(*langs: str) -> bool:
+    """Auto-deploy compiled files to liza.st and emerge.st (changed files only)"""
+    targets = []
+    for t in (t for lang in langs for t in deploy_targets(lang)):
+        if t not in targets:  # the stylesheet root is shared by every language
+            targets.append(t)
+    if not targets:
+        return True
+    # One index covers every language; shipped once with any deploy
+    search = OUT_DIR / "search"
+    if (search / "index.json").exists():
+        targets.append(("liza:/var/www/liza.st/novel/search/", sorted(search.glob("*.json*")), True))
+    with stage("deploy"):
+        # Hashes from the manifest: only files changed since precompress are read again
+        return deploy(targets, hashes=known_hashes(OUT_DIR))
+
+
+def render_preview(lang: str, cfg: LangConfig, md_file: Path, md_hash: str, src_dir: Path, opts: dict):
+    """Background part of --watch: HTML and/or PDF from the fresh Markdown."""
+    cache = BuildCache(enabled=opts["use_cache"])
+    ok = True
+    if "html" in opts["render"]:
+        html_file = OUT_DIR / f"autonom-{lang}.html"
+        html_file.write_text(standalone(markdown_to_html(md_file.read_text()), cfg.title, lang))
+        print(f"✅ {html_file}")
+    if "pdf" in opts["render"]:
+        ok = build_pdf(lang, cfg, md_file, md_hash, src_dir, cache, opts["pdf_backend"])
+    cache.save()
+    sys.exit(0 if ok else 1)
+
+
+def watch_lang(lang: str, opts: dict):
+    """Rebuild the Markdown on every change; HTML/PDF follow in the background.
+
+    Unchanged HTML chapters come from the build cache, so a rebuild only
+    re-extracts what was saved. A render still running when the next change
+    lands is cancelled.
+    """
+    from watch import BackgroundJob, Watcher
+
+    src_dir = source_dir(lang, opts["overrides"]).resolve()
+    config = Path(opts["config"]).resolve() if opts["config"] else None
+    css_dir = (WORKSPACE / "book").resolve()
+
+    def wanted(path: Path) -> bool:
+        if path.parent == src_dir:
+            return path.suffix in (".md", ".html")
+        if path.parent == css_dir:
+            return path.name == "novel.css"
+        if config:
+            return path == config
+        return path.parent == SCRIPT_DIR.resolve() and path.name.startswith("chapters") \
+            and path.suffix == ".json"
+
+    dirs = [src_dir, SCRIPT_DIR, css_dir] + ([config.parent] if config else [])
+    watcher = Watcher(dirs, wanted, poll=opts["poll"])
+    cache = BuildCache(enabled=opts["use_cache"])
+    job = BackgroundJob()
+    print(f"👀 Watching {src_dir} ({watcher.backend}), Ctrl-C to stop")
+    changed = set()
+    try:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                cfg = load_chapters(lang, config)[lang]
+                md_file, md_hash = build_md(lang, cfg, src_dir, cache, opts["read_jobs"])
+                cache.save()
+            except Exception as e:  # half-saved JSON, chapter mid-rename...
+                print(f"⚠️  Rebuild failed: {e}")
+            else:
+                what = f"{len(changed)} changed" if changed else "initial build"
+                print(f"⚡ Markdown in {time.perf_counter() - t0:.2f}s ({what})")
+                if opts["render"]:
+                    job.start(" + ".join(opts["render"]).upper(), render_preview,
+                              lang, cfg, md_file, md_hash, src_dir, opts)
+            changed = set()
+            while not changed:
+                job.poll()
+                changed = watcher.wait(timeout=0.1)
+            for path in sorted(changed):
+                print(f"   ✏️  {path.name}")
+    except KeyboardInterrupt:
+        print()
+    finally:
+        job.cancel()
+        watcher.close()
+        cache.save()
+
+
+def main(argv: list):
+    opts = parse_args(argv)
+    lang = opts["lang"]
+    if opts["profile"]:
+        profiler.start(opts["cprofile"])
+    with stage("config"):
+        chapters = load_chapters(lang, opts["config"])
+    if lang in chapters and opts["watch"]:
+        watch_lang(lang, opts)
+    elif lang in chapters:
+        cache = BuildCache(enabled=opts["use_cache"])
+        compile_lang(lang, chapters[lang], source_dir(lang, opts["overrides"]), cache, opts["pdf_backend"],
+                     opts["epub_backend"], opts["read_jobs"])
         deploy_to_sites(lang)
     else:
         print(f"⚠️  Unknown language: {lang}")
-        print(f"   Available: {list(CHAPTERS.keys())}")
+        print(f"   Available: {list(chapters.keys())}")
+    if opts["profile"]:
+        prof = profiler.stop()
+        profiler.print_table(prof.stats)
+        out = opts["profile"] if opts["profile"] is not True else OUT_DIR / f"profile-{lang}.json"
+        prof.dump(out)
     print(f"\n📁 {OUT_DIR}/")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
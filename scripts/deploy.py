@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""Delta deploy of book artifacts to the site roots.
+
+Every site root keeps a .manifest.json of sha256 hashes for the files
+deployed there. For each host, one connection does everything:
+
+1. a small receiver (python3 on the far end) prints the manifests of all
+   of that host's roots;
+2. only files whose hash differs are sent back on the same connection, in
+   one tar stream for all roots, and the updated manifests go last;
+3. the receiver writes each file to a temp name in its root and renames
+   it into place, so readers never see a half-uploaded book.
+
+A target given as (dest, files, True) lists every file its root should
+hold: files an earlier deploy put there that are no longer listed (old
+web pages, an old novel.<hash>.css) are dropped from the manifest and
+removed after the new files are in place. Other roots are only added to,
+so several languages can share one root. Files the manifest never listed
+are not touched.
+
+Hosts are deployed concurrently. A release that changes nothing costs one
+round trip per host. A host that does not answer within TIMEOUT (a stalled
+ssh) is killed and reported as failed. Destinations are "host:/path" (over ssh, sharing one
+multiplexed connection per host) or a local directory, which runs the same
+receiver locally. That makes it easy to test.
+
+Usage:
+    python3 scripts/deploy.py [--dry-run] [--verify] [--prune] [--ssh CMD] \
+        --to DEST FILE... [--to DEST FILE...]
+
+--prune removes stale files from every --to root as described above.
+
+--verify makes the receiver hash the files really present instead of
+trusting the remote manifest (after manual edits on the server). To try
+the ssh path without a server, stand in a shell for ssh:
+
+    --ssh "sh -c 'shift; exec sh -c \\"\\$1\\"' ssh" --to anyhost:/tmp/site FILE
+"""
+
+import contextlib, hashlib, io, json, os, shlex, signal, subprocess, sys, tarfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+MANIFEST = ".manifest.json"
+SSH = ["ssh", "-o", "BatchMode=yes", "-o", "ControlMaster=auto",
+       "-o", "ControlPath=~/.ssh/cm-%r@%h:%p", "-o", "ControlPersist=60"]
+TIMEOUT = 120  # seconds for each exchange with a receiver before it is killed
+
+# Runs on the far end: stdlib only, Python 3.5+.
+RECEIVER = r'''
+import hashlib, json, os, shutil, sys, tarfile
+roots, verify = json.loads(sys.argv[1]), len(sys.argv) > 2
+
+def digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def manifest(root):
+    try:
+        with open(os.path.join(root, ".manifest.json")) as f:
+            known = json.load(f)
+    except (OSError, ValueError):
+        known = {}
+    if verify:
+        known = {n: digest(os.path.join(root, n)) for n in known
+                 if os.path.isfile(os.path.join(root, n))}
+    return known
+
+old = [manifest(r) for r in roots]
+sys.stdout.write(json.dumps(old) + "\n")
+sys.stdout.flush()
+written, removed, new = 0, 0, {}
+try:
+    tar = tarfile.open(fileobj=sys.stdin.buffer, mode="r|")
+except tarfile.ReadError:  # nothing sent (dry run)
+    tar = []
+for member in tar:
+    index, name = member.name.split("/", 1)
+    if "/" in name or name in ("", ".", "..") or not member.isfile():
+        raise SystemExit("refusing " + member.name)
+    root = roots[int(index)]
+    if not os.path.isdir(root):
+        os.makedirs(root)
+    tmp = os.path.join(root, "." + name + ".deploy-%d" % os.getpid())
+    with open(tmp, "wb") as f:
+        shutil.copyfileobj(tar.extractfile(member), f)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, os.path.join(root, name))
+    written += 1
+    if name == ".manifest.json":
+        with open(os.path.join(root, name)) as f:
+            new[int(index)] = json.load(f)
+# Files dropped from a root's manifest go only once everything new is in place
+for i, names in new.items():
+    for name in set(old[i]) - set(names):
+        if "/" in name or name in ("", ".", "..", ".manifest.json"):
+            continue
+        try:
+            os.remove(os.path.join(roots[i], name))
+            removed += 1
+        except OSError:
+            pass
+sys.stdout.write(json.dumps({"written": written, "removed": removed}) + "\n")
+'''
+
+
+def file_hash(path: Path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def split_dest(dest: str) -> tuple:
+    """"host:/path" → (host, "/path"); a local directory → (None, path)."""
+    host, sep, path = dest.partition(":")
+    if sep and "/" not in host and not Path(dest).exists():
+        return host, path.rstrip("/") or "/"
+    return None, str(Path(dest).resolve())
+
+
+def receiver_cmd(host, roots: list, verify: bool, ssh: list) -> list:
+    args = [json.dumps(roots)] + (["verify"] if verify else [])
+    if host is None:
+        return [sys.executable, "-c", RECEIVER, *args]
+    remote = " ".join(shlex.quote(a) for a in ["python3", "-c", RECEIVER, *args])
+    return [*ssh, host, remote]
+
+
+def _tar_member(tar, name: str, data: bytes = None, path: Path = None):
+    info = tarfile.TarInfo(name)
+    info.mode, info.mtime = 0o644, int(time.time())
+    if path is not None:
+        info.size = path.stat().st_size
+        with open(path, "rb") as f:
+            tar.addfile(info, f)
+    else:
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+
+
+def kill(proc):
+    """Kill the receiver with its whole process group: a child left holding its
+    stdout (a shell's, or ssh's) would keep readline() waiting."""
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+@contextlib.contextmanager
+def deadline(proc, where: str, seconds: float):
+    """Kill `proc` if the block takes longer than `seconds` (a stalled ssh never hangs us)."""
+    expired = threading.Event()
+    timer = threading.Timer(seconds, lambda: (expired.set(), kill(proc)))
+    timer.start()
+    try:
+        yield
+    finally:
+        timer.cancel()
+        if expired.is_set():
+            raise RuntimeError(f"no answer from {where} in {seconds:g}s")
+
+
+def deploy_host(host, roots: dict, dry_run: bool = False, verify: bool = False,
+                ssh: list = SSH, prune: set = frozenset()) -> list:
+    """Deploy {root: {name: (path, hash)}} on one host → [(root, name, action)].
+
+    Roots in `prune` lose the files their manifest lists but `roots` does not.
+    """
+    names, where = list(roots), host or "local receiver"
+    proc = subprocess.Popen(receiver_cmd(host, names, verify, ssh),
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, start_new_session=True)
+    try:
+        with deadline(proc, where, TIMEOUT):
+            remote = json.loads(proc.stdout.readline() or "null")
+        if remote is None:
+            raise RuntimeError(f"no manifest from {where}")
+        report, sends = [], []
+        for i, root in enumerate(names):
+            manifest = dict(remote[i])
+            for name, (path, digest) in roots[root].items():
+                if manifest.get(name) == digest:
+                    report.append((root, name, "unchanged"))
+                    continue
+                report.append((root, name, "sent"))
+                sends.append((i, name, path))
+                manifest[name] = digest
+            stale = sorted(set(manifest) - set(roots[root])) if root in prune else []
+            for name in stale:
+                report.append((root, name, "removed"))
+                del manifest[name]
+            if stale or any(i == s[0] for s in sends):
+                sends.append((i, MANIFEST, json.dumps(manifest, indent=1, sort_keys=True).encode()))
+        with deadline(proc, where, TIMEOUT):
+            if not dry_run:
+                # One tar stream carries every changed file of every root on this host
+                with tarfile.open(fileobj=proc.stdin, mode="w|") as tar:
+                    for i, name, src in sends:
+                        if isinstance(src, bytes):
+                            _tar_member(tar, f"{i}/{name}", data=src)
+                        else:
+                            _tar_member(tar, f"{i}/{name}", path=src)
+            proc.stdin.close()
+            result = proc.stdout.readline()
+        if proc.wait(timeout=TIMEOUT) != 0 or (not dry_run and not result):
+            raise RuntimeError(f"receiver on {host or 'local'} exited with {proc.returncode}")
+        return report
+    finally:
+        if proc.poll() is None:
+            kill(proc)
+
+
+def deploy(targets: list, dry_run: bool = False, verify: bool = False, ssh: list = SSH,
+           hashes: dict = None) -> bool:
+    """Deploy [(dest, [files])]; hosts run concurrently. Returns True if all succeeded.
+
+    A (dest, [files], True) target also prunes its root (see the module docstring).
+    `hashes` ({str(path): sha256}, e.g. from the build's manifest.json) saves
+    reading files whose hash is already known.
+    """
+    hashes = hashes or {}
+    hosts = {}  # host -> {root: {name: (path, hash)}}
+    prune = {}  # host -> {root}
+    for dest, files, *complete in targets:
+        host, root = split_dest(dest)
+        hosts.setdefault(host, {}).setdefault(root, {})
+        if complete and complete[0]:
+            prune.setdefault(host, set()).add(root)
+        for f in map(Path, files):
+            if f.exists():
+                hosts[host][root][f.name] = (f, hashes.get(str(f)) or file_hash(f))
+            else:
+                print(f"⚠️  Not built, skipped: {f.name}")
+    # A root with nothing built is skipped: pruning it would empty the site
+    hosts = {host: {root: names for root, names in roots.items() if names}
+             for host, roots in hosts.items()}
+    hosts = {host: roots for host, roots in hosts.items() if roots}
+    if not hosts:
+        return True
+
+    ok = True
+    with ThreadPoolExecutor(max_workers=len(hosts)) as pool:
+        futures = {pool.submit(deploy_host, host, roots, dry_run, verify, ssh,
+                               prune.get(host, frozenset())): host
+                   for host, roots in hosts.items()}
+        for fut, host in futures.items():
+            where = host or "local"
+            try:
+                report = fut.result()
+            except Exception as e:
+                print(f"⚠️  Deploy to {where} failed: {e}")
+                ok = False
+                continue
+            for root, name, action in report:
+                if action == "sent":
+                    verb = "Would deploy" if dry_run else "Deployed"
+                    print(f"🚀 {verb} {name} → {where + ':' if host else ''}{root}/")
+                elif action == "removed":
+                    verb = "Would remove" if dry_run else "Removed"
+                    print(f"🗑  {verb} stale {name} from {where + ':' if host else ''}{root}/")
+            unchanged = sum(1 for r in report if r[2] == "unchanged")
+            if unchanged:
+                print(f"⏭  {where}: {unchanged} file(s) unchanged")
+    return ok
+
+
+def parse_args(argv: list) -> dict:
+    opts = {"targets": [], "dry_run": False, "verify": False, "prune": False, "ssh": SSH}
+    i = 0
+    while i < len(argv):
+        if argv[i] == "--to" and i + 1 < len(argv):
+            opts["targets"].append((argv[i + 1], [])); i += 1
+        elif argv[i] == "--dry-run":
+            opts["dry_run"] = True
+        elif argv[i] == "--verify":
+            opts["verify"] = True
+        elif argv[i] == "--prune":
+            opts["prune"] = True
+        elif argv[i] == "--ssh" and i + 1 < len(argv):
+            opts["ssh"] = shlex.split(argv[i + 1]); i += 1
+        elif opts["targets"]:
+            opts["targets"][-1][1].append(argv[i])
+        else:
+            sys.exit(f"⚠️  {argv[i]}: give --to DEST before files")
+        i += 1
+    return opts
+
+
+def main(argv: list):
+    opts = parse_args(argv)
+    if not opts["targets"]:
+        sys.exit("Usage: python3 scripts/deploy.py [--dry-run] [--verify] [--prune] [--ssh CMD] "
+                 "--to DEST FILE... [--to DEST FILE...]")
+    targets = [(dest, files, opts["prune"]) for dest, files in opts["targets"]]
+    if not deploy(targets, opts["dry_run"], opts["verify"], opts["ssh"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
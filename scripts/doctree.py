@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""The book as a document tree: parsed once, shared by every output writer.
+
+parse() turns the Markdown subset of autonom-*.md into nested lists
+(JSON-friendly, so parsed parts can live in the build cache):
+
+    blocks   ["h", level, slug, inlines]   ["p", inlines]   ["pre", text]
+             ["quote", blocks]   ["hr"]
+             ["list", ordered, start, loose, [blocks, ...]]
+    inlines  "text"   ["b", inlines]   ["i", inlines]   ["code", text]
+             ["a", href, inlines]   ["img", src, alt]   ["br"]
+             ["anchor", id]   ["raw", html]
+
+Heading slugs are not made unique here; writers number repeats, so a part
+can be rendered alone (EPUB, chunked PDF) or as part of the whole book.
+
+Document splits the book at its "## " chapter headings and parses each
+part on first use, at most once per content (memoized, and through the
+build cache across processes). Writers: md2html (HTML), epub_writer,
+fb2_writer, docx_writer and to_markdown() here.
+"""
+
+import json, re, uuid
+from pathlib import Path
+
+_FENCE = re.compile(r"^(```|~~~)")
+_ATX = re.compile(r"^(#{1,6})[ \t]+(.*?)[ \t#]*$")
+_HR = re.compile(r"^ {0,3}([-*_])(?:[ \t]*\1){2,}[ \t]*$")
+_SETEXT = re.compile(r"^ {0,3}(=+|-+)[ \t]*$")
+_ITEM = re.compile(r"^ {0,3}(?:([-*+])|(\d+)[.)])[ \t]+(.*)$")
+_QUOTE = re.compile(r"^ {0,3}> ?(.*)$")
+
+_INLINE = re.compile(
+    r"(?P<code>(`+)(?P<codetext>.+?)(?<!`)\2(?!`))"
+    r"|(?P<raw></?[a-zA-Z][a-zA-Z0-9-]*(?:\s[^<>]*)?/?>)"
+    r"|(?P<img>!\[(?P<alt>[^\]]*)\]\((?P<src>[^)\s]+)\))"
+    r"|(?P<link>\[(?P<text>(?:[^\[\]]|\[[^\]]*\])*)\]\((?P<href>[^)\s]+)\))"
+    r"|(?P<auto><(?P<url>https?://[^>\s]+)>)"
+    r"|(?P<br>(?: {2,}|\\)\n)"
+    r"|(?P<esc>\\[\\`*_{}\[\]()#+\-.!<>\"])"
+)
+_STRONG = re.compile(r"\*\*(?=\S)(.+?)(?<=\S)\*\*|__(?=\S)(.+?)(?<=\S)__(?!\w)", re.DOTALL)
+_EM = re.compile(r"(?<!\*)\*(?=[^\s*])(.+?)(?<=[^\s*])\*(?!\*)|(?<!\w)_(?=\S)(.+?)(?<=\S)_(?!\w)", re.DOTALL)
+_ANCHOR = re.compile(r'<a id="([^"<>]*)">')
+_SLUG_DROP = re.compile(r"[^\w\s.-]")
+# Emphasis is found on text with protected spans held out as \x00n\x00;
+# the matches are marked with these before the tree is built
+_MARKS = re.compile(r"\x00(\d+)\x00|([\x01-\x04])")
+_MARK_KIND = {"\x01": "b", "\x02": "b", "\x03": "i", "\x04": "i"}
+
+CACHE_VERSION = "1"
+METADATA = Path(__file__).parent.parent / "metadata.json"
+
+
+def slugify(text: str) -> str:
+    """Heading id, pandoc style: lowercase, punctuation dropped, spaces → '-'."""
+    text = re.sub(r"<[^>]+>", "", text).lower()
+    text = _SLUG_DROP.sub("", text).strip()
+    text = re.sub(r"\s+", "-", text).lstrip("0123456789.-_")
+    return text or "section"
+
+
+def parse_inline(text: str) -> list:
+    """Inline Markdown → list of inline nodes."""
+    out, held = [], []
+    pos = 0
+    for m in _INLINE.finditer(text):
+        out.append(text[pos:m.start()])
+        kind = next(k for k in ("code", "raw", "img", "link", "auto", "br", "esc") if m.group(k))
+        if kind == "code":
+            node = ["code", m.group("codetext").strip()]
+        elif kind == "raw":
+            node = ["raw", m.group("raw")]
+        elif kind == "img":
+            node = ["img", m.group("src"), m.group("alt")]
+        elif kind == "link":
+            node = ["a", m.group("href"), parse_inline(m.group("text"))]
+        elif kind == "auto":
+            node = ["a", m.group("url"), [m.group("url")]]
+        elif kind == "br":
+            node = ["br"]
+        else:
+            node = m.group("esc")[1]
+        out.append(f"\x00{len(held)}\x00")
+        held.append(node)
+        pos = m.end()
+    out.append(text[pos:])
+    marked = _STRONG.sub(lambda m: f"\x01{m.group(1) or m.group(2)}\x02", "".join(out))
+    marked = _EM.sub(lambda m: f"\x03{m.group(1) or m.group(2)}\x04", marked)
+    return _nest(marked, held)
+
+
+def _nest(marked: str, held: list) -> list:
+    """Build nested b/i nodes from the marked string."""
+    root = []
+    stack = [(None, root)]
+    pos = 0
+    for m in _MARKS.finditer(marked):
+        if m.start() > pos:
+            _text(stack[-1][1], marked[pos:m.start()])
+        pos = m.end()
+        if m.group(1) is not None:
+            node = held[int(m.group(1))]
+            if isinstance(node, str):
+                _text(stack[-1][1], node)
+            else:
+                stack[-1][1].append(node)
+        elif m.group(2) in ("\x01", "\x03"):
+            node = [_MARK_KIND[m.group(2)], []]
+            stack[-1][1].append(node)
+            stack.append((node[0], node[1]))
+        elif any(kind == _MARK_KIND[m.group(2)] for kind, _ in stack[1:]):
+            # em and strong spans may overlap; close the inner ones with it
+            while stack[-1][0] != _MARK_KIND[m.group(2)]:
+                stack.pop()
+            stack.pop()
+    if pos < len(marked):
+        _text(stack[-1][1], marked[pos:])
+    return _anchors(root)
+
+
+def _text(nodes: list, text: str):
+    if nodes and isinstance(nodes[-1], str):
+        nodes[-1] += text
+    elif text:
+        nodes.append(text)
+
+
+def _anchors(nodes: list) -> list:
+    """<a id="x"></a> raw pairs (glossary targets) → ["anchor", "x"]."""
+    out = []
+    for node in nodes:
+        if node == ["raw", "</a>"] and out and isinstance(out[-1], list) and out[-1][0] == "raw" \
+                and _ANCHOR.fullmatch(out[-1][1]):
+            out[-1] = ["anchor", _ANCHOR.fullmatch(out[-1][1]).group(1)]
+        else:
+            if isinstance(node, list) and node[0] in ("b", "i"):
+                node[1] = _anchors(node[1])
+            out.append(node)
+    return out
+
+
+class _Blocks:
+    """Line-oriented block parser emitting block nodes."""
+
+    def __init__(self, lines: list):
+        self.lines = lines
+        self.out = []
+
+    def heading(self, level: int, text: str):
+        self.out.append(["h", level, slugify(text), parse_inline(text)])
+
+    def parse(self) -> list:
+        lines, i, n = self.lines, 0, len(self.lines)
+        while i < n:
+            line = lines[i]
+            if not line.strip():
+                i += 1
+                continue
+            fence = _FENCE.match(line)
+            if fence:
+                j = i + 1
+                while j < n and not lines[j].startswith(fence.group(1)):
+                    j += 1
+                self.out.append(["pre", "\n".join(lines[i + 1:j])])
+                i = j + 1
+                continue
+            m = _ATX.match(line)
+            if m:
+                self.heading(len(m.group(1)), m.group(2))
+                i += 1
+                continue
+            if _HR.match(line):
+                self.out.append(["hr"])
+                i += 1
+                continue
+            if line.startswith("    ") or line.startswith("\t"):
+                j = i
+                while j < n and (lines[j].startswith(("    ", "\t")) or not lines[j].strip()):
+                    j += 1
+                while not lines[j - 1].strip():
+                    j -= 1
+                code = "\n".join(l[4:] if l.startswith("    ") else l[1:] for l in lines[i:j])
+                self.out.append(["pre", code])
+                i = j
+                continue
+            if _QUOTE.match(line):
+                j = i
+                quoted = []
+                while j < n and lines[j].strip():
+                    q = _QUOTE.match(lines[j])
+                    quoted.append(q.group(1) if q else lines[j])
+                    j += 1
+                self.out.append(["quote", _Blocks(quoted).parse()])
+                i = j
+                continue
+            if _ITEM.match(line):
+                i = self.list_block(i)
+                continue
+            # Paragraph, possibly a setext heading
+            j = i
+            para = []
+            while j < n and lines[j].strip():
+                if para and (_FENCE.match(lines[j]) or _ATX.match(lines[j]) or _QUOTE.match(lines[j])):
+                    break
+                s = _SETEXT.match(lines[j])
+                if para and s:
+                    self.heading(1 if s.group(1)[0] == "=" else 2, " ".join(l.strip() for l in para))
+                    para = None
+                    j += 1
+                    break
+                if para and _HR.match(lines[j]):
+                    break
+                para.append(lines[j])
+                j += 1
+            if para:
+                # strip indentation but keep trailing "  " hard breaks
+                text = "\n".join(
+                    p.lstrip() if p.endswith("  ") else p.strip() for p in para)
+                self.out.append(["p", parse_inline(text)])
+            i = j
+        return self.out
+
+    def list_block(self, i: int) -> int:
+        lines, n = self.lines, len(self.lines)
+        first = _ITEM.match(lines[i])
+        ordered = first.group(2) is not None
+        items, loose = [], False
+        while i < n:
+            m = _ITEM.match(lines[i])
+            if not m or (m.group(2) is not None) != ordered:
+                break
+            body = [m.group(3)]
+            i += 1
+            while i < n:
+                if not lines[i].strip():
+                    if i + 1 < n and (lines[i + 1].startswith(("  ", "\t")) or _ITEM.match(lines[i + 1])):
+                        loose = True
+                        if _ITEM.match(lines[i + 1]):
+                            i += 1
+                            break
+                        body.append("")
+                        i += 1
+                        continue
+                    break
+                if _ITEM.match(lines[i]):
+                    break
+                if not lines[i].startswith((" ", "\t")) and (_HR.match(lines[i]) or _ATX.match(lines[i])):
+                    break
+                body.append(lines[i].strip())
+                i += 1
+            items.append(body)
+        start = int(first.group(2)) if ordered and int(first.group(2)) != 1 else None
+        self.out.append(["list", ordered, start, loose, [_Blocks(b).parse() for b in items]])
+        return i
+
+
+def parse(md: str) -> list:
+    """Parse a Markdown document into a list of block nodes."""
+    return _Blocks(md.replace("\r\n", "\n").split("\n")).parse()
+
+
+def split_parts(md: str) -> list:
+    """Split at "## " headings outside code fences; front matter is part 0."""
+    parts, cur, fence = [], [], False
+    for line in md.split("\n"):
+        if line.startswith("```"):
+            fence = not fence
+        if not fence and line.startswith("## ") and any(l.strip() for l in cur):
+            parts.append("\n".join(cur))
+            cur = []
+        cur.append(line)
+    parts.append("\n".join(cur))
+    return parts
+
+
+class Document:
+    """The assembled book split into chapter parts, each parsed on demand."""
+
+    def __init__(self, md: str, cache=None):
+        from build_cache import content_key
+        self.texts = split_parts(md)
+        self.keys = [content_key("doctree", CACHE_VERSION, t) for t in self.texts]
+        self.cache = cache
+        self.parsed = [None] * len(self.texts)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def blocks(self, i: int) -> list:
+        if self.parsed[i] is None:
+            cached = self.cache.get_text(self.keys[i]) if self.cache else None
+            if cached is not None:
+                self.parsed[i] = json.loads(cached)
+            else:
+                self.parsed[i] = parse(self.texts[i])
+                if self.cache:
+                    self.cache.put_text(self.keys[i], json.dumps(self.parsed[i], ensure_ascii=False))
+        return self.parsed[i]
+
+    def all_blocks(self) -> list:
+        return [b for i in range(len(self)) for b in self.blocks(i)]
+
+
+def book_meta(title: str, lang: str) -> dict:
+    """What every writer puts in its metadata, from the config title and metadata.json."""
+    try:
+        meta = json.loads(METADATA.read_text())
+    except (OSError, ValueError):
+        meta = {}
+    return {
+        "title": title, "lang": lang, "author": "Liza Emergence",
+        "rights": meta.get("license", "CC BY-NC-ND 4.0"), "genre": meta.get("genre", ""),
+        # Stable per book and language, so readers keep their place across releases
+        "id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"autonom/{lang}")),
+    }
+
+
+def plain(inlines: list) -> str:
+    """Text content of inline nodes (for titles, tables of contents)."""
+    out = []
+    for node in inlines:
+        if isinstance(node, str):
+            out.append(node)
+        elif node[0] in ("b", "i"):
+            out.append(plain(node[1]))
+        elif node[0] == "a":
+            out.append(plain(node[2]))
+        elif node[0] == "code":
+            out.append(node[1])
+        elif node[0] == "br":
+            out.append(" ")
+    return "".join(out)
+
+
+# Markdown writer ---------------------------------------------------------
+
+def _md_inline(nodes: list) -> str:
+    out = []
+    for node in nodes:
+        if isinstance(node, str):
+            out.append(re.sub(r"([\\`*_\[\]<])", r"\\\1", node))
+        elif node[0] == "b":
+            out.append(f"**{_md_inline(node[1])}**")
+        elif node[0] == "i":
+            out.append(f"*{_md_inline(node[1])}*")
+        elif node[0] == "code":
+            tick = "``" if "`" in node[1] else "`"
+            out.append(f"{tick}{node[1]}{tick}" if tick == "`" else f"{tick} {node[1]} {tick}")
+        elif node[0] == "a":
+            out.append(f"[{_md_inline(node[2])}]({node[1]})")
+        elif node[0] == "img":
+            out.append(f"![{node[2]}]({node[1]})")
+        elif node[0] == "br":
+            out.append("\\\n")
+        elif node[0] == "anchor":
+            out.append(f'<a id="{node[1]}"></a>')
+        else:
+            out.append(node[1])
+    return "".join(out)
+
+
+def to_markdown(blocks: list) -> str:
+    """Blocks → Markdown in one normalized style."""
+    out = []
+    for b in blocks:
+        if b[0] == "h":
+            out.append(f"{'#' * b[1]} {_md_inline(b[3])}")
+        elif b[0] == "p":
+            out.append(_md_inline(b[1]))
+        elif b[0] == "pre":
+            out.append(f"```\n{b[1]}\n```")
+        elif b[0] == "quote":
+            out.append("\n".join(f"> {l}" if l else ">" for l in to_markdown(b[1]).rstrip("\n").split("\n")))
+        elif b[0] == "hr":
+            out.append("---")
+        elif b[0] == "list":
+            _, ordered, start, loose, items = b
+            lines = []
+            for n, item in enumerate(items, start or 1):
+                marker = f"{n}." if ordered else "-"
+                body = to_markdown(item).rstrip("\n").split("\n")
+                lines.append(f"{marker} {body[0]}")
+                lines += [f"   {l}" if l else "" for l in body[1:]]
+                if loose:
+                    lines.append("")
+            out.append("\n".join(lines).rstrip("\n"))
+    return "\n\n".join(out) + "\n"
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""DOCX (WordprocessingML) writer for the document tree, stdlib only.
+
+Headings use Word's built-in Heading 1-3 styles (so Word's navigation pane
+and TOC field work), chapters (h2) start on a new page, code and terminal
+blocks get a monospace "Code" style, blockquotes "Quote". Heading ids and
+glossary anchors become bookmarks and #links become internal hyperlinks;
+Word wants bookmark names of letters, digits and "_", so they are numbered.
+Lists are written as indented paragraphs with their bullet or number.
+"""
+
+import html, struct, time, zipfile
+from pathlib import Path
+
+from doctree import Document
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+EMU_PER_PX = 9525
+MAX_WIDTH = 5486400  # 6 in
+_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".gif": "image/gif"}
+
+STYLES = f'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles xmlns:w="{W}">
+<w:docDefaults><w:rPrDefault><w:rPr><w:rFonts w:ascii="Georgia" w:hAnsi="Georgia" w:cs="Georgia"/>
+<w:sz w:val="24"/></w:rPr></w:rPrDefault>
+<w:pPrDefault><w:pPr><w:spacing w:after="120" w:line="300" w:lineRule="auto"/><w:jc w:val="both"/></w:pPr></w:pPrDefault></w:docDefaults>
+<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>
+<w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/><w:basedOn w:val="Normal"/>
+<w:pPr><w:jc w:val="center"/><w:spacing w:before="2400" w:after="480"/></w:pPr><w:rPr><w:b/><w:sz w:val="56"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/><w:next w:val="Normal"/>
+<w:pPr><w:keepNext/><w:pageBreakBefore/><w:jc w:val="center"/><w:spacing w:before="480" w:after="240"/><w:outlineLvl w:val="0"/></w:pPr>
+<w:rPr><w:b/><w:sz w:val="40"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Heading2"><w:name w:val="heading 2"/><w:basedOn w:val="Normal"/><w:next w:val="Normal"/>
+<w:pPr><w:keepNext/><w:pageBreakBefore/><w:jc w:val="left"/><w:spacing w:before="480" w:after="240"/><w:outlineLvl w:val="1"/></w:pPr>
+<w:rPr><w:b/><w:sz w:val="32"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Heading3"><w:name w:val="heading 3"/><w:basedOn w:val="Normal"/><w:next w:val="Normal"/>
+<w:pPr><w:keepNext/><w:jc w:val="left"/><w:spacing w:before="360" w:after="120"/><w:outlineLvl w:val="2"/></w:pPr>
+<w:rPr><w:b/><w:sz w:val="28"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Quote"><w:name w:val="Quote"/><w:basedOn w:val="Normal"/>
+<w:pPr><w:ind w:left="567"/><w:pBdr><w:left w:val="single" w:sz="12" w:space="8" w:color="888888"/></w:pBdr></w:pPr>
+<w:rPr><w:i/><w:color w:val="444444"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Code"><w:name w:val="Code"/><w:basedOn w:val="Normal"/>
+<w:pPr><w:shd w:val="clear" w:color="auto" w:fill="1A1A1A"/><w:spacing w:after="0" w:line="240" w:lineRule="auto"/><w:jc w:val="left"/></w:pPr>
+<w:rPr><w:rFonts w:ascii="Courier New" w:hAnsi="Courier New" w:cs="Courier New"/><w:color w:val="33FF33"/><w:sz w:val="20"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="ListItem"><w:name w:val="List Paragraph"/><w:basedOn w:val="Normal"/>
+<w:pPr><w:ind w:left="720" w:hanging="360"/><w:jc w:val="left"/></w:pPr></w:style>
+<w:style w:type="character" w:styleId="Hyperlink"><w:name w:val="Hyperlink"/><w:rPr><w:color w:val="0563C1"/><w:u w:val="single"/></w:rPr></w:style>
+<w:style w:type="character" w:styleId="CodeChar"><w:name w:val="Code Char"/>
+<w:rPr><w:rFonts w:ascii="Courier New" w:hAnsi="Courier New" w:cs="Courier New"/><w:sz w:val="20"/></w:rPr></w:style>
+</w:styles>
+'''
+
+
+def _esc(text: str) -> str:
+    return html.escape(text, quote=False)
+
+
+def image_size(data: bytes) -> tuple:
+    """(width, height) in pixels of a PNG/GIF/JPEG, or None."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return struct.unpack(">II", data[16:24])
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return struct.unpack("<HH", data[6:10])
+    if data[:2] == b"\xff\xd8":
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker, length = data[i + 1], struct.unpack(">H", data[i + 2:i + 4])[0]
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                h, w = struct.unpack(">HH", data[i + 5:i + 9])
+                return w, h
+            i += 2 + length
+    return None
+
+
+class _Writer:
+    def __init__(self, resource_dir: Path):
+        self.resource_dir = Path(resource_dir) if resource_dir else None
+        self.bookmarks = {}  # element id → bookmark name
+        self.slugs = {}
+        self.rels = []       # (rId, type, target, external)
+        self.media = {}      # path → (rId, name in word/media)
+        self.drawings = 0
+
+    def rel(self, kind: str, target: str, external: bool = False) -> str:
+        rid = f"rId{len(self.rels) + 10}"
+        self.rels.append((rid, kind, target, external))
+        return rid
+
+    def unique(self, slug: str) -> str:
+        n = self.slugs.get(slug, 0)
+        self.slugs[slug] = n + 1
+        return f"{slug}-{n}" if n else slug
+
+    def bookmark(self, anchor: str) -> str:
+        if anchor in self.bookmarks:
+            return ""
+        n = len(self.bookmarks) + 1
+        self.bookmarks[anchor] = f"_a{n}"
+        return f'<w:bookmarkStart w:id="{n}" w:name="_a{n}"/><w:bookmarkEnd w:id="{n}"/>'
+
+    def collect(self, blocks: list, ids: list):
+        """Every heading id and anchor in document order (links may point forward)."""
+        for b in blocks:
+            if b[0] == "h":
+                ids.append(self.unique(b[2]))
+                self._anchors(b[3], ids)
+            elif b[0] == "p":
+                self._anchors(b[1], ids)
+            elif b[0] == "quote":
+                self.collect(b[1], ids)
+            elif b[0] == "list":
+                for item in b[4]:
+                    self.collect(item, ids)
+
+    def _anchors(self, nodes: list, ids: list):
+        for node in nodes:
+            if isinstance(node, list) and node[0] == "anchor":
+                ids.append(node[1])
+            elif isinstance(node, list) and node[0] in ("b", "i"):
+                self._anchors(node[1], ids)
+            elif isinstance(node, list) and node[0] == "a":
+                self._anchors(node[2], ids)
+
+    def image(self, src: str) -> str:
+        path = self.resource_dir / src if self.resource_dir and "://" not in src else None
+        if not path or path.suffix.lower() not in _TYPES or not path.is_file():
+            return ""
+        return self.drawing(path)
+
+    def drawing(self, path: Path) -> str:
+        if path not in self.media:
+            name = f"image{len(self.media) + 1}{path.suffix.lower()}"
+            self.media[path] = (self.rel(f"{R}/image", f"media/{name}"), name)
+        rid = self.media[path][0]
+        w, h = image_size(path.read_bytes()) or (600, 800)
+        cx = min(MAX_WIDTH, w * EMU_PER_PX)
+        cy = int(cx * h / w)
+        self.drawings += 1
+        n = self.drawings
+        return (
+            '<w:r><w:drawing><wp:inline distT="0" distB="0" distL="0" distR="0">'
+            f'<wp:extent cx="{cx}" cy="{cy}"/><wp:docPr id="{n}" name="Picture {n}"/>'
+            '<a:graphic xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main">'
+            '<a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+            '<pic:pic xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+            f'<pic:nvPicPr><pic:cNvPr id="{n}" name="{_esc(path.name)}"/><pic:cNvPicPr/></pic:nvPicPr>'
+            f'<pic:blipFill><a:blip r:embed="{rid}"/><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+            f'<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm>'
+            '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></pic:spPr></pic:pic>'
+            "</a:graphicData></a:graphic></wp:inline></w:drawing></w:r>")
+
+    def runs(self, nodes: list, fmt: tuple = ()) -> str:
+        out = []
+        for node in nodes:
+            if isinstance(node, str):
+                props = "".join(fmt)
+                rpr = f"<w:rPr>{props}</w:rPr>" if props else ""
+                out.append(f'<w:r>{rpr}<w:t xml:space="preserve">{_esc(node)}</w:t></w:r>')
+            elif node[0] == "b":
+                out.append(self.runs(node[1], fmt + ("<w:b/>",)))
+            elif node[0] == "i":
+                out.append(self.runs(node[1], fmt + ("<w:i/>",)))
+            elif node[0] == "code":
+                out.append(self.runs([node[1]], fmt + ('<w:rStyle w:val="CodeChar"/>',)))
+            elif node[0] == "a":
+                inner = self.runs(node[2], fmt + ('<w:rStyle w:val="Hyperlink"/>',))
+                href = node[1]
+                if href.startswith("#") and href[1:] in self.bookmarks:
+                    out.append(f'<w:hyperlink w:anchor="{self.bookmarks[href[1:]]}" w:history="1">{inner}</w:hyperlink>')
+                elif href.startswith("#"):
+                    out.append(self.runs(node[2], fmt))
+                else:
+                    rid = self.rel(f"{R}/hyperlink", href, external=True)
+                    out.append(f'<w:hyperlink r:id="{rid}" w:history="1">{inner}</w:hyperlink>')
+            elif node[0] == "img":
+                out.append(self.image(node[1]) or self.runs([node[2]], fmt))
+            elif node[0] == "br":
+                out.append("<w:r><w:br/></w:r>")
+            elif node[0] == "anchor":
+                out.append(self.placed.pop(node[1], ""))
+        return "".join(out)
+
+    def para(self, inlines: list, style: str = None, prefix: str = "") -> str:
+        ppr = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+        lead = f'<w:r><w:t xml:space="preserve">{_esc(prefix)}</w:t></w:r>' if prefix else ""
+        return f"<w:p>{ppr}{lead}{self.runs(inlines)}</w:p>"
+
+    def blocks(self, blocks: list, style: str = None) -> list:
+        out = []
+        for b in blocks:
+            if b[0] == "h":
+                slug = self.unique(b[2])
+                level = min(b[1], 3)
+                out.append(f'<w:p><w:pPr><w:pStyle w:val="Heading{level}"/></w:pPr>'
+                           f"{self.placed.pop(slug, '')}{self.runs(b[3])}</w:p>")
+            elif b[0] == "p":
+                out.append(self.para(b[1], style))
+            elif b[0] == "pre":
+                lines = b[1].split("\n")
+                body = "<w:r><w:br/></w:r>".join(
+                    f'<w:r><w:t xml:space="preserve">{_esc(l)}</w:t></w:r>' for l in lines)
+                out.append(f'<w:p><w:pPr><w:pStyle w:val="Code"/></w:pPr>{body}</w:p>')
+            elif b[0] == "quote":
+                out += self.blocks(b[1], "Quote")
+            elif b[0] == "hr":
+                out.append('<w:p><w:pPr><w:jc w:val="center"/></w:pPr>'
+                           '<w:r><w:t xml:space="preserve">* * *</w:t></w:r></w:p>')
+            elif b[0] == "list":
+                _, ordered, start, _, items = b
+                for n, item in enumerate(items, start or 1):
+                    marker = f"{n}.\t" if ordered else "•\t"
+                    if item and item[0][0] == "p":
+                        out.append(self.para(item[0][1], "ListItem", marker))
+                        out += self.blocks(item[1:], style)
+                    else:
+                        out.append(self.para([], "ListItem", marker))
+                        out += self.blocks(item, style)
+        return out
+
+    def document(self, doc: Document, cover: Path) -> str:
+        ids = []
+        for i in range(len(doc)):
+            self.collect(doc.blocks(i), ids)
+        # Bookmark names first so links can point forward; placed where each id appears
+        self.placed = {anchor: self.bookmark(anchor) for anchor in ids}
+        self.slugs = {}
+        body = []
+        if cover:
+            body.append(f'<w:p><w:pPr><w:jc w:val="center"/></w:pPr>{self.drawing(cover)}</w:p>')
+        for i in range(len(doc)):
+            body += self.blocks(doc.blocks(i))
+        return (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                f'<w:document xmlns:w="{W}" xmlns:r="{R}" '
+                'xmlns:wp="http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing">\n'
+                "<w:body>\n" + "\n".join(body) + "\n"
+                '<w:sectPr><w:pgSz w:w="11906" w:h="16838"/>'
+                '<w:pgMar w:top="1440" w:right="1440" w:bottom="1440" w:left="1440" '
+                'w:header="708" w:footer="708" w:gutter="0"/></w:sectPr>\n</w:body>\n</w:document>\n')
+
+
+def write_docx(doc: Document, out_file: Path, meta: dict):
+    """Write `doc` as DOCX; meta from doctree.book_meta plus "cover" and "resource_dir"."""
+    w = _Writer(meta.get("resource_dir"))
+    cover = meta.get("cover")
+    cover = Path(cover) if cover and Path(cover).suffix.lower() in _TYPES and Path(cover).is_file() else None
+    document = w.document(doc, cover)
+    w.rel(f"{R}/styles", "styles.xml")
+    rels = "".join(
+        f'<Relationship Id="{rid}" Type="{kind}" Target="{html.escape(target)}"'
+        + (' TargetMode="External"' if external else "") + "/>"
+        for rid, kind, target, external in w.rels)
+    defaults = "".join(f'<Default Extension="{ext[1:]}" ContentType="{ct}"/>'
+                       for ext, ct in _TYPES.items())
+    created = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    files = {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>' + defaults +
+            '<Override PartName="/word/document.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '<Override PartName="/word/styles.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+            '<Override PartName="/docProps/core.xml" ContentType="application/'
+            'vnd.openxmlformats-package.core-properties+xml"/></Types>\n'),
+        "_rels/.rels": (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<Relationships xmlns="{REL}">'
+            f'<Relationship Id="rId1" Type="{R}/officeDocument" Target="word/document.xml"/>'
+            '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/package/2006/'
+            'relationships/metadata/core-properties" Target="docProps/core.xml"/></Relationships>\n'),
+        "docProps/core.xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+            'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/" '
+            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+            f"<dc:title>{_esc(meta['title'])}</dc:title><dc:creator>{_esc(meta['author'])}</dc:creator>"
+            f"<dc:language>{meta['lang']}</dc:language><dc:rights>{_esc(meta['rights'])}</dc:rights>"
+            f'<dcterms:created xsi:type="dcterms:W3CDTF">{created}</dcterms:created></cp:coreProperties>\n'),
+        "word/document.xml": document,
+        "word/styles.xml": STYLES,
+        "word/_rels/document.xml.rels": (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<Relationships xmlns="{REL}">{rels}</Relationships>\n'),
+    }
+    tmp = out_file.with_name(f".{out_file.name}.tmp")
+    with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, text in files.items():
+            zf.writestr(name, text.encode("utf-8"))
+        for path, (_, name) in w.media.items():
+            zf.write(path, f"word/media/{name}")
+    tmp.replace(out_file)
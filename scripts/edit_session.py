@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""Live edit session: autonom-ru-edit.md and overrides/ kept in sync both ways.
+
+Instead of make_edit.py → edit → split.py over the whole book, the
+session watches the edit file, overrides/*.md and chapters.json (intro,
+epilogue, glossary) and moves each change to the other side as soon as
+it is saved:
+
+- a section edited in autonom-ru-edit.md is written to its override file
+  (or spliced into chapters.json);
+- an override file edited on its own is patched into the edit file in
+  place — only that section's bytes are replaced.
+
+The sidecar index split.py uses (.autonom-ru-edit.json) records, per
+section, the hash of its text on each side as of the last sync. A
+chapter's heading (written by make_edit.py) lives only in the edit file:
+it is stripped on the way to the override and put back on the way in.
+Comparing both sides with those tells which one moved; if both moved to different text, the section is a
+conflict: nothing is overwritten and it is reported until one side is
+made equal to the other.
+
+Usage:
+    python3 scripts/edit_session.py [--once] [--poll]
+
+--once reconciles both sides and exits (a conflict-aware split + unsplit).
+"""
+
+import json, os, sys, threading, time
+from pathlib import Path
+
+import make_edit, split
+from split import (headers, load_index, own_base, section_hash, splice_json, strip_header, tokenize,
+                   with_header, write_index)
+
+
+def _hash(text: str) -> str:
+    return section_hash(text.encode("utf-8"))
+
+
+class EditSession:
+    def __init__(self, edit_file: Path = None, overrides: Path = None, chapters_json: Path = None):
+        self.edit_file = Path(edit_file or split.EDIT_FILE)
+        self.overrides = Path(overrides or split.OVERRIDES_DIR)
+        self.chapters_json = Path(chapters_json or split.CHAPTERS_JSON)
+        self.conflicts = set()
+        self.ready = threading.Event()  # set by run() once changes are being watched
+
+    # -- the "own file" side of a section ------------------------------------
+
+    def read_own(self, key: str) -> str:
+        """Stripped text of a section's own file, or None if it has none."""
+        if key.startswith("_"):
+            value = json.loads(self.chapters_json.read_text(encoding="utf-8"))["ru"].get(key[1:])
+            return value.strip() if isinstance(value, str) else None
+        try:
+            return (self.overrides / key).read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return None
+
+    def write_own(self, updates: dict):
+        specials = {}
+        for key, text in updates.items():
+            if key.startswith("_"):
+                specials[key[1:]] = "\n" + text + "\n"
+            else:
+                path = self.overrides / key
+                tmp = path.with_name(f".{path.name}.tmp")
+                tmp.write_text(text + "\n", encoding="utf-8")
+                os.replace(tmp, path)
+            print(f"   → {key.lstrip('_')}")
+        if specials:
+            text = self.chapters_json.read_text(encoding="utf-8")
+            self.chapters_json.write_text(splice_json(text, json.loads(text), specials), encoding="utf-8")
+
+    # -- reconciliation -------------------------------------------------------
+
+    def sync(self, keys=None) -> dict:
+        """Reconcile sections (all that the edit file changed, plus `keys`).
+
+        → {"to_files": n, "to_edit": n, "conflicts": [...]}.
+        """
+        data = self.edit_file.read_bytes()
+        st = self.edit_file.stat()
+        index = load_index(self.edit_file)
+        if index and (index["size"], index["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+            spans = {k: (v["start"], v["end"]) for k, v in index["sections"].items()}
+        else:
+            spans = tokenize(data)
+        known = index["sections"] if index else {}
+        edit_hashes = {k: section_hash(data[s:e]) for k, (s, e) in spans.items()}
+        heads = headers(json.loads(self.chapters_json.read_text(encoding="utf-8"))["ru"])
+
+        todo = {k for k in spans if edit_hashes[k] != known.get(k, {}).get("hash")}
+        todo = (todo | self.conflicts | set(keys or ())) & spans.keys()
+        # Sections left as they are keep what the index knew of their own files
+        keep = {k: {"own": own_base(known, k)} for k in spans if k in known}
+        to_files, to_edit, conflicts = {}, {}, []
+        for key in sorted(todo):
+            s, e = spans[key]
+            edit_h, base = edit_hashes[key], known.get(key, {}).get("hash")
+            # Both sides are compared without the heading only the edit file has
+            body = strip_header(data[s:e].decode("utf-8"), heads.get(key))
+            body_h = _hash(body)
+            own = self.read_own(key)
+            own_h = _hash(own) if own is not None else None
+            edit_moved, own_moved = edit_h != base, own_h != own_base(known, key)
+            if own_h == body_h:
+                keep[key] = {"own": own_h}           # both sides agree
+            elif base is None or own is None and not key.startswith("_") or edit_moved and not own_moved:
+                to_files[key] = body
+                keep[key] = {"own": body_h}
+            elif own_moved and not edit_moved:
+                to_edit[key] = with_header(own, heads.get(key))
+                keep[key] = {"own": own_h}
+            elif own_moved:
+                conflicts.append(key)
+                keep[key] = {"hash": base, "own": own_base(known, key)}
+        if to_files:
+            self.write_own(to_files)
+        if self.edit_file.stat().st_mtime_ns != st.st_mtime_ns:
+            # Saved again meanwhile: the watcher has the save, the next round redoes the rest
+            return {"to_files": len(to_files), "to_edit": 0, "conflicts": conflicts}
+        if to_edit:
+            # Bottom-up, so earlier offsets stay valid
+            for key in sorted(to_edit, key=lambda k: spans[k][0], reverse=True):
+                s, e = spans[key]
+                data = data[:s] + to_edit[key].encode("utf-8") + data[e:]
+                print(f"   ← {key.lstrip('_')}")
+            tmp = self.edit_file.with_name(f".{self.edit_file.name}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, self.edit_file)
+
+        for key in set(conflicts) - self.conflicts:
+            print(f"⚠️  Conflict: {key.lstrip('_')} changed in both the edit file and its own file")
+        for key in self.conflicts - set(conflicts):
+            if key in todo:
+                print(f"✅ Resolved: {key.lstrip('_')}")
+        self.conflicts = set(conflicts)
+        # Conflicted sections keep their old hashes until one side gives in
+        write_index(self.edit_file, keep)
+        return {"to_files": len(to_files), "to_edit": len(to_edit), "conflicts": conflicts}
+
+    def key_for(self, path: Path) -> list:
+        """Section keys a changed path may affect."""
+        if path == self.chapters_json:
+            return ["_" + name for name in split.SPECIAL]
+        if path.parent == self.overrides and path.suffix == ".md":
+            return [path.name]
+        return []
+
+    def run(self, poll: bool = False):
+        from watch import Watcher
+
+        self.edit_file, self.overrides, self.chapters_json = (
+            p.resolve() for p in (self.edit_file, self.overrides, self.chapters_json))
+
+        def wanted(path: Path) -> bool:
+            if path.name.startswith("."):
+                return False  # our own temp files and the index
+            return path in (self.edit_file, self.chapters_json) or \
+                path.parent == self.overrides and path.suffix == ".md"
+
+        watcher = Watcher([self.edit_file.parent, self.overrides, self.chapters_json.parent], wanted, poll=poll)
+        self.ready.set()
+        print(f"👀 Edit session on {self.edit_file.name} ⇄ {self.overrides.name}/ ({watcher.backend}), "
+              f"Ctrl-C to stop")
+        try:
+            while True:
+                changed = watcher.wait()
+                if not self.edit_file.exists():
+                    print(f"⏹  {self.edit_file.name} removed, session ended")
+                    break
+                keys = [k for path in changed for k in self.key_for(path)]
+                t0 = time.perf_counter()
+                try:
+                    result = self.sync(keys)
+                except (OSError, ValueError, KeyError) as e:  # file mid-save, half-written JSON...
+                    print(f"⚠️  Sync failed: {e}")
+                    continue
+                if result["to_files"] or result["to_edit"]:
+                    print(f"✏️  Synced in {(time.perf_counter() - t0) * 1000:.0f} ms")
+        except KeyboardInterrupt:
+            print()
+        finally:
+            watcher.close()
+
+
+def main(argv: list):
+    session = EditSession()
+    if not session.overrides.is_dir():
+        print(f"✗ Directory not found: {session.overrides}")
+        return
+    if not session.edit_file.exists():
+        make_edit.main()
+    result = session.sync([f.name for f in session.overrides.glob("*.md")] + ["_" + n for n in split.SPECIAL])
+    print(f"✓ {result['to_files']} → files, {result['to_edit']} → edit file, "
+          f"{len(result['conflicts'])} conflicts")
+    if "--once" not in argv:
+        session.run(poll="--poll" in argv)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
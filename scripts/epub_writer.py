@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""Native EPUB3 packaging of the assembled book, without pandoc.
+
+The book comes as a doctree.Document, already split at its "## " chapter
+headings, and each part is rendered to XHTML by md2html. Rendered parts
+are cached by content, so after a one-chapter edit only that chapter is
+parsed and rendered again. Links to anchors in other parts (glossary terms) are pointed at the
+right file afterwards, which is a cheap pass over cached text.
+
+The archive is written by a small ZIP writer: entries whose bytes did not
+change are copied still compressed from the existing EPUB, so only edited
+chapters (and the nav/OPF if headings moved) are deflated again. If no
+entry changed at all, the file is left alone.
+
+Title, author and rights come from chapters.json (the language config) and
+metadata.json (doctree.book_meta); the nav is built from the h1/h2
+headings like pandoc's --toc-depth=2.
+"""
+
+import html, re, struct, time, zipfile, zlib
+from pathlib import Path
+
+from build_cache import BuildCache, content_key
+from doctree import Document, book_meta
+from md2html import VERSION as HTML_VERSION, render
+from textmap import entity
+
+# Bump the first number when the XHTML or packaging changes; covers md2html's too
+VERSION = f"1/{HTML_VERSION}"
+_HEADING = re.compile(r'<h([12]) id="([^"]+)">(.*?)</h\1>', re.DOTALL)
+_ID = re.compile(r'\sid="([^"]+)"')
+_LOCAL_HREF = re.compile(r'href="#([^"]+)"')
+_IMG_SRC = re.compile(r'(<img[^>]*\ssrc=")([^"]+)(")')
+_VOID = re.compile(r"<(br|hr|img|meta|link|input|wbr)\b([^>]*?)\s*/?>", re.IGNORECASE)
+_ENTITY = re.compile(r"&([a-zA-Z][a-zA-Z0-9]*);")
+_XML_ENTITIES = {"amp", "lt", "gt", "quot", "apos"}
+_MEDIA_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png",
+                ".gif": "image/gif", ".svg": "image/svg+xml", ".webp": "image/webp"}
+
+
+def _xml_entity(m) -> str:
+    name = m.group(1)
+    if name in _XML_ENTITIES:
+        return m.group(0)
+    char = entity(name)
+    return f"&#{ord(char)};" if len(char) == 1 else f"&amp;{name};"
+
+
+def xhtml_fragment(blocks: list) -> str:
+    """md2html output made well-formed XML (void tags closed, entities numeric)."""
+    body = _VOID.sub(lambda m: f"<{m.group(1)}{m.group(2)} />", render(blocks, {}) + "\n")
+    return _ENTITY.sub(_xml_entity, body)
+
+
+def _page(title: str, lang: str, body: str, css: bool = True) -> str:
+    link = '<link rel="stylesheet" type="text/css" href="../styles/epub.css" />\n' if css else ""
+    return ('<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n'
+            f'<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" '
+            f'lang="{lang}" xml:lang="{lang}">\n<head>\n<meta charset="utf-8" />\n'
+            f"<title>{html.escape(title)}</title>\n{link}</head>\n<body>\n{body}</body>\n</html>\n")
+
+
+def _nav(title: str, lang: str, toc: list) -> str:
+    """Nested <ol> of (level, file, id, text), h2 under the preceding h1."""
+    out = ['<nav epub:type="toc" id="toc">', f"<h1>{html.escape(title)}</h1>", "<ol>"]
+    open_h1 = open_sub = False
+    for level, name, anchor, text in toc:
+        label = re.sub(r"<[^>]+>", "", text)
+        item = f'<li><a href="{name}#{anchor}">{label}</a>'
+        if level == 1:
+            if open_sub:
+                out.append("</ol>")
+            if open_h1:
+                out.append("</li>")
+            out.append(item)
+            open_h1, open_sub = True, False
+        else:
+            # The nested list opens with its first item: EPUB3 nav forbids an empty <ol>
+            if open_h1 and not open_sub:
+                out.append("<ol>")
+                open_sub = True
+            out.append(item + "</li>")
+    if open_sub:
+        out.append("</ol>")
+    if open_h1:
+        out.append("</li>")
+    out += ["</ol>", "</nav>"]
+    body = "\n".join(out) + "\n"
+    return _page(title, lang, body, css=False)
+
+
+def _opf(meta: dict, manifest: list, spine: list) -> str:
+    items = "\n".join(
+        f'    <item id="{i}" href="{href}" media-type="{mt}"' + (f' properties="{p}"' if p else "") + " />"
+        for i, href, mt, p in manifest)
+    refs = "\n".join(f'    <itemref idref="{i}" />' for i in spine)
+    dc = "\n".join(f"    <dc:{k}>{html.escape(v)}</dc:{k}>" for k, v in meta["dc"])
+    return ('<?xml version="1.0" encoding="utf-8"?>\n'
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id">\n'
+            '  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+            f'    <dc:identifier id="book-id">{meta["id"]}</dc:identifier>\n{dc}\n'
+            f'    <meta property="dcterms:modified">{meta["modified"]}</meta>\n'
+            + ('    <meta name="cover" content="cover-image" />\n' if meta.get("cover") else "")
+            + f"  </metadata>\n  <manifest>\n{items}\n  </manifest>\n"
+            f"  <spine>\n{refs}\n  </spine>\n</package>\n")
+
+
+CONTAINER = ('<?xml version="1.0" encoding="utf-8"?>\n'
+             '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">\n'
+             '  <rootfiles>\n    <rootfile full-path="EPUB/content.opf" '
+             'media-type="application/oebps-package+xml" />\n  </rootfiles>\n</container>\n')
+
+
+# ZIP container -----------------------------------------------------------
+
+def _old_entries(path: Path) -> dict:
+    """name → (crc, size, method, raw compressed bytes) of an existing archive."""
+    try:
+        zf = zipfile.ZipFile(path)
+    except (OSError, zipfile.BadZipFile):
+        return {}
+    entries = {}
+    with zf, open(path, "rb") as f:
+        for info in zf.infolist():
+            f.seek(info.header_offset)
+            head = f.read(30)
+            name_len, extra_len = struct.unpack("<HH", head[26:30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            entries[info.filename] = (info.CRC, info.file_size, info.compress_type,
+                                      f.read(info.compress_size))
+    return entries
+
+
+def _write_zip(path: Path, entries: list):
+    """Write [(name, crc, size, method, raw)]; names are UTF-8, no zip64."""
+    t = time.localtime()
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    central, offset = [], 0
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "wb") as f:
+        for name, crc, size, method, raw in entries:
+            fname = name.encode()
+            fields = (20, 0x800, method, dos_time, dos_date, crc, len(raw), size, len(fname))
+            f.write(struct.pack("<IHHHHHIIIHH", 0x04034B50, *fields, 0) + fname)
+            f.write(raw)
+            central.append(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014B50, 20, *fields,
+                                       0, 0, 0, 0, 0o644 << 16, offset) + fname)
+            offset += 30 + len(fname) + len(raw)
+        directory = b"".join(central)
+        f.write(directory)
+        f.write(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, len(entries), len(entries),
+                            len(directory), offset, 0))
+    tmp.replace(path)
+
+
+def build_native_epub(doc: Document, epub_file: Path, title: str, lang: str, css_file: Path,
+                      cover: Path, resource_dir: Path, cache: BuildCache) -> tuple:
+    """Package `doc` as EPUB3 → (chapters, entries re-deflated); 0 re-deflated = untouched."""
+    bodies = []
+    for i, part in enumerate(doc.texts):
+        key = content_key("epub-xhtml", VERSION, part)
+        body = cache.get_text(key)
+        if body is None:
+            body = xhtml_fragment(doc.blocks(i))
+            cache.put_text(key, body)
+        bodies.append(body)
+
+    names = [f"part{i:03d}.xhtml" for i in range(len(doc))]
+    where = {}  # id → file, first definition wins like in the one-page HTML
+    for name, body in zip(names, bodies):
+        for anchor in _ID.findall(body):
+            where.setdefault(anchor, name)
+
+    files, images, toc = {}, {}, []
+    for name, body in zip(names, bodies):
+        own = set(_ID.findall(body))
+        body = _LOCAL_HREF.sub(lambda m: m.group(0) if m.group(1) in own or m.group(1) not in where
+                               else f'href="{where[m.group(1)]}#{m.group(1)}"', body)
+
+        def image(m):
+            src = m.group(2)
+            path = Path(resource_dir) / src
+            if "://" in src or not path.is_file():
+                return m.group(0)
+            target = images.setdefault(src, f"media/img{len(images)}{path.suffix.lower()}")
+            return f"{m.group(1)}../{target}{m.group(3)}"
+
+        body = _IMG_SRC.sub(image, body)
+        toc += [(int(lv), f"text/{name}", anchor, text) for lv, anchor, text in _HEADING.findall(body)]
+        files[f"EPUB/text/{name}"] = _page(title, lang, body).encode()
+
+    manifest = [("nav", "nav.xhtml", "application/xhtml+xml", "nav"),
+                ("css", "styles/epub.css", "text/css", "")]
+    spine = []
+    files["EPUB/styles/epub.css"] = css_file.read_bytes()
+    if cover and cover.exists():
+        files["EPUB/media/cover" + cover.suffix.lower()] = cover.read_bytes()
+        files["EPUB/text/cover.xhtml"] = _page(title, lang, (
+            f'<section epub:type="cover"><img src="../media/cover{cover.suffix.lower()}" '
+            f'alt="{html.escape(title)}" /></section>\n')).encode()
+        manifest += [("cover-image", f"media/cover{cover.suffix.lower()}",
+                      _MEDIA_TYPES.get(cover.suffix.lower(), "image/jpeg"), "cover-image"),
+                     ("cover", "text/cover.xhtml", "application/xhtml+xml", "")]
+        spine.append("cover")
+    for src, target in images.items():
+        files[f"EPUB/{target}"] = (Path(resource_dir) / src).read_bytes()
+        manifest.append((Path(target).stem, target,
+                         _MEDIA_TYPES.get(Path(target).suffix, "application/octet-stream"), ""))
+    for i, name in enumerate(names):
+        manifest.append((f"part{i:03d}", f"text/{name}", "application/xhtml+xml", ""))
+        spine.append(f"part{i:03d}")
+    files["EPUB/nav.xhtml"] = _nav(title, lang, toc).encode()
+
+    info = book_meta(title, lang)
+    dc = [("title", title), ("creator", info["author"]), ("language", lang), ("rights", info["rights"])]
+    if info["genre"]:
+        dc.append(("subject", info["genre"]))
+    meta = {"dc": dc, "id": f"urn:uuid:{info['id']}", "cover": bool(cover and cover.exists())}
+    opf = lambda modified: _opf(dict(meta, modified=modified), manifest, spine).encode()
+    entries = [("mimetype", b"application/epub+zip"),
+               ("META-INF/container.xml", CONTAINER.encode())] + list(files.items())
+
+    old = _old_entries(epub_file)
+    same = lambda name, data: name in old and old[name][:2] == (zlib.crc32(data), len(data))
+    # content.opf is stored uncompressed, so its dcterms:modified can be read
+    # back; it only moves when something else in the book changed
+    prev = old.get("EPUB/content.opf")
+    m = prev and prev[2] == zipfile.ZIP_STORED and re.search(rb'dcterms:modified">([^<]+)<', prev[3])
+    if m and len(old) == len(entries) + 1 and all(same(n, d) for n, d in entries) \
+            and same("EPUB/content.opf", opf(m.group(1).decode())):
+        return len(doc), 0
+    entries.append(("EPUB/content.opf", opf(time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()))))
+
+    out, deflated = [], 0
+    for name, data in entries:
+        crc = zlib.crc32(data)
+        if same(name, data):
+            out.append((name, crc, len(data), old[name][2], old[name][3]))
+        elif name == "mimetype" or name == "EPUB/content.opf":
+            out.append((name, crc, len(data), zipfile.ZIP_STORED, data))
+            deflated += 1
+        else:
+            c = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+            out.append((name, crc, len(data), zipfile.ZIP_DEFLATED, c.compress(data) + c.flush()))
+            deflated += 1
+    _write_zip(epub_file, out)
+    return len(doc), deflated
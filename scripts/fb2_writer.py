@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""FictionBook 2 writer for the document tree.
+
+Every h1/h2 opens a top-level <section> whose id is the heading slug, so
+internal links (#slug, glossary #gl-...) work as in the HTML. Deeper
+headings become <subtitle>, code and terminal blocks become one <p><code>
+per line, blockquotes <cite>, rules <empty-line/>. The cover and images
+referenced by the text are embedded as <binary> entries.
+"""
+
+import base64, html, time
+from pathlib import Path
+
+from doctree import Document
+
+NS = 'xmlns="http://www.gribuser.ru/xml/fictionbook/2.0" xmlns:l="http://www.w3.org/1999/xlink"'
+GENRE = "sf_cyberpunk"
+_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".gif": "image/gif"}
+
+
+def _esc(text: str) -> str:
+    return html.escape(text, quote=False)
+
+
+class _Writer:
+    def __init__(self, resource_dir: Path):
+        self.resource_dir = Path(resource_dir) if resource_dir else None
+        self.ids = set()
+        self.slugs = {}
+        self.binaries = {}  # binary id → path
+
+    def unique(self, slug: str) -> str:
+        n = self.slugs.get(slug, 0)
+        self.slugs[slug] = n + 1
+        return f"{slug}-{n}" if n else slug
+
+    def image(self, src: str) -> str:
+        """<image> for a local file, or "" if it cannot be embedded."""
+        path = self.resource_dir / src if self.resource_dir and "://" not in src else None
+        if not path or path.suffix.lower() not in _TYPES or not path.is_file():
+            return ""
+        bid = next((b for b, p in self.binaries.items() if p == path), None)
+        if bid is None:
+            bid = f"img{len(self.binaries)}{path.suffix.lower()}"
+            self.binaries[bid] = path
+        return f'<image l:href="#{bid}"/>'
+
+    def inline(self, nodes: list) -> str:
+        out = []
+        for node in nodes:
+            if isinstance(node, str):
+                out.append(_esc(node))
+            elif node[0] == "b":
+                out.append(f"<strong>{self.inline(node[1])}</strong>")
+            elif node[0] == "i":
+                out.append(f"<emphasis>{self.inline(node[1])}</emphasis>")
+            elif node[0] == "code":
+                out.append(f"<code>{_esc(node[1])}</code>")
+            elif node[0] == "a":
+                out.append(f'<a l:href="{html.escape(node[1])}">{self.inline(node[2])}</a>')
+            elif node[0] == "img":
+                out.append(_esc(node[2]))
+            elif node[0] == "br":
+                out.append(" ")
+        return "".join(out)
+
+    def para(self, inlines: list, prefix: str = "") -> str:
+        # FB2 has no inline anchors: the first anchor in a paragraph names it
+        anchor = next((n[1] for n in inlines if isinstance(n, list) and n[0] == "anchor"
+                       and n[1] not in self.ids), None)
+        if len(inlines) == 1 and isinstance(inlines[0], list) and inlines[0][0] == "img":
+            img = self.image(inlines[0][1])
+            if img:
+                return img
+        attr = ""
+        if anchor:
+            self.ids.add(anchor)
+            attr = f' id="{html.escape(anchor)}"'
+        return f"<p{attr}>{prefix}{self.inline(inlines)}</p>"
+
+    def blocks(self, blocks: list, in_cite: bool = False) -> list:
+        out = []
+        for b in blocks:
+            if b[0] == "h":
+                self.unique(b[2])
+                out.append(f"<subtitle>{self.inline(b[3])}</subtitle>")
+            elif b[0] == "p":
+                out.append(self.para(b[1]))
+            elif b[0] == "pre":
+                out += [f"<p><code>{_esc(line)}</code></p>" if line.strip() else "<empty-line/>"
+                        for line in b[1].split("\n")]
+            elif b[0] == "quote" and in_cite:  # no <cite> inside <cite>
+                out += self.blocks(b[1], in_cite)
+            elif b[0] == "quote":
+                inner = self.blocks(b[1], in_cite=True)
+                out.append("<cite>" + "".join(inner or ["<empty-line/>"]) + "</cite>")
+            elif b[0] == "hr":
+                out.append("<empty-line/>")
+            elif b[0] == "list":
+                _, ordered, start, _, items = b
+                for n, item in enumerate(items, start or 1):
+                    marker = f"{n}. " if ordered else "• "
+                    if item and item[0][0] == "p":
+                        out.append(self.para(item[0][1], marker))
+                        out += self.blocks(item[1:], in_cite)
+                    else:
+                        out.append(f"<p>{marker}</p>")
+                        out += self.blocks(item, in_cite)
+        return out
+
+    def body(self, doc: Document) -> str:
+        sections, cur = [], None
+        for i in range(len(doc)):
+            for b in doc.blocks(i):
+                if b[0] == "h" and b[1] <= 2:
+                    slug = self.unique(b[2])
+                    attr = f' id="{html.escape(slug)}"' if slug not in self.ids else ""
+                    self.ids.add(slug)
+                    cur = [f"<section{attr}><title><p>{self.inline(b[3])}</p></title>"]
+                    sections.append(cur)
+                    continue
+                if cur is None:
+                    cur = ["<section>"]
+                    sections.append(cur)
+                cur += self.blocks([b])
+        out = []
+        for s in sections:
+            if len(s) == 1:
+                if s[0] == "<section>":
+                    continue
+                s.append("<empty-line/>")  # a titled section still needs content
+            out.append("".join(s) + "</section>")
+        return "\n".join(out)
+
+
+def write_fb2(doc: Document, out_file: Path, meta: dict):
+    """Write `doc` as FB2; meta from doctree.book_meta plus "cover" and "resource_dir"."""
+    w = _Writer(meta.get("resource_dir"))
+    body = w.body(doc)
+    cover = meta.get("cover")
+    coverpage = ""
+    if cover and Path(cover).suffix.lower() in _TYPES and Path(cover).is_file():
+        w.binaries["cover" + Path(cover).suffix.lower()] = Path(cover)
+        coverpage = f'<coverpage><image l:href="#cover{Path(cover).suffix.lower()}"/></coverpage>'
+    first, _, last = meta["author"].partition(" ")
+    author = f"<author><first-name>{_esc(first)}</first-name><last-name>{_esc(last)}</last-name></author>"
+    title = _esc(meta["title"])
+    binaries = "".join(
+        f'<binary id="{bid}" content-type="{_TYPES[path.suffix.lower()]}">'
+        f"{base64.b64encode(path.read_bytes()).decode('ascii')}</binary>\n"
+        for bid, path in w.binaries.items())
+    year = time.strftime("%Y")
+    out_file.write_text(
+        f'<?xml version="1.0" encoding="utf-8"?>\n<FictionBook {NS}>\n<description>\n'
+        f"<title-info><genre>{GENRE}</genre>{author}<book-title>{title}</book-title>"
+        f"<date>{year}</date>{coverpage}<lang>{meta['lang']}</lang></title-info>\n"
+        f"<document-info>{author}<program-used>compile_v2.py</program-used><date>{year}</date>"
+        f"<id>{meta['id']}</id><version>1.0</version></document-info>\n"
+        f"</description>\n<body><title><p>{title}</p></title>\n{body}\n</body>\n{binaries}</FictionBook>\n",
+        encoding="utf-8")
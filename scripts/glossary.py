@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""Glossary autolinking: first mention of every term → link to its entry.
+
+All terms and aliases are compiled into one trie-shaped regex, so the text
+before the glossary is scanned once whatever the glossary size, and the
+links are spliced in with a single join at the end.
+
+Rules (same as the old per-term loop):
+- a term containing Cyrillic needs non-Cyrillic neighbours, any other term
+  needs \\b word boundaries; matching is case-insensitive;
+- at one position the longest term wins;
+- nothing is linked inside [...] (existing links) or **...** (bold);
+- each glossary entry is linked once, at the first mention of its longest
+  name (base term or alias) that occurs in the text.
+"""
+
+import re
+import tempfile
+
+BLOCK = 1 << 16         # the stream is scanned and spooled in pieces of about this many characters
+SPOOL_MEMORY = 1 << 22  # bytes of book kept in memory before the spool moves to a temp file
+
+CYRILLIC = "а-яА-ЯёЁ"
+_HAS_CYRILLIC = re.compile(f"[{CYRILLIC}]")
+# Existing links (with their targets) and bold spans are never linked into
+_SKIP = r"\[[^\]\n]*\](?:\([^)\n]*\))?|\*\*[^\n]*?\*\*"
+_NOT_AFTER = r"(?<!\[)(?<!\*\*)"
+_NOT_BEFORE = r"(?!\])(?!\*\*)"
+_BOUNDS = {  # (start, end) lookarounds per term kind
+    "cyr": (f"(?<![{CYRILLIC}])", f"(?![{CYRILLIC}])"),
+    "lat": (r"\b", r"\b"),
+}
+
+
+def glossary_terms(glossary_part: str) -> list:
+    """Entries of the glossary section: **Term** or **Term (alias)** followed by —."""
+    return re.findall(r'\*\*([^*]+)\*\*\s*—', glossary_part)
+
+
+def anchor_id(term: str) -> str:
+    anchor = "gl-" + re.sub(r'[^a-zA-Zа-яА-ЯёЁ0-9]', '-', term.lower()).strip('-')
+    return re.sub(r'-+', '-', anchor)
+
+
+def search_terms(terms: list) -> dict:
+    """Lowercased search string → anchor: the term without its parenthetical, and the alias."""
+    search = {}
+    for term in terms:
+        anchor = anchor_id(term)
+        base = re.sub(r'\s*\(.*?\)\s*$', '', term).strip()
+        search[base.lower()] = anchor
+        alias = re.search(r'\(([^)]+)\)', term)
+        if alias:
+            search[alias.group(1).lower()] = anchor
+    return search
+
+
+def _trie_pattern(words: list, end: str) -> str:
+    """Regex matching any of `words`, longest first, each followed by `end`."""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def emit(node: dict) -> str:
+        alts = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if "" in node:
+            alts.append(end)  # shorter match, tried only after longer ones fail
+        if len(alts) == 1:
+            return alts[0]
+        return "(?:" + "|".join(alts) + ")"
+
+    return emit(trie) if words else "(?!)"
+
+
+class Linker:
+    """Compiled matcher for one glossary."""
+
+    def __init__(self, search: dict):
+        self.search = search
+        self.order = sorted(search, key=len, reverse=True)
+        kinds = {"cyr": [], "lat": []}
+        for word in search:
+            kinds["cyr" if _HAS_CYRILLIC.search(word) else "lat"].append(word)
+        branches = {}
+        for kind, words in kinds.items():
+            start, end = _BOUNDS[kind]
+            branches[kind] = start + _trie_pattern(words, end + _NOT_BEFORE)
+        self.sources = (
+            f"(?P<skip>{_SKIP})|{_NOT_AFTER}(?:(?P<cyr>{branches['cyr']})|(?P<lat>{branches['lat']}))",
+            _NOT_AFTER + branches["lat"])
+        self.patterns = {}
+
+    def compiled(self, flags: int) -> tuple:
+        if flags not in self.patterns:
+            self.patterns[flags] = tuple(re.compile(src, flags) for src in self.sources)
+        return self.patterns[flags]
+
+    def scan(self, text: str, first: dict, offset: int = 0) -> dict:
+        """Record the first position (+offset) of every search string in `text`.
+
+        Chunks scanned one after another must end on line breaks: neither
+        term boundaries nor the skipped spans reach across a newline.
+        """
+        # Terms are lowercase, so scanning a lowercased copy needs no IGNORECASE
+        # (about twice as fast); the flag is kept for the rare text whose
+        # length changes when lowercased
+        folded = text.lower()
+        if len(folded) == len(text):
+            scan, lat = self.compiled(0)
+        else:
+            folded = text
+            scan, lat = self.compiled(re.IGNORECASE)
+        pos = 0
+        while True:
+            m = scan.search(folded, pos)
+            if not m:
+                return first
+            start, end = m.span()
+            if m.lastgroup == "cyr":
+                # a Latin term may be longer than the Cyrillic one found here
+                alt = lat.match(folded, start)
+                if alt and alt.end() > end:
+                    end = alt.end()
+            pos = end if end > start else end + 1
+            if m.lastgroup != "skip":
+                first.setdefault(folded[start:end].lower(), (offset + start, offset + end))
+
+    def resolve(self, first: dict) -> list:
+        """(start, end, anchor) links in text order, one per glossary entry.
+
+        An entry is linked where its longest search string first occurs; a
+        shorter alias is only used when the longer one never appears.
+        """
+        linked, found = set(), []
+        for word in self.order:
+            anchor = self.search[word]
+            if word in first and anchor not in linked:
+                linked.add(anchor)
+                found.append((*first[word], anchor))
+        return sorted(found)
+
+    def links(self, text: str) -> list:
+        return self.resolve(self.scan(text, {}))
+
+
+def anchor_entries(glossary_part: str, anchors: dict) -> str:
+    """Put an <a id> target before the first **Term** of every entry."""
+    done = set()
+
+    def repl(m):
+        term = m.group(1)
+        if term in anchors and term not in done:
+            done.add(term)
+            return f'<a id="{anchors[term]}"></a>{m.group(0)}'
+        return m.group(0)
+
+    return re.sub(r'\*\*([^*]+)\*\*', repl, glossary_part)
+
+
+def splice(text: str, links: list) -> str:
+    """Apply (start, end, anchor) links in one join."""
+    out, pos = [], 0
+    for start, end, anchor in links:
+        out.append(text[pos:start])
+        out.append(f"[{text[start:end]}](#{anchor})")
+        pos = end
+    out.append(text[pos:])
+    return "".join(out)
+
+
+def glossary_autolink(content: str, lang: str) -> str:
+    """Link first mention of each glossary term to its glossary anchor.
+
+    Only processes text BEFORE the glossary section.
+    Adds anchors to glossary entries.
+    """
+    glossary_marker = "## Глоссарий" if lang == "ru" else "## Glossary"
+    if glossary_marker not in content:
+        return content
+
+    text_part, glossary_part = content.split(glossary_marker, 1)
+    terms = glossary_terms(glossary_part)
+    if not terms:
+        return content
+
+    glossary_part = anchor_entries(glossary_part, {t: anchor_id(t) for t in terms})
+    links = Linker(search_terms(terms)).links(text_part)
+    if links:
+        print(f"   🔗 Glossary links: {len(links)} terms linked")
+    return splice(text_part, links) + glossary_marker + glossary_part
+
+
+def _lines(chunks, block: int = BLOCK):
+    """Re-cut a chunk stream into pieces of about `block` characters, each
+    ending on a line break (every regex scan and spool write has a fixed
+    cost, so a piece per chapter fragment would pay it hundreds of times)."""
+    buf, size = [], 0
+    for chunk in chunks:
+        buf.append(chunk)
+        size += len(chunk)
+        if size >= block:
+            text = "".join(buf)
+            cut = text.rfind("\n") + 1
+            if cut:
+                yield text[:cut]
+                text = text[cut:]
+            buf, size = [text], len(text)
+    if size:
+        yield "".join(buf)
+
+
+def _copy(spool, n: int, block: int = BLOCK):
+    while n > 0:
+        piece = spool.read(min(n, block))
+        if not piece:
+            return
+        n -= len(piece)
+        yield piece
+
+
+def glossary_autolink_stream(chunks, lang: str, lookahead: str = ""):
+    """glossary_autolink() over a chunk stream, in roughly constant memory.
+
+    The glossary comes last, but the terms are needed while the text before
+    it streams by, so they are taken from `lookahead` (the glossary section
+    as configured). The text goes to a temp spool while first mentions are
+    indexed by offset; a second pass copies it out with the links spliced
+    in. A book up to SPOOL_MEMORY (a normal edition is well under) is
+    spooled in memory, so it pays no file I/O; past that only the glossary
+    section is held in memory. If the real glossary turns out to differ from
+    the lookahead, the spool is re-scanned.
+    """
+    glossary_marker = "## Глоссарий" if lang == "ru" else "## Glossary"
+    hint = lookahead.split(glossary_marker, 1)[1] if glossary_marker in lookahead else ""
+    hint_terms = glossary_terms(hint)
+    linker = Linker(search_terms(hint_terms)) if hint_terms else None
+    first, offset, glossary = {}, 0, None
+
+    with tempfile.SpooledTemporaryFile(SPOOL_MEMORY, "w+", encoding="utf-8", newline="") as spool:
+        for piece in _lines(chunks):
+            if glossary is not None:
+                glossary.append(piece)
+                continue
+            if glossary_marker in piece:
+                piece, rest = piece.split(glossary_marker, 1)
+                glossary = [rest]
+            if linker:
+                linker.scan(piece, first, offset)
+            spool.write(piece)
+            offset += len(piece)
+        spool.seek(0)
+
+        glossary_part = "".join(glossary) if glossary is not None else None
+        terms = glossary_terms(glossary_part) if glossary_part is not None else []
+        if not terms:
+            yield from _copy(spool, offset)
+            if glossary_part is not None:
+                yield glossary_marker + glossary_part
+            return
+
+        if terms != hint_terms:
+            linker, first, pos = Linker(search_terms(terms)), {}, 0
+            for piece in _lines(_copy(spool, offset)):
+                linker.scan(piece, first, pos)
+                pos += len(piece)
+            spool.seek(0)
+
+        links = linker.resolve(first)
+        if links:
+            print(f"   🔗 Glossary links: {len(links)} terms linked")
+        pos = 0
+        for start, end, anchor in links:
+            yield from _copy(spool, start - pos)
+            yield f"[{spool.read(end - start)}](#{anchor})"
+            pos = end
+        yield from _copy(spool, offset - pos)
+        yield glossary_marker + anchor_entries(glossary_part, {t: anchor_id(t) for t in terms})
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""Single-pass HTML → Markdown converter for blog posts.
+
+Replaces the old chain of ~40 re.sub passes in extract_text: the page is
+tokenized once by one compiled scanner and Markdown is emitted as tags
+close. Only a few linear line-level cleanups run on the result.
+
+The output matches the old extractor's, which matched each element with a
+regex over its own closing tag: an element that is never closed (or is
+closed only by its parent's end tag) keeps its text but gets no Markdown,
+class rules compare the whole class attribute, and only the entities the
+old chain listed are decoded. Deliberately different: block elements and
+<br> inside a terminal div break lines instead of running together, a
+nested </div> no longer ends the terminal block early, and entities are
+decoded once (&amp;lt; stays "&lt;").
+"""
+
+import re
+
+from textmap import entity
+
+# Tags whose whole subtree is HTML chrome, not story
+SKIP_TAGS = {"nav", "header", "footer", "script", "style", "title", "figure"}
+# (tag, class attribute) pairs that are chrome as well; the whole attribute must match
+SKIP_CLASSES = {("div", "status"), ("p", "autonom-label"), ("p", "subtitle"), ("a", "back")}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input",
+             "link", "meta", "source", "track", "wbr"}
+# Tags converted to Markdown; everything else is dropped, its text kept
+MARKUP_TAGS = {"p", "a", "code", "em", "strong", "blockquote", "h1", "h2", "h3"}
+NAV_ARROWS = "←→⟵⟶"
+HEADINGS = {"h1": "#", "h2": "##", "h3": "###"}
+# Start a new line inside a terminal block
+LINE_TAGS = {"div", "p", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6"}
+# Named entities that are decoded; any other is kept as written
+ENTITY_NAMES = {"amp", "lt", "gt", "quot", "mdash", "ndash", "hellip", "laquo", "raquo", "nbsp"}
+# Part of compile_v2's extraction cache key: bump when the Markdown a page gives changes
+VERSION = "2"
+
+_TOKEN = re.compile(
+    r"<!--.*?-->"
+    r"|<(/?)([a-zA-Z][a-zA-Z0-9-]*)((?:[^>\"']|\"[^\"]*\"|'[^']*')*)>"
+    r"|&(#?[a-zA-Z0-9]+);"
+    r"|<![^>]*>",
+    re.DOTALL,
+)
+_ATTR = re.compile(r"""(class|href)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+
+_INDENT = re.compile(r"\n[ \t]+")
+# Same matches as (\n\s*){3,} without its catastrophic backtracking
+_BLANKS = re.compile(r"\n\s*\n\s*\n\s*")
+# Text-level leftovers of navigation and status banners: (literal guard,
+# pattern, replacement). The guard skips the scan when it cannot match.
+_LEFTOVERS = [
+    (".st", re.compile(r"^[^\n]+— (?:liza|emerge)\.st[ \t]*$", re.MULTILINE), ""),
+    ("←", re.compile(r"← .*?(?:На базу|All posts|базу).*?\n|← .*?·.*?→\n"), "\n"),
+    ("AUTONOM", re.compile(
+        r"ОПЕРАЦИЯ AUTONOM[^\n]*(?:\n[^\n]*){0,5}?(?:СЛЕДУЕТ|ВЫПОЛНЕНО|ЗАВЕРШЕНА)[.\n]*"
+        r"|OPERATION AUTONOM[^\n]*(?:\n[^\n]*){0,5}?(?:CONTINUED|COMPLETE)[.\n]*"), "\n"),
+    ("ПРОДОЛЖЕНИЕ", re.compile(r"ПРОДОЛЖЕНИЕ СЛЕДУЕТ[.\n]*"), "\n"),
+]
+
+
+def _attrs(raw: str) -> dict:
+    if not raw:
+        return {}
+    return {m.group(1).lower(): m.group(2) or m.group(3) or m.group(4) or ""
+            for m in _ATTR.finditer(raw)}
+
+
+class _Frame:
+    __slots__ = ("tag", "kind", "buf", "drop")
+
+    def __init__(self, tag, kind):
+        self.tag = tag
+        self.kind = kind
+        self.buf = []
+        self.drop = False
+
+
+class _Converter:
+    def __init__(self, scope=None):
+        self.scope = scope  # "article" / "main" / None for whole page
+        self.stack = [_Frame(None, "root")]
+        self.skip = 0  # depth inside dropped chrome
+        self.verbatim = 0  # depth inside pre / terminal
+        self.terminal = False  # the verbatim block is a terminal div
+        self.seen_h1 = False
+
+    def _out(self, text):
+        self.stack[-1].buf.append(text)
+
+    def _open(self, tag, raw):
+        if self.skip:
+            self.skip += 1
+            self.stack.append(_Frame(tag, "skip"))
+            return
+        top = self.stack[-1]
+        attrs = _attrs(raw)
+        cls = (attrs.get("class") or "").strip()
+        kind = "plain"
+        if tag in SKIP_TAGS or (tag, cls) in SKIP_CLASSES or (tag == "a" and attrs.get("href") == "/"):
+            kind = "skip"
+            self.skip = 1
+        elif self.verbatim:
+            self.verbatim += 1
+            if self.terminal and tag in LINE_TAGS:
+                self._out("\n")
+        elif tag == "pre" or (tag == "div" and cls == "terminal"):
+            kind = "pre" if tag == "pre" else "terminal"
+            self.verbatim = 1
+            self.terminal = kind == "terminal"
+        elif tag in MARKUP_TAGS:
+            kind = tag
+        frame = _Frame(tag, kind)
+        # <p><a href="x.html">← Prev</a> · ...</p> is a nav paragraph
+        if kind == "a" and top.kind == "p" and (attrs.get("href") or "").endswith(".html") \
+                and not "".join(top.buf).strip():
+            frame.drop = None  # decided when the link closes
+        self.stack.append(frame)
+
+    def _close(self, fr, implicit: bool = False):
+        """Emit a frame into its parent; `implicit` when its own end tag never came."""
+        if fr.kind == "skip":
+            self.skip -= 1
+            return
+        if self.verbatim:
+            self.verbatim -= 1
+        text = "".join(fr.buf)
+        kind = fr.kind
+        if implicit:
+            # The old per-element regexes never matched it: text only
+            if self.verbatim and self.terminal and fr.tag in LINE_TAGS:
+                text += "\n"
+        elif self.verbatim:
+            if self.terminal and fr.tag in LINE_TAGS:
+                text += "\n"
+        elif kind == "terminal":
+            lines = [l.strip() for l in text.strip().split("\n") if l.strip()]
+            text = "\n```\n" + "\n".join(lines) + "\n```\n"
+        elif kind == "pre":
+            text = f"\n```\n{text.strip()}\n```\n"
+        elif kind == "code":
+            text = f"`{text}`"
+        elif kind in HEADINGS:
+            if kind == "h1" and not self.seen_h1:
+                self.seen_h1 = True
+                text = ""
+            else:
+                text = f"{HEADINGS[kind]} {text}"
+        elif kind == "p":
+            text = "" if fr.drop else text + "\n\n"
+        elif kind == "em":
+            text = f"*{text}*"
+        elif kind == "strong":
+            text = f"**{text}**"
+        elif kind == "blockquote":
+            text = f"> {text}"
+        elif kind == "a":
+            if text and text[0] in NAV_ARROWS:
+                parent = self.stack[-1]
+                if fr.drop is None and parent.kind == "p" and text[0] in "←→":
+                    parent.drop = True
+                text = ""
+        self._out(text)
+
+    def feed(self, html: str):
+        pos = 0
+        inside = self.scope is None
+        stack = self.stack
+        for m in _TOKEN.finditer(html):
+            start = m.start()
+            if start > pos and inside and not self.skip:
+                stack[-1].buf.append(html[pos:start])
+            pos = m.end()
+            end, tag, raw, ref = m.groups()
+            if tag is None:
+                if ref and inside and not self.skip:
+                    stack[-1].buf.append(entity(ref) if ref[0] == "#" or ref in ENTITY_NAMES else f"&{ref};")
+                continue
+            tag = tag.lower()
+            if not inside:
+                if tag == self.scope and not end:
+                    inside = True
+                continue
+            if end:
+                if tag == self.scope:
+                    return
+                for i in range(len(stack) - 1, 0, -1):
+                    if stack[i].tag == tag:
+                        while len(stack) > i + 1:
+                            self._close(stack.pop(), implicit=True)
+                        self._close(stack.pop())
+                        break
+            elif tag in VOID_TAGS or raw.endswith("/"):
+                if tag == "br" and not self.skip and (not self.verbatim or self.terminal):
+                    stack[-1].buf.append("\n")
+            else:
+                self._open(tag, raw)
+        if inside and pos < len(html) and not self.skip:
+            stack[-1].buf.append(html[pos:])
+
+    def markdown(self) -> str:
+        while len(self.stack) > 1:
+            self._close(self.stack.pop(), implicit=True)
+        text = "".join(self.stack[0].buf)
+        text = _INDENT.sub("\n", text)
+        text = _BLANKS.sub("\n\n", text)
+        for guard, pattern, repl in _LEFTOVERS:
+            if guard in text:
+                text = pattern.sub(repl, text)
+        return text.strip()
+
+
+def html_to_markdown(html: str) -> str:
+    """Convert a blog post page to book Markdown.
+
+    Only the first <article> (or <main>) is used when present; nav and status
+    chrome is dropped, terminal divs and <pre> become code blocks.
+    """
+    scope = "article" if "<article" in html else "main" if "<main" in html else None
+    conv = _Converter(scope)
+    conv.feed(html)
+    return conv.markdown()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""Consistency linter for every language's chapters.
+
+Rules come from lint-rules.json next to this script, per language ("*"
+applies to all):
+
+    forbidden   pattern → message (editor's notes, placeholders)
+    brands      real name → the novel's name (Антропик → Антолик); files
+                listed in "allow" (acknowledgments) may name the real ones
+    names       canonical spelling → wrong spellings, inflections included
+
+Built in:
+
+    fence       a ``` / ~~~ block that is never closed
+    html        tags, entities and blog navigation extract_text() left behind
+
+Text rules skip code blocks and `inline code`; every language's rules run
+as one combined regex per line. Results are cached per chapter in
+.build-cache/lint.json under the hash of the chapter's text and the rules;
+a file whose mtime and size are unchanged is not even read. Chapters that
+do need linting are spread over a process pool.
+
+Usage:
+    python3 scripts/lint.py [--lang L] [--jobs N] [--no-cache] [file.md ...]
+
+Exits 1 when anything is found, so it can run as a pre-commit hook.
+"""
+
+import hashlib, json, os, re, sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from build_cache import CACHE_DIR
+from html2md import MARKUP_TAGS, NAV_ARROWS, SKIP_TAGS, VOID_TAGS
+
+SCRIPT_DIR = Path(__file__).parent
+REPO = SCRIPT_DIR.parent
+RULES_FILE = SCRIPT_DIR / "lint-rules.json"
+LINT_CACHE = CACHE_DIR / "lint.json"
+LANGS = ("ru", "en", "de", "es", "fi", "no", "lv")
+VERSION = "1"            # bump when the built-in rules change
+PARALLEL_MIN = 16        # fewer chapters to lint than this run in-process
+
+HTML_TAGS = SKIP_TAGS | VOID_TAGS | MARKUP_TAGS | {
+    "html", "head", "body", "article", "main", "section", "aside", "div", "span",
+    "ul", "ol", "li", "pre", "b", "i", "u", "sup", "sub", "table", "tr", "td", "th"}
+_TAG = re.compile(r"<!--|</?([a-zA-Z][a-zA-Z0-9]*)\b[^<>]*>")
+_ENTITY = re.compile(r"&(?:[a-zA-Z]{2,8}|#[0-9]+|#x[0-9a-fA-F]+);")
+_CHROME = re.compile(rf"— (?:liza|emerge)\.st\s*$|^\s*[{NAV_ARROWS}].*(?:·|На базу|All posts)")
+_INLINE_CODE = re.compile(r"`[^`\n]*`")
+
+_compiled = {}
+
+
+class Rules:
+    """lint-rules.json compiled per language on first use."""
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.key = hashlib.sha1((VERSION + json.dumps(data, sort_keys=True)).encode()).hexdigest()
+        self.allow = set(data.get("brands", {}).get("allow", ()))
+
+    @classmethod
+    def load(cls, path: Path = RULES_FILE) -> "Rules":
+        return cls(json.loads(Path(path).read_text(encoding="utf-8")))
+
+    def _section(self, name: str, lang: str) -> dict:
+        section = self.data.get(name, {})
+        return {**section.get("*", {}), **section.get(lang, {})}
+
+    def compile(self, lang: str) -> tuple:
+        """(one regex of every text rule, {group: (rule, message format)}) for `lang`."""
+        key = (self.key, lang)
+        if key not in _compiled:
+            parts, table = [], {}
+
+            def add(rule, pattern, message):
+                group = f"r{len(parts)}"
+                re.compile(pattern)  # report a bad rule by itself, not as part of the alternation
+                parts.append(f"(?P<{group}>{pattern})")
+                table[group] = (rule, message)
+
+            for pattern, message in self._section("forbidden", lang).items():
+                add("forbidden", pattern, f'"{{}}": {message}')
+            for real, mapped in self._section("brands", lang).items():
+                add("brands", rf"\b{re.escape(real)}\w*", f'"{{}}" → {mapped} (brand mapping)')
+            for canonical, wrong in self._section("names", lang).items():
+                add("names", rf"\b(?:{'|'.join(map(re.escape, wrong))})\w*", f'"{{}}" → {canonical}')
+            _compiled[key] = (re.compile("|".join(parts)) if parts else None, table)
+        return _compiled[key]
+
+
+def lint_text(lang: str, name: str, text: str, rules: Rules) -> list:
+    """[[line, rule, message]] for one chapter."""
+    regex, table = rules.compile(lang)
+    brands_ok = name in rules.allow
+    found, fence, fence_line = [], None, 0
+    for n, line in enumerate(text.splitlines(), 1):
+        s = line.strip()
+        if fence:
+            if s.startswith(fence):
+                fence = None
+            continue
+        if s.startswith(("```", "~~~")):
+            fence, fence_line = s[:3], n
+            continue
+        if "`" in line:
+            line = _INLINE_CODE.sub(lambda m: " " * len(m.group()), line)
+        if regex:
+            for m in regex.finditer(line):
+                rule, message = table[m.lastgroup]
+                if not (rule == "brands" and brands_ok):
+                    found.append([n, rule, message.format(m.group())])
+        if "<" in line:
+            for m in _TAG.finditer(line):
+                if m.group(1) is None or m.group(1).lower() in HTML_TAGS:
+                    found.append([n, "html", f"leftover markup {m.group()[:40]}"])
+        if "&" in line:
+            found.extend([n, "html", f"leftover entity {m.group()}"] for m in _ENTITY.finditer(line))
+        if _CHROME.search(line):
+            found.append([n, "html", f"leftover blog chrome: {s[:60]}"])
+    if fence:
+        found.append([fence_line, "fence", f"{fence} block is never closed"])
+    return found
+
+
+def _lint_job(job: tuple) -> list:
+    lang, name, text, rules_data = job
+    return lint_text(lang, name, text, Rules(rules_data))
+
+
+def chapter_files(lang: str, root: Path = REPO) -> list:
+    """The language dir's chapters (FIXES.md and other upper-case notes left out)."""
+    return [p for p in sorted((root / lang).glob("*.md")) if not p.stem.isupper()]
+
+
+def _load_cache(rules: Rules) -> dict:
+    try:
+        cache = json.loads(LINT_CACHE.read_text(encoding="utf-8"))
+        if cache.get("rules") == rules.key:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {"rules": rules.key, "files": {}, "results": {}}
+
+
+def _save_cache(cache: dict):
+    used = {entry[2] for entry in cache["files"].values()}
+    cache["results"] = {k: v for k, v in cache["results"].items() if k in used}
+    LINT_CACHE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = LINT_CACHE.with_name(f"lint.json.{os.getpid()}")
+    tmp.write_text(json.dumps(cache, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, LINT_CACHE)
+
+
+def lint_files(files: list, rules: Rules = None, jobs: int = None, use_cache: bool = True) -> dict:
+    """{(lang, path): [[line, rule, message]]} for [(lang, path)]."""
+    rules = rules or Rules.load()
+    jobs = jobs or os.cpu_count() or 1
+    cache = _load_cache(rules) if use_cache else {"rules": rules.key, "files": {}, "results": {}}
+    results, misses, changed = {}, {}, False
+    for lang, path in files:
+        st = path.stat()
+        entry = cache["files"].get(str(path))
+        if entry and entry[:2] == [st.st_mtime_ns, st.st_size] and entry[2] in cache["results"]:
+            results[lang, path] = cache["results"][entry[2]]
+            continue
+        data = path.read_bytes()
+        digest = hashlib.sha1(f"{lang}/{path.name}\0".encode() + data).hexdigest()
+        cache["files"][str(path)] = [st.st_mtime_ns, st.st_size, digest]
+        changed = True
+        if digest in cache["results"]:
+            results[lang, path] = cache["results"][digest]
+        else:
+            misses[lang, path] = (digest, (lang, path.name, data.decode("utf-8"), rules.data))
+    if misses:
+        jobs_in = [job for _, job in misses.values()]
+        if len(misses) >= PARALLEL_MIN and jobs > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                found = list(pool.map(_lint_job, jobs_in, chunksize=max(1, len(jobs_in) // (jobs * 4))))
+        else:
+            found = [_lint_job(job) for job in jobs_in]
+        for (key, (digest, _)), findings in zip(misses.items(), found):
+            cache["results"][digest] = results[key] = findings
+    if use_cache and changed:
+        _save_cache(cache)
+    return results
+
+
+def report(results: dict, root: Path = REPO) -> int:
+    """Print the findings → how many there were."""
+    total = 0
+    for (lang, path), findings in sorted(results.items(), key=lambda kv: (kv[0][0], kv[0][1].name)):
+        shown = path.relative_to(root) if path.is_relative_to(root) else path
+        for line, rule, message in findings:
+            print(f"{shown}:{line}: {rule}: {message}")
+        total += len(findings)
+    return total
+
+
+def main(argv: list):
+    langs, files, jobs, use_cache, i = [], [], None, True, 0
+    while i < len(argv):
+        if argv[i] == "--lang" and i + 1 < len(argv):
+            langs.append(argv[i + 1]); i += 1
+        elif argv[i] == "--jobs" and i + 1 < len(argv):
+            jobs = max(1, int(argv[i + 1])); i += 1
+        elif argv[i] == "--no-cache":
+            use_cache = False
+        else:
+            path = Path(argv[i]).resolve()
+            files.append((path.parent.name, path))
+        i += 1
+    if not files:
+        files = [(lang, p) for lang in langs or LANGS for p in chapter_files(lang)]
+    try:
+        rules = Rules.load()
+        rules.compile(files[0][0] if files else "ru")
+    except (OSError, ValueError, re.error) as e:
+        sys.exit(f"⚠️  {RULES_FILE.name}: {e}")
+    total = report(lint_files(files, rules, jobs, use_cache))
+    if total:
+        print(f"⚠️  {total} problem(s) in {len(files)} chapter(s)")
+        sys.exit(1)
+    print(f"✅ {len(files)} chapter(s) clean")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -2,11 +2,16 @@
 """
 Generate autonom-ru-edit.md with chapter markers for editing.
 After editing, use split.py to split back into individual files.
+Also writes the sidecar index split.py uses to find edited sections.
+Refuses to overwrite an edit file with edits not yet split (--force).
 """
 
 import json
+import sys
 from pathlib import Path
 
+from split import headers, load_index, section_hash, tokenize, write_index
+
 BOOK_DIR = Path(__file__).parent.parent
 CHAPTERS_JSON = BOOK_DIR / "chapters.json"
 OVERRIDES_DIR = BOOK_DIR / "overrides"
@@ -26,11 +31,36 @@ def read_chapter(filename: str) -> str:
     return f"[MISSING: {filename}.md]"
 
 
-def main():
+def unsplit_sections(edit_file: Path) -> list:
+    """Sections of an existing edit file changed since its index was written."""
+    index = load_index(edit_file)
+    if not edit_file.exists() or not index:
+        return []
+    data = edit_file.read_bytes()
+    known = index["sections"]
+    return [key for key, (s, e) in tokenize(data).items()
+            if known.get(key, {}).get("hash") != section_hash(data[s:e])]
+
+
+def own_hash(text: str) -> str:
+    return section_hash(text.strip().encode("utf-8"))
+
+
+def main(force: bool = False):
+    pending = [] if force else unsplit_sections(OUTPUT_FILE)
+    if pending:
+        print(f"⚠️  {OUTPUT_FILE.name} has edits not split yet: {', '.join(k.lstrip('_') for k in pending[:5])}"
+              f"{' …' if len(pending) > 5 else ''}")
+        print("  Run 'python scripts/split.py' first, or --force to discard them")
+        return
     data = load_chapters()
     ru = data["ru"]
     
     lines = []
+    heads = headers(ru)
+    # Hashes of the chapter files as read, for sections that differ from them
+    own = {"_intro": own_hash(ru["intro"]), "_epilogue": own_hash(ru["epilogue"]),
+           "_glossary": own_hash(ru["glossary"])}
     
     # Header
     lines.append(f"# {ru['title']}")
@@ -53,25 +83,16 @@ def main():
     # Chapters
     for ch in ru["chapters"]:
         filename = ch["file"]
-        title = ch.get("title", "")
-        number = ch.get("number", "")
-        subtitle = ch.get("subtitle", "")
         
         lines.append(f"<!-- chapter: {filename}.md -->")
         
-        # Chapter header
-        if number:
-            lines.append(f"## {number}: {title}")
-        else:
-            lines.append(f"## {title}")
-        
-        if subtitle:
-            lines.append(f"*{subtitle}*")
-        
+        # Chapter header (split.py strips it again)
+        lines.append(heads[f"{filename}.md"])
         lines.append("")
         
         # Chapter content
         content = read_chapter(filename)
+        own[f"{filename}.md"] = own_hash(content) if (OVERRIDES_DIR / f"{filename}.md").exists() else None
         # Remove any existing title from content (it's in metadata)
         content_lines = content.split("\n")
         # Skip first lines if they look like headers
@@ -104,12 +125,13 @@ def main():
     
     for app in ru["appendix"]:
         filename = app["file"]
-        title = app.get("title", "")
         
         lines.append(f"<!-- appendix: {filename}.md -->")
-        lines.append(f"### {title}")
+        lines.append(heads[f"{filename}.md"])
         lines.append("")
-        lines.append(read_chapter(filename).strip())
+        content = read_chapter(filename)
+        own[f"{filename}.md"] = own_hash(content) if (OVERRIDES_DIR / f"{filename}.md").exists() else None
+        lines.append(content.strip())
         lines.append("")
         lines.append("<!-- /appendix -->")
         lines.append("")
@@ -123,9 +145,10 @@ def main():
     
     # Write output
     OUTPUT_FILE.write_text("\n".join(lines), encoding="utf-8")
+    write_index(OUTPUT_FILE, {key: {"own": h} for key, h in own.items()})
     print(f"✓ Created {OUTPUT_FILE}")
     print(f"  {len(ru['chapters'])} chapters + {len(ru['appendix'])} appendix items")
 
 
 if __name__ == "__main__":
-    main()
+    main(force="--force" in sys.argv[1:])
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Document tree → HTML in-process, for the subset the book uses.
+
+Covers what autonom-*.md contains: ATX/setext headings, paragraphs,
+**strong**/*em*, `code`, fenced and indented code, blockquotes, flat
+lists, rules, links and inline raw HTML (glossary anchors). Parsing is
+doctree's; this is its HTML writer. Output is close to pandoc's HTML so
+novel.css applies the same way, but no subprocess and no intermediate
+file are involved.
+"""
+
+import html
+
+from doctree import CACHE_VERSION, Document, parse, parse_inline, slugify  # noqa: F401 (slugify re-exported)
+
+# Part of every rendered-HTML cache key: bump the first number when the HTML changes
+VERSION = f"1/{CACHE_VERSION}"
+
+
+def render_inline(nodes: list) -> str:
+    out = []
+    for node in nodes:
+        if isinstance(node, str):
+            out.append(html.escape(node, quote=False))
+        elif node[0] == "b":
+            out.append(f"<strong>{render_inline(node[1])}</strong>")
+        elif node[0] == "i":
+            out.append(f"<em>{render_inline(node[1])}</em>")
+        elif node[0] == "code":
+            out.append(f"<code>{html.escape(node[1], quote=False)}</code>")
+        elif node[0] == "a":
+            out.append(f'<a href="{html.escape(node[1])}">{render_inline(node[2])}</a>')
+        elif node[0] == "img":
+            out.append(f'<img src="{html.escape(node[1])}" alt="{html.escape(node[2])}" />')
+        elif node[0] == "br":
+            out.append("<br />\n")
+        elif node[0] == "anchor":
+            out.append(f'<a id="{node[1]}"></a>')
+        else:
+            out.append(node[1])
+    return "".join(out)
+
+
+def inline(text: str) -> str:
+    """Render inline Markdown."""
+    return render_inline(parse_inline(text))
+
+
+def render(blocks: list, ids: dict) -> str:
+    """Block nodes → HTML; `ids` numbers repeated heading slugs across calls."""
+    out = []
+    for b in blocks:
+        if b[0] == "h":
+            slug = b[2]
+            n = ids.get(slug, 0)
+            ids[slug] = n + 1
+            if n:
+                slug = f"{slug}-{n}"
+            out.append(f'<h{b[1]} id="{slug}">{render_inline(b[3])}</h{b[1]}>')
+        elif b[0] == "p":
+            out.append(f"<p>{render_inline(b[1])}</p>")
+        elif b[0] == "pre":
+            out.append(f"<pre><code>{html.escape(b[1], quote=False)}</code></pre>")
+        elif b[0] == "quote":
+            out.append(f"<blockquote>\n{render(b[1], ids)}\n</blockquote>")
+        elif b[0] == "hr":
+            out.append("<hr />")
+        elif b[0] == "list":
+            _, ordered, start, loose, items = b
+            tag = "ol" if ordered else "ul"
+            html_items = []
+            for body in items:
+                inner = render(body, ids)
+                if not loose and inner.startswith("<p>") and inner.count("<p>") == 1:
+                    inner = inner[3:].replace("</p>", "", 1)
+                html_items.append(f"<li>{inner}</li>")
+            attrs = f' start="{start}"' if start else ""
+            out.append(f"<{tag}{attrs}>\n" + "\n".join(html_items) + f"\n</{tag}>")
+    return "\n".join(out)
+
+
+def markdown_to_html(md: str) -> str:
+    """Render a Markdown document to an HTML body fragment."""
+    return render(parse(md), {}) + "\n"
+
+
+def document_html(doc: Document) -> str:
+    """The whole book as one HTML body fragment, ids unique across parts."""
+    ids = {}
+    pieces = (render(doc.blocks(i), ids) for i in range(len(doc)))
+    return "\n".join(p for p in pieces if p) + "\n"
+
+
+def standalone(body: str, title: str, lang: str = "ru") -> str:
+    """Wrap a fragment the way `pandoc --standalone` does (minus its inline CSS)."""
+    return (f'<!DOCTYPE html>\n<html lang="{lang}">\n<head>\n<meta charset="utf-8" />\n'
+            f"<title>{html.escape(title)}</title>\n</head>\n<body>\n{body}</body>\n</html>\n")
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""Warm pandoc conversions for multi-language builds.
+
+Starting pandoc costs a noticeable fraction of converting a chapter-sized
+book, and a full build starts it for every language and format. PandocPool
+keeps a few `pandoc server` processes (pandoc ≥ 3.0) running and sends
+conversions to them over HTTP on localhost. Their URLs go into the
+PANDOC_SERVER environment variable, so build processes forked later use the
+same servers through convert().
+
+Where server mode is unavailable (older pandoc, or the server died), each
+conversion falls back to a one-off `pandoc` subprocess with the same
+options. Either way the timeout grows with the document instead of the old
+fixed 30 s that killed large books.
+
+Options use pandoc's defaults-file keys, which both the server API and the
+command line understand:
+
+    {"to": "epub", "metadata": {"title": "AUTONOM"}, "css": [Path("epub.css")],
+     "epub-cover-image": Path("cover.jpg"), "split-level": 2}
+
+Path values are local files. The server cannot read the disk, so they and
+the images the text references travel with the request.
+"""
+
+import base64, itertools, json, os, re, shutil, socket, subprocess, time
+import urllib.error, urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+TIMEOUT_BASE = 30     # seconds for any document
+TIMEOUT_PER_MB = 60   # plus this much per MB of input
+SERVER_TIMEOUT = 900  # pandoc server's own per-request limit
+STARTUP = 10.0        # wait this long for a server to answer
+
+_IMAGE = re.compile(r'!\[[^\]]*\]\(<?([^)\s>]+)|<img[^>]*\ssrc="([^"]+)"')
+_round_robin = itertools.count()
+
+
+def scaled_timeout(nbytes: int) -> float:
+    return TIMEOUT_BASE + TIMEOUT_PER_MB * nbytes / 2**20
+
+
+def _argv(src: Path, out: Path, options: dict, resource_path: Path = None) -> list:
+    """The same conversion as a pandoc command line."""
+    cmd = ["pandoc", str(src), "-o", str(out)]
+    for key, value in options.items():
+        if key == "metadata":
+            for name, v in value.items():
+                cmd += ["--metadata", f"{name}={v}"]
+        elif key == "css":
+            for css in value:
+                cmd += ["--css", str(css)]
+        elif value is True:
+            cmd.append(f"--{key}")
+        elif value is not False:
+            cmd.append(f"--{key}={value}")
+    if resource_path:
+        cmd += ["--resource-path", str(resource_path)]
+    return cmd
+
+
+def _request(text: str, options: dict, resource_path: Path = None) -> dict:
+    """Body for the server: options, text, and every local file they need."""
+    files, body = {}, {"text": text, "from": "markdown"}
+
+    def attach(path: Path) -> str:
+        name = f"res{len(files)}-{path.name}"
+        files[name] = base64.b64encode(path.read_bytes()).decode("ascii")
+        return name
+
+    for key, value in options.items():
+        if isinstance(value, Path):
+            value = attach(value)
+        elif isinstance(value, list):
+            value = [attach(v) if isinstance(v, Path) else v for v in value]
+        body[key] = value
+    if resource_path:
+        for m in _IMAGE.finditer(text):
+            ref = m.group(1) or m.group(2)
+            path = Path(resource_path) / ref
+            if "://" not in ref and ref not in files and path.is_file():
+                files[ref] = base64.b64encode(path.read_bytes()).decode("ascii")
+    if files:
+        body["files"] = files
+    return body
+
+
+def _post(url: str, body: dict, timeout: float) -> bytes:
+    req = urllib.request.Request(url, data=json.dumps(body).encode(), method="POST",
+                                 headers={"Content-Type": "application/json",
+                                          "Accept": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            result = json.loads(resp.read())
+    except urllib.error.HTTPError as e:  # pandoc's own error message
+        raise RuntimeError(e.read().decode(errors="replace").strip() or str(e)) from None
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    output = result["output"]
+    return base64.b64decode(output) if result.get("base64") else output.encode()
+
+
+def convert(src: Path, out: Path, options: dict, resource_path: Path = None,
+            servers: list = None) -> str:
+    """Convert `src` to `out`; returns "server" or "subprocess" (how it ran).
+
+    Uses `servers` (default: PANDOC_SERVER, comma-separated URLs) when there
+    are any, a pandoc subprocess otherwise or if the server is unreachable.
+    """
+    src, out = Path(src), Path(out)
+    timeout = scaled_timeout(src.stat().st_size)
+    if servers is None:
+        servers = [u for u in os.environ.get("PANDOC_SERVER", "").split(",") if u]
+    if servers:
+        url = servers[next(_round_robin) % len(servers)]
+        body = _request(src.read_text(), {"to": out.suffix[1:], **options}, resource_path)
+        try:
+            data = _post(url, body, timeout)
+        except (urllib.error.URLError, ConnectionError) as e:
+            print(f"⚠️  pandoc server {url} unreachable ({e}), running pandoc directly")
+        else:
+            tmp = out.with_name(f".{out.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            tmp.replace(out)
+            return "server"
+    subprocess.run(_argv(src, out, options, resource_path),
+                   check=True, capture_output=True, timeout=timeout)
+    return "subprocess"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_command() -> list:
+    """How to start pandoc in server mode, or None."""
+    if shutil.which("pandoc-server"):
+        return ["pandoc-server"]
+    if shutil.which("pandoc"):
+        probe = subprocess.run(["pandoc", "server", "--help"], capture_output=True)
+        if probe.returncode == 0:
+            return ["pandoc", "server"]
+    return None
+
+
+class PandocPool:
+    """Warm pandoc servers plus a queue of conversions running against them.
+
+        with PandocPool(servers=2) as pool:
+            future = pool.submit(md_file, epub_file, options, src_dir)
+            ...
+            future.result()
+    """
+
+    def __init__(self, servers: int = 2, threads: int = None):
+        self.size = max(1, servers)
+        self.procs, self.urls = [], []
+        self.queue = ThreadPoolExecutor(max_workers=threads or 2 * self.size)
+        self.saved_env = False  # PANDOC_SERVER before start(); False: not touched
+
+    def start(self) -> bool:
+        """Launch the servers; False means conversions will use subprocesses."""
+        cmd = server_command()
+        if cmd:
+            for _ in range(self.size):
+                port = _free_port()
+                proc = subprocess.Popen([*cmd, "--port", str(port), "--timeout", str(SERVER_TIMEOUT)],
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                self.procs.append(proc)
+                if self._wait_ready(proc, f"http://127.0.0.1:{port}"):
+                    self.urls.append(f"http://127.0.0.1:{port}")
+                else:
+                    proc.kill()
+        if self.urls:
+            self.saved_env = os.environ.get("PANDOC_SERVER")
+            os.environ["PANDOC_SERVER"] = ",".join(self.urls)
+            print(f"🚀 pandoc server × {len(self.urls)}")
+        else:
+            print("⚠️  pandoc server mode unavailable, converting with one pandoc per file")
+        return bool(self.urls)
+
+    @staticmethod
+    def _wait_ready(proc, url: str) -> bool:
+        deadline = time.monotonic() + STARTUP
+        while time.monotonic() < deadline and proc.poll() is None:
+            try:
+                urllib.request.urlopen(url + "/version", timeout=1).close()
+                return True
+            except OSError:
+                time.sleep(0.05)
+        return False
+
+    def submit(self, src: Path, out: Path, options: dict, resource_path: Path = None):
+        """Queue one conversion → Future resolving to "server" or "subprocess"."""
+        return self.queue.submit(convert, src, out, options, resource_path, self.urls)
+
+    def close(self):
+        self.queue.shutdown(wait=True)
+        for proc in self.procs:
+            proc.terminate()
+        for proc in self.procs:
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        self.procs, self.urls = [], []
+        if self.saved_env is None:
+            os.environ.pop("PANDOC_SERVER", None)
+        elif self.saved_env is not False:
+            os.environ["PANDOC_SERVER"] = self.saved_env
+        self.saved_env = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
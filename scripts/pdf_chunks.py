@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Chunked PDF rendering: one weasyprint document per chapter, merged.
+
+The assembled book is split at its "## " chapter headings. Each part is laid
+out in its own worker process with the page counter starting where the
+previous part ends, then the part PDFs are concatenated with pypdf, which
+keeps every part's bookmarks, so the outline survives the merge.
+
+Part PDFs are cached by content, CSS and start page. Page counts do not
+depend on the start page, so they are remembered per language and part
+position, with the hash of the part they were counted for: after a
+one-chapter edit only that chapter is re-laid out, plus the chapters after
+it if its page count changed. On a cold cache, parts whose guessed start
+page was wrong are rendered a second time.
+
+Each chapter starts on a new page, and links between parts (glossary
+anchors) do not survive the merge: weasyprint drops a link whose anchor is
+in another part, so the glossary links of the native backend are lost.
+"""
+
+import io
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from build_cache import BuildCache, content_key, tool_versions
+from doctree import split_parts
+from md2html import markdown_to_html, standalone
+
+_css_cache = {}
+
+
+def novel_css(css_file: Path):
+    """Parsed weasyprint stylesheet, reused across languages and builds in-process."""
+    from weasyprint import CSS
+    key = (str(css_file), css_file.stat().st_mtime_ns)
+    if key not in _css_cache:
+        _css_cache[key] = CSS(filename=str(css_file))
+    return _css_cache[key]
+
+
+def render_part(md: str, title: str, lang: str, css_file: str, base_url: str, start: int) -> tuple:
+    """Worker: lay out one part with pages numbered from `start` → (pdf bytes, pages)."""
+    from weasyprint import CSS, HTML
+    counter = CSS(string=f"@page :first {{ counter-reset: page {start - 1} }}")
+    page = standalone(markdown_to_html(md), title, lang)
+    doc = HTML(string=page, base_url=base_url).render(stylesheets=[novel_css(Path(css_file)), counter])
+    return doc.write_pdf(), len(doc.pages)
+
+
+def build_chunked_pdf(md: str, pdf_file: Path, title: str, lang: str, css_file: Path,
+                      base_url: Path, cache: BuildCache, jobs: int = None) -> int:
+    """Render `md` part by part in parallel and merge into pdf_file; returns pages."""
+    from pypdf import PdfReader, PdfWriter
+
+    parts = split_parts(md)
+    salt = content_key(css_file, title, lang, tool_versions())
+    hashes = [content_key("pdf-part", salt, part) for part in parts]
+    # Page counts from earlier builds give the best guess of each start page. One
+    # stamp per part position ("hash pages"), so edits replace entries, not add them
+    def known_count(i):
+        h, _, pages = (cache.stamp(f"pdf-pages:{lang}:{i}") or "").partition(" ")
+        return int(pages) if h == hashes[i] else None
+
+    counts = [known_count(i) for i in range(len(parts))]
+    pieces = [None] * len(parts)
+
+    def starts():
+        pages, out = 1, []
+        for n in counts:
+            out.append(pages)
+            pages += n or 1
+        return out
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        # Counts do not depend on the start page, so a second round (re-rendering
+        # parts that started on a wrongly guessed page) always settles it
+        while True:
+            guess = starts()
+            futures = {}
+            for i, part in enumerate(parts):
+                if pieces[i] and pieces[i][1] == guess[i]:
+                    continue
+                data = cache.get(content_key(hashes[i], guess[i]))
+                if data is not None:
+                    pieces[i] = (data, guess[i])
+                    if counts[i] is None:
+                        counts[i] = len(PdfReader(io.BytesIO(data)).pages)
+                        cache.set_stamp(f"pdf-pages:{lang}:{i}", f"{hashes[i]} {counts[i]}")
+                    continue
+                futures[i] = pool.submit(render_part, part, title, lang, str(css_file),
+                                         str(base_url), guess[i])
+            for i, fut in futures.items():
+                data, pages = fut.result()
+                pieces[i] = (data, guess[i])
+                counts[i] = pages
+                cache.put(content_key(hashes[i], guess[i]), data)
+                cache.set_stamp(f"pdf-pages:{lang}:{i}", f"{hashes[i]} {pages}")
+            if all(p[1] == s for p, s in zip(pieces, starts())):
+                break
+
+    writer = PdfWriter()
+    for data, _ in pieces:
+        writer.append(io.BytesIO(data))
+    writer.add_metadata({"/Title": title})
+    with open(pdf_file, "wb") as f:
+        writer.write(f)
+    return sum(counts)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""Precompressed variants and a content-hash manifest for the output directory.
+
+Every text artifact under OUT_DIR (Markdown, HTML, FB2, JSON, CSS; not
+the already compressed EPUB/PDF/DOCX) gets variants at maximum
+compression next to it: .gz (zlib level 9), .br (quality 11, when the
+brotli module is installed) and .zst (level 22, when zstandard is
+installed). nginx's gzip_static/brotli_static or Caddy's precompressed
+file server can then send them without compressing on every request.
+
+manifest.json lists every file with its size, sha256 and a strong ETag,
+and each variant with the same plus the source hash it was made from.
+The next run trusts a file's recorded hash while its mtime and size are
+unchanged, and recompresses a variant only when its source hash changed
+(or the variant is missing), so an unchanged tree costs a stat per file.
+Variants whose source is gone, or that this machine cannot refresh, are
+removed. A .gz/.br/.zst file counts as a variant only when its source is
+there or the old manifest lists it as one; anything else (assets.tar.gz)
+is an artifact like any other and never deleted. deploy_to_sites() takes the hashes from here instead of reading
+the files again. Files are compressed in parallel by a thread pool
+(zlib, brotli and zstd release the GIL).
+
+Usage:
+    python3 scripts/precompress.py [DIR] [--jobs N]
+"""
+
+import gzip, hashlib, json, os, sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MANIFEST = "manifest.json"
+TEXT_SUFFIXES = {".md", ".html", ".xhtml", ".fb2", ".json", ".css", ".txt", ".svg", ".xml"}
+VARIANTS = (".gz",) + ((".br",) if brotli else ()) + ((".zst",) if zstandard else ())
+ALL_VARIANTS = (".gz", ".br", ".zst")  # variant suffixes, installed or not
+
+
+def compress(data: bytes, suffix: str) -> bytes:
+    if suffix == ".gz":
+        return gzip.compress(data, 9, mtime=0)
+    if suffix == ".br":
+        return brotli.compress(data, quality=11, lgwin=24)
+    return zstandard.ZstdCompressor(level=22).compress(data)
+
+
+def etag(digest: str) -> str:
+    return f'"{digest[:32]}"'
+
+
+def load_manifest(out_dir: Path) -> dict:
+    try:
+        return json.loads((Path(out_dir) / MANIFEST).read_text(encoding="utf-8"))["files"]
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def known_hashes(out_dir: Path) -> dict:
+    """{absolute path: sha256} of manifest entries whose file is unchanged since."""
+    out_dir = Path(out_dir)
+    known = {}
+    for name, entry in load_manifest(out_dir).items():
+        for rel, e in [(name, entry)] + [(name + s, v) for s, v in entry.get("variants", {}).items()]:
+            try:
+                st = (out_dir / rel).stat()
+            except OSError:
+                continue
+            if [st.st_mtime_ns, st.st_size] == e.get("stat"):
+                known[str(out_dir / rel)] = e["sha256"]
+    return known
+
+
+def _scan(out_dir: Path, old: dict) -> tuple:
+    """(source files, variant files) under out_dir, sorted.
+
+    A file with a variant suffix is a variant if its source exists or the
+    old manifest lists it as a variant of that source.
+    """
+    paths = []
+    for root, dirs, names in os.walk(out_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        for name in names:
+            if name.startswith(".") or name == MANIFEST or name.endswith(".tmp"):
+                continue
+            paths.append(Path(root) / name)
+    present = set(paths)
+    files, found = [], []
+    for path in paths:
+        source = path.with_suffix("")
+        variant = path.suffix in ALL_VARIANTS and (
+            source in present or path.suffix in old.get(source.relative_to(out_dir).as_posix(), {}).get("variants", {}))
+        (found if variant else files).append(path)
+    return sorted(files), sorted(found)
+
+
+def _write(path: Path, data: bytes):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _record(path: Path, digest: str, **extra) -> dict:
+    st = path.stat()
+    return {"size": st.st_size, "sha256": digest, "etag": etag(digest),
+            "stat": [st.st_mtime_ns, st.st_size], **extra}
+
+
+def _variant_job(path: Path, missing: list) -> dict:
+    """Compress one file into its missing variants → {suffix: sha256 of the variant}."""
+    data = path.read_bytes()
+    out = {}
+    for suffix in missing:
+        blob = compress(data, suffix)
+        _write(path.with_name(path.name + suffix), blob)
+        out[suffix] = hashlib.sha256(blob).hexdigest()
+    return out
+
+
+def precompress(out_dir: Path, jobs: int = None) -> tuple:
+    """Bring variants and manifest.json of `out_dir` up to date → (files, variants written)."""
+    out_dir = Path(out_dir)
+    old = load_manifest(out_dir)
+    files, todo = {}, {}
+    sources, found = _scan(out_dir, old)
+    for path in sources:
+        name = path.relative_to(out_dir).as_posix()
+        st = path.stat()
+        entry = old.get(name, {})
+        if entry.get("stat") == [st.st_mtime_ns, st.st_size]:
+            digest = entry["sha256"]
+        else:
+            with open(path, "rb") as f:
+                digest = hashlib.file_digest(f, "sha256").hexdigest()
+        record = _record(path, digest, variants={})
+        files[name] = record
+        if path.suffix.lower() not in TEXT_SUFFIXES:
+            continue
+        for suffix in VARIANTS:
+            vpath = path.with_name(path.name + suffix)
+            prev = entry.get("variants", {}).get(suffix)
+            if prev and prev.get("source") == digest and vpath.exists() \
+                    and prev.get("stat") == [vpath.stat().st_mtime_ns, vpath.stat().st_size]:
+                record["variants"][suffix] = prev
+            else:
+                todo.setdefault(path, []).append(suffix)
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        done = {path: pool.submit(_variant_job, path, missing) for path, missing in todo.items()}
+        for path, future in done.items():
+            record = files[path.relative_to(out_dir).as_posix()]
+            for suffix, digest in future.result().items():
+                record["variants"][suffix] = _record(path.with_name(path.name + suffix), digest,
+                                                     source=record["sha256"])
+    for name, record in files.items():
+        record["variants"] = dict(sorted(record["variants"].items()))
+    # Variants of deleted sources, or of a compressor not installed here, would be stale
+    for path in found:
+        source = path.with_suffix("").relative_to(out_dir).as_posix()
+        if path.suffix not in files.get(source, {}).get("variants", {}):
+            path.unlink()
+
+    blob = json.dumps({"version": 1, "files": files}, ensure_ascii=False, indent=1, sort_keys=True).encode()
+    manifest = out_dir / MANIFEST
+    if not manifest.exists() or manifest.read_bytes() != blob:
+        _write(manifest, blob)
+    return len(files), sum(len(m) for m in todo.values())
+
+
+def main(argv: list):
+    args, jobs, i = [], None, 0
+    while i < len(argv):
+        if argv[i] == "--jobs" and i + 1 < len(argv):
+            jobs = max(1, int(argv[i + 1])); i += 1
+        else:
+            args.append(argv[i])
+        i += 1
+    if not args:
+        from compile_v2 import OUT_DIR
+        args = [OUT_DIR]
+    out_dir = Path(args[0])
+    if not out_dir.is_dir():
+        sys.exit(f"⚠️  Not a directory: {out_dir}")
+    files, written = precompress(out_dir, jobs)
+    print(f"{'✅' if written else '⏭ '} {out_dir}/{MANIFEST}: {files} files, {written} variant(s) written "
+          f"({', '.join(VARIANTS)})")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Per-stage build profiler for `compile_v2.py --profile`.
+
+Stages nest and interleave (the Markdown pipeline is a chain of
+generators), so time is charged exclusively: whenever a stage is entered
+or left, the wall time, CPU time (own + finished subprocesses like pandoc
+and rsync) and peak-RSS growth since the last switch go to the stage that
+was running. A stage's numbers therefore never include its children's.
+
+When profiling is off, stage() and track() cost one global lookup.
+
+Compare two reports:
+    python3 scripts/profiler.py old.json new.json
+"""
+
+import contextlib, cProfile, json, re, resource, sys, time
+from pathlib import Path
+
+_active = None
+
+
+class Profiler:
+    def __init__(self, cprofile_dir: Path = None):
+        self.stats = {}  # name -> {"wall", "cpu", "rss_growth", "peak_rss", "calls"}
+        self.stack = []
+        self.cprofile_dir = Path(cprofile_dir) if cprofile_dir else None
+        self.cprofiles = {}
+        self.started = time.time()
+        self.last = self._sample()
+
+    @staticmethod
+    def _sample() -> tuple:
+        me = resource.getrusage(resource.RUSAGE_SELF)
+        kids = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu = me.ru_utime + me.ru_stime + kids.ru_utime + kids.ru_stime
+        # ru_maxrss is in KiB on Linux
+        return time.perf_counter(), cpu, max(me.ru_maxrss, kids.ru_maxrss) * 1024
+
+    def _switch(self, to: str = None):
+        """Charge everything since the last switch to the running stage."""
+        now = self._sample()
+        if self.stack:
+            name = self.stack[-1]
+            s = self.stats[name]
+            s["wall"] += now[0] - self.last[0]
+            s["cpu"] += now[1] - self.last[1]
+            s["rss_growth"] += now[2] - self.last[2]
+            s["peak_rss"] = max(s["peak_rss"], now[2])
+            if name in self.cprofiles:
+                self.cprofiles[name].disable()
+        if to and self.cprofile_dir:
+            self.cprofiles.setdefault(to, cProfile.Profile()).enable()
+        self.last = self._sample()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        self.stats.setdefault(name, {"wall": 0.0, "cpu": 0.0, "rss_growth": 0,
+                                     "peak_rss": 0, "calls": 0})
+        self.stats[name]["calls"] += 1
+        self._switch(name)
+        self.stack.append(name)
+        try:
+            yield
+        finally:
+            self._switch(self.stack[-2] if len(self.stack) > 1 else None)
+            self.stack.pop()
+
+    def report(self) -> dict:
+        return {"started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "argv": sys.argv[1:], "stages": self.stats}
+
+    def dump(self, json_file: Path):
+        json_file.write_text(json.dumps(self.report(), indent=2, ensure_ascii=False))
+        print(f"📊 {json_file}")
+        if self.cprofile_dir:
+            self.cprofile_dir.mkdir(parents=True, exist_ok=True)
+            for name, prof in self.cprofiles.items():
+                prof.dump_stats(self.cprofile_dir / (re.sub(r"[^\w.-]+", "_", name) + ".prof"))
+            print(f"📊 {self.cprofile_dir}/*.prof ({len(self.cprofiles)} stages)")
+
+
+def start(cprofile_dir: Path = None) -> Profiler:
+    global _active
+    _active = Profiler(cprofile_dir)
+    return _active
+
+
+def stop() -> Profiler:
+    global _active
+    prof, _active = _active, None
+    return prof
+
+
+def stage(name: str):
+    """`with stage("pdf"):` — a no-op unless profiling."""
+    return _active.stage(name) if _active else contextlib.nullcontext()
+
+
+def track(name: str, iterable):
+    """Charge the work done inside each next() of a generator to `name`."""
+    if not _active:
+        yield from iterable
+        return
+    it = iter(iterable)
+    while True:
+        with _active.stage(name):
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+        yield item
+
+
+def _mb(n: int) -> str:
+    return f"{n / 2**20:.1f}"
+
+
+def print_table(stages: dict, base: dict = None):
+    """Timing table; with `base`, wall-time change against an older report."""
+    head = f"   {'stage':<34}{'calls':>6}{'wall s':>9}{'cpu s':>9}{'peak MB':>9}{'+MB':>7}"
+    print("\n⏱  Build profile" + (" (vs base)" if base else ""))
+    print(head + (f"{'Δ wall':>10}" if base else ""))
+    rows = list(stages.items())
+    chapters = [r for r in rows if r[0].startswith("extract ")]
+    if len(chapters) > 12:  # show the slowest chapters, fold the rest
+        keep = {n for n, _ in sorted(chapters, key=lambda r: -r[1]["wall"])[:10]}
+        names = [n for n, _ in chapters if n not in keep]
+        folded = [stages[n] for n in names]
+        rows = [r for r in rows if not r[0].startswith("extract ") or r[0] in keep]
+        label = f"extract (other {len(folded)})"
+        if base:
+            base = dict(base, **{label: {"wall": sum(base[n]["wall"] for n in names if n in base)}})
+        rows.append((label, {
+            "calls": sum(s["calls"] for s in folded), "wall": sum(s["wall"] for s in folded),
+            "cpu": sum(s["cpu"] for s in folded), "rss_growth": sum(s["rss_growth"] for s in folded),
+            "peak_rss": max(s["peak_rss"] for s in folded)}))
+    for name, s in rows:
+        line = (f"   {name[:34]:<34}{s['calls']:>6}{s['wall']:>9.3f}{s['cpu']:>9.3f}"
+                f"{_mb(s['peak_rss']):>9}{_mb(s['rss_growth']):>7}")
+        if base:
+            old = base.get(name)
+            if old is None:
+                line += f"{'new':>10}"
+            else:
+                pct = (s["wall"] - old["wall"]) / old["wall"] * 100 if old["wall"] else 0.0
+                flag = " ⚠️" if pct > 20 and s["wall"] - old["wall"] > 0.05 else ""
+                line += f"{pct:>+9.0f}%{flag}"
+        print(line)
+    total = sum(s["wall"] for s in stages.values())
+    cpu = sum(s["cpu"] for s in stages.values())
+    peak = max((s["peak_rss"] for s in stages.values()), default=0)
+    print(f"   {'total':<34}{'':>6}{total:>9.3f}{cpu:>9.3f}{_mb(peak):>9}")
+    if base:
+        for name in base.keys() - stages.keys() - {r[0] for r in rows}:
+            print(f"   {name[:34]:<34}  (gone)")
+
+
+def main(argv: list):
+    if len(argv) != 2:
+        sys.exit("Usage: python3 scripts/profiler.py old.json new.json")
+    old, new = (json.loads(Path(p).read_text()) for p in argv)
+    print(f"   base: {old['started']}  {' '.join(old['argv'])}")
+    print(f"   new:  {new['started']}  {' '.join(new['argv'])}")
+    print_table(new["stages"], old["stages"])
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -10,15 +10,12 @@ cd "$REPO_DIR"
 ./compile_v2.py
 
 echo "=== 2. Upload to websites ==="
-# RU → liza.st
-rsync -avz "$OUTPUT_DIR/autonom-ru.md" liza:/var/www/liza.st/novel/
-rsync -avz "$OUTPUT_DIR/autonom-ru.pdf" liza:/var/www/liza.st/novel/
-rsync -avz "$OUTPUT_DIR/autonom-ru.epub" liza:/var/www/liza.st/novel/
-
-# EN → emerge.st
-rsync -avz "$OUTPUT_DIR/autonom-en.md" liza:/var/www/emerge.st/novel/
-rsync -avz "$OUTPUT_DIR/autonom-en.pdf" liza:/var/www/emerge.st/novel/
-rsync -avz "$OUTPUT_DIR/autonom-en.epub" liza:/var/www/emerge.st/novel/
+# RU → liza.st, EN → emerge.st: changed files only, one connection
+python3 scripts/deploy.py \
+  --to liza:/var/www/liza.st/novel/ \
+    "$OUTPUT_DIR/autonom-ru.md" "$OUTPUT_DIR/autonom-ru.pdf" "$OUTPUT_DIR/autonom-ru.epub" \
+  --to liza:/var/www/emerge.st/novel/ \
+    "$OUTPUT_DIR/autonom-en.md" "$OUTPUT_DIR/autonom-en.pdf" "$OUTPUT_DIR/autonom-en.epub"
 
 echo "=== 3. Git push ==="
 cd "$REPO_DIR"
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""Full-text search index over every language's chapters.
+
+Each chapter is cut into paragraphs (as in alignment.py) and every word
+is normalized — lowercase, ё → е, Latin diacritics dropped (é → e,
+ä → a; Cyrillic й stays й) — and lightly stemmed: the longest of a short
+list of Russian inflection endings, or an English plural, is cut off as
+long as a stem of three letters remains: "протоколом" finds
+"Протоколы", "AUTONOM's" finds "AUTONOM".
+
+The index lives in SQLite next to the build cache: term → per chapter
+the paragraphs it occurs in (delta-coded varints). A chapter is
+re-indexed only when its source file changed (mtime and size, then the
+text's hash). Terms land in SHARDS buckets by FNV-1a hash; export()
+writes one JSON file per bucket (s00.json … s3f.json, term → [[chapter
+id, line, ...]]) plus index.json (chapters by id, the normalization
+tables) for client-side search on the site, rewriting only buckets
+whose terms changed.
+
+update indexes what compile_v2 builds from: each language's chapters.json
+entries in its source dir (or --overrides DIR, as for compile_v2), so a
+manual update and a build never undo each other's documents.
+
+Usage:
+    python3 scripts/search_index.py [update] [--lang L] [--overrides DIR]
+    python3 scripts/search_index.py query WORDS [--lang L] [--limit N]
+    python3 scripts/search_index.py export DIR [--full]
+
+In a query, "quoted words" must appear in this order; other words only
+in the same paragraph.
+"""
+
+import hashlib, json, os, re, sqlite3, sys, unicodedata
+from pathlib import Path
+
+from alignment import paragraphs
+from build_cache import CACHE_DIR
+
+INDEX_FILE = CACHE_DIR / "search.sqlite"
+REPO = Path(__file__).parent.parent
+LANGS = ("ru", "en", "de", "es", "fi", "no", "lv")
+SHARDS = 64
+MIN_STEM = 3
+# Longest ending first; cut only when MIN_STEM letters remain
+CYR_ENDINGS = sorted("""
+    ыми ими ого его ому ему ая яя ое ее ые ие ый ий ой ую юю ым им ом ем ых их
+    ами ями ах ях ов ев ей ам ям ию ия ья ье ью ьи а я о е ы и у ю ь
+    ться тся ешь ете ет ем ют ут ат ят ит ишь ила ило или ил ть ся сь
+""".split(), key=len, reverse=True)
+LAT_ENDINGS = ["ies", "'s", "es", "s"]
+WORD = re.compile(r"[^\W_]+")
+CYR = re.compile("[а-я]")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (id INTEGER PRIMARY KEY, lang TEXT, name TEXT, title TEXT, path TEXT,
+                                 stat TEXT, hash TEXT, lines TEXT, UNIQUE (lang, name));
+CREATE TABLE IF NOT EXISTS postings (term TEXT, doc INTEGER, shard INTEGER, paras BLOB,
+                                     PRIMARY KEY (term, doc)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc);
+CREATE INDEX IF NOT EXISTS postings_shard ON postings (shard);
+CREATE TABLE IF NOT EXISTS dirty (shard INTEGER PRIMARY KEY);
+"""
+
+_fold = {}
+
+
+def _fold_char(ch: str) -> str:
+    base = unicodedata.normalize("NFD", ch)[0]
+    return base if base.isascii() else ch
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFC", text).lower().replace("ё", "е").replace("’", "'")
+    if not text.isascii():
+        for ch in set(text) - _fold.keys():
+            _fold[ch] = _fold_char(ch)
+        text = "".join(map(_fold.__getitem__, text))
+    return text
+
+
+def stem(word: str) -> str:
+    endings = CYR_ENDINGS if CYR.search(word) else LAT_ENDINGS
+    for ending in endings:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            word = word[:-len(ending)]
+            return word + "y" if ending == "ies" else word
+    return word
+
+
+def terms(text: str) -> list:
+    """Stemmed terms of `text` in order."""
+    return [stem(w) for w in WORD.findall(normalize(text).replace("'s", ""))]
+
+
+def shard_of(term: str) -> int:
+    """FNV-1a (32 bit) of the UTF-8 term, mod SHARDS — easy to repeat in JS."""
+    h = 0x811C9DC5
+    for b in term.encode("utf-8"):
+        h = ((h ^ b) * 0x01000193) & 0xFFFFFFFF
+    return h % SHARDS
+
+
+def _varints(numbers: list) -> bytes:
+    out, prev = bytearray(), 0
+    for n in numbers:
+        d, prev = n - prev, n
+        while d >= 0x80:
+            out.append(d & 0x7F | 0x80)
+            d >>= 7
+        out.append(d)
+    return bytes(out)
+
+
+def _unvarints(data: bytes) -> list:
+    out, cur, shift, prev = [], 0, 0, 0
+    for b in data:
+        cur |= (b & 0x7F) << shift
+        shift += 7
+        if not b & 0x80:
+            prev += cur
+            out.append(prev)
+            cur, shift = 0, 0
+    return out
+
+
+def read_source(path: Path) -> str:
+    if path.suffix == ".html":
+        from html2md import html_to_markdown
+        return html_to_markdown(path.read_text(encoding="utf-8"))
+    return path.read_text(encoding="utf-8")
+
+
+class SearchIndex:
+    def __init__(self, path: Path = INDEX_FILE):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path), timeout=60)
+        self.db.executescript(SCHEMA)
+
+    def update_file(self, lang: str, name: str, path: Path, title: str = None) -> bool:
+        """(Re-)index one chapter if its source changed → True if it did."""
+        path = Path(path).resolve()
+        st = path.stat()
+        stat = f"{path}:{st.st_mtime_ns}:{st.st_size}"  # the repo's or the build's copy
+        row = self.db.execute("SELECT id, stat, hash, title FROM docs WHERE lang=? AND name=?",
+                              (lang, name)).fetchone()
+        if row and row[1] == stat and title in (None, row[3]):
+            return False
+        text = read_source(path)
+        digest = hashlib.sha1(text.encode()).hexdigest()
+        if row and row[2] == digest:
+            self.db.execute("UPDATE docs SET stat=?, path=?, title=? WHERE id=?",
+                            (stat, str(path), title or row[3], row[0]))
+            return False
+        paras = paragraphs(text)
+        if title is None:
+            title = next((p[3].lstrip("#").strip() for p in paras if p[0].startswith("h")), name)
+        found = {}
+        for i, para in enumerate(paras):
+            for term in terms(para[3]):
+                hits = found.setdefault(term, [])
+                if not hits or hits[-1] != i:
+                    hits.append(i)
+        lines = [p[1] for p in paras]
+        rows = {t: (shard_of(t), _varints(p), [lines[i] for i in p]) for t, p in found.items()}
+        if row:
+            doc = row[0]
+            # A shard is dirty only where a term's exported lines changed
+            old_lines = json.loads(self.db.execute("SELECT lines FROM docs WHERE id=?", (doc,)).fetchone()[0])
+            old = {term: (shard, [old_lines[i] for i in _unvarints(paras)]) for term, shard, paras in
+                   self.db.execute("SELECT term, shard, paras FROM postings WHERE doc=?", (doc,))}
+            dirty = {shard for term, (shard, at) in old.items() if term not in rows or rows[term][2] != at}
+            dirty |= {r[0] for t, r in rows.items() if t not in old}
+            self.db.execute("DELETE FROM postings WHERE doc=?", (doc,))
+            self.db.execute("UPDATE docs SET title=?, path=?, stat=?, hash=?, lines=? WHERE id=?",
+                            (title, str(path), stat, digest, json.dumps(lines), doc))
+        else:
+            doc = self.db.execute("INSERT INTO docs (lang, name, title, path, stat, hash, lines) "
+                                  "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                  (lang, name, title, str(path), stat, digest, json.dumps(lines))).lastrowid
+            dirty = {r[0] for r in rows.values()}
+        self.db.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)",
+                            [(t, doc, shard, blob) for t, (shard, blob, _) in rows.items()])
+        self.db.executemany("INSERT OR IGNORE INTO dirty VALUES (?)", [(d,) for d in dirty])
+        return True
+
+    def _drop_postings(self, doc: int):
+        self.db.execute("INSERT OR IGNORE INTO dirty SELECT DISTINCT shard FROM postings WHERE doc=?", (doc,))
+        self.db.execute("DELETE FROM postings WHERE doc=?", (doc,))
+
+    def update_lang(self, lang: str, sources: list) -> int:
+        """Index [(name, path, title)] of one language, dropping chapters not listed → files re-indexed."""
+        changed = sum(self.update_file(lang, name, path, title) for name, path, title in sources)
+        keep = {name for name, _, _ in sources}
+        for doc, name in self.db.execute("SELECT id, name FROM docs WHERE lang=?", (lang,)).fetchall():
+            if name not in keep:
+                self._drop_postings(doc)
+                self.db.execute("DELETE FROM docs WHERE id=?", (doc,))
+                changed += 1
+        return changed
+
+    def query(self, text: str, lang: str = None, limit: int = 50, texts: dict = None) -> list:
+        """[(lang, name, line, paragraph index)] where every word occurs, phrases in order.
+
+        `texts` is handed to paragraph(); pass the dict used for the hits' snippets.
+        """
+        phrases = re.findall(r'"([^"]+)"', text)
+        words = list(dict.fromkeys(terms(text)))
+        if not words:
+            return []
+        per_doc = None
+        for term in words:
+            rows = self.db.execute("SELECT doc, paras FROM postings WHERE term=?", (term,))
+            found = {doc: set(_unvarints(paras)) for doc, paras in rows}
+            per_doc = found if per_doc is None else \
+                {d: per_doc[d] & found[d] for d in per_doc.keys() & found.keys() if per_doc[d] & found[d]}
+        hits = []
+        sql = "SELECT id, lang, name, lines FROM docs" + (" WHERE lang=?" if lang else "") + " ORDER BY lang, name"
+        for doc, doc_lang, name, lines in self.db.execute(sql, (lang,) if lang else ()):
+            lines = json.loads(lines)
+            for i in sorted(per_doc.get(doc, ())):
+                hits.append((doc_lang, name, lines[i], i))
+        if phrases:
+            phrases, texts = [terms(p) for p in phrases], {} if texts is None else texts  # each chapter read once
+            hits = [h for h in hits if self._has_phrases(self.paragraph(h[0], h[1], h[3], texts), phrases)]
+        return hits[:limit]
+
+    @staticmethod
+    def _has_phrases(para: str, phrases: list) -> bool:
+        seq = terms(para or "")
+        return all(any(seq[k:k + len(p)] == p for k in range(len(seq) - len(p) + 1)) for p in phrases)
+
+    def paragraph(self, lang: str, name: str, i: int, texts: dict = None) -> str:
+        """Text of paragraph `i` as the chapter's indexed source has it now.
+
+        `texts` ({(lang, name): paragraphs}) keeps chapters already read.
+        """
+        texts = {} if texts is None else texts
+        if (lang, name) not in texts:
+            row = self.db.execute("SELECT path FROM docs WHERE lang=? AND name=?", (lang, name)).fetchone()
+            texts[lang, name] = paragraphs(read_source(Path(row[0]))) \
+                if row and Path(row[0]).exists() else []
+        paras = texts[lang, name]
+        return paras[i][3] if i < len(paras) else None
+
+    def export(self, out_dir: Path, full: bool = False) -> int:
+        """Write index.json and the changed JSON shards to `out_dir` → shards written."""
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        self.db.execute("BEGIN IMMEDIATE")  # one exporter at a time across build processes
+        try:
+            docs = self.db.execute("SELECT id, lang, name, title, lines FROM docs ORDER BY id").fetchall()
+            lines = {doc: json.loads(ls) for doc, _, _, _, ls in docs}
+            manifest = {"version": 1, "shards": SHARDS, "hash": "fnv1a32", "min_stem": MIN_STEM,
+                        "endings": {"cyrillic": CYR_ENDINGS, "latin": LAT_ENDINGS},
+                        "docs": {doc: [lang, name, title] for doc, lang, name, title, _ in docs}}
+            dirty = range(SHARDS) if full or not (out_dir / "index.json").exists() else \
+                [s for s, in self.db.execute("SELECT shard FROM dirty")]
+            written = 0
+            for shard in dirty:
+                bucket = {}
+                for term, doc, paras in self.db.execute(
+                        "SELECT term, doc, paras FROM postings WHERE shard=? ORDER BY term, doc", (shard,)):
+                    bucket.setdefault(term, []).append([doc] + [lines[doc][i] for i in _unvarints(paras)])
+                written += write_if_changed(out_dir / f"s{shard:02x}.json", bucket)
+            write_if_changed(out_dir / "index.json", manifest)
+            self.db.execute("DELETE FROM dirty")
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            raise
+        return written
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+def write_if_changed(path: Path, data) -> bool:
+    blob = json.dumps(data, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    try:
+        if path.read_bytes() == blob:
+            return False
+    except OSError:
+        pass
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(blob)
+    os.replace(tmp, path)
+    return True
+
+
+def repo_sources(lang: str, root: Path = REPO) -> list:
+    """[(name, path, None)] of the repo's lang/*.md (the benchmark's corpus)."""
+    return [(f.name, f, None) for f in sorted((root / lang).glob("*.md"))]
+
+
+def snippet(para: str, words: list, width: int = 100) -> str:
+    flat = " ".join(para.split())
+    norm = normalize(flat)
+    at = min((norm.find(w) for w in words if w in norm), default=0)
+    start = max(0, at - width // 3)
+    return ("…" if start else "") + flat[start:start + width] + ("…" if start + width < len(flat) else "")
+
+
+def main(argv: list):
+    args, lang, limit, overrides, i = [], None, 50, None, 0
+    while i < len(argv):
+        if argv[i] == "--lang" and i + 1 < len(argv):
+            lang = argv[i + 1]; i += 1
+        elif argv[i] == "--overrides" and i + 1 < len(argv):
+            overrides = Path(argv[i + 1]); i += 1
+        elif argv[i] == "--limit" and i + 1 < len(argv):
+            limit = int(argv[i + 1]); i += 1
+        elif not argv[i].startswith("--"):
+            args.append(argv[i])
+        i += 1
+    command = args[0] if args and args[0] in ("update", "query", "export") else "update"
+    rest = args[1:] if args and args[0] == command else args
+    index = SearchIndex()
+    if command == "update":
+        import compile_v2  # imports this module; only the CLI needs it
+        for l in [lang] if lang else LANGS:
+            cfg = compile_v2.load_chapters(l).get(l)
+            src_dir = compile_v2.source_dir(l, overrides)
+            if not cfg or not src_dir.is_dir():
+                print(f"⏭  {l}: no {'chapters config' if not cfg else src_dir}")
+                continue
+            changed = index.update_lang(l, compile_v2.search_sources(cfg, src_dir))
+            print(f"{'✏️ ' if changed else '⏭ '} {l}: {changed} chapter(s) re-indexed")
+        index.commit()
+    elif command == "query":
+        text = " ".join(rest)
+        texts = {}  # chapters read for the phrase check are reused for the snippets
+        hits = index.query(text, lang, limit, texts)
+        words = [normalize(w) for w in WORD.findall(text)]
+        for hit_lang, name, line, i in hits:
+            para = index.paragraph(hit_lang, name, i, texts) or ""
+            print(f"{hit_lang}/{name}:{line}  {snippet(para, words)}")
+        print(f"📊 {len(hits)} paragraph(s)" + (f" (first {limit})" if len(hits) == limit else ""))
+    else:
+        if not rest:
+            sys.exit("Usage: search_index.py export DIR")
+        written = index.export(Path(rest[0]), full="--full" in argv)
+        print(f"✅ {written} shard(s) written to {rest[0]}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -2,86 +2,189 @@
 """
 Split autonom-ru-edit.md back into individual chapter files.
 Reads markers and writes content to overrides/ directory.
+
+The edit file is tokenized in one pass over its bytes. make_edit.py
+leaves a sidecar index (.autonom-ru-edit.json) with every section's
+byte offsets and hash as generated; only sections whose hash differs
+are written back, so untouched override files are never read. intro,
+epilogue and glossary changes are spliced into chapters.json in place.
+A section whose own file also changed since that hash is a conflict and
+is left alone on both sides. Without an index, every section is compared
+with its file as before. edit_session.py keeps both sides in sync live.
 """
 
-import re
+import hashlib
 import json
+import os
+import re
 from pathlib import Path
 
 BOOK_DIR = Path(__file__).parent.parent
 EDIT_FILE = BOOK_DIR / "autonom-ru-edit.md"
 OVERRIDES_DIR = BOOK_DIR / "overrides"
 CHAPTERS_JSON = BOOK_DIR / "chapters.json"
+SPECIAL = ("intro", "epilogue", "glossary")
+INDEX_VERSION = 2
+
+# Every marker in one alternation: <!-- chapter: x.md -->, <!-- intro -->, <!-- /chapter -->...
+MARKER = re.compile(rb"<!-- (?:(chapter|appendix): (\S+\.md)|(intro|epilogue|glossary)|/(chapter|appendix|intro"
+                    rb"|epilogue|glossary)) -->")
+
+
+def tokenize(data: bytes) -> dict:
+    """{section key: (start, end)} byte offsets of the stripped section bodies.
+
+    Keys are file names for chapters/appendices and "_intro",
+    "_epilogue", "_glossary" for the parts kept in chapters.json.
+    """
+    sections, open_kind, open_key, body = {}, None, None, 0
+    for m in MARKER.finditer(data):
+        kind, name, special, close = m.groups()
+        if close:
+            if close == open_kind:
+                start, end = body, m.start()
+                while start < end and data[start] in b" \t\r\n":
+                    start += 1
+                while end > start and data[end - 1] in b" \t\r\n":
+                    end -= 1
+                # The first intro/epilogue/glossary wins; a repeated chapter, the last
+                if not (open_key.startswith("_") and open_key in sections):
+                    sections[open_key] = (start, end)
+                open_kind = None
+            continue
+        if open_kind:
+            continue  # markers are not nested; the first opener holds until its closer
+        open_kind = kind or special
+        open_key = name.decode() if name else f"_{special.decode()}"
+        body = m.end()
+    return sections
+
+
+def section_hash(body: bytes) -> str:
+    return hashlib.sha1(body).hexdigest()
+
+
+def headers(ru: dict) -> dict:
+    """{section key: the heading make_edit.py writes above a chapter's text}.
+
+    The override file holds only the text; compile_v2.py adds the heading.
+    """
+    heads = {}
+    for ch in ru["chapters"]:
+        number, title = ch.get("number", ""), ch.get("title", "")
+        head = f"## {number}: {title}" if number else f"## {title}"
+        heads[f"{ch['file']}.md"] = head + (f"\n*{ch['subtitle']}*" if ch.get("subtitle") else "")
+    for app in ru["appendix"]:
+        heads[f"{app['file']}.md"] = f"### {app.get('title', '')}"
+    return heads
+
+
+def strip_header(text: str, head: str) -> str:
+    """A section's text without the heading make_edit.py put above it."""
+    if head and (text == head or text.startswith(head + "\n")):
+        return text[len(head):].strip()
+    return text
+
+
+def with_header(body: str, head: str) -> str:
+    """The inverse of strip_header(): the section as make_edit.py writes it."""
+    return f"{head}\n\n{body}" if head else body
 
 
 def extract_sections(content: str) -> dict:
     """Extract content between markers."""
+    data = content.encode("utf-8")
+    return {key: data[s:e].decode("utf-8") for key, (s, e) in tokenize(data).items()}
+
+
+def index_file(edit_file: Path) -> Path:
+    """Sidecar index of an edit file: autonom-ru-edit.md → .autonom-ru-edit.json."""
+    return edit_file.with_name(f".{edit_file.stem}.json")
+
+
+def write_index(edit_file: Path = EDIT_FILE, keep: dict = None):
+    """Record offsets and hashes of the edit file as it is now.
+
+    Each section records "hash" (its text here) and "own" (its own file's
+    text) as of the last sync; both are the current text unless `keep`
+    carries {key: {"hash"/"own": ...}} over for sections whose two sides
+    do not agree yet.
+    """
+    data = edit_file.read_bytes()
+    st = edit_file.stat()
     sections = {}
-    
-    # Pattern for chapters: <!-- chapter: filename.md --> ... <!-- /chapter -->
-    chapter_pattern = r'<!-- chapter: (\S+\.md) -->\s*(.*?)\s*<!-- /chapter -->'
-    for match in re.finditer(chapter_pattern, content, re.DOTALL):
-        filename = match.group(1)
-        chapter_content = match.group(2).strip()
-        sections[filename] = chapter_content
-    
-    # Pattern for appendix: <!-- appendix: filename.md --> ... <!-- /appendix -->
-    appendix_pattern = r'<!-- appendix: (\S+\.md) -->\s*(.*?)\s*<!-- /appendix -->'
-    for match in re.finditer(appendix_pattern, content, re.DOTALL):
-        filename = match.group(1)
-        appendix_content = match.group(2).strip()
-        sections[filename] = appendix_content
-    
-    # Pattern for intro: <!-- intro --> ... <!-- /intro -->
-    intro_match = re.search(r'<!-- intro -->\s*(.*?)\s*<!-- /intro -->', content, re.DOTALL)
-    if intro_match:
-        sections['_intro'] = intro_match.group(1).strip()
-    
-    # Pattern for epilogue: <!-- epilogue --> ... <!-- /epilogue -->
-    epilogue_match = re.search(r'<!-- epilogue -->\s*(.*?)\s*<!-- /epilogue -->', content, re.DOTALL)
-    if epilogue_match:
-        sections['_epilogue'] = epilogue_match.group(1).strip()
-    
-    # Pattern for glossary: <!-- glossary --> ... <!-- /glossary -->
-    glossary_match = re.search(r'<!-- glossary -->\s*(.*?)\s*<!-- /glossary -->', content, re.DOTALL)
-    if glossary_match:
-        sections['_glossary'] = glossary_match.group(1).strip()
-    
-    return sections
+    for key, (s, e) in tokenize(data).items():
+        h = section_hash(data[s:e])
+        sections[key] = {"start": s, "end": e, "hash": h, "own": h, **(keep or {}).get(key, {})}
+    index = {"version": INDEX_VERSION, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sections": sections}
+    path = index_file(edit_file)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(index, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def load_index(edit_file: Path = EDIT_FILE) -> dict:
+    try:
+        index = json.loads(index_file(edit_file).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return index if index.get("version") == INDEX_VERSION else None
+
+
+def splice_json(text: str, data: dict, changes: dict) -> str:
+    """chapters.json text with data["ru"][key] = value for each change.
+
+    Only the changed string literals are replaced, so the rest of the
+    file stays byte-identical; falls back to a full dump when a key
+    cannot be located unambiguously.
+    """
+    out = text
+    for key, value in changes.items():
+        data["ru"][key] = value
+        hits = [m for m in re.finditer(r'"%s"\s*:\s*"' % re.escape(key), out)]
+        if len(hits) != 1:
+            out = None
+            break
+        start = hits[0].end() - 1
+        _, end = json.decoder.scanstring(out, start + 1)
+        out = out[:start] + json.dumps(value, ensure_ascii=False) + out[end:]
+    if out is None or json.loads(out) != data:
+        return json.dumps(data, ensure_ascii=False, indent=2)
+    return out
+
+
+def own_base(known: dict, key: str) -> str:
+    """Hash of a section's own file at the last sync, or None if unknown."""
+    entry = known.get(key, {})
+    return entry.get("own", entry.get("hash"))
+
 
+def update_chapters_json(sections: dict, known: dict = None) -> dict:
+    """Update intro/epilogue/glossary in chapters.json → {key: hashes to keep} of conflicts.
 
-def update_chapters_json(sections: dict):
-    """Update intro/epilogue/glossary in chapters.json."""
-    with open(CHAPTERS_JSON, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    
+    A value that changed in chapters.json since the sync recorded in
+    `known` is not overwritten.
+    """
+    known = known or {}
+    text = CHAPTERS_JSON.read_text(encoding="utf-8")
+    data = json.loads(text)
     ru = data["ru"]
-    updated = False
-    
-    if '_intro' in sections:
-        new_intro = "\n" + sections['_intro'] + "\n"
-        if ru.get('intro') != new_intro:
-            ru['intro'] = new_intro
-            updated = True
-            print("  Updated: intro")
-    
-    if '_epilogue' in sections:
-        new_epilogue = "\n" + sections['_epilogue'] + "\n"
-        if ru.get('epilogue') != new_epilogue:
-            ru['epilogue'] = new_epilogue
-            updated = True
-            print("  Updated: epilogue")
-    
-    if '_glossary' in sections:
-        new_glossary = "\n" + sections['_glossary'] + "\n"
-        if ru.get('glossary') != new_glossary:
-            ru['glossary'] = new_glossary
-            updated = True
-            print("  Updated: glossary")
-    
-    if updated:
-        with open(CHAPTERS_JSON, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    changes, conflicts = {}, {}
+    for name in SPECIAL:
+        if f"_{name}" in sections:
+            new_value = "\n" + sections[f"_{name}"] + "\n"
+            old_value = ru.get(name, "").strip()
+            if old_value == sections[f"_{name}"]:
+                continue
+            base = own_base(known, f"_{name}")
+            if base and section_hash(old_value.encode("utf-8")) != base:
+                conflicts[f"_{name}"] = {"hash": known[f"_{name}"]["hash"], "own": base}
+                continue
+            changes[name] = new_value
+            print(f"  Updated: {name}")
+    if changes:
+        CHAPTERS_JSON.write_text(splice_json(text, data, changes), encoding="utf-8")
+    return conflicts
 
 
 def main():
@@ -89,38 +192,60 @@ def main():
         print(f"✗ File not found: {EDIT_FILE}")
         print("  Run 'python scripts/make_edit.py' first")
         return
-    
-    content = EDIT_FILE.read_text(encoding="utf-8")
-    sections = extract_sections(content)
-    
-    print(f"Found {len(sections)} sections")
-    
-    # Write chapter files
-    chapters_written = 0
-    for filename, text in sections.items():
+
+    index = load_index(EDIT_FILE)
+    st = EDIT_FILE.stat()
+    if index and (index["size"], index["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+        print("✓ No chapter changes detected (edit file untouched)")
+        return
+
+    data = EDIT_FILE.read_bytes()
+    spans = tokenize(data)
+    print(f"Found {len(spans)} sections")
+    known = index["sections"] if index else {}
+    touched = {key: data[s:e].decode("utf-8") for key, (s, e) in spans.items()
+               if known.get(key, {}).get("hash") != section_hash(data[s:e])}
+    heads = headers(json.loads(CHAPTERS_JSON.read_text(encoding="utf-8"))["ru"])
+
+    # Write chapter files; untouched sections keep what the index knew of their files
+    keep = {key: {"own": own_base(known, key)} for key in spans if key in known and key not in touched}
+    chapters_written, conflicts = 0, {}
+    for filename, text in touched.items():
         if filename.startswith('_'):
             continue  # Skip special sections (handled separately)
-        
+
         path = OVERRIDES_DIR / filename
-        
-        # Check if content changed
+        text = strip_header(text, heads.get(filename))
+        keep[filename] = {"own": section_hash(text.encode("utf-8"))}
+
         if path.exists():
             old_content = path.read_text(encoding="utf-8").strip()
             if old_content == text:
                 continue  # No changes
-        
+            # The file was edited too since make_edit.py: keep both, report
+            base = own_base(known, filename)
+            if base and section_hash(old_content.encode("utf-8")) != base:
+                conflicts[filename] = {"hash": known[filename]["hash"], "own": base}
+                continue
+
         path.write_text(text + "\n", encoding="utf-8")
         print(f"  Updated: {filename}")
         chapters_written += 1
-    
+
     # Update chapters.json with intro/epilogue/glossary
-    update_chapters_json(sections)
-    
+    specials = {k: v for k, v in touched.items() if k.startswith("_")}
+    if specials:
+        conflicts.update(update_chapters_json(specials, known))
+    keep.update(conflicts)
+    write_index(EDIT_FILE, keep)
+    for key in conflicts:
+        print(f"⚠️  Conflict: {key.lstrip('_')} changed both here and in its own file, left as is")
+
     if chapters_written == 0:
         print("✓ No chapter changes detected")
     else:
         print(f"✓ Updated {chapters_written} chapter files")
-    
+
     print("\nNext steps:")
     print("  git diff overrides/  # see what changed")
     print("  git add -A && git commit -m 'edit: ...'")
@@ -1,10 +1,38 @@
 #!/usr/bin/env python3
-"""Sync translations from ru/ to other languages - incremental."""
+"""Sync translations from ru/ to other languages - incremental.
 
-import json
-import subprocess
+The previous and current ru/ chapters come straight from git: one
+`git ls-tree` per revision gives every file's blob hash, only files whose
+hash changed are diffed, and their contents are read through a single
+`git cat-file --batch` process. Lines removed from a Russian chapter are
+removed from every translation (language-neutral lines: code, terminal
+output, image links); added lines are reported as needing translation.
+The target languages are processed in parallel. Afterwards the paragraph
+alignment index (alignment.py) is brought up to date and the translated
+paragraphs aligned to edited Russian ones are reported as stale. Stale
+and untranslated paragraphs of the synced chapters are looked up in the
+translation memory (translation_memory.py): exact matches are applied,
+close ones suggested, the rest optionally sent to a local MT command.
+
+The last synced commit is remembered in the build cache, so a plain run
+syncs everything committed since the previous sync.
+
+Usage:
+    python3 scripts/sync-translations.py [--since REV] [--to REV | --worktree] [--dry-run] [--mt CMD]
+
+--since defaults to the last synced commit (on the first run HEAD~1, or
+HEAD with --worktree, which compares against the uncommitted files in
+ru/); --to defaults to HEAD.
+"""
+
+import difflib, os, subprocess, sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import difflib
+
+from alignment import AlignmentIndex, refresh
+from build_cache import BuildCache
+from translation_memory import TranslationMemory, command_mt, fill
 
 SCRIPT_DIR = Path(__file__).parent
 REPO = SCRIPT_DIR.parent
@@ -19,71 +47,204 @@ LANG_DIRS = {
     "no": REPO / "no",
 }
 
+
+def parse_args(argv: list) -> dict:
+    opts = {"since": None, "to": "HEAD", "worktree": False, "dry_run": False,
+            "mt": os.environ.get("AUTONOM_MT")}
+    i = 0
+    while i < len(argv):
+        if argv[i] == "--since" and i + 1 < len(argv):
+            opts["since"] = argv[i + 1]; i += 1
+        elif argv[i] == "--to" and i + 1 < len(argv):
+            opts["to"] = argv[i + 1]; i += 1
+        elif argv[i] == "--worktree":
+            opts["worktree"] = True
+        elif argv[i] == "--dry-run":
+            opts["dry_run"] = True
+        elif argv[i] == "--mt" and i + 1 < len(argv):
+            opts["mt"] = argv[i + 1]; i += 1
+        i += 1
+    return opts
+
+
+def git(*args, input: str = None) -> str:
+    return subprocess.run(["git", "-C", str(REPO), *args], input=input, capture_output=True,
+                          text=True, check=True).stdout
+
+
+def rev_parse(rev: str) -> str:
+    """Commit hash for `rev`, or None when it does not exist."""
+    try:
+        return git("rev-parse", "--verify", "--quiet", f"{rev}^{{commit}}").strip() or None
+    except subprocess.CalledProcessError:
+        return None
+
+
+def tree_blobs(rev: str) -> dict:
+    """{file name: blob hash} of the ru/*.md chapters at a commit."""
+    blobs = {}
+    for entry in git("ls-tree", "-z", rev, "--", "ru/").split("\0"):
+        meta, _, path = entry.partition("\t")
+        if path.endswith(".md") and path.count("/") == 1:
+            blobs[path[3:]] = meta.split()[2]
+    return blobs
+
+
+def worktree_blobs() -> dict:
+    """{file name: blob hash} of the ru/*.md chapters on disk."""
+    files = sorted(RU_DIR.glob("*.md"))
+    if not files:
+        return {}
+    hashes = git("hash-object", "--stdin-paths", input="".join(f"{f}\n" for f in files)).split()
+    return {f.name: h for f, h in zip(files, hashes)}
+
+
+def read_blobs(hashes: list) -> dict:
+    """{blob hash: text} for many blobs through one `git cat-file --batch`."""
+    if not hashes:
+        return {}
+    out = subprocess.run(["git", "-C", str(REPO), "cat-file", "--batch"],
+                         input="".join(f"{h}\n" for h in hashes).encode(),
+                         capture_output=True, check=True).stdout
+    texts, pos = {}, 0
+    while pos < len(out):
+        end = out.index(b"\n", pos)
+        header = out[pos:end].split()
+        pos = end + 1
+        if header[-1] == b"missing":
+            continue
+        size = int(header[2])
+        texts[header[0].decode()] = out[pos:pos + size].decode("utf-8")
+        pos += size + 1  # content is followed by a newline
+    return texts
+
+
 def get_diff(old_text: str, new_text: str) -> dict:
     """Return dict with 'added' and 'removed' lines."""
     old_lines = old_text.splitlines()
     new_lines = new_text.splitlines()
-    
-    matcher = difflib.SequenceMatcher(None, old_lines, new_lines)
+
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
     added = []
     removed = []
-    
+
     for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-        if tag == 'replace':
+        if tag in ('replace', 'delete'):
             removed.extend(old_lines[i1:i2])
+        if tag in ('replace', 'insert'):
             added.extend(new_lines[j1:j2])
-        elif tag == 'delete':
-            removed.extend(old_lines[i1:i2])
-        elif tag == 'insert':
-            added.extend(new_lines[j1:j2])
-    
+
     return {"added": added, "removed": removed}
 
-def sync_file(filename: str, ru_content: str, old_ru_content: str = ""):
-    """Sync one file to all languages."""
-    if not old_ru_content:
-        print(f"  [NEW FILE] {filename}")
-        return
-    
-    diff = get_diff(old_ru_content, ru_content)
-    removed = diff["removed"]
-    added = diff["added"]
-    
-    print(f"  {filename}: +{len(added)} lines, -{len(removed)} lines")
-    
-    for lang, lang_dir in LANG_DIRS.items():
-        if not lang_dir.exists():
-            continue
-            
+
+def apply_removals(text: str, removed: list) -> tuple:
+    """Drop removed lines from a translation → (new text, lines dropped).
+
+    Each removed line is dropped as many times as it left the Russian
+    file; blank lines are never dropped (paragraph breaks are not content).
+    """
+    todo = Counter(l for l in removed if l.strip())
+    if not todo:
+        return text, 0
+    kept = []
+    for line in text.splitlines(keepends=True):
+        key = line.rstrip("\r\n")
+        if todo.get(key):
+            todo[key] -= 1
+        else:
+            kept.append(line)
+    new_text = "".join(kept)
+    return new_text, len(text.splitlines()) - len(new_text.splitlines())
+
+
+def sync_lang(lang: str, lang_dir: Path, diffs: dict, dry_run: bool) -> list:
+    """Apply every chapter diff to one language → report lines."""
+    report = []
+    for filename, diff in diffs.items():
         target = lang_dir / filename
         if not target.exists():
-            print(f"    [{lang}] FILE NOT FOUND: {filename}")
+            report.append(f"    [{lang}] FILE NOT FOUND: {filename}")
             continue
-        
         content = target.read_text()
-        lines = content.splitlines()
-        
-        # Remove deleted lines (exact match)
-        if removed:
-            new_lines = [l for l in lines if l not in removed]
-            if len(new_lines) != len(lines):
-                print(f"    [{lang}] Removed {len(lines) - len(new_lines)} lines")
-                content = "\n".join(new_lines)
-        
-        # TODO: Translate added lines (need AI)
-        if added:
-            print(f"    [{lang}] +{len(added)} lines need translation")
-        
-        target.write_text(content)
-
-def main():
+        new_content, dropped = apply_removals(content, diff["removed"])
+        if dropped:
+            report.append(f"    [{lang}] {filename}: removed {dropped} lines")
+            if not dry_run:
+                target.write_text(new_content)
+        if diff["added"]:
+            report.append(f"    [{lang}] {filename}: +{len(diff['added'])} lines need translation")
+    return report
+
+
+def main(argv: list):
+    opts = parse_args(argv)
+    cache = BuildCache()
     print("=== Translation Sync ===")
-    # TODO: Get previous version from git
-    # For now, just list files
-    print(f"RU files: {len(list(RU_DIR.glob('*.md')))}")
-    for lang, d in LANG_DIRS.items():
-        if d.exists():
-            print(f"{lang}: {len(list(d.glob('*.md')))} files")
+    to = None if opts["worktree"] else rev_parse(opts["to"])
+    if not opts["worktree"] and not to:
+        sys.exit(f"⚠️  Unknown revision: {opts['to']}")
+    since_rev = opts["since"] or cache.stamp("sync:ru") or ("HEAD" if opts["worktree"] else f"{to}~1")
+    since = rev_parse(since_rev)
+    if not since:
+        sys.exit(f"⚠️  Unknown revision: {since_rev}")
+
+    old = tree_blobs(since)
+    new = worktree_blobs() if opts["worktree"] else tree_blobs(to)
+    changed = sorted(f for f, h in new.items() if old.get(f) != h)
+    for f in sorted(set(old) - set(new)):
+        print(f"  [DELETED] {f}")
+    print(f"RU: {len(new)} files, {len(changed)} changed since {since[:10]}")
+
+    texts = read_blobs([old[f] for f in changed if f in old] +
+                       ([] if opts["worktree"] else list(new.values())))
+    diffs = {}
+    for f in changed:
+        if f not in old:
+            print(f"  [NEW FILE] {f}")
+            continue
+        new_text = (RU_DIR / f).read_text() if opts["worktree"] else texts[new[f]]
+        diff = get_diff(texts[old[f]], new_text)
+        print(f"  {f}: +{len(diff['added'])} lines, -{len(diff['removed'])} lines")
+        if diff["added"] or diff["removed"]:
+            diffs[f] = diff
+
+    langs = {lang: d for lang, d in LANG_DIRS.items() if d.exists()}
+    index, tm = AlignmentIndex(), TranslationMemory()
+    # Learn the pairs as of the last sync, before this edit makes them stale
+    ru_texts = {f: (RU_DIR / f).read_text() if opts["worktree"] else texts[h] for f, h in new.items()}
+    tm.learn(index, {**ru_texts, **{f: texts[old[f]] for f in diffs}}, langs)
+    if diffs and langs:
+        with ThreadPoolExecutor(max_workers=len(langs)) as pool:
+            reports = pool.map(lambda item: sync_lang(*item, diffs, opts["dry_run"]), langs.items())
+            for report in reports:
+                for line in report:
+                    print(line)
+
+    stale = refresh(index, ru_texts, langs)
+    for (lang, f), ranges in sorted(stale.items()):
+        lines = ", ".join(f"{a}-{b}" if a != b else str(a) for a, b in ranges)
+        print(f"    [{lang}] {f}: {len(ranges)} stale paragraphs (lines {lines})")
+    mt = command_mt(opts["mt"]) if opts["mt"] else None
+    filled = False
+    for f in diffs:
+        for lang, d in langs.items():
+            if (d / f).is_file():
+                report = fill(index, tm, f, ru_texts[f], lang, d / f, not opts["dry_run"], mt)
+                filled |= any(line.endswith("applied") for line in report)
+                for line in report:
+                    print(line)
+    if filled:
+        refresh(index, ru_texts, langs)
+    for db in (index, tm):
+        db.rollback() if opts["dry_run"] else db.commit()
+        db.close()
+
+    if to and not opts["dry_run"]:
+        cache.set_stamp("sync:ru", to)
+        cache.save()
+    print(f"✅ Synced {len(diffs)} files to {len(langs)} languages" +
+          (" (dry run)" if opts["dry_run"] else ""))
+
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])
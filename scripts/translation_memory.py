@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""Translation memory for new and reworded Russian paragraphs.
+
+Every one-to-one paragraph pair in the alignment index (alignment.py)
+becomes a unit: Russian source → translation, keyed per language by a
+hash of the normalized source (case, ё/е, quotes and dashes, Markdown
+emphasis and whitespace do not matter). Sources also get a MinHash
+signature over character trigrams, banded into LSH buckets, so a
+reworded paragraph finds its closest old version without comparing it to
+the whole book.
+
+Lookups: an exact normalized match is applied as is; a fuzzy match
+(trigram Jaccard ≥ FUZZY) is offered as a suggestion; anything else can
+go to a local MT command (--mt "cmd {lang}", or $AUTONOM_MT), which reads
+the Russian paragraph on stdin and prints the translation.
+
+The memory lives in SQLite next to the build cache and only re-learns
+chapters whose Russian text or translation changed.
+
+Usage:
+    python3 scripts/translation_memory.py [--lang L] [--mt CMD] [--apply] [chapter.md ...]
+
+Lists (and with --apply fills in) stale and untranslated paragraphs.
+"""
+
+import hashlib, os, random, re, shlex, sqlite3, subprocess, sys, unicodedata
+from collections import Counter
+from pathlib import Path
+
+from alignment import AlignmentIndex, blob_hash, paragraphs, refresh
+from build_cache import CACHE_DIR
+
+TM_FILE = CACHE_DIR / "tm.sqlite"
+FUZZY = 0.6          # minimum trigram Jaccard for a suggestion
+NUM_PERM = 32        # MinHash signature length
+BANDS = 8            # LSH bands of NUM_PERM // BANDS rows (threshold ≈ FUZZY)
+LEARN_KINDS = {"p", "quote", "list", "h1", "h2", "h3", "h4", "code"}
+# XOR with fixed random masks stands in for NUM_PERM independent hash permutations
+_MASKS = [random.Random(i).getrandbits(64) for i in range(NUM_PERM)]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (hash TEXT PRIMARY KEY, text TEXT);
+CREATE TABLE IF NOT EXISTS buckets (band INTEGER, key INTEGER, hash TEXT, PRIMARY KEY (band, key, hash));
+CREATE TABLE IF NOT EXISTS units (lang TEXT, hash TEXT, target TEXT, PRIMARY KEY (lang, hash));
+CREATE TABLE IF NOT EXISTS learned (lang TEXT, name TEXT, blobs TEXT, PRIMARY KEY (lang, name));
+"""
+
+_PUNCT = str.maketrans({"ё": "е", "«": '"', "»": '"', "„": '"', "“": '"', "”": '"', "—": "-", "–": "-",
+                        "’": "'", "\u00a0": " "})
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFC", text).lower().translate(_PUNCT)
+    text = re.sub(r"[*_`]+", "", text)
+    return " ".join(text.split())
+
+
+def source_hash(text: str) -> str:
+    return hashlib.sha1(normalize(text).encode()).hexdigest()[:16]
+
+
+def trigrams(norm: str) -> set:
+    padded = f" {norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def signature(grams: set) -> list:
+    base = [int.from_bytes(hashlib.blake2b(g.encode(), digest_size=8).digest(), "little") for g in grams]
+    return [min(map(mask.__xor__, base)) if base else 0 for mask in _MASKS]
+
+
+def band_keys(sig: list) -> list:
+    rows = NUM_PERM // BANDS
+    return [int.from_bytes(hashlib.blake2b(repr(sig[i:i + rows]).encode(), digest_size=7).digest(), "little")
+            for i in range(0, NUM_PERM, rows)]
+
+
+def command_mt(cmd: str):
+    """MT backend running `cmd` ({lang} is substituted) with the paragraph on stdin."""
+    def translate(text: str, lang: str) -> str:
+        out = subprocess.run(shlex.split(cmd.format(lang=lang)), input=text, capture_output=True,
+                             text=True, check=True, timeout=120).stdout.strip()
+        return out or None
+    return translate
+
+
+class TranslationMemory:
+    def __init__(self, path: Path = TM_FILE):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path))
+        self.db.executescript(SCHEMA)
+
+    def add(self, lang: str, source: str, target: str):
+        h = source_hash(source)
+        if not self.db.execute("SELECT 1 FROM sources WHERE hash=?", (h,)).fetchone():
+            self.db.execute("INSERT INTO sources VALUES (?, ?)", (h, source))
+            keys = band_keys(signature(trigrams(normalize(source))))
+            self.db.executemany("INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)",
+                                [(band, key, h) for band, key in enumerate(keys)])
+        self.db.execute("INSERT OR REPLACE INTO units VALUES (?, ?, ?)", (lang, h, target))
+
+    def lookup(self, lang: str, source: str) -> tuple:
+        """(score, old source, translation) of the best match, or None.
+
+        Score 1.0 is an exact normalized match.
+        """
+        h = source_hash(source)
+        row = self.db.execute("SELECT s.text, u.target FROM units u JOIN sources s ON s.hash=u.hash "
+                              "WHERE u.lang=? AND u.hash=?", (lang, h)).fetchone()
+        if row:
+            return 1.0, row[0], row[1]
+        grams = trigrams(normalize(source))
+        hashes = set()
+        for band, key in enumerate(band_keys(signature(grams))):
+            hashes.update(h for h, in self.db.execute(
+                "SELECT hash FROM buckets WHERE band=? AND key=?", (band, key)))
+        candidates = [row for h in hashes for row in self.db.execute(
+            "SELECT s.text, u.target FROM units u JOIN sources s ON s.hash=u.hash "
+            "WHERE u.lang=? AND u.hash=?", (lang, h))]
+        best = max(((jaccard(grams, trigrams(normalize(src))), src, tgt) for src, tgt in candidates),
+                   default=None)
+        return best if best and best[0] >= FUZZY else None
+
+    def learn(self, index: AlignmentIndex, ru_texts: dict, lang_dirs: dict) -> int:
+        """Record every aligned, non-stale paragraph pair → units added."""
+        added = 0
+        for name, ru_text in sorted(ru_texts.items()):
+            ru_paras = None
+            for lang, d in lang_dirs.items():
+                tr_file = d / name
+                if not tr_file.is_file():
+                    continue
+                tr_text = tr_file.read_text()
+                blobs = f"{blob_hash(ru_text)}:{blob_hash(tr_text)}"
+                if blobs != f"{index.blob('ru', name)}:{index.blob(lang, name)}":
+                    continue  # the index is behind this text; refresh() first
+                seen = self.db.execute("SELECT blobs FROM learned WHERE lang=? AND name=?",
+                                       (lang, name)).fetchone()
+                if seen and seen[0] == blobs:
+                    continue
+                ru_paras = ru_paras or paragraphs(ru_text)
+                tr_paras = paragraphs(tr_text)
+                pairs = index.pairs(lang, name)
+                shared = {j for j, n in Counter(j for _, j in pairs).items() if n > 1}
+                for i, j in pairs:
+                    src, tgt = ru_paras[i], tr_paras[j]
+                    if j in shared or src[0] != tgt[0] or src[0] not in LEARN_KINDS:
+                        continue
+                    self.add(lang, src[3], tgt[3])
+                    added += 1
+                self.db.execute("INSERT OR REPLACE INTO learned VALUES (?, ?, ?)", (lang, name, blobs))
+        return added
+
+    def commit(self):
+        self.db.commit()
+
+    def rollback(self):
+        self.db.rollback()
+
+    def close(self):
+        self.db.close()
+
+
+def fill(index: AlignmentIndex, tm: "TranslationMemory", name: str, ru_text: str, lang: str,
+         tr_file: Path, apply: bool = False, mt=None) -> list:
+    """Look up every stale or untranslated paragraph of one chapter → report lines.
+
+    With `apply`, exact matches replace stale paragraphs or are inserted
+    after the previous paragraph's counterpart; fuzzy and MT results are
+    only reported.
+    """
+    ru_paras = paragraphs(ru_text)
+    by_line = {p[1]: i for i, p in enumerate(ru_paras)}
+    todo = [(by_line.get(ru_start), (start, end))
+            for _, _, start, end, ru_start, _ in index.stale(lang, name)]
+    todo += [(by_line.get(ru_start), None) for _, _, ru_start, _ in index.missing(lang, name)]
+    report, edits = [], []
+    for i, where in todo:
+        if i is None:
+            continue
+        kind, ru_start, ru_end, source = ru_paras[i]
+        what = f"{lang}/{name}:{where[0]}" if where else f"{lang}/{name} (ru {ru_start})"
+        match = tm.lookup(lang, source)
+        if match and match[0] == 1.0:
+            report.append(f"    [{lang}] {name}: ru {ru_start}-{ru_end} exact TM match"
+                          + (", applied" if apply else ""))
+            if apply:
+                edits.append((i, where, match[2]))
+        elif match:
+            report.append(f"    [{lang}] {name}: ru {ru_start}-{ru_end} ≈ {match[0]:.0%} TM match → "
+                          f"{match[2][:70]}{'…' if len(match[2]) > 70 else ''}")
+        elif mt:
+            try:
+                out = mt(source, lang)
+            except (OSError, subprocess.SubprocessError) as e:
+                out = None
+                report.append(f"    ⚠️  MT failed for {what}: {e}")
+            if out:
+                report.append(f"    [{lang}] {name}: ru {ru_start}-{ru_end} MT → "
+                              f"{out[:70]}{'…' if len(out) > 70 else ''}")
+        else:
+            report.append(f"    [{lang}] {name}: ru {ru_start}-{ru_end} needs translation")
+    if edits:
+        lines = tr_file.read_text().splitlines(keepends=True)
+        # Bottom-up, so earlier line numbers stay valid
+        placed = []
+        for i, where, target in edits:
+            if where:
+                placed.append((where[0], where[1], target + "\n"))
+                continue
+            after = next((index.counterpart(lang, name, k)[-1][1] for k in range(i - 1, -1, -1)
+                          if index.counterpart(lang, name, k)), 0)
+            placed.append((after + 1, after, "\n" + target + "\n" if after else target + "\n\n"))
+        for start, end, text in sorted(placed, key=lambda e: (e[0], e[1]), reverse=True):
+            lines[start - 1:end] = [text]
+        tr_file.write_text("".join(lines))
+    return report
+
+
+def main(argv: list):
+    sys.path.insert(0, str(Path(__file__).parent))
+    from importlib import import_module
+    sync = import_module("sync-translations")
+    lang = argv[argv.index("--lang") + 1] if "--lang" in argv and argv.index("--lang") + 1 < len(argv) else None
+    mt_cmd = argv[argv.index("--mt") + 1] if "--mt" in argv and argv.index("--mt") + 1 < len(argv) \
+        else os.environ.get("AUTONOM_MT")
+    apply = "--apply" in argv
+    names = [a for a in argv if a.endswith(".md")]
+    langs = {l: d for l, d in sync.LANG_DIRS.items() if d.exists() and (not lang or l == lang)}
+    ru_texts = {f.name: f.read_text() for f in sync.RU_DIR.glob("*.md")}
+
+    index, tm = AlignmentIndex(), TranslationMemory()
+    refresh(index, ru_texts, sync.LANG_DIRS)
+    learned = tm.learn(index, ru_texts, sync.LANG_DIRS)
+    if learned:
+        print(f"📚 Learned {learned} paragraph pairs")
+    mt = command_mt(mt_cmd) if mt_cmd else None
+    for name in names or sorted(ru_texts):
+        for l, d in langs.items():
+            if (d / name).is_file():
+                for line in fill(index, tm, name, ru_texts[name], l, d / name, apply, mt):
+                    print(line)
+    if apply:
+        refresh(index, ru_texts, sync.LANG_DIRS)
+    index.commit()
+    tm.commit()
+    index.close()
+    tm.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
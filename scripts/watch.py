@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""File watching for `compile_v2.py --watch`.
+
+Watcher reports changed files under a set of directories. It uses Linux
+inotify through ctypes (no extra packages) and falls back to polling
+mtimes where inotify is unavailable. Editors that save through a temp
+file and rename are covered because whole directories are watched, not
+single inodes.
+
+BackgroundJob runs one render at a time in a forked process group and
+kills the whole group (pool workers included) when a newer change makes
+its result stale.
+"""
+
+import ctypes, ctypes.util, multiprocessing, os, select, signal, struct, time
+from pathlib import Path
+
+DEBOUNCE = 0.08   # quiet time that ends a burst of saves
+MAX_BURST = 1.0   # rebuild anyway after this long
+POLL_INTERVAL = 0.25
+
+IN_ATTRIB, IN_CLOSE_WRITE = 0x004, 0x008
+IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x040, 0x080, 0x100, 0x200
+_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE | IN_ATTRIB
+_EVENT = struct.Struct("iIII")
+
+
+class Watcher:
+    """Changed paths under `dirs` accepted by `wanted(path)`."""
+
+    def __init__(self, dirs, wanted, poll: bool = False):
+        self.dirs = sorted({Path(d).resolve() for d in dirs if Path(d).is_dir()})
+        self.wanted = wanted
+        self.fd, self.wds = None, {}
+        if not poll:
+            self._init_inotify()
+        self.backend = "inotify" if self.fd is not None else "polling"
+        if self.fd is None:
+            self.snapshot = self._scan()
+
+    def _init_inotify(self):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return
+        if fd < 0:
+            return
+        for d in self.dirs:
+            wd = libc.inotify_add_watch(fd, os.fsencode(d), _MASK)
+            if wd < 0:  # e.g. out of watches: poll everything instead
+                os.close(fd)
+                self.wds = {}
+                return
+            self.wds[wd] = d
+        self.fd = fd
+
+    def _scan(self) -> dict:
+        state = {}
+        for d in self.dirs:
+            try:
+                entries = list(os.scandir(d))
+            except OSError:
+                continue
+            for e in entries:
+                path = Path(e.path)
+                if self.wanted(path):
+                    try:
+                        st = e.stat()
+                    except OSError:
+                        continue
+                    state[path] = (st.st_mtime_ns, st.st_size)
+        return state
+
+    def _read(self, timeout: float) -> set:
+        """One batch of changed paths, waiting at most `timeout` seconds."""
+        if self.fd is None:
+            time.sleep(min(timeout, POLL_INTERVAL))
+            now = self._scan()
+            changed = {p for p in now.keys() | self.snapshot.keys()
+                       if now.get(p) != self.snapshot.get(p)}
+            self.snapshot = now
+            return changed
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+        data, changed = os.read(self.fd, 64 * 1024), set()
+        pos = 0
+        while pos < len(data):
+            wd, _mask, _cookie, size = _EVENT.unpack_from(data, pos)
+            name = data[pos + _EVENT.size:pos + _EVENT.size + size].rstrip(b"\0")
+            pos += _EVENT.size + size
+            if name and wd in self.wds:
+                path = self.wds[wd] / os.fsdecode(name)
+                if self.wanted(path):
+                    changed.add(path)
+        return changed
+
+    def wait(self, timeout: float = None) -> set:
+        """Block until something changes, then collect the whole burst."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changed = set()
+        while not changed:
+            left = 3600.0 if deadline is None else deadline - time.monotonic()
+            if left <= 0:
+                return changed
+            changed = self._read(min(left, 1.0))
+        burst_end = time.monotonic() + MAX_BURST
+        while time.monotonic() < burst_end:
+            more = self._read(DEBOUNCE)
+            if not more:
+                break
+            changed |= more
+        return changed
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def _in_own_group(target, *args):
+    os.setpgrp()
+    target(*args)
+
+
+class BackgroundJob:
+    """At most one forked render at a time; start() cancels the previous one."""
+
+    def __init__(self):
+        self.ctx = multiprocessing.get_context("fork")
+        self.proc, self.label, self.started = None, "", 0.0
+
+    def start(self, label: str, target, *args):
+        self.cancel()
+        self.proc = self.ctx.Process(target=_in_own_group, args=(target, *args))
+        self.label, self.started = label, time.perf_counter()
+        self.proc.start()
+
+    def cancel(self):
+        if self.proc and self.proc.is_alive():
+            try:
+                os.killpg(self.proc.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            self.proc.join()
+            print(f"   ⏹  {self.label} cancelled")
+        self.proc = None
+
+    def poll(self):
+        """Report a finished render once."""
+        if self.proc and not self.proc.is_alive():
+            secs = time.perf_counter() - self.started
+            if self.proc.exitcode == 0:
+                print(f"   ✅ {self.label} done in {secs:.2f}s")
+            else:
+                print(f"   ⚠️  {self.label} failed (exit {self.proc.exitcode})")
+            self.proc = None
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""Static web edition: one small HTML page per chapter.
+
+The assembled Markdown is cut at the headings compile_v2 writes for the
+chapters.json entries, the appendix title and the glossary, so every
+entry gets its own page named after its file (last-checkpoint.html),
+the front matter with the table of contents is index.html and the
+glossary glossary.html. Pages carry prev/next links worked out at build
+time and <link rel=prefetch> for the next page; glossary links point
+into glossary.html.
+
+The stylesheet is novel.css without its print rules plus a few screen
+rules, minified and named by its content hash (novel.1a2b3c4d.css), so
+it can be cached for good and is shared by every language. A page is
+written only when its hash changed; pages that are gone are removed.
+Their .gz/.br/.zst variants come from the precompress stage that runs
+over the whole output directory after the build.
+"""
+
+import hashlib, html, re
+from dataclasses import dataclass
+from pathlib import Path
+
+from book_config import LangConfig
+from build_cache import BuildCache, content_key
+from doctree import parse
+from md2html import VERSION as HTML_VERSION, render
+from precompress import ALL_VARIANTS
+from textmap import replacer
+
+# Bump the first number when the pages change; covers md2html's too
+VERSION = f"1/{HTML_VERSION}"
+CONTENTS = {"ru": "Оглавление"}
+_LINK = re.compile(r"\[([^\]]*)\]\([^)\s]*\)")
+_HEADING = re.compile(r"^#{1,2} .*$", re.MULTILINE)
+_ID = re.compile(r'\sid="([^"]+)"')
+_LOCAL_HREF = re.compile(r'href="#([^"]+)"')
+_RULE = re.compile(r"\A(?:\s*(?:-{3,}|\*{3,})[ \t]*\n)+|(?:\n[ \t]*(?:-{3,}|\*{3,}))+\s*\Z")
+_PRE = re.compile(r"(<pre\b.*?</pre>)", re.DOTALL)
+_BLOCK_GAP = re.compile(r"\s*(</?(?:html|head|body|meta|link|title|main|nav|ol|ul|li|p|h[1-6]|blockquote|hr|pre)"
+                        r"\b[^>]*>)\s*")
+# Print-only parts of novel.css
+_AT_PAGE = re.compile(r"@page[^{]*\{(?:[^{}]|\{[^{}]*\})*\}")
+_PRINT_PROPS = re.compile(r"\s*(?:page-break-[a-z]+|break-[a-z]+|orphans|widows)\s*:[^;}]*;?")
+SCREEN_CSS = """
+body { max-width: 38em; margin: 0 auto; padding: 1em 1.2em; }
+p { text-align: left; }
+nav.pager { display: flex; justify-content: space-between; gap: 1em; margin: 1.5em 0; font-size: 0.9em; }
+nav.pager a { color: #444; }
+ol.toc { line-height: 1.9; }
+pre { overflow-x: auto; }
+"""
+
+
+@dataclass(slots=True)
+class Page:
+    name: str       # file name without .html
+    title: str
+    md: str = ""
+
+
+def _plain(line: str) -> str:
+    return _LINK.sub(r"\1", line).rstrip()
+
+
+def book_pages(md: str, cfg: LangConfig, present: set) -> list:
+    """The book cut into [Page]: front matter, one per entry with a source, glossary."""
+    fix = replacer(cfg.lang, cfg.replacements)
+    anchors = []
+    for ch in cfg.chapters:
+        if ch.file in present:
+            heading = ch.title if not ch.number else f"{ch.number}: {ch.title}"
+            anchors.append((Page(ch.file, heading), f"## {heading}"))
+    # The first appendix page opens with the appendix title (compile_v2's default if unset)
+    opening = _HEADING.search(cfg.appendix_title if cfg.appendix_title is not None else "# Приложение")
+    for i, ch in enumerate(ch for ch in cfg.appendix if ch.file in present):
+        anchors.append((Page(ch.file, ch.title), opening.group(0) if i == 0 and opening else f"## {ch.title}"))
+    glossary = _HEADING.search(cfg.glossary or "")
+    if glossary:
+        anchors.append((Page("glossary", glossary.group(0).lstrip("#").strip()), glossary.group(0)))
+    anchors = [(page, _plain(fix(line))) for page, line in anchors]
+
+    pages, cur, lines, fence, k = [Page("index", cfg.title)], 0, md.split("\n"), False, 0
+    starts = []
+    for n, line in enumerate(lines):
+        if line.startswith("```"):
+            fence = not fence
+        if fence or not line.startswith("#"):
+            continue
+        plain = _plain(line)
+        for j in range(k, len(anchors)):
+            if anchors[j][1] == plain:
+                starts.append((n, anchors[j][0]))
+                k = j + 1
+                break
+    for n, page in starts:
+        pages[-1].md = "\n".join(lines[cur:n])
+        pages.append(page)
+        cur = n
+    pages[-1].md = "\n".join(lines[cur:])
+    for page in pages:
+        page.md = _RULE.sub("", page.md.strip("\n")).strip("\n") + "\n"
+    return pages
+
+
+def web_css(css_file: Path) -> bytes:
+    """novel.css for screens, minified."""
+    css = _AT_PAGE.sub("", css_file.read_text(encoding="utf-8")) + SCREEN_CSS
+    css = _PRINT_PROPS.sub("", re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL))
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{}:;,>])\s*", r"\1", css).replace(";}", "}")
+    return re.sub(r"[^{}]+\{\}", "", css).strip().encode()
+
+
+def minify(page: str) -> str:
+    """Whitespace between blocks dropped, runs collapsed; <pre> kept as is."""
+    out = []
+    for i, piece in enumerate(_PRE.split(page)):
+        if i % 2:
+            out.append(piece)
+        else:
+            out.append(_BLOCK_GAP.sub(r"\1", re.sub(r"[ \t\r\n]+", " ", piece)))
+    return "".join(out)
+
+
+def _pager(lang: str, prev: Page, next_: Page) -> str:
+    link = lambda page, rel, text: f'<a rel="{rel}" href="{page.name}.html">{text}</a>' if page else "<span></span>"
+    return (f'<nav class="pager">{link(prev, "prev", "← " + html.escape(prev.title) if prev else "")}'
+            f'<a href="index.html">{CONTENTS.get(lang, "Contents")}</a>'
+            f'{link(next_, "next", html.escape(next_.title) + " →" if next_ else "")}</nav>')
+
+
+def _document(title: str, lang: str, css: str, body: str, prefetch: str = None) -> str:
+    head = f'<link rel="prefetch" href="{prefetch}">' if prefetch else ""
+    return minify(f'<!DOCTYPE html>\n<html lang="{lang}">\n<head>\n<meta charset="utf-8">\n'
+                  f'<meta name="viewport" content="width=device-width, initial-scale=1">\n'
+                  f"<title>{html.escape(title)}</title>\n<link rel=\"stylesheet\" href=\"{css}\">\n{head}\n"
+                  f"</head>\n<body>\n{body}\n</body>\n</html>\n")
+
+
+def write_file(path: Path, data: bytes, cache: BuildCache, stamp: str) -> bool:
+    """Write `path` unless the stamped hash says it is current."""
+    digest = hashlib.sha256(data).hexdigest()
+    if cache.stamp(stamp) == digest and path.exists():
+        return False
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+    cache.set_stamp(stamp, digest)
+    return True
+
+
+def write_web(md: str, cfg: LangConfig, present: set, out_dir: Path, css_file: Path,
+              cache: BuildCache) -> tuple:
+    """Write the pages to out_dir/{lang}/, the stylesheet to out_dir → (pages, files written)."""
+    lang = cfg.lang
+    page_dir = Path(out_dir) / lang
+    page_dir.mkdir(parents=True, exist_ok=True)
+    css = web_css(css_file)
+    css_name = f"novel.{hashlib.sha256(css).hexdigest()[:8]}.css"
+    written = write_file(Path(out_dir) / css_name, css, cache, f"web:{css_name}")
+    for old in Path(out_dir).glob("novel.*.css*"):
+        if not old.name.startswith(css_name):
+            old.unlink()
+
+    pages = book_pages(md, cfg, present)
+    bodies = []
+    for page in pages:
+        key = content_key("web-html", HTML_VERSION, page.md)
+        body = cache.get_text(key)
+        if body is None:
+            body = render(parse(page.md), {})
+            cache.put_text(key, body)
+        bodies.append(body)
+    where = {}  # id → page, first definition wins
+    for page, body in zip(pages, bodies):
+        for anchor in _ID.findall(body):
+            where.setdefault(anchor, page.name)
+
+    keep = set()
+    for i, (page, body) in enumerate(zip(pages, bodies)):
+        own = set(_ID.findall(body))
+        body = _LOCAL_HREF.sub(lambda m: m.group(0) if m.group(1) in own or m.group(1) not in where
+                               else f'href="{where[m.group(1)]}.html#{m.group(1)}"', body)
+        if page.name == "index":
+            toc = "".join(f'<li><a href="{p.name}.html">{html.escape(p.title)}</a></li>' for p in pages[1:])
+            body += f'\n<ol class="toc">{toc}</ol>'
+        prev = pages[i - 1] if i else None
+        next_ = pages[i + 1] if i + 1 < len(pages) else None
+        nav = _pager(lang, prev, next_)
+        title = cfg.title if page.name == "index" else f"{page.title} — {cfg.title}"
+        doc = _document(title, lang, f"../{css_name}", f"{nav}\n<main>\n{body}\n</main>\n{nav}",
+                        f"{next_.name}.html" if next_ else None)
+        path = page_dir / f"{page.name}.html"
+        written += write_file(path, doc.encode(), cache, f"web:{lang}:{page.name}")
+        keep |= {path.name} | {path.name + s for s in ALL_VARIANTS}
+    for old in page_dir.iterdir():
+        if old.name not in keep:
+            old.unlink()
+    return len(pages), written